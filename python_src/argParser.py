@@ -94,7 +94,8 @@ def argParser():
 				3: ProxSpiderBoost\n\
 				4: ProxSVRG\n\
 				5: ProxSGD\n\
-				6: ProxGD\
+				6: ProxGD\n\
+				7: ProxSAGA\
 				")
 
 	ap.add_argument("-so", "--ProxSARAHOption", required=False,
@@ -118,6 +119,77 @@ def argParser():
 	ap.add_argument("-id", "--identification", required=False,
 		help="unique ID number")
 
+	ap.add_argument("-sm", "--sampling", required=False,
+		help="mini-batch sampling mode:\n\
+				without_replacement: distinct indices in each mini-batch (default)\n\
+				with_replacement: independent uniform indices\n\
+				shuffled_epoch: read mini-batches from a random permutation redrawn every epoch\n\
+				shuffled_contiguous: permute the data every epoch and read contiguous mini-batches\n\
+				importance: draw samples with probability proportional to their Lipschitz constants\
+				")
+
+	ap.add_argument("-sd", "--seed", required=False,
+		help="seed of the mini-batch sampler")
+
+	ap.add_argument("-lz", "--lazy", required=False,
+		help="1: lazy l1 proximal updates in the single-sample ProxSARAH, ProxSVRG and ProxSGD (sparse data)\n\
+			  0: dense updates (default)\
+			  ")
+
+	ap.add_argument("-nw", "--workers", required=False,
+		help="number of worker processes sharing the train data to compute full gradients (default 1: serial)")
+
+	ap.add_argument("-mem", "--membudget", required=False,
+		help="memory budget in GB for the row chunks processed by the gradient oracles (default 1)")
+
+	ap.add_argument("-pr", "--precision", required=False, choices=['float64', 'float32'],
+		help="floating point precision of the data and iterates: float64 (default) or float32")
+
+	ap.add_argument("-bt", "--batched", required=False,
+		help="1: run ProxSARAH-v1/v2 and ProxSARAH-v3/v4 as batched sweeps sharing the passes over the data\n\
+			  0: one run per option (default)\
+			  ")
+
+	ap.add_argument("-pj", "--parallel", required=False,
+		help="number of worker processes running the selected methods concurrently on shared data (default 1: sequential)")
+
+	ap.add_argument("-hd", "--histdir", required=False,
+		help="directory the history of every run is saved to as a compressed .npz file with its metadata (default: not saved)")
+
+	ap.add_argument("-ck", "--checkpoint", required=False,
+		help="directory of the checkpoints of ProxSARAH, ProxSARAHAdaptive, ProxSpiderBoost and ProxSVRG, a run resumes from its last checkpoint there (default: no checkpoints)")
+
+	ap.add_argument("-ckf", "--checkpointfreq", required=False,
+		help="number of outer iterations between two checkpoints (default 1)")
+
+	ap.add_argument("-gt", "--gradtol", required=False,
+		help="stop a run once the squared norm of its gradient mapping is at most this tolerance (default: no tolerance)")
+
+	ap.add_argument("-tl", "--timelimit", required=False,
+		help="wall-clock budget of every run in seconds (default: no limit)")
+
+	ap.add_argument("-ta", "--testacc", required=False,
+		help="stop a run once its test accuracy reaches this target, binary classification only (default: no target)")
+
+	ap.add_argument("-pw", "--plateauwindow", required=False,
+		help="stop a run once its train loss did not improve by the plateau tolerance over this many logging points (default: no plateau detection)")
+
+	ap.add_argument("-pt", "--plateautol", required=False,
+		help="minimum relative improvement of the train loss over the plateau window (default 1e-4)")
+
+	ap.add_argument("-pf", "--profile", required=False,
+		help="profile the phases of the solver loops, print the per-phase summary and save a Chrome trace JSON file to this path (default: no profiling)")
+
+	ap.add_argument("-jit", "--jit", required=False,
+		help="1: run the single-sample ProxSARAH, ProxSVRG and ProxSGD inner loops with compiled kernels (needs numba)\n\
+			  0: numpy inner loops (default)\
+			  ")
+
+	ap.add_argument("-ooc", "--outofcore", required=False,
+		help="1: keep the dataset on disk as read-only maps of its cache and stream the passes over it (datasets larger than memory)\n\
+			  0: train on copy-on-write maps normalized in memory (default)\
+			  ")
+
 	# read arguments
 	args = ap.parse_args()
 
@@ -145,6 +217,82 @@ def argParser():
 	if args.loss:
 		prog_option["LossFunction"] = args.loss
 
+	prog_option["SamplingMode"] = 'without_replacement'
+	if args.sampling:
+		prog_option["SamplingMode"] = args.sampling
+
+	prog_option["Seed"] = 0
+	if args.seed:
+		prog_option["Seed"] = int(args.seed)
+
+	prog_option["LazyUpdate"] = 0
+	if args.lazy:
+		prog_option["LazyUpdate"] = int(args.lazy)
+
+	prog_option["NumWorkers"] = 1
+	if args.workers:
+		prog_option["NumWorkers"] = int(args.workers)
+
+	prog_option["MemBudget"] = 1.0
+	if args.membudget:
+		prog_option["MemBudget"] = float(args.membudget)
+
+	prog_option["Precision"] = 'float64'
+	if args.precision:
+		prog_option["Precision"] = args.precision
+
+	prog_option["Batched"] = 0
+	if args.batched:
+		prog_option["Batched"] = int(args.batched)
+
+	prog_option["NumParallel"] = 1
+	if args.parallel:
+		prog_option["NumParallel"] = int(args.parallel)
+
+	prog_option["HistDir"] = ''
+	if args.histdir:
+		prog_option["HistDir"] = args.histdir
+
+	prog_option["CheckpointDir"] = ''
+	if args.checkpoint:
+		prog_option["CheckpointDir"] = args.checkpoint
+
+	prog_option["CheckpointEvery"] = 1
+	if args.checkpointfreq:
+		prog_option["CheckpointEvery"] = int(args.checkpointfreq)
+
+	prog_option["GradMapTol"] = None
+	if args.gradtol:
+		prog_option["GradMapTol"] = float(args.gradtol)
+
+	prog_option["TimeLimit"] = None
+	if args.timelimit:
+		prog_option["TimeLimit"] = float(args.timelimit)
+
+	prog_option["TestAccTarget"] = None
+	if args.testacc:
+		prog_option["TestAccTarget"] = float(args.testacc)
+
+	prog_option["PlateauWindow"] = None
+	if args.plateauwindow:
+		prog_option["PlateauWindow"] = int(args.plateauwindow)
+
+	prog_option["PlateauTol"] = 1.0e-4
+	if args.plateautol:
+		prog_option["PlateauTol"] = float(args.plateautol)
+
+	prog_option["ProfilePath"] = ''
+	if args.profile:
+		prog_option["ProfilePath"] = args.profile
+
+	prog_option["JitInner"] = 0
+	if args.jit:
+		prog_option["JitInner"] = int(args.jit)
+
+	prog_option["OutOfCore"] = 0
+	if args.outofcore:
+		prog_option["OutOfCore"] = int(args.outofcore)
+
 	# get mini batch size
 	if args.batch:
 		prog_option["BatchSize"] = int(args.batch)
@@ -167,7 +315,8 @@ def argParser():
 					"ProxSpiderBoost"	:	0,
 					"ProxSVRG"			:	0,
 					"ProxSGD"			:	0,
-					"ProxGD"			:	0
+					"ProxGD"			:	0,
+					"ProxSAGA"			:	0
 					}
 
 	if args.algorithms:
@@ -195,6 +344,10 @@ def argParser():
 		    print ('Prox GD')
 		    alg_list["ProxGD"] = 1
 
+		if '7' in args.algorithms:
+		    print ('Prox SAGA')
+		    alg_list["ProxSAGA"] = 1
+
 		if '0' in args.algorithms:
 			print('Enable all algorithms')
 			alg_list["ProxSARAH"] 			= 1
@@ -203,6 +356,7 @@ def argParser():
 			alg_list["ProxSVRG"] 			= 1
 			alg_list["ProxSGD"] 			= 1
 			alg_list["ProxGD"] 				= 1
+			alg_list["ProxSAGA"] 			= 1
 
 	else:
 		print('No algorithm selected, running Prox SARAH')
@@ -0,0 +1,412 @@
+"""!@package benchmark_convergence
+
+Convergence-versus-time benchmark of the methods on a fixed dataset.
+
+Every selected method is run with the step sizes and batch sizes of binary_classification_example.py on a synthetic
+dataset (util_Synthetic) or on a dataset cached by import_data, and the training time it takes to reach given
+thresholds of the squared norm of the gradient mapping and of the train loss is reported per algorithm and batch size.
+The time spent in the logging passes (loss, accuracies, gradient mapping, printing) is excluded from the timed region:
+the runs enable a profiler recording only the 'log' phase (see util_Profiler) and read Profiler.elapsed('log') at
+every logging point. The thresholds are checked at the logging points, i.e. about once per epoch.
+
+The loss thresholds are absolute values (-lt) or fractions of the initial suboptimality (-lg): F <= F* + gap (F0 - F*),
+with F0 the train loss at the initial point and F* the best train loss reached by any of the runs. With several repeats the sampler seed changes between repeats, the data stays the same, and the table reports
+the medians. The results are saved as JSON, and -show prints the tables of saved results, e.g. of this benchmark and of
+tensorflow_src/benchmark_convergence.py, which writes the same format.
+
+Example: python benchmark_convergence.py -n 20000 -dim 500 -den 0.02 -ep 20 -a ProxSARAH-v2,ProxSVRG-mb
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+# import methods
+from method_ProxSARAH import prox_sarah
+from method_ProxSARAH_Adaptive import prox_sarah_adaptive
+from method_ProxSpiderBoost import prox_spbd
+from method_ProxSVRG import prox_svrg
+from method_ProxSGD import prox_sgd
+from method_ProxSAGA import prox_saga
+from method_ProxGD import prox_gd
+
+# import utility functions
+from util_Synthetic import synthetic_csr
+from util_Sampler import MinibatchSampler
+from util_History import HistoryRecorder
+from util_Stopping import StoppingPolicy
+from util_Profiler import enable_profiler, disable_profiler
+from util_ChunkPlan import set_mem_budget
+from util_Precision import precisions
+from util_BinClass import *
+from benchmark_oracles import machine_info
+
+## losses of the binary classification: function pointers and Lipschitz constant of f', as in the driver
+losses = {
+	'1': (func_val_bin_class_loss_1, grad_eval_bin_class_loss_1, grad_diff_eval_bin_class_loss_1, grad_coef_eval_bin_class_loss_1, \
+			8*(1+np.sqrt(3))*(2+np.sqrt(3))/(3 + np.sqrt(3))**3),
+	'2': (func_val_bin_class_loss_2, grad_eval_bin_class_loss_2, grad_diff_eval_bin_class_loss_2, grad_coef_eval_bin_class_loss_2, 0.15405),
+	'3': (func_val_bin_class_loss_3, grad_eval_bin_class_loss_3, grad_diff_eval_bin_class_loss_3, grad_coef_eval_bin_class_loss_3, 0.1),
+}
+
+class TimedHistory(HistoryRecorder):
+	"""! History also recording the training time at every logging point
+
+	Parameters
+	----------
+	@param profiler : Profiler recording the 'log' phase, started with the run
+	"""
+
+	def __init__(self, profiler):
+		HistoryRecorder.__init__(self)
+		self.profiler = profiler
+		## training time in seconds at every logging point, without the logging passes
+		self.times = []
+
+	def record(self, *args, **kwargs):
+		self.times.append(self.profiler.elapsed('log'))
+		HistoryRecorder.record(self, *args, **kwargs)
+
+def solver_configs(n, L):
+	"""! Runs of the benchmark, with the parameters binary_classification_example.py uses for batch size 1 and for its
+	mini-batch variants
+
+	Parameters
+	----------
+	@param n : number of train samples
+	@param L : Lipschitz constant of f'
+
+	Returns
+	-------
+	@retval : list of (name, algorithm, b, method, params, eta), params are the arguments of the method between
+		max_num_epoch and the function pointers, with 'w0', 'lamb' and 'eta_prime' standing for the initial point, the
+		regularization parameter and the second step size of ProxSGD
+	"""
+	# ProxSARAH, see the parameter selection of the driver
+	c, r = 0.01, 100.0
+	q = 2 + c + (1/r)
+	omega = (q**2 + 8) / (q**2)
+	gamma_const = np.array([0.5, 0.95, 0.99, 0.95, 0.99])
+	C_const = np.maximum(np.minimum((q**2) / ((q**2 + 8) * L**2 * gamma_const**2), 4), 0.5)
+
+	sarah_single_m = n
+	sarah_single_eta = 2 * np.sqrt(omega * n) / (q * np.sqrt(omega * n) + 1)
+	sarah_single_gamma = 1 / (L * np.sqrt(omega * n))
+	sarah_v2_b = max(int(int(n**0.5) / C_const[2]), 1)
+	sarah_v2_m = max(int(n / sarah_v2_b), 1)
+	sarah_v4_m = max(int(n**(1.0/3.0)), 1)
+	sarah_v4_b = max(int(int(n**(1.0/3.0)) / C_const[4]), 1)
+	sarah_eta = 2.0 / (q + gamma_const * L)
+
+	# ProxSARAH Adaptive
+	gamma_m = 0.99
+	eta_adaptive = 1.0 / (L * gamma_m)
+	adaptive_b = max(int(n**0.5), 1)
+
+	# ProxSpiderBoost
+	spdb_b = max(int(round(np.sqrt(n))), 1)
+
+	# mini-batch ProxSVRG and ProxSAGA
+	svrg_b = max(int(round(n**(2.0/3.0))), 1)
+	sgd_b = max(int(round(np.sqrt(n))), 1)
+
+	return [
+		('ProxSARAH-single', 'ProxSARAH', 1, prox_sarah, (sarah_single_m, 'w0', sarah_single_gamma, 'lamb', n, 1), sarah_single_eta),
+		('ProxSARAH-v2', 'ProxSARAH', sarah_v2_b, prox_sarah, (sarah_v2_m, 'w0', gamma_const[2], 'lamb', n, sarah_v2_b), sarah_eta[2]),
+		('ProxSARAH-v4', 'ProxSARAH', sarah_v4_b, prox_sarah, (sarah_v4_m, 'w0', gamma_const[4], 'lamb', n, sarah_v4_b), sarah_eta[4]),
+		('ProxSARAH-A-single', 'ProxSARAH-Adaptive', 1, prox_sarah_adaptive, (n, 'w0', L, gamma_m, 'lamb', n, 1), eta_adaptive),
+		('ProxSARAH-A-mb', 'ProxSARAH-Adaptive', adaptive_b, prox_sarah_adaptive, (max(int(n**0.5), 1), 'w0', L, gamma_m, 'lamb', n, adaptive_b), \
+			eta_adaptive),
+		('ProxSpiderBoost', 'ProxSpiderBoost', spdb_b, prox_spbd, (max(n // spdb_b, 1), 'w0', 'lamb', n, spdb_b), 1 / (2*L)),
+		('ProxSVRG-single', 'ProxSVRG', 1, prox_svrg, (n, 'w0', 'lamb', 1), 5 / (3*L * n)),
+		('ProxSVRG-mb', 'ProxSVRG', svrg_b, prox_svrg, (max(n // svrg_b, 1), 'w0', 'lamb', svrg_b), 1.0 / (3*L)),
+		('ProxSGD-single', 'ProxSGD', 1, prox_sgd, ('eta_prime', 'w0', 'lamb', 1), 0.01),
+		('ProxSGD-mb', 'ProxSGD', sgd_b, prox_sgd, ('eta_prime', 'w0', 'lamb', sgd_b), 0.5),
+		('ProxSAGA-single', 'ProxSAGA', 1, prox_saga, ('w0', 'lamb', 1), 1.0 / (3*L * n**(2.0/3.0))),
+		('ProxSAGA-mb', 'ProxSAGA', svrg_b, prox_saga, ('w0', 'lamb', svrg_b), 1.0 / (5*L)),
+		('ProxGD', 'ProxGD', n, prox_gd, ('w0', 'lamb'), 1.0 / L),
+	]
+
+def load_dataset(args, dtype):
+	"""! Train and test data of the benchmark: a synthetic dataset, or a dataset of import_data preprocessed like the driver
+
+	Returns
+	-------
+	@retval X_train, Y_train, X_test, Y_test : data and labels in {-1, 1}
+	@retval dataset : description saved with the results
+	"""
+	if args.data is None:
+		dataset = {'name': 'synthetic', 'n': args.numrows, 'd': args.dim, 'density': args.density, 'skew': args.skew, \
+					'seed': args.seed}
+		X, Y = synthetic_csr(args.numrows, args.dim, args.density, args.skew, args.seed, dtype)
+	else:
+		# the synthetic runs do not need the dataset folder
+		from import_data import import_preprocessed
+		dataset = {'name': args.data}
+		# the preprocessing of the driver, with all the labels converted to -1/1
+		pipeline = [('csr', {}), ('binary_labels', {'part': 'train'}), ('test_set', {'fraction': 0.9, 'binary_labels': True}), \
+					('flatten_labels', {}), ('normalize', {'norm': 'l2'})]
+		X, Y, X_test, Y_test = import_preprocessed(args.data, pipeline, args.precision)
+		return X, Y, X_test, Y_test, dataset
+
+	# hold out the last 10% as test set, like the driver
+	start_idx = int(0.9 * X.shape[0])
+	return X[:start_idx], Y[:start_idx], X[start_idx:], Y[start_idx:], dataset
+
+def first_hit(times, epochs, values, threshold):
+	"""! Training time and epochs at the first logging point where values <= threshold
+
+	Returns
+	-------
+	@retval : (time, epoch), (None, None) if the threshold is not reached
+	"""
+	hit = np.flatnonzero(np.asarray(values) <= threshold)
+	if len(hit) == 0:
+		return None, None
+	return float(times[hit[0]]), float(epochs[hit[0]])
+
+def _median(values):
+	"""! Median of the values of the repeats, None (not reached) counted as infinite
+	"""
+	median = float(np.median([np.inf if value is None else value for value in values]))
+	return None if np.isinf(median) else median
+
+def summarize(runs, grad_tols, loss_targets):
+	"""! Rows of the comparison table from the histories of the runs
+
+	Parameters
+	----------
+	@param runs : list of dictionaries (name, algorithm, b, repeats: list of dictionaries with times, epochs, losses,
+		grad_norms), one per configuration
+	@param grad_tols : thresholds on the squared norm of the gradient mapping
+	@param loss_targets : thresholds on the train loss
+
+	Returns
+	-------
+	@retval : list of dictionaries, one per configuration
+	"""
+	rows = []
+	for run in runs:
+		repeats = run['repeats']
+		row = {
+			'name': run['name'], 'algorithm': run['algorithm'], 'b': int(run['b']), 'framework': run.get('framework', 'python'),
+			'repeats': len(repeats),
+			'time_to_grad': [], 'epochs_to_grad': [], 'time_to_loss': [], 'epochs_to_loss': [],
+			'final_loss': float(np.median([rep['losses'][-1] for rep in repeats])),
+			'final_grad_map': float(np.median([rep['grad_norms'][-1] for rep in repeats])),
+			'epochs': float(np.median([rep['epochs'][-1] for rep in repeats])),
+			'train_time': float(np.median([rep['times'][-1] for rep in repeats])),
+		}
+		for key, column, thresholds in (('grad', 'grad_norms', grad_tols), ('loss', 'losses', loss_targets)):
+			for threshold in thresholds:
+				hits = [first_hit(rep['times'], rep['epochs'], rep[column], threshold) for rep in repeats]
+				row['time_to_' + key].append(_median([hit[0] for hit in hits]))
+				row['epochs_to_' + key].append(_median([hit[1] for hit in hits]))
+		rows.append(row)
+
+	return rows
+
+def print_table(results):
+	"""! Print the comparison table of saved results, one row per algorithm and batch size
+
+	Parameters
+	----------
+	@param results : content of a JSON file written by this benchmark
+	"""
+	headers = ['||G||^2<={:g}'.format(tol) for tol in results['grad_thresholds']] + list(results['loss_labels'])
+	width = 34 + 8 + 21 * len(headers) + 3 * 12
+
+	print(' Dataset:', results['dataset'])
+	print(' Time in seconds to reach each threshold (epochs), without the logging passes, median of the repeats')
+	print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=width,))
+	print(' {:<34}|{:^8}|'.format('Algorithm', 'b') + ''.join('{:^20}|'.format(header) for header in headers) + \
+		'{:^11}|{:^11}|{:^11}'.format('Final F', 'Final G^2', 'Time (s)'))
+	print(' {message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=width,))
+	for row in results['rows']:
+		cells = []
+		for key in ('grad', 'loss'):
+			for elapsed, epochs in zip(row['time_to_' + key], row['epochs_to_' + key]):
+				cells.append('-' if elapsed is None else '{:.3f} ({:.1f})'.format(elapsed, epochs))
+		name = row['name'] if row.get('framework', 'python') == 'python' else '{} [{}]'.format(row['name'], row['framework'])
+		print(' {:<34}|{:^8d}|'.format(name, row['b']) + ''.join('{:^20}|'.format(cell) for cell in cells) + \
+			'{:^11.3e}|{:^11.3e}|{:^11.3f}'.format(row['final_loss'], row['final_grad_map'], row['train_time']))
+	print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=width,))
+
+def run_config(config, data, w0, lamb, eta_comp, max_num_epoch, oracles, sampler, time_limit, verbose):
+	"""! Run one configuration and return its history with the training times
+
+	Returns
+	-------
+	@retval : dictionary of numpy arrays times, epochs, losses and grad_norms, one entry per logging point
+	"""
+	name, algorithm, b, method, params, eta = config
+	X_train, Y_train, X_test, Y_test, bias = data
+	n, d = X_train.shape
+	FuncF_Eval, GradEval, GradDiffEval, GradCoefEval = oracles
+	isAccEval = 1 if len(Y_test) > 0 else 0
+
+	values = {'w0': w0, 'lamb': lamb, 'eta_prime': 0.5}
+	params = tuple(values[param] if isinstance(param, str) else param for param in params)
+	if method is prox_sgd:
+		eta, params = (eta, params[0]), params[1:]
+	else:
+		eta = (eta,)
+
+	# the pointers between the parameters and the accuracy, in the order of each signature
+	if method is prox_saga:
+		pointers = (GradEval, GradCoefEval, FuncF_Eval, prox_l1_norm, func_val_l1_norm)
+	elif method in (prox_sgd, prox_gd):
+		pointers = (GradEval, FuncF_Eval, prox_l1_norm, func_val_l1_norm)
+	else:
+		pointers = (GradEval, GradDiffEval, FuncF_Eval, prox_l1_norm, func_val_l1_norm)
+
+	kwargs = {} if method is prox_gd else {'sampler': sampler}
+	stopping = StoppingPolicy(time_limit=time_limit)
+
+	profiler = enable_profiler(phases=('log',))
+	history = TimedHistory(profiler)
+	try:
+		profiler.reset()
+		hist = method(n, d, X_train, Y_train, X_test, Y_test, bias, *eta, eta_comp, max_num_epoch, *params, *pointers, accuracy, \
+						isAccEval, verbose=verbose, is_fun_eval=1, history=history, stopping=stopping, **kwargs)
+	finally:
+		disable_profiler()
+
+	return {'times': np.array(history.times), 'epochs': hist[2], 'losses': hist[3], 'grad_norms': hist[4]}
+
+def parse_args(argv = None):
+	"""! Options of the benchmark, see python benchmark_convergence.py -h
+	"""
+	ap = argparse.ArgumentParser(description='Time to reach gradient mapping and loss thresholds of the methods')
+	ap.add_argument("-d", "--data", default=None, help="dataset of import_data, e.g. w8a (default: synthetic data)")
+	ap.add_argument("-n", "--numrows", type=int, default=5000, help="number of rows of the synthetic data (default 5000)")
+	ap.add_argument("-dim", "--dim", type=int, default=200, help="number of columns of the synthetic data (default 200)")
+	ap.add_argument("-den", "--density", type=float, default=0.05, help="fraction of non-zeros (default 0.05)")
+	ap.add_argument("-sk", "--skew", type=float, default=0.0,
+		help="power law exponent of the row lengths and column frequencies, 0: uniform (default)")
+	ap.add_argument("-sd", "--seed", type=int, default=0, help="seed of the data and of the first repeat (default 0)")
+	ap.add_argument("-pr", "--precision", default='float64', choices=sorted(precisions),
+		help="floating point precision of the data (default float64)")
+	ap.add_argument("-lo", "--loss", default='2', choices=sorted(losses), help="loss function of the driver (default 2)")
+	ap.add_argument("-mem", "--memory", type=float, default=1.0,
+		help="memory budget in GB for the row chunks of the oracles (default 1)")
+	ap.add_argument("-a", "--algorithms", default=None,
+		help="comma separated runs (default: all of " + ', '.join(config[0] for config in solver_configs(100, 1.0)) + ")")
+	ap.add_argument("-ep", "--epochs", type=int, default=10, help="maximum number of epochs of a run (default 10)")
+	ap.add_argument("-tl", "--timelimit", type=float, default=None, help="wall-clock budget of a run in seconds")
+	ap.add_argument("-gt", "--gradtol", default='1e-4,5e-5,2e-5',
+		help="comma separated thresholds on ||Grad Map||^2 (default 1e-4,5e-5,2e-5)")
+	ap.add_argument("-lt", "--losstarget", default=None, help="comma separated absolute thresholds on the train loss")
+	ap.add_argument("-lg", "--lossgap", default='1e-1,1e-2',
+		help="comma separated fractions of the initial suboptimality: F <= F* + gap (F0 - F*), F* the best loss of all runs (default 1e-1,1e-2)")
+	ap.add_argument("-r", "--repeat", type=int, default=1, help="number of repeats with different sampler seeds (default 1)")
+	ap.add_argument("-v", "--verbose", type=int, default=0, help="flag whether the methods print their progress (default 0)")
+	ap.add_argument("-o", "--output", default='benchmark_convergence.json', help="JSON file of the results (default benchmark_convergence.json)")
+	ap.add_argument("-show", "--show", nargs='+', default=None,
+		help="only print the tables of saved JSON results, e.g. of the python and tensorflow benchmarks")
+	return ap.parse_args(argv)
+
+def show(paths):
+	"""! Print the tables of saved results, merging the files with the same thresholds and dataset into one table
+	"""
+	tables = []
+	for path in paths:
+		with open(path) as f:
+			results = json.load(f)
+		for table in tables:
+			if all(table[key] == results[key] for key in ('dataset', 'grad_thresholds', 'loss_labels')):
+				table['rows'] = table['rows'] + results['rows']
+				break
+		else:
+			tables.append(results)
+
+	for table in tables:
+		print_table(table)
+		print()
+
+def _floats(option):
+	return [] if not option else [float(value) for value in option.split(',')]
+
+def main(argv = None):
+	args = parse_args(argv)
+	if args.show:
+		show(args.show)
+		return
+
+	dtype = precisions[args.precision]
+	set_mem_budget(args.memory * 2**30)
+
+	FuncF_Eval, GradEval, GradDiffEval, GradCoefEval, L = losses[args.loss]
+	X_train, Y_train, X_test, Y_test, dataset = load_dataset(args, dtype)
+	n, d = X_train.shape
+	dataset.update({'num_train': int(n), 'num_test': int(X_test.shape[0]), 'dim': int(d), 'nnz': int(X_train.nnz), \
+					'precision': args.precision, 'loss': args.loss})
+	print('Dataset:', dataset)
+
+	configs = solver_configs(n, L)
+	if args.algorithms:
+		names = args.algorithms.split(',')
+		unknown = set(names) - set(config[0] for config in configs)
+		if unknown:
+			raise ValueError("Unknown runs: {}".format(', '.join(sorted(unknown))))
+		configs = [config for config in configs if config[0] in names]
+
+	data = (X_train, Y_train, X_test, Y_test, np.zeros(n, dtype=dtype))
+	w0 = np.zeros(d, dtype=dtype)
+	oracles = (FuncF_Eval, GradEval, GradDiffEval, GradCoefEval)
+
+	runs = []
+	for config in configs:
+		print('Run {} (b = {})'.format(config[0], config[2]))
+		repeats = []
+		for repeat in range(args.repeat):
+			sampler = MinibatchSampler('without_replacement', args.seed + repeat)
+			repeats.append(run_config(config, data, w0, 1.0 / n, 0.5, args.epochs, oracles, sampler, args.timelimit, args.verbose))
+		runs.append({'name': config[0], 'algorithm': config[1], 'b': config[2], 'repeats': repeats})
+
+	# loss thresholds relative to the initial loss and the best train loss of all runs
+	best_loss = min(float(np.min(rep['losses'])) for run in runs for rep in run['repeats'])
+	init_loss = float(runs[0]['repeats'][0]['losses'][0])
+	loss_targets = _floats(args.losstarget)
+	loss_labels = ['F<={:.4g}'.format(target) for target in loss_targets]
+	for gap in _floats(args.lossgap):
+		loss_targets.append(best_loss + gap * (init_loss - best_loss))
+		loss_labels.append('F-F*<={:g}(F0-F*)'.format(gap))
+
+	grad_tols = _floats(args.gradtol)
+	results = {
+		'machine': machine_info(), 'dataset': dataset, 'framework': 'python', 'max_num_epoch': args.epochs,
+		'time_limit': args.timelimit, 'init_loss': init_loss, 'best_loss': best_loss, 'grad_thresholds': grad_tols,
+		'loss_thresholds': loss_targets, 'loss_labels': loss_labels,
+		'rows': summarize(runs, grad_tols, loss_targets),
+	}
+	print_table(results)
+
+	directory = os.path.dirname(args.output)
+	if directory:
+		os.makedirs(directory, exist_ok=True)
+	with open(args.output, 'w') as f:
+		json.dump(results, f, indent=1)
+	print('Results saved to', args.output)
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
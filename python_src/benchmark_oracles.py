@@ -0,0 +1,303 @@
+"""!@package benchmark_oracles
+
+Microbenchmarks of the gradient oracles, proximal operators and accuracy on synthetic sparse data.
+
+Every oracle is timed on a dataset of util_Synthetic for the mini-batch sizes b = 1, n^(1/3), sqrt(n) and n. A
+mini-batch oracle cycles through pre-drawn mini-batches so that the rows are not cache-hot between calls, and the
+accuracy is timed on the first b rows. Each timing is the best of several repeats of as many calls as fit in the
+minimum time. Throughputs are reported in rows/s, non-zeros/s and effective GB/s, counting the bytes an oracle has to
+read and write at least: the CSR rows of the batch once per sparse product plus the dense vectors (see _bytes_moved).
+The proximal operators do not touch the data, their 'rows' are the d coordinates, and they write into a preallocated
+output buffer.
+
+The results go to a JSON file with the machine and dataset description, and can be compared with a previous run:
+
+	python benchmark_oracles.py -n 100000 -dim 20000 -den 0.001 -o base.json
+
+	python benchmark_oracles.py -n 100000 -dim 20000 -den 0.001 -o new.json -cmp base.json
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import numpy as np
+import scipy
+
+# import utility functions
+from util_Synthetic import synthetic_csr
+from util_Sampler import MinibatchSampler
+from util_ChunkPlan import set_mem_budget
+from util_Precision import precisions
+from util_BinClass import grad_eval_bin_class_loss_1, grad_eval_bin_class_loss_2, grad_eval_bin_class_loss_3, \
+	grad_diff_eval_bin_class_loss_1, grad_diff_eval_bin_class_loss_2, grad_diff_eval_bin_class_loss_3, prox_l1_norm, accuracy
+from util_NonNegPCA import grad_eval_non_neg_pca, grad_diff_eval_non_neg_pca, prox_half_l2_ball
+from util_Prox import prox_elastic_net, prox_nonneg_l1, prox_box, prox_group_lasso, prox_mcp, prox_scad
+
+## benchmarked functions: (name, function, kind), the kind selects the arguments and the bytes moved
+oracles = [
+	('grad_eval_bin_class_loss_1', grad_eval_bin_class_loss_1, 'grad'),
+	('grad_eval_bin_class_loss_2', grad_eval_bin_class_loss_2, 'grad'),
+	('grad_eval_bin_class_loss_3', grad_eval_bin_class_loss_3, 'grad'),
+	('grad_diff_eval_bin_class_loss_1', grad_diff_eval_bin_class_loss_1, 'grad_diff'),
+	('grad_diff_eval_bin_class_loss_2', grad_diff_eval_bin_class_loss_2, 'grad_diff'),
+	('grad_diff_eval_bin_class_loss_3', grad_diff_eval_bin_class_loss_3, 'grad_diff'),
+	('grad_eval_non_neg_pca', grad_eval_non_neg_pca, 'grad'),
+	('grad_diff_eval_non_neg_pca', grad_diff_eval_non_neg_pca, 'grad_diff'),
+	('accuracy', accuracy, 'accuracy'),
+	('prox_l1_norm', prox_l1_norm, 'prox'),
+	('prox_half_l2_ball', prox_half_l2_ball, 'prox'),
+	('prox_elastic_net', prox_elastic_net, 'prox'),
+	('prox_nonneg_l1', prox_nonneg_l1, 'prox'),
+	('prox_box', prox_box, 'prox'),
+	('prox_group_lasso', prox_group_lasso, 'prox'),
+	('prox_mcp', prox_mcp, 'prox'),
+	('prox_scad', prox_scad, 'prox'),
+]
+
+## number of sparse products over the batch rows and of dense d-vectors read or written by an oracle of each kind
+_traffic = {
+	'grad' : (2, 2),
+	'grad_diff' : (3, 3),
+	'accuracy' : (1, 1),
+	'prox' : (0, 2),
+}
+
+def batch_sizes(n):
+	"""! Benchmarked mini-batch sizes 1, n^(1/3), sqrt(n) and n, without duplicates
+	"""
+	return sorted(set([1, max(int(round(n ** (1.0/3))), 1), max(int(round(np.sqrt(n))), 1), n]))
+
+def _bytes_moved(kind, X, b, nnz, d):
+	"""! Bytes an oracle has to read and write at least for a batch of b rows holding nnz non-zeros
+	"""
+	passes, vectors = _traffic[kind]
+	value_size = X.data.dtype.itemsize
+	row_bytes = nnz * (value_size + X.indices.dtype.itemsize) + (b + 1) * X.indptr.dtype.itemsize
+	label_bytes = 2 * b * value_size if passes else 0
+	return passes * row_bytes + label_bytes + vectors * d * value_size
+
+def _time_calls(call, num_calls, min_time, repeat):
+	"""! Best time per call of call(t), t = 0, 1, ..., over repeat measurements of at least min_time seconds
+
+	Returns
+	-------
+	@retval best : best time per call in seconds
+	@retval median : median time per call in seconds
+	@retval number : number of calls per measurement
+	"""
+	# warm up and find the number of calls filling min_time
+	number = 1
+	while True:
+		start = time.perf_counter()
+		for t in range(number):
+			call(t % num_calls)
+		elapsed = time.perf_counter() - start
+		if elapsed >= min_time:
+			break
+		number = 2*number if elapsed <= 0 else max(2*number, int(number * 1.2 * min_time / elapsed))
+
+	times = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for t in range(number):
+			call(t % num_calls)
+		times.append((time.perf_counter() - start) / number)
+
+	return min(times), float(np.median(times)), number
+
+def benchmark(X, Y, sizes, min_time = 0.2, repeat = 5, num_batches = 64, seed = 0, names = None, verbose = 1):
+	"""! Time the oracles on a dataset
+
+	Parameters
+	----------
+	@param X : data, CSR matrix
+	@param Y : labels
+	@param sizes : mini-batch sizes
+	@param min_time : minimum time in seconds of one measurement
+	@param repeat : number of measurements, the best one is reported
+	@param num_batches : number of pre-drawn mini-batches the calls cycle through
+	@param seed : seed of the mini-batches and vectors
+	@param names : names of the oracles to time, all if None
+	@param verbose : flag whether to print a row per timing
+
+	Returns
+	-------
+	@retval : list of dictionaries, one per (oracle, b)
+	"""
+	n, d = X.shape
+	dtype = X.dtype
+	rng = np.random.default_rng(seed)
+	bias = np.zeros(n, dtype=dtype)
+	w1 = (rng.standard_normal(d) / np.sqrt(d)).astype(dtype)
+	w2 = (w1 + 0.01 * rng.standard_normal(d) / np.sqrt(d)).astype(dtype)
+	prox_out = np.empty_like(w1)
+	sampler = MinibatchSampler('without_replacement', seed)
+	row_nnz = np.diff(X.indptr)
+
+	if verbose:
+		print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=103,))
+		print(' {:<32}|{:^10}|{:^14}|{:^14}|{:^14}|{:^14}'.format('Oracle', 'b', 'Time/call (s)', 'Rows/s', 'Nnz/s', 'GB/s'))
+		print(' {message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=103,))
+
+	results = []
+	for name, func, kind in oracles:
+		if names and name not in names:
+			continue
+
+		for b in (sizes if kind != 'prox' else [d]):
+			if kind == 'prox':
+				call = lambda t: func(w1, 1.0e-3, out=prox_out)
+				num_calls, nnz = 1, d
+			elif kind == 'accuracy':
+				X_b, Y_b, bias_b = X[:b], Y[:b], bias[:b]
+				call = lambda t: func(b, d, X_b, Y_b, bias_b, w1)
+				num_calls, nnz = 1, int(row_nnz[:b].sum())
+			elif b == n:
+				if kind == 'grad':
+					call = lambda t: func(n, d, n, X, Y, bias, w1)
+				else:
+					call = lambda t: func(n, d, n, X, Y, bias, w1, w2)
+				num_calls, nnz = 1, X.nnz
+			else:
+				blocks = sampler.sample_blocks(n, num_batches, b)
+				if kind == 'grad':
+					call = lambda t: func(n, d, b, X, Y, bias, w1, 0, blocks[t])
+				else:
+					call = lambda t: func(n, d, b, X, Y, bias, w1, w2, 0, blocks[t])
+				num_calls, nnz = num_batches, float(np.mean([row_nnz[block].sum() for block in blocks]))
+
+			best, median, number = _time_calls(call, num_calls, min_time, repeat)
+			rows = None if kind == 'prox' else b
+			moved = _bytes_moved(kind, X, 0 if kind == 'prox' else b, 0 if kind == 'prox' else nnz, d)
+			result = {
+				'oracle': name, 'kind': kind, 'b': int(b), 'calls': int(number), 'repeat': int(repeat),
+				'seconds_per_call': best, 'median_seconds_per_call': median,
+				'rows_per_s': None if rows is None else rows / best,
+				'nnz_per_s': nnz / best,
+				'gb_per_s': moved / best / 1.0e9,
+				'bytes_per_call': int(moved),
+			}
+			results.append(result)
+
+			if verbose:
+				print(' {:<32}|{:^10d}|{:^14.3e}|{:^14}|{:^14.3e}|{:^14.3f}'.format(name, result['b'], best, \
+					'N/A' if rows is None else '{:.3e}'.format(result['rows_per_s']), result['nnz_per_s'], result['gb_per_s']))
+
+	if verbose:
+		print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=103,))
+
+	return results
+
+def machine_info():
+	"""! Description of the machine and libraries, saved with the results
+	"""
+	return {
+		'python': platform.python_version(), 'numpy': np.__version__, 'scipy': scipy.__version__,
+		'platform': platform.platform(), 'processor': platform.processor() or platform.machine(),
+		'cpu_count': os.cpu_count(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+	}
+
+def compare(results, baseline):
+	"""! Print the speedup of every timing over the same (oracle, b) of a baseline run
+
+	Parameters
+	----------
+	@param results : content of the JSON file of this run
+	@param baseline : content of a JSON file written by a previous run
+	"""
+	if baseline['dataset'] != results['dataset']:
+		print('Warning: the baseline was run on a different dataset:', baseline['dataset'])
+
+	base = {(r['oracle'], r['b']): r for r in baseline['results']}
+
+	print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=89,))
+	print(' {:<32}|{:^10}|{:^14}|{:^14}|{:^14}'.format('Oracle', 'b', 'Base (s)', 'New (s)', 'Speedup'))
+	print(' {message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=89,))
+	for r in results['results']:
+		old = base.get((r['oracle'], r['b']))
+		if old is None:
+			continue
+		print(' {:<32}|{:^10d}|{:^14.3e}|{:^14.3e}|{:^14.2f}'.format(r['oracle'], r['b'], old['seconds_per_call'], \
+			r['seconds_per_call'], old['seconds_per_call'] / r['seconds_per_call']))
+	print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=89,))
+
+def parse_args(argv = None):
+	"""! Options of the benchmark, see python benchmark_oracles.py -h
+	"""
+	ap = argparse.ArgumentParser(description='Microbenchmarks of the oracles and proximal operators on synthetic sparse data')
+	ap.add_argument("-n", "--numrows", type=int, default=20000, help="number of rows of the synthetic data (default 20000)")
+	ap.add_argument("-dim", "--dim", type=int, default=5000, help="number of columns of the synthetic data (default 5000)")
+	ap.add_argument("-den", "--density", type=float, default=0.002, help="fraction of non-zeros (default 0.002)")
+	ap.add_argument("-sk", "--skew", type=float, default=0.0,
+		help="power law exponent of the row lengths and column frequencies, 0: uniform (default)")
+	ap.add_argument("-sd", "--seed", type=int, default=0, help="seed of the data, mini-batches and vectors (default 0)")
+	ap.add_argument("-pr", "--precision", default='float64', choices=sorted(precisions),
+		help="floating point precision of the data (default float64)")
+	ap.add_argument("-mem", "--memory", type=float, default=1.0,
+		help="memory budget in GB for the row chunks of the oracles (default 1)")
+	ap.add_argument("-b", "--batch", default=None,
+		help="comma separated mini-batch sizes (default: 1, n^(1/3), sqrt(n), n)")
+	ap.add_argument("-or", "--oracles", default=None,
+		help="comma separated names of the timed functions (default: all of " + ', '.join(name for name, _, _ in oracles) + ")")
+	ap.add_argument("-mt", "--mintime", type=float, default=0.2, help="minimum time in seconds of one measurement (default 0.2)")
+	ap.add_argument("-r", "--repeat", type=int, default=5, help="number of measurements, the best is reported (default 5)")
+	ap.add_argument("-o", "--output", default='benchmark_oracles.json', help="JSON file of the results (default benchmark_oracles.json)")
+	ap.add_argument("-cmp", "--compare", default=None, help="JSON file of a previous run to compare with")
+	return ap.parse_args(argv)
+
+def main(argv = None):
+	args = parse_args(argv)
+	dtype = precisions[args.precision]
+	set_mem_budget(args.memory * 2**30)
+
+	dataset = {'n': args.numrows, 'd': args.dim, 'density': args.density, 'skew': args.skew, 'seed': args.seed, \
+				'precision': args.precision}
+	print('Generate synthetic data', dataset)
+	X, Y = synthetic_csr(args.numrows, args.dim, args.density, args.skew, args.seed, dtype)
+	dataset['nnz'] = int(X.nnz)
+	print('Non-zeros:', X.nnz)
+
+	sizes = batch_sizes(args.numrows) if not args.batch else sorted(set(int(b) for b in args.batch.split(',')))
+	names = None if not args.oracles else args.oracles.split(',')
+	unknown = set(names or []) - set(name for name, _, _ in oracles)
+	if unknown:
+		raise ValueError("Unknown oracles: {}".format(', '.join(sorted(unknown))))
+
+	results = {
+		'machine': machine_info(), 'dataset': dataset, 'mem_budget_gb': args.memory, 'min_time': args.mintime,
+		'results': benchmark(X, Y, sizes, args.mintime, args.repeat, seed=args.seed, names=names),
+	}
+
+	directory = os.path.dirname(args.output)
+	if directory:
+		os.makedirs(directory, exist_ok=True)
+	with open(args.output, 'w') as f:
+		json.dump(results, f, indent=1)
+	print('Results saved to', args.output)
+
+	if args.compare:
+		with open(args.compare) as f:
+			compare(results, json.load(f))
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -19,8 +19,6 @@ If you found this helpful and are using it within our software please cite the f
 
 """
 
-import matplotlib.pyplot as plt
-import sklearn
 from scipy import sparse
 from import_data import *
 from argParser import *
@@ -31,9 +29,20 @@ from method_ProxSARAH_Adaptive import *
 from method_ProxSpiderBoost import *
 from method_ProxSVRG import *
 from method_ProxSGD import *
+from method_ProxSAGA import *
 from method_ProxGD import *
+from method_ProxBatched import *
 
 # import utility functions
+from util_Sampler import MinibatchSampler
+from util_SharedGrad import SharedGradEngine
+from util_ExperimentRunner import ExperimentRunner
+from util_History import history_recorder
+from util_Checkpoint import checkpointer
+from util_Stopping import StoppingPolicy
+from util_Profiler import enable_profiler, disable_profiler
+from util_ChunkPlan import set_mem_budget
+from util_Precision import precisions
 from util_BinClass import *
 
 import os
@@ -80,78 +89,55 @@ batch_size 		= prog_option["BatchSize"]
 max_num_epochs 	= prog_option["MaxNumEpoch"]
 verbose			= prog_option["Verbose"]
 log_enable		= prog_option["LogEnable"]
+sampling_mode	= prog_option["SamplingMode"]
+seed			= prog_option["Seed"]
+lazy_update		= prog_option["LazyUpdate"]
+jit_inner		= prog_option["JitInner"]
+num_workers		= prog_option["NumWorkers"]
+num_parallel	= prog_option["NumParallel"]
+precision		= prog_option["Precision"]
+dtype			= precisions[precision]
+batched			= prog_option["Batched"]
+hist_dir		= prog_option["HistDir"]
+checkpoint_dir	= prog_option["CheckpointDir"]
+checkpoint_every	= prog_option["CheckpointEvery"]
+profile_path	= prog_option["ProfilePath"]
+out_of_core		= prog_option["OutOfCore"]
+
+# stopping criteria of every run besides max_num_epoch
+stopping = StoppingPolicy(prog_option["GradMapTol"], prog_option["TimeLimit"], prog_option["TestAccTarget"], \
+	prog_option["PlateauWindow"], prog_option["PlateauTol"])
+
+# shuffled_contiguous permutes the rows of the data in memory every epoch
+if out_of_core and sampling_mode == 'shuffled_contiguous':
+	sys.exit("Out-of-core training does not support the 'shuffled_contiguous' sampling mode")
+
+# the shared gradient workers hold the rows in their original order, so they would be bypassed by the permuted rows
+if num_workers > 1 and num_parallel <= 1 and sampling_mode == 'shuffled_contiguous':
+	sys.exit("The shared gradient workers (-nw) do not support the 'shuffled_contiguous' sampling mode")
+
+# split the passes of the oracles into row chunks within this budget
+set_mem_budget(prog_option["MemBudget"] * 2**30)
+
+# preprocessing of the data, its output is cached with the dataset (see util_Preprocess)
+pipeline = [('csr', {})]
+# check label, if not valid, convert to -1,1
+if data_name == 'avazu-app' or data_name == 'criteo.kaggle2014' or data_name =='kddb-raw':
+	pipeline.append(('binary_labels', {'part': 'train'}))
+# use the test set, or split the train set 90/10 if there is none or its dimension does not match
+pipeline += [('test_set', {'fraction': 0.9, 'binary_labels': True}), ('flatten_labels', {}), ('normalize', {'norm': 'l2'})]
 
 # load data
 print('Load data', data_name)
-X_train, Y_train, X_test, Y_test = import_data(data_name)
-
-# convert to sparse matrix if necessary
-if not sparse.isspmatrix_csr(X_train):
-	X_train = sparse.csr_matrix(X_train)
+# out of core, the data stays on disk as read-only maps of the cache
+X_train, Y_train, X_test, Y_test = import_preprocessed(data_name, pipeline, precision, 'r' if out_of_core else 'c')
 
-# get size of data
-num_train, total_dim = np.shape(X_train)
-
-if num_train == 0:
+if not sparse.issparse(X_train) or X_train.shape[0] == 0:
 	sys.exit("Input dataset not found!")
 
-if data_name == 'avazu-app' or data_name == 'criteo.kaggle2014' or data_name =='kddb-raw':
-	min_val = np.amin(Y_train)
-	max_val = np.amax(Y_train)
-	mid_val = (min_val + max_val) / 2.0
-
-	Y_train = 1*(Y_train >= mid_val) - 1*(Y_train < mid_val)
-
 # get size of data
-if len(Y_test) > 0:
-	num_test, total_dim_test = np.shape(X_test)
-	# conver test data to sparse matrix if necessary
-	if total_dim_test == total_dim:
-		if not sparse.isspmatrix_csr(X_test):
-			X_test = sparse.csr_matrix(X_test)
-		# check label, if not valid, convert to -1,1
-		min_val = np.amin(Y_test)
-		max_val = np.amax(Y_test)
-		mid_val = (min_val + max_val) / 2.0
-
-		Y_test = 1*(Y_test >= mid_val) - 1*(Y_test < mid_val)
-	else:
-		print('Dimension mismatch between train/test set, splitting train set')
-
-		start_idx = int(0.9*num_train)
-
-		New_X_train = X_train[:start_idx]
-		X_test = X_train[start_idx:]
-
-		New_Y_train = Y_train[:start_idx]
-		Y_test = Y_train[start_idx:]
-
-		X_train = New_X_train
-		Y_train = New_Y_train
-
-		num_test 		= num_train - start_idx
-		total_dim_test 	= total_dim
-
-		num_train = start_idx
-else:
-	# data spliting
-	print('No test set given, splitting train set')
-
-	start_idx = int(0.9*num_train)
-
-	New_X_train = X_train[:start_idx]
-	X_test = X_train[start_idx:]
-
-	New_Y_train = Y_train[:start_idx]
-	Y_test = Y_train[start_idx:]
-
-	X_train = New_X_train
-	Y_train = New_Y_train
-
-	num_test 		= num_train - start_idx
-	total_dim_test 	= total_dim
-
-	num_train = start_idx
+num_train, total_dim = np.shape(X_train)
+num_test, total_dim_test = np.shape(X_test) if len(Y_test) > 0 else (0, 0)
 
 # print size
 print('Training size:', np.shape(X_train) )
@@ -164,21 +150,10 @@ print('Min Num Non Zero Train:', np.amin(X_train.getnnz(axis=1)))
 print('Average Sparsity Train:', np.mean(X_train.getnnz(axis=1) / total_dim))
 print('Max Sparsity Train:', np.amax(X_train.getnnz(axis=1) / total_dim))
 print('Min Sparsity Train:', np.amin(X_train.getnnz(axis=1) / total_dim))
-
-# flatten input label
-Y_train = Y_train.flatten()
-if num_test > 0:
-	Y_test = Y_test.flatten()
-
-# normalize data
-print("Normalizing data...")
-sklearn.preprocessing.normalize(X_train, 'l2', axis=1, copy=False)
-if num_test > 0:
-	sklearn.preprocessing.normalize(X_test, 'l2', axis=1, copy=False)
 print()
 
 # fix a seed
-np.random.seed(0)
+np.random.seed(seed)
 
 #=================== Define Function Pointer =====================
 
@@ -193,6 +168,9 @@ if prog_option["LossFunction"] == '1':
 	FuncF_Eval 		= func_val_bin_class_loss_1
 	GradEval 		= grad_eval_bin_class_loss_1
 	GradDiffEval 	= grad_diff_eval_bin_class_loss_1
+	GradCoefEval 	= grad_coef_eval_bin_class_loss_1
+	BlockCoefEval 	= block_coef_eval_bin_class_loss_1
+	SampleLipschitzEval = sample_lipschitz_bin_class_loss_1
 	OMEGA = 1
 	#### The Lipschitz constant of f'
 	L = 8*(1+np.sqrt(3))*(2+np.sqrt(3))/(3 + np.sqrt(3))**3*OMEGA**2
@@ -202,6 +180,9 @@ elif prog_option["LossFunction"] == '2':
 	FuncF_Eval 		= func_val_bin_class_loss_2
 	GradEval 		= grad_eval_bin_class_loss_2
 	GradDiffEval 	= grad_diff_eval_bin_class_loss_2
+	GradCoefEval 	= grad_coef_eval_bin_class_loss_2
+	BlockCoefEval 	= block_coef_eval_bin_class_loss_2
+	SampleLipschitzEval = sample_lipschitz_bin_class_loss_2
 	#### The Lipschitz constant of f'
 	L = 0.15405
 
@@ -210,6 +191,9 @@ if prog_option["LossFunction"] == '3':
 	FuncF_Eval 		= func_val_bin_class_loss_3
 	GradEval 		= grad_eval_bin_class_loss_3
 	GradDiffEval 	= grad_diff_eval_bin_class_loss_3
+	GradCoefEval 	= grad_coef_eval_bin_class_loss_3
+	BlockCoefEval 	= block_coef_eval_bin_class_loss_3
+	SampleLipschitzEval = sample_lipschitz_bin_class_loss_3
 	#### The Lipschitz constant of f'
 	L = 0.1 ## Exact value: 0.092372
 
@@ -217,6 +201,15 @@ if prog_option["LossFunction"] == '3':
 ProxEval = prox_l1_norm
 FuncG_Eval = func_val_l1_norm
 Acc_Eval = accuracy
+
+# per-sample Lipschitz constants of the importance sampling, computed once for all methods
+sample_lipschitz = SampleLipschitzEval(X_train) if sampling_mode == 'importance' else None
+
+def new_sampler():
+	"""! Mini-batch sampler of one run, started from the seed so that the run does not depend on the order of the runs
+	"""
+	return MinibatchSampler(sampling_mode, seed, lipschitz=sample_lipschitz)
+
 # decide whether to perform accuracy evaluation
 if num_test > 0 and total_dim_test == total_dim:
 	isAccEval = 1
@@ -236,6 +229,14 @@ if batch_size == 1:
 	eta_prime_prox_sgd = 0.5#0.5
 	prox_sgd_batch_size = batch_size
 
+	# lazy l1 updates and compiled inner loops only apply to single-sample steps
+	lazy_update_single = lazy_update
+	jit_inner_single = jit_inner
+
+	# ProxSAGA
+	eta_prox_saga = 1.0 / (3*L * num_train**(2.0/3.0))
+	prox_saga_batch_size = batch_size
+
 else:
 	# ProxSPDB
 	eta_prox_spdb = 1 / (2*L)
@@ -252,6 +253,14 @@ else:
 	eta_prime_prox_sgd = 0.5#0.5
 	prox_sgd_batch_size = batch_size
 
+	# lazy l1 updates and compiled inner loops only apply to single-sample steps
+	lazy_update_single = 0
+	jit_inner_single = 0
+
+	# ProxSAGA
+	eta_prox_saga = 1.0 / (5*L)
+	prox_saga_batch_size = int(round(num_train**(2.0/3.0)))   # this is b
+
 # ProxGD
 eta_prox_gd = 1.0/L
 
@@ -340,10 +349,15 @@ prox_sarah_adaptive_inner_batch = prox_sarah_adaptive_inner_batch.astype(int)
 # initial point
 # w0 = np.ones(total_dim)
 # w0 = (1/np.sqrt(total_dim))*w0
-w0 = np.zeros(total_dim)
+w0 = np.zeros(total_dim, dtype=dtype)
 
 # Define the bias vector
-bias = np.zeros(num_train)
+bias = np.zeros(num_train, dtype=dtype)
+
+# compute full gradients on a pool of workers sharing the train data, not within parallel runs
+if num_workers > 1 and num_parallel <= 1:
+	grad_engine = SharedGradEngine(X_train, Y_train, bias, num_workers)
+	GradEval = grad_engine.wrap(GradEval)
 
 #=================================================================
 #=====================  Training Process  ========================
@@ -352,181 +366,295 @@ bias = np.zeros(num_train)
 # record start time
 start_train = time.time()
 
+# metadata saved with the history of every run, see util_History
+run_info = dict(dataset=data_name, seed=seed, sampling=sampling_mode, precision=precision, loss=prog_option["LossFunction"], lamb=lamb, \
+				max_num_epoch=max_num_epoch, eta_comp=eta_comp)
+
+# time the phases of the runs, before forking the workers so that they profile too
+if profile_path:
+	enable_profiler(trace=True)
+
+# run the selected methods on one shared copy of the data, concurrently if num_parallel > 1
+runner = ExperimentRunner(X_train, Y_train, X_test, Y_test, bias, num_parallel)
+
 # ProxSARAH single sample
 if (alg_list["ProxSARAH"] and prox_sarah_option['1']):
-	print('----------------------------------------------------')
-	start_prox_sarah1 = time.time()
-
-	w_prox_sarah1, hist_NumGrad_prox_sarah1, hist_NumEpoch_prox_sarah1, \
-	hist_TrainLoss_prox_sarah1, hist_GradNorm_prox_sarah1, hist_MinGradNorm_prox_sarah1, \
-	hist_TrainAcc_prox_sarah1, hist_TestAcc_prox_sarah1 = prox_sarah(num_train, total_dim, X_train,\
+	runner.submit('ProxSARAH single sample', prox_sarah, num_train, total_dim, X_train,\
 			Y_train, X_test, Y_test, bias, eta_prox_sarah[0], eta_comp, max_num_epoch, max_inner_prox_sarah[0], \
 			w0,	gamma_prox_sarah[0], lamb, num_train, prox_sarah_inner_batch[0], GradEval, \
-			GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-
-	elapsed_prox_sarah1 = time.time() - start_prox_sarah1
-	print("\nTraining time (ProxSARAH single sample): {:^8.2f} seconds\n".format(elapsed_prox_sarah1))
+			GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			lazy_update, GradCoefEval, jit_inner, \
+			history = history_recorder(hist_dir, 'ProxSARAH single sample', eta=eta_prox_sarah[0], gamma=gamma_prox_sarah[0], \
+				max_inner=max_inner_prox_sarah[0], grad_batch_size=num_train, inner_batch_size=prox_sarah_inner_batch[0], **run_info), \
+			checkpoint = checkpointer(checkpoint_dir, 'ProxSARAH single sample', checkpoint_every), \
+			stopping = stopping)
+
+# ProxSARAH-v1/v2 and ProxSARAH-v3/v4 only differ in eta and gamma when they share b and m,
+# in batched mode each such pair runs as one sweep sharing the passes over the data
+batched_prox_sarah = {'2': 0, '3': 0, '4': 0, '5': 0}
+if batched and alg_list["ProxSARAH"]:
+	for first, second in (('2', '3'), ('4', '5')):
+		k1, k2 = int(first) - 1, int(second) - 1
+		if prox_sarah_option[first] and prox_sarah_option[second] and max_inner_prox_sarah[k1] == max_inner_prox_sarah[k2] \
+				and prox_sarah_inner_batch[k1] == prox_sarah_inner_batch[k2]:
+			batched_prox_sarah[first] = batched_prox_sarah[second] = 1
+
+# ProxSARAH-v1 and ProxSARAH-v2 batched
+if batched_prox_sarah['2']:
+	runner.submit('ProxSARAH-v1 and ProxSARAH-v2 batched', prox_sarah_batched, num_train, total_dim,\
+			X_train, Y_train, X_test, Y_test, bias, eta_prox_sarah[1:3], eta_comp, max_num_epoch,\
+			max_inner_prox_sarah[1], w0, gamma_prox_sarah[1:3], lamb, num_train, prox_sarah_inner_batch[1],\
+			BlockCoefEval, FuncF_Eval, ProxEval, FuncG_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			histories = [history_recorder(hist_dir, 'ProxSARAH-v1', eta=eta_prox_sarah[1], gamma=gamma_prox_sarah[1], \
+					max_inner=max_inner_prox_sarah[1], grad_batch_size=num_train, inner_batch_size=prox_sarah_inner_batch[1], **run_info), \
+				history_recorder(hist_dir, 'ProxSARAH-v2', eta=eta_prox_sarah[2], gamma=gamma_prox_sarah[2], \
+					max_inner=max_inner_prox_sarah[1], grad_batch_size=num_train, inner_batch_size=prox_sarah_inner_batch[1], **run_info)], \
+			stopping = stopping)
+
+# ProxSARAH-v3 and ProxSARAH-v4 batched
+if batched_prox_sarah['4']:
+	runner.submit('ProxSARAH-v3 and ProxSARAH-v4 batched', prox_sarah_batched, num_train, total_dim,\
+			X_train, Y_train, X_test, Y_test, bias, eta_prox_sarah[3:5], eta_comp, max_num_epoch,\
+			max_inner_prox_sarah[3], w0, gamma_prox_sarah[3:5], lamb, num_train, prox_sarah_inner_batch[3],\
+			BlockCoefEval, FuncF_Eval, ProxEval, FuncG_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			histories = [history_recorder(hist_dir, 'ProxSARAH-v3', eta=eta_prox_sarah[3], gamma=gamma_prox_sarah[3], \
+					max_inner=max_inner_prox_sarah[3], grad_batch_size=num_train, inner_batch_size=prox_sarah_inner_batch[3], **run_info), \
+				history_recorder(hist_dir, 'ProxSARAH-v4', eta=eta_prox_sarah[4], gamma=gamma_prox_sarah[4], \
+					max_inner=max_inner_prox_sarah[3], grad_batch_size=num_train, inner_batch_size=prox_sarah_inner_batch[3], **run_info)], \
+			stopping = stopping)
 
 # ProxSARAH-v1
-if (alg_list["ProxSARAH"] and prox_sarah_option['2']):
-	print('----------------------------------------------------')
-	start_prox_sarah2 = time.time()
-
-	w_prox_sarah2, hist_NumGrad_prox_sarah2, hist_NumEpoch_prox_sarah2, \
-	hist_TrainLoss_prox_sarah2, hist_GradNorm_prox_sarah2, hist_MinGradNorm_prox_sarah2, \
-	hist_TrainAcc_prox_sarah2, hist_TestAcc_prox_sarah2 = prox_sarah(num_train, total_dim,\
+if (alg_list["ProxSARAH"] and prox_sarah_option['2'] and not batched_prox_sarah['2']):
+	runner.submit('ProxSARAH-v1', prox_sarah, num_train, total_dim,\
 			X_train, Y_train, X_test, Y_test, bias, eta_prox_sarah[1], eta_comp, max_num_epoch,\
 			max_inner_prox_sarah[1], w0, gamma_prox_sarah[1], lamb, num_train, prox_sarah_inner_batch[1],\
-			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-
-	elapsed_prox_sarah2 = time.time() - start_prox_sarah2
-	print("\nTraining time (ProxSARAH-v1): {:^8.2f} seconds\n".format(elapsed_prox_sarah2))
+			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			history = history_recorder(hist_dir, 'ProxSARAH-v1', eta=eta_prox_sarah[1], gamma=gamma_prox_sarah[1], \
+				max_inner=max_inner_prox_sarah[1], grad_batch_size=num_train, inner_batch_size=prox_sarah_inner_batch[1], **run_info), \
+			checkpoint = checkpointer(checkpoint_dir, 'ProxSARAH-v1', checkpoint_every), \
+			stopping = stopping)
 
 # ProxSARAH-v2
-if (alg_list["ProxSARAH"] and prox_sarah_option['3']):
-	print('----------------------------------------------------')
-	start_prox_sarah3 = time.time()
-
-	w_prox_sarah3, hist_NumGrad_prox_sarah3, hist_NumEpoch_prox_sarah3, \
-	hist_TrainLoss_prox_sarah3, hist_GradNorm_prox_sarah3, hist_MinGradNorm_prox_sarah3, \
-	hist_TrainAcc_prox_sarah3, hist_TestAcc_prox_sarah3= prox_sarah(num_train, total_dim,\
+if (alg_list["ProxSARAH"] and prox_sarah_option['3'] and not batched_prox_sarah['3']):
+	runner.submit('ProxSARAH-v2', prox_sarah, num_train, total_dim,\
 			X_train, Y_train, X_test, Y_test, bias,	eta_prox_sarah[2], eta_comp, max_num_epoch,\
 			max_inner_prox_sarah[2], w0, gamma_prox_sarah[2], lamb, num_train, prox_sarah_inner_batch[2],\
-			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-
-	elapsed_prox_sarah3 = time.time() - start_prox_sarah3
-	print("\nTraining time (ProxSARAH-v2): {:^8.2f} seconds\n".format(elapsed_prox_sarah3))
+			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			history = history_recorder(hist_dir, 'ProxSARAH-v2', eta=eta_prox_sarah[2], gamma=gamma_prox_sarah[2], \
+				max_inner=max_inner_prox_sarah[2], grad_batch_size=num_train, inner_batch_size=prox_sarah_inner_batch[2], **run_info), \
+			checkpoint = checkpointer(checkpoint_dir, 'ProxSARAH-v2', checkpoint_every), \
+			stopping = stopping)
 
 # ProxSARAH-v3
-if (alg_list["ProxSARAH"] and prox_sarah_option['4']):
-	print('----------------------------------------------------')
-	start_prox_sarah4 = time.time()
-
-	w_prox_sarah4, hist_NumGrad_prox_sarah4, hist_NumEpoch_prox_sarah4, \
-	hist_TrainLoss_prox_sarah4, hist_GradNorm_prox_sarah4, hist_MinGradNorm_prox_sarah4, \
-	hist_TrainAcc_prox_sarah4, hist_TestAcc_prox_sarah4 = prox_sarah(num_train, total_dim,\
+if (alg_list["ProxSARAH"] and prox_sarah_option['4'] and not batched_prox_sarah['4']):
+	runner.submit('ProxSARAH-v3', prox_sarah, num_train, total_dim,\
 			X_train, Y_train, X_test, Y_test, bias,	eta_prox_sarah[3], eta_comp, max_num_epoch,\
 			max_inner_prox_sarah[3], w0, gamma_prox_sarah[3], lamb, num_train, prox_sarah_inner_batch[3],\
-			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-
-	elapsed_prox_sarah4 = time.time() - start_prox_sarah4
-	print("\nTraining time (ProxSARAH-v3): {:^8.2f} seconds\n".format(elapsed_prox_sarah4))
+			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			history = history_recorder(hist_dir, 'ProxSARAH-v3', eta=eta_prox_sarah[3], gamma=gamma_prox_sarah[3], \
+				max_inner=max_inner_prox_sarah[3], grad_batch_size=num_train, inner_batch_size=prox_sarah_inner_batch[3], **run_info), \
+			checkpoint = checkpointer(checkpoint_dir, 'ProxSARAH-v3', checkpoint_every), \
+			stopping = stopping)
 
 # ProxSARAH-v4
-if (alg_list["ProxSARAH"] and prox_sarah_option['5']):
-	print('----------------------------------------------------')
-	start_prox_sarah5 = time.time()
-
-	w_prox_sarah5, hist_NumGrad_prox_sarah5, hist_NumEpoch_prox_sarah5, \
-	hist_TrainLoss_prox_sarah5, hist_GradNorm_prox_sarah5, hist_MinGradNorm_prox_sarah5, \
-	hist_TrainAcc_prox_sarah5, hist_TestAcc_prox_sarah5	= prox_sarah(num_train, total_dim,\
+if (alg_list["ProxSARAH"] and prox_sarah_option['5'] and not batched_prox_sarah['5']):
+	runner.submit('ProxSARAH-v4', prox_sarah, num_train, total_dim,\
 			X_train, Y_train, X_test, Y_test, bias,	eta_prox_sarah[4], eta_comp, max_num_epoch,\
 			max_inner_prox_sarah[4], w0, gamma_prox_sarah[4], lamb, num_train, prox_sarah_inner_batch[4],\
-			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-
-	elapsed_prox_sarah5 = time.time() - start_prox_sarah5
-	print("\nTraining time (ProxSARAH-v4): {:^8.2f} seconds\n".format(elapsed_prox_sarah5))
+			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			history = history_recorder(hist_dir, 'ProxSARAH-v4', eta=eta_prox_sarah[4], gamma=gamma_prox_sarah[4], \
+				max_inner=max_inner_prox_sarah[4], grad_batch_size=num_train, inner_batch_size=prox_sarah_inner_batch[4], **run_info), \
+			checkpoint = checkpointer(checkpoint_dir, 'ProxSARAH-v4', checkpoint_every), \
+			stopping = stopping)
 
 # ProxSARAH-A-v1
 if (alg_list["ProxSARAHAdaptive"] and prox_sarah_adaptive_option['1']):
-	print('----------------------------------------------------')
-	start_prox_sarah_adaptive1 = time.time()
-
-	w_prox_sarah_adaptive1, hist_NumGrad_prox_sarah_adaptive1, hist_NumEpoch_prox_sarah_adaptive1, \
-	hist_TrainLoss_prox_sarah_adaptive1, hist_GradNorm_prox_sarah_adaptive1, hist_MinGradNorm_prox_sarah_adaptive1, \
-	hist_TrainAcc_prox_sarah_adaptive1, hist_TestAcc_prox_sarah_adaptive1 = prox_sarah_adaptive(num_train, total_dim,\
+	runner.submit('ProxSARAH-A-v1', prox_sarah_adaptive, num_train, total_dim,\
 			X_train, Y_train, X_test, Y_test, bias,	eta_prox_sarah_adaptive, eta_comp, max_num_epoch,\
 			max_inner_prox_sarah_adaptive[0], w0, L, gamma_m, lamb, num_train, prox_sarah_adaptive_inner_batch[0],\
-			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-
-	elapsed_prox_sarah_adaptive1 = time.time() - start_prox_sarah_adaptive1
-	print("\nTraining time (ProxSARAH-A-v1): {:^8.2f} seconds\n".format(elapsed_prox_sarah_adaptive1))
+			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			history = history_recorder(hist_dir, 'ProxSARAH-A-v1', eta=eta_prox_sarah_adaptive, Lconst=L, \
+				gamma_m=gamma_m, max_inner=max_inner_prox_sarah_adaptive[0], grad_batch_size=num_train, inner_batch_size=prox_sarah_adaptive_inner_batch[0], **run_info), \
+			checkpoint = checkpointer(checkpoint_dir, 'ProxSARAH-A-v1', checkpoint_every), \
+			stopping = stopping)
 
 # ProxSARAH-A-v2
 if (alg_list["ProxSARAHAdaptive"] and prox_sarah_adaptive_option['2']):
-	print('----------------------------------------------------')
-	start_prox_sarah_adaptive2 = time.time()
-
-	w_prox_sarah_adaptive2, hist_NumGrad_prox_sarah_adaptive2, hist_NumEpoch_prox_sarah_adaptive2, \
-	hist_TrainLoss_prox_sarah_adaptive2, hist_GradNorm_prox_sarah_adaptive2, hist_MinGradNorm_prox_sarah_adaptive2, \
-	hist_TrainAcc_prox_sarah_adaptive2, hist_TestAcc_prox_sarah_adaptive2 = prox_sarah_adaptive(num_train, total_dim,\
+	runner.submit('ProxSARAH-A-v2', prox_sarah_adaptive, num_train, total_dim,\
 			X_train, Y_train, X_test, Y_test, bias, eta_prox_sarah_adaptive, eta_comp, max_num_epoch,\
 			max_inner_prox_sarah_adaptive[1], w0, L, gamma_m, lamb, num_train, prox_sarah_adaptive_inner_batch[1],\
-			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-
-	elapsed_prox_sarah_adaptive2 = time.time() - start_prox_sarah_adaptive2
-	print("\nTraining time (ProxSARAH-A-v2): {:^8.2f} seconds\n".format(elapsed_prox_sarah_adaptive2))
+			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			history = history_recorder(hist_dir, 'ProxSARAH-A-v2', eta=eta_prox_sarah_adaptive, Lconst=L, \
+				gamma_m=gamma_m, max_inner=max_inner_prox_sarah_adaptive[1], grad_batch_size=num_train, inner_batch_size=prox_sarah_adaptive_inner_batch[1], **run_info), \
+			checkpoint = checkpointer(checkpoint_dir, 'ProxSARAH-A-v2', checkpoint_every), \
+			stopping = stopping)
 
 # ProxSARAH-A-v3
 if (alg_list["ProxSARAHAdaptive"] and prox_sarah_adaptive_option['3']):
-	print('----------------------------------------------------')
-	start_prox_sarah_adaptive3 = time.time()
-
-	w_prox_sarah_adaptive3, hist_NumGrad_prox_sarah_adaptive3, hist_NumEpoch_prox_sarah_adaptive3, \
-	hist_TrainLoss_prox_sarah_adaptive3, hist_GradNorm_prox_sarah_adaptive3, hist_MinGradNorm_prox_sarah_adaptive3, \
-	hist_TrainAcc_prox_sarah_adaptive3, hist_TestAcc_prox_sarah_adaptive3 = prox_sarah_adaptive(num_train, total_dim,\
+	runner.submit('ProxSARAH-A-v3', prox_sarah_adaptive, num_train, total_dim,\
 			X_train, Y_train, X_test, Y_test, bias, eta_prox_sarah_adaptive, eta_comp, max_num_epoch,\
 			max_inner_prox_sarah_adaptive[2], w0, L, gamma_m, lamb, num_train, prox_sarah_adaptive_inner_batch[2],\
-			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-
-	elapsed_prox_sarah_adaptive3 = time.time() - start_prox_sarah_adaptive3
-	print("\nTraining time (ProxSARAH-A-v3): {:^8.2f} seconds\n".format(elapsed_prox_sarah_adaptive3))
+			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			history = history_recorder(hist_dir, 'ProxSARAH-A-v3', eta=eta_prox_sarah_adaptive, Lconst=L, \
+				gamma_m=gamma_m, max_inner=max_inner_prox_sarah_adaptive[2], grad_batch_size=num_train, inner_batch_size=prox_sarah_adaptive_inner_batch[2], **run_info), \
+			checkpoint = checkpointer(checkpoint_dir, 'ProxSARAH-A-v3', checkpoint_every), \
+			stopping = stopping)
 
 # ProxSpiderBoost 
 if (alg_list["ProxSpiderBoost"]):
-	print('----------------------------------------------------')
-	start_prox_spdb = time.time()
-
-	w_prox_spdb, hist_NumGrad_prox_spdb, hist_NumEpoch_prox_spdb, hist_TrainLoss_prox_spdb, \
-	hist_GradNorm_prox_spdb, hist_MinGradNorm_prox_spdb, hist_TrainAcc_prox_spdb, hist_TestAcc_prox_spdb \
-			= prox_spbd(num_train, total_dim, X_train, Y_train, X_test, Y_test, bias, eta_prox_spdb, eta_comp, \
+	runner.submit('ProxSpiderBoost', prox_spbd, num_train, total_dim, X_train, Y_train, X_test, Y_test, bias, eta_prox_spdb, eta_comp, \
 			max_num_epoch, max_inner_prox_spdb, w0, lamb, num_train,prox_spdb_inner_batch_size,\
-			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-
-	elapsed_prox_spdb = time.time() - start_prox_spdb
-	print("\nTraining time (ProxSpiderBoost): {:^8.2f} seconds\n".format(elapsed_prox_spdb))
+			GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			history = history_recorder(hist_dir, 'ProxSpiderBoost', eta=eta_prox_spdb, max_inner=max_inner_prox_spdb, \
+				batch_size=num_train, inner_batch_size=prox_spdb_inner_batch_size, **run_info), \
+			checkpoint = checkpointer(checkpoint_dir, 'ProxSpiderBoost', checkpoint_every), \
+			stopping = stopping)
 
 # ProxSVRG 
 if (alg_list["ProxSVRG"]):
-	print('----------------------------------------------------')
-	start_prox_svrg = time.time()
-
-	w_prox_svrg, hist_NumGrad_prox_svrg, hist_NumEpoch_prox_svrg, hist_TrainLoss_prox_svrg, \
-	hist_GradNorm_prox_svrg, hist_MinGradNorm_prox_svrg, hist_TrainAcc_prox_svrg, hist_TestAcc_prox_svrg \
-			= prox_svrg(num_train, total_dim, X_train, Y_train, X_test, Y_test, bias, eta_prox_svrg,\
+	runner.submit('ProxSVRG', prox_svrg, num_train, total_dim, X_train, Y_train, X_test, Y_test, bias, eta_prox_svrg,\
 			eta_comp, max_num_epoch, max_inner_prox_svrg, w0, lamb, prox_svrg_inner_batch, GradEval, \
-			GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-
-	elapsed_prox_svrg = time.time() - start_prox_svrg
-	print("\nTraining time (ProxSVRG): {:^8.2f} seconds\n".format(elapsed_prox_svrg))
+			GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			lazy_update_single, GradCoefEval, jit_inner_single, \
+			history = history_recorder(hist_dir, 'ProxSVRG', eta=eta_prox_svrg, max_inner=max_inner_prox_svrg, \
+				inner_batch_size=prox_svrg_inner_batch, **run_info), \
+			checkpoint = checkpointer(checkpoint_dir, 'ProxSVRG', checkpoint_every), \
+			stopping = stopping)
 
 # ProxSGD 
 if (alg_list["ProxSGD"]):
-	print('----------------------------------------------------')
-	start_prox_sgd = time.time()
-
-	w_prox_sgd, hist_NumGrad_prox_sgd, hist_NumEpoch_prox_sgd, hist_TrainLoss_prox_sgd, \
-	hist_GradNorm_prox_sgd, hist_MinGradNorm_prox_sgd, hist_TrainAcc_prox_sgd, hist_TestAcc_prox_sgd \
-			= prox_sgd(num_train, total_dim, X_train, Y_train, X_test, Y_test, bias, eta_prox_sgd,\
+	runner.submit('ProxSGD', prox_sgd, num_train, total_dim, X_train, Y_train, X_test, Y_test, bias, eta_prox_sgd,\
 			eta_prime_prox_sgd, eta_comp, max_num_epoch, w0, lamb, prox_sgd_batch_size, GradEval, \
-			FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
-	
-	elapsed_prox_sgd = time.time() - start_prox_sgd
-	print("\nTraining time (ProxSGD): {:^8.2f} seconds\n".format(elapsed_prox_sgd))
+			FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			lazy_update_single, GradCoefEval, jit_inner_single, \
+			history = history_recorder(hist_dir, 'ProxSGD', eta=eta_prox_sgd, eta_prime=eta_prime_prox_sgd, \
+				batch_size=prox_sgd_batch_size, **run_info), \
+			stopping = stopping)
+
+# ProxSAGA
+if (alg_list["ProxSAGA"]):
+	runner.submit('ProxSAGA', prox_saga, num_train, total_dim, X_train, Y_train, X_test, Y_test, bias, eta_prox_saga,\
+			eta_comp, max_num_epoch, w0, lamb, prox_saga_batch_size, GradEval, GradCoefEval, \
+			FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, new_sampler(), \
+			history = history_recorder(hist_dir, 'ProxSAGA', eta=eta_prox_saga, batch_size=prox_saga_batch_size, \
+				**run_info), \
+			stopping = stopping)
 
 # ProxGD
 if (alg_list["ProxGD"]):
-	print('----------------------------------------------------')
-	start_prox_gd = time.time()
-
-	w_prox_gd, hist_NumGrad_prox_gd, hist_NumEpoch_prox_gd, hist_TrainLoss_prox_gd, \
-	hist_GradNorm_prox_gd, hist_MinGradNorm_prox_gd, hist_TrainAcc_prox_gd, hist_TestAcc_prox_gd \
-			= prox_gd(num_train, total_dim, X_train, Y_train, X_test, Y_test, bias, eta_prox_gd, \
+	runner.submit('ProxGD', prox_gd, num_train, total_dim, X_train, Y_train, X_test, Y_test, bias, eta_prox_gd, \
 			eta_comp, max_num_epoch, w0, lamb, GradEval, FuncF_Eval, ProxEval, \
-			FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable)
+			FuncG_Eval, Acc_Eval, isAccEval, verbose, log_enable, \
+			history = history_recorder(hist_dir, 'ProxGD', eta=eta_prox_gd, **run_info), \
+			stopping = stopping)
+
+# collect the outputs and training times of all runs
+results = runner.results()
+runner.close()
+
+# print and save the phases of all runs
+if profile_path:
+	profiler = disable_profiler()
+	print(profiler.summary())
+	profiler.write_trace(profile_path)
+	print('Profile trace saved to', profile_path)
+
+if (alg_list["ProxSARAH"] and prox_sarah_option['1']):
+	(w_prox_sarah1, hist_NumGrad_prox_sarah1, hist_NumEpoch_prox_sarah1, \
+	hist_TrainLoss_prox_sarah1, hist_GradNorm_prox_sarah1, hist_MinGradNorm_prox_sarah1, \
+	hist_TrainAcc_prox_sarah1, hist_TestAcc_prox_sarah1), \
+	elapsed_prox_sarah1 = results['ProxSARAH single sample']
+
+if batched_prox_sarah['2']:
+	((w_prox_sarah2, hist_NumGrad_prox_sarah2, hist_NumEpoch_prox_sarah2, \
+	hist_TrainLoss_prox_sarah2, hist_GradNorm_prox_sarah2, hist_MinGradNorm_prox_sarah2, \
+	hist_TrainAcc_prox_sarah2, hist_TestAcc_prox_sarah2), \
+	(w_prox_sarah3, hist_NumGrad_prox_sarah3, hist_NumEpoch_prox_sarah3, \
+	hist_TrainLoss_prox_sarah3, hist_GradNorm_prox_sarah3, hist_MinGradNorm_prox_sarah3, \
+	hist_TrainAcc_prox_sarah3, hist_TestAcc_prox_sarah3)), \
+	elapsed_prox_sarah2 = results['ProxSARAH-v1 and ProxSARAH-v2 batched']
+	elapsed_prox_sarah3 = elapsed_prox_sarah2
+
+if batched_prox_sarah['4']:
+	((w_prox_sarah4, hist_NumGrad_prox_sarah4, hist_NumEpoch_prox_sarah4, \
+	hist_TrainLoss_prox_sarah4, hist_GradNorm_prox_sarah4, hist_MinGradNorm_prox_sarah4, \
+	hist_TrainAcc_prox_sarah4, hist_TestAcc_prox_sarah4), \
+	(w_prox_sarah5, hist_NumGrad_prox_sarah5, hist_NumEpoch_prox_sarah5, \
+	hist_TrainLoss_prox_sarah5, hist_GradNorm_prox_sarah5, hist_MinGradNorm_prox_sarah5, \
+	hist_TrainAcc_prox_sarah5, hist_TestAcc_prox_sarah5)), \
+	elapsed_prox_sarah4 = results['ProxSARAH-v3 and ProxSARAH-v4 batched']
+	elapsed_prox_sarah5 = elapsed_prox_sarah4
+
+if (alg_list["ProxSARAH"] and prox_sarah_option['2'] and not batched_prox_sarah['2']):
+	(w_prox_sarah2, hist_NumGrad_prox_sarah2, hist_NumEpoch_prox_sarah2, \
+	hist_TrainLoss_prox_sarah2, hist_GradNorm_prox_sarah2, hist_MinGradNorm_prox_sarah2, \
+	hist_TrainAcc_prox_sarah2, hist_TestAcc_prox_sarah2), \
+	elapsed_prox_sarah2 = results['ProxSARAH-v1']
+
+if (alg_list["ProxSARAH"] and prox_sarah_option['3'] and not batched_prox_sarah['3']):
+	(w_prox_sarah3, hist_NumGrad_prox_sarah3, hist_NumEpoch_prox_sarah3, \
+	hist_TrainLoss_prox_sarah3, hist_GradNorm_prox_sarah3, hist_MinGradNorm_prox_sarah3, \
+	hist_TrainAcc_prox_sarah3, hist_TestAcc_prox_sarah3), \
+	elapsed_prox_sarah3 = results['ProxSARAH-v2']
 
-	elapsed_prox_gd = time.time() - start_prox_gd
-	print("\nTraining time (ProxGD): {:^8.2f} seconds\n".format(elapsed_prox_gd))
+if (alg_list["ProxSARAH"] and prox_sarah_option['4'] and not batched_prox_sarah['4']):
+	(w_prox_sarah4, hist_NumGrad_prox_sarah4, hist_NumEpoch_prox_sarah4, \
+	hist_TrainLoss_prox_sarah4, hist_GradNorm_prox_sarah4, hist_MinGradNorm_prox_sarah4, \
+	hist_TrainAcc_prox_sarah4, hist_TestAcc_prox_sarah4), \
+	elapsed_prox_sarah4 = results['ProxSARAH-v3']
+
+if (alg_list["ProxSARAH"] and prox_sarah_option['5'] and not batched_prox_sarah['5']):
+	(w_prox_sarah5, hist_NumGrad_prox_sarah5, hist_NumEpoch_prox_sarah5, \
+	hist_TrainLoss_prox_sarah5, hist_GradNorm_prox_sarah5, hist_MinGradNorm_prox_sarah5, \
+	hist_TrainAcc_prox_sarah5, hist_TestAcc_prox_sarah5), \
+	elapsed_prox_sarah5 = results['ProxSARAH-v4']
+
+if (alg_list["ProxSARAHAdaptive"] and prox_sarah_adaptive_option['1']):
+	(w_prox_sarah_adaptive1, hist_NumGrad_prox_sarah_adaptive1, hist_NumEpoch_prox_sarah_adaptive1, \
+	hist_TrainLoss_prox_sarah_adaptive1, hist_GradNorm_prox_sarah_adaptive1, hist_MinGradNorm_prox_sarah_adaptive1, \
+	hist_TrainAcc_prox_sarah_adaptive1, hist_TestAcc_prox_sarah_adaptive1), \
+	elapsed_prox_sarah_adaptive1 = results['ProxSARAH-A-v1']
+
+if (alg_list["ProxSARAHAdaptive"] and prox_sarah_adaptive_option['2']):
+	(w_prox_sarah_adaptive2, hist_NumGrad_prox_sarah_adaptive2, hist_NumEpoch_prox_sarah_adaptive2, \
+	hist_TrainLoss_prox_sarah_adaptive2, hist_GradNorm_prox_sarah_adaptive2, hist_MinGradNorm_prox_sarah_adaptive2, \
+	hist_TrainAcc_prox_sarah_adaptive2, hist_TestAcc_prox_sarah_adaptive2), \
+	elapsed_prox_sarah_adaptive2 = results['ProxSARAH-A-v2']
+
+if (alg_list["ProxSARAHAdaptive"] and prox_sarah_adaptive_option['3']):
+	(w_prox_sarah_adaptive3, hist_NumGrad_prox_sarah_adaptive3, hist_NumEpoch_prox_sarah_adaptive3, \
+	hist_TrainLoss_prox_sarah_adaptive3, hist_GradNorm_prox_sarah_adaptive3, hist_MinGradNorm_prox_sarah_adaptive3, \
+	hist_TrainAcc_prox_sarah_adaptive3, hist_TestAcc_prox_sarah_adaptive3), \
+	elapsed_prox_sarah_adaptive3 = results['ProxSARAH-A-v3']
+
+if (alg_list["ProxSpiderBoost"]):
+	(w_prox_spdb, hist_NumGrad_prox_spdb, hist_NumEpoch_prox_spdb, hist_TrainLoss_prox_spdb, \
+	hist_GradNorm_prox_spdb, hist_MinGradNorm_prox_spdb, hist_TrainAcc_prox_spdb, hist_TestAcc_prox_spdb), \
+	elapsed_prox_spdb = results['ProxSpiderBoost']
+
+if (alg_list["ProxSVRG"]):
+	(w_prox_svrg, hist_NumGrad_prox_svrg, hist_NumEpoch_prox_svrg, hist_TrainLoss_prox_svrg, \
+	hist_GradNorm_prox_svrg, hist_MinGradNorm_prox_svrg, hist_TrainAcc_prox_svrg, hist_TestAcc_prox_svrg), \
+	elapsed_prox_svrg = results['ProxSVRG']
+
+if (alg_list["ProxSGD"]):
+	(w_prox_sgd, hist_NumGrad_prox_sgd, hist_NumEpoch_prox_sgd, hist_TrainLoss_prox_sgd, \
+	hist_GradNorm_prox_sgd, hist_MinGradNorm_prox_sgd, hist_TrainAcc_prox_sgd, hist_TestAcc_prox_sgd), \
+	elapsed_prox_sgd = results['ProxSGD']
+
+if (alg_list["ProxSAGA"]):
+	(w_prox_saga, hist_NumGrad_prox_saga, hist_NumEpoch_prox_saga, hist_TrainLoss_prox_saga, \
+	hist_GradNorm_prox_saga, hist_MinGradNorm_prox_saga, hist_TrainAcc_prox_saga, hist_TestAcc_prox_saga), \
+	elapsed_prox_saga = results['ProxSAGA']
+
+if (alg_list["ProxGD"]):
+	(w_prox_gd, hist_NumGrad_prox_gd, hist_NumEpoch_prox_gd, hist_TrainLoss_prox_gd, \
+	hist_GradNorm_prox_gd, hist_MinGradNorm_prox_gd, hist_TrainAcc_prox_gd, hist_TestAcc_prox_gd), \
+	elapsed_prox_gd = results['ProxGD']
+
+# stop the full gradient workers
+if num_workers > 1 and num_parallel <= 1:
+	grad_engine.close()
 
 # record time elapsed
 elapsed_train = time.time() - start_train
@@ -539,6 +667,8 @@ print("Total training time: {:^8.2f} seconds\n".format(elapsed_train))
 examplename = 'Binary Classification'
 
 if plot_option:
+	# matplotlib is only needed to plot
+	import matplotlib.pyplot as plt
 
 	#=================================================================
 	# Plot Training Loss
@@ -578,6 +708,9 @@ if plot_option:
 	if (alg_list["ProxSGD"]):
 		plt.plot(np.array(hist_NumEpoch_prox_sgd), hist_TrainLoss_prox_sgd, 'g-.', label = 'ProxSGD')	
 
+	if (alg_list["ProxSAGA"]):
+		plt.plot(np.array(hist_NumEpoch_prox_saga), hist_TrainLoss_prox_saga, 'C3:', label = 'ProxSAGA')
+
 	if (alg_list["ProxGD"]):
 		plt.plot(np.array(hist_NumEpoch_prox_gd), hist_TrainLoss_prox_gd, 'C7-.', label = 'ProxGD')
 
@@ -625,6 +758,9 @@ if plot_option:
 	if (alg_list["ProxSGD"]):
 		plt.semilogy(np.array(hist_NumEpoch_prox_sgd), hist_GradNorm_prox_sgd, 'g-.', label = 'ProxSGD')
 
+	if (alg_list["ProxSAGA"]):
+		plt.semilogy(np.array(hist_NumEpoch_prox_saga), hist_GradNorm_prox_saga, 'C3:', label = 'ProxSAGA')
+
 	if (alg_list["ProxGD"]):
 		plt.semilogy(np.array(hist_NumEpoch_prox_gd), hist_GradNorm_prox_gd, 'C7-.', label = 'ProxGD')
 
@@ -672,6 +808,9 @@ if plot_option:
 	if (alg_list["ProxSGD"]):
 		plt.semilogy(np.array(hist_NumEpoch_prox_sgd), hist_MinGradNorm_prox_sgd, 'g-.', label = 'ProxSGD')
 
+	if (alg_list["ProxSAGA"]):
+		plt.semilogy(np.array(hist_NumEpoch_prox_saga), hist_MinGradNorm_prox_saga, 'C3:', label = 'ProxSAGA')
+
 	if (alg_list["ProxGD"]):
 		plt.semilogy(np.array(hist_NumEpoch_prox_gd), hist_MinGradNorm_prox_gd, 'C7-.', label = 'ProxGD')
 
@@ -720,6 +859,9 @@ if plot_option:
 		if (alg_list["ProxSGD"]):
 			plt.plot(np.array(hist_NumEpoch_prox_sgd), hist_TrainAcc_prox_sgd, 'g-.', label = 'ProxSGD')
 
+		if (alg_list["ProxSAGA"]):
+			plt.plot(np.array(hist_NumEpoch_prox_saga), hist_TrainAcc_prox_saga, 'C3:', label = 'ProxSAGA')
+
 		if (alg_list["ProxGD"]):
 			plt.plot(np.array(hist_NumEpoch_prox_gd), hist_TrainAcc_prox_gd, 'C7-.', label = 'ProxGD')
 
@@ -767,6 +909,9 @@ if plot_option:
 		if (alg_list["ProxSGD"]):
 			plt.plot(np.array(hist_NumEpoch_prox_sgd), hist_TestAcc_prox_sgd, 'g-.', label = 'ProxSGD')
 
+		if (alg_list["ProxSAGA"]):
+			plt.plot(np.array(hist_NumEpoch_prox_saga), hist_TestAcc_prox_saga, 'C3:', label = 'ProxSAGA')
+
 		if (alg_list["ProxGD"]):
 			plt.plot(np.array(hist_NumEpoch_prox_gd), hist_TestAcc_prox_gd, 'C7-.', label = 'ProxGD')
 
@@ -4,6 +4,17 @@ Useful function to read different dataset.
 
 Supported file: .csv or LIBSVM datasets.
 
+A dataset is read from its source files once, then from a cache of .npy arrays in data_path + 'npycache/' that is
+mapped into memory (see util_DataCache). The cache of a dataset is rebuilt when its source files change, deleting the
+cache directory also forces a rebuild. import_preprocessed caches the output of a preprocessing pipeline of the drivers
+the same way (see util_Preprocess).
+
+The readers of the source files are registered by dataset name with register_dataset, any other name is read as a
+LIBSVM dataset. A reader imports the modules it needs (sklearn, the CSV and LIBSVM parsers, ...) when it runs, so
+importing this module and loading a cached dataset only needs numpy and scipy. The dataset folder is data_path,
+taken from the environment variable PROXSARAH_DATA_PATH unless set below, and is only checked when a dataset is
+imported.
+
 Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
 
 Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
@@ -23,41 +34,72 @@ If you found this helpful and are using it within our software please cite the f
 
 # external library
 import numpy as np
-from sklearn.datasets import *
-import numpy as np
-from joblib import Memory
+from scipy import sparse
 from pathlib import Path
-from csv import reader
 import sys
 import os
 
-# Important: change these paths to folder containing datasets according to your setup.
-# data_path = '/home/MyPC/dataset'
+from util_Precision import precisions, as_precision
+from util_DataCache import source_files, load_cache, write_cache
+from util_Preprocess import pipeline_key, run_pipeline
 
-# check if dataset path exists
-if not os.path.exists(data_path):
-	sys.exit("\033[91m {}\033[00m" .format("Error: Dataset not found!!!"))
+# Important: change this path to the folder containing the datasets according to your setup,
+# or set the environment variable PROXSARAH_DATA_PATH.
+data_path = os.environ.get('PROXSARAH_DATA_PATH', '')
+# data_path = '/home/MyPC/dataset'
 
 # check if path ends with '/', if not append '/' to the path
-if data_path[-1] != '/':
+if data_path and data_path[-1] != '/':
 	data_path = data_path + '/'
 
 # set a location to store cache file
 # default: same folder as dataset folder
-mem = Memory(data_path + "mycache")
+cache_path = data_path + 'npycache/'
 
-@mem.cache
-def import_data(data_option):
-	"""! Import dataset
+## readers of the source files of the datasets by name, see register_dataset
+dataset_readers = {}
+
+def register_dataset(*names):
+	"""! Decorator registering the reader of the datasets of the given names
+
+	A reader is called as reader(data_option, dtype) and returns (X_train, Y_train, X_test, Y_test), with empty lists
+	for the missing parts. It imports the modules it needs itself.
+
+	Parameters
+	----------
+	@param names : names of the datasets read by the decorated function
+
+	Returns
+	-------
+	@retval : the decorator
+	"""
+	def register(reader):
+		for name in names:
+			dataset_readers[name] = reader
+		return reader
+	return register
+
+def check_data_path():
+	"""! Exit with an error if the dataset folder does not exist
+	"""
+	if not data_path or not os.path.exists(data_path):
+		sys.exit("\033[91m {}\033[00m" .format("Error: Dataset not found!!! Set data_path in import_data.py or PROXSARAH_DATA_PATH"))
+
+def import_data(data_option, precision = 'float64', mmap_mode = 'c'):
+	"""! Import dataset, from its cache if it is up to date
+
+	The cached arrays are copy-on-write memory maps by default: the drivers can normalize them in place, only the
+	modified pages are copied and the cache files are left unchanged. Read-only maps ('r') keep the dataset on disk for
+	out-of-core training (see util_OutOfCore).
 
-	Depending on the name of dataset, this function will return the corresponding input.
-	
 	@Note: for libsvm dataset, only the prefix are needed.
 		Ex: the data contains data.tr and data.t, you only need to set data_option = 'data'
 
 	Parameters
 	----------
 	@param data_option : name of the dataset
+	@param precision : floating point precision of the returned data and labels, 'float64' or 'float32'
+	@param mmap_mode : mode of the maps of the cached arrays, 'c' for copy-on-write, 'r' for read-only
 	    
 	Returns
 	-------
@@ -66,496 +108,318 @@ def import_data(data_option):
 	@retval X_test : test data
 	@retval New_Y_test : test label
 	"""
-	if (data_option == 'mnist'): 
+	check_data_path()
 
-		### ==================== MNIST DATA ===========================
+	cache_dir = cache_path + data_option + '-' + precision
+	sources = source_files(data_path + data_option + '*')
 
-		mnist_path = data_path + 'MNIST_data/'
+	data = load_cache(cache_dir, sources, mmap_mode=mmap_mode)
+	if data is None:
+		data = read_data(data_option, precision)
 
-		if sys.version_info[0] == 2:
-			from urllib import urlretrieve
-		else:
-			from urllib.request import urlretrieve
+		# a missing dataset is not cached
+		X_train = data[0]
+		if sparse.issparse(X_train) or len(X_train) > 0:
+			write_cache(cache_dir, data, sources)
 
-		def download(filename, source='http://yann.lecun.com/exdb/mnist/'):
-			print("Downloading %s" % filename)
-			urlretrieve(source + filename, mnist_path + filename)
-		
-		import gzip
-		
-		def load_mnist_images(filename):
-			if not os.path.exists(mnist_path + filename):
-				download(filename)
-			with gzip.open(mnist_path + filename, 'rb') as f:
-				data = np.frombuffer(f.read(), np.uint8, offset=16)
-			data = data.reshape(-1, 784)
-			return data
-
-		def load_mnist_labels(filename):
-			if not os.path.exists(mnist_path + filename):
-				download(filename)
-			with gzip.open(mnist_path + filename, 'rb') as f:
-				data = np.frombuffer(f.read(), np.uint8, offset=8)
-			return data
-			
-		# Get Training and Test Data
-		X_train = load_mnist_images('train-images-idx3-ubyte.gz')
-		Y_train = load_mnist_labels('train-labels-idx1-ubyte.gz')
-		X_test = load_mnist_images('t10k-images-idx3-ubyte.gz')
-		Y_test = load_mnist_labels('t10k-labels-idx1-ubyte.gz')
+			# continue on the maps like the later runs, the parsed arrays are freed
+			cached = load_cache(cache_dir, mmap_mode=mmap_mode)
+			if cached is not None:
+				del X_train
+				data = cached
 
-		# scale data
-		X_train = X_train / 255
-		X_test = X_test / 255
+	return data
 
-		# Get sizes of training data
-		num_train = len(Y_train)
+def import_preprocessed(data_option, pipeline, precision = 'float64', mmap_mode = 'c'):
+	"""! Import a dataset preprocessed by a pipeline, from its cache if it is up to date
 
-		# Get size of test data
-		num_test = len(Y_test)
+	The output of the pipeline is cached in data_path + 'npycache/<dataset>-<precision>-<key>/', the key being a hash
+	of the source files, the precision and the steps of the pipeline (see util_Preprocess).
 
-		num_classes = 10
-
-		# categorize training data
-		Temp_Y_train = np.zeros((num_train, num_classes))
-
-		# set corresponding position to 1
-		for i in range(num_train):
-			Temp_Y_train[i,Y_train[i]] = 1
-
-		New_Y_train = Temp_Y_train
+	Parameters
+	----------
+	@param data_option : name of the dataset
+	@param pipeline : list of (transform name, parameters) of util_Preprocess
+	@param precision : floating point precision of the returned data and labels, 'float64' or 'float32'
+	@param mmap_mode : mode of the maps of the cached arrays, 'c' for copy-on-write, 'r' for read-only (out of core)
 
-		# categorize test data
-		Temp_Y_test = np.zeros((num_test, num_classes))
-		
-		for i in range(num_test):
-			Temp_Y_test[i,Y_test[i]] = 1
+	Returns
+	-------
+	@retval X_train : train data
+	@retval Y_train : train label
+	@retval X_test : test data
+	@retval Y_test : test label
+	"""
+	check_data_path()
 
-		New_Y_test = Temp_Y_test
+	sources = source_files(data_path + data_option + '*')
+	cache_dir = '{}{}-{}-{}'.format(cache_path, data_option, precision, pipeline_key(pipeline, sources, precision))
 
-		### ==========================================================		
+	data = load_cache(cache_dir, sources, mmap_mode=mmap_mode)
+	if data is None:
+		data = import_data(data_option, precision, mmap_mode)
 
-	elif (data_option == 'optdigits'):
+		# a missing dataset is not preprocessed
+		if not sparse.issparse(data[0]) and len(data[0]) == 0:
+			return data
 
-		### ==================== OPTDIGITS DATA ===========================	
+		print('Preprocessing data...')
+		data = run_pipeline(data, pipeline, precisions[precision], mmap_mode == 'r', cache_path)
+		write_cache(cache_dir, data, sources)
 
-		source_path = data_path
-		
-		# Train Data
-		filename_train = 'optdigits.tra'
-		train_data = load_csv(source_path + filename_train)
-		for i in range(len(train_data[0])):
-			str_column_to_float(train_data, i)
-
-		train_data = np.array(train_data)	
-		X_train = train_data[:,0:64]
-		Y_train = train_data[:,64]
-
-		# Test Data
-		filename_test = 'optdigits.tes'
-		test_data = load_csv(source_path + filename_test)
-		for i in range(len(test_data[0])):
-			str_column_to_float(test_data, i)
-
-		test_data = np.array(test_data)	
-		X_test = test_data[:,0:64]
-		Y_test = test_data[:,64]
-
-		# Normalize data
-		max_val = np.max(X_train)
-		min_val = np.min(X_train)
-		X_train = (X_train - min_val)/(max_val - min_val)
-		X_test = (X_test - min_val)/(max_val - min_val)
-
-		# Get sizes of training data
-		num_train, num_feature = np.shape(X_train)
-
-		# Get size of test data
-		num_test = len(Y_test)
-
-		# Convert label to -1 (0,1,2,3,4) and +1 (5,6,7,8,9)
-		New_Y_train = np.zeros(num_train)
-		New_Y_test = np.zeros(num_test)
-
-		for i in range(0,num_train):
-			if (Y_train[i] != 1):
-				New_Y_train[i] = -1
-			else:
-				New_Y_train[i] = 1
-				
-		for i in range(0,num_test):
-			if (Y_test[i] != 1):
-				New_Y_test[i] = -1
-			else:
-				New_Y_test[i] = 1
-
-		### ==========================================================	
-
-	elif (data_option == 'news20'): 
-
-		### ==================== NEWS20 DATA ===========================
-
-		train = fetch_20newsgroups_vectorized(subset='train')
-		test = fetch_20newsgroups_vectorized(subset='test')
-
-		X_train_sparse = train.data
-		X_test_sparse = test.data
-
-		# Convert sparse matrices
-		X_train = X_train_sparse.toarray()
-		X_test = X_test_sparse.toarray()
-
-		Y_train = train.target
-		Y_test = test.target
-
-		# Normalize data
-		max_val = np.max(X_train)
-		min_val = np.min(X_train)
-		X_train = (X_train - min_val)/(max_val - min_val)
-		X_test = (X_test - min_val)/(max_val - min_val)
-
-		# Get sizes of training data
-		num_train, num_feature = np.shape(X_train)
-
-		# Get size of test data
-		num_test = len(Y_test)
-
-		# Convert label to -1 and +1
-		New_Y_train = np.zeros(num_train)
-		New_Y_test = np.zeros(num_test)
-
-		for i in range(0,num_train):
-			if (Y_train[i] != 10):
-				New_Y_train[i] = -1
-			else:
-				New_Y_train[i] = 1
-				
-		for i in range(0,num_test):
-			if (Y_test[i] != 10):
-				New_Y_test[i] = -1
-			else:
-				New_Y_test[i] = 1
-
-		### ==========================================================	
-
-	elif (data_option == 'covtype'):
-
-		### ==================== covtype DATA ===========================	
-
-		source_path = data_path
-		
-		# X Data
-		filename_x = 'covtype_x_data.csv'
-		x_data = load_csv(source_path + filename_x)
-		for i in range(len(x_data[0])):
-			str_column_to_float(x_data, i)
+		# continue on the maps like the later runs
+		cached = load_cache(cache_dir, mmap_mode=mmap_mode)
+		if cached is not None:
+			data = cached
 
-		x_data = np.array(x_data)
-		len_x_data, _ = np.shape(x_data)
-		sep_len = len_x_data*7//10	
-		X_train = x_data[:sep_len]
-		X_test = x_data[sep_len:]
+	return data
 
-		# Y Data
-		filename_y = 'covtype_y_data.csv'
-		y_data = load_csv(source_path + filename_y)
-		for i in range(len(y_data[0])):
-			str_column_to_float(y_data, i)
+def read_data(data_option, precision = 'float64'):
+	"""! Read dataset from its source files
 
-		y_data = np.array(y_data)
-		Y_train = y_data[:sep_len]
-		Y_test = y_data[sep_len:]
+	Depending on the name of dataset, this function will call the corresponding reader (see register_dataset), or
+	read_libsvm for the names without a reader.
+	
+	@Note: for libsvm dataset, only the prefix are needed.
+		Ex: the data contains data.tr and data.t, you only need to set data_option = 'data'
 
-		# Normalize data
-		max_val = np.max(X_train)
-		min_val = np.min(X_train)
-		X_train = (X_train - min_val)/(max_val - min_val)
-		X_test = (X_test - min_val)/(max_val - min_val)
+	Parameters
+	----------
+	@param data_option : name of the dataset
+	@param precision : floating point precision of the returned data and labels, 'float64' or 'float32'
+	    
+	Returns
+	-------
+	@retval X_train : train data
+	@retval New_Y_train : train label
+	@retval X_test : test data
+	@retval New_Y_test : test label
+	"""
+	dtype = precisions[precision]
 
-		# Get sizes of training data
-		num_train, num_feature = np.shape(X_train)
+	reader = dataset_readers.get(data_option, read_libsvm)
+	X_train, New_Y_train, X_test, New_Y_test = reader(data_option, dtype)
 
-		# Get size of test data
-		num_test = len(Y_test)
+	# convert the data of all sources to the requested precision
+	X_train, New_Y_train = as_precision(X_train, dtype), as_precision(New_Y_train, dtype)
+	X_test, New_Y_test = as_precision(X_test, dtype), as_precision(New_Y_test, dtype)
 
-		# Convert label to -1 (1) and +1 (2)
-		New_Y_train = Y_train*2 - 3
-		New_Y_test = Y_test*2 - 3
+	return X_train, New_Y_train, X_test, New_Y_test
 
-		### ==========================================================	
+def _min_max_scale(X_train, X_test = None):
+	"""! Scale the data to [0, 1] by the minimum and maximum of the train data
+	"""
+	max_val = np.max(X_train)
+	min_val = np.min(X_train)
+	X_train = (X_train - min_val)/(max_val - min_val)
+	if X_test is None:
+		return X_train
+	return X_train, (X_test - min_val)/(max_val - min_val)
+
+@register_dataset('mnist')
+def read_mnist(data_option, dtype):
+	"""! MNIST, downloaded to data_path + 'MNIST_data/' if missing, with one-hot labels
+	"""
+	### ==================== MNIST DATA ===========================
 
-	elif (data_option == 'ijcnn1'):
+	import gzip
 
-		### ==================== ijcnn1 DATA ===========================	
+	mnist_path = data_path + 'MNIST_data/'
 
-		source_path = data_path
+	if sys.version_info[0] == 2:
+		from urllib import urlretrieve
+	else:
+		from urllib.request import urlretrieve
+
+	def download(filename, source='http://yann.lecun.com/exdb/mnist/'):
+		print("Downloading %s" % filename)
+		urlretrieve(source + filename, mnist_path + filename)
+
+	def load_mnist_images(filename):
+		if not os.path.exists(mnist_path + filename):
+			download(filename)
+		with gzip.open(mnist_path + filename, 'rb') as f:
+			data = np.frombuffer(f.read(), np.uint8, offset=16)
+		data = data.reshape(-1, 784)
+		return data
+
+	def load_mnist_labels(filename):
+		if not os.path.exists(mnist_path + filename):
+			download(filename)
+		with gzip.open(mnist_path + filename, 'rb') as f:
+			data = np.frombuffer(f.read(), np.uint8, offset=8)
+		return data
 		
-		# Train Data
-		filename_x_train = 'ijcnn1_x_train.csv'
-		train_x_data = load_csv(source_path + filename_x_train)
-		for i in range(len(train_x_data[0])):
-			str_column_to_float(train_x_data, i)
+	# Get Training and Test Data
+	X_train = load_mnist_images('train-images-idx3-ubyte.gz')
+	Y_train = load_mnist_labels('train-labels-idx1-ubyte.gz')
+	X_test = load_mnist_images('t10k-images-idx3-ubyte.gz')
+	Y_test = load_mnist_labels('t10k-labels-idx1-ubyte.gz')
 
-		train_x_data = np.array(train_x_data)	
-		X_train = train_x_data
+	# scale data
+	X_train = X_train / 255
+	X_test = X_test / 255
 
-		filename_y_train = 'ijcnn1_y_train.csv'
-		train_y_data = load_csv(source_path + filename_y_train)
-		for i in range(len(train_y_data[0])):
-			str_column_to_float(train_y_data, i)
+	num_classes = 10
 
-		train_y_data = np.array(train_y_data)	
-		Y_train = train_y_data
+	# categorize training and test data: set the position of the label to 1
+	New_Y_train = np.zeros((len(Y_train), num_classes))
+	New_Y_train[np.arange(len(Y_train)), Y_train] = 1
 
-		# Test Data
-		filename_x_test = 'ijcnn1_x_test.csv'
-		test_x_data = load_csv(source_path + filename_x_test)
-		for i in range(len(test_x_data[0])):
-			str_column_to_float(test_x_data, i)
+	New_Y_test = np.zeros((len(Y_test), num_classes))
+	New_Y_test[np.arange(len(Y_test)), Y_test] = 1
 
-		test_x_data = np.array(test_x_data)	
-		X_test = test_x_data
-
-		filename_y_test = 'ijcnn1_y_test.csv'
-		test_y_data = load_csv(source_path + filename_y_test)
-		for i in range(len(test_y_data[0])):
-			str_column_to_float(test_y_data, i)
-
-		test_y_data = np.array(test_y_data)	
-		Y_test = test_y_data
-
-		# Normalize data
-		max_val = np.max(X_train)
-		min_val = np.min(X_train)
-		X_train = (X_train - min_val)/(max_val - min_val)
-		X_test = (X_test - min_val)/(max_val - min_val)
-
-		# Get sizes of training data
-		num_train, num_feature = np.shape(X_train)
-
-		# Get size of test data
-		num_test = len(Y_test)
-
-		New_Y_train = Y_train
-		New_Y_test = Y_test
+	return X_train, New_Y_train, X_test, New_Y_test
 
-		### ==========================================================	
+@register_dataset('optdigits')
+def read_optdigits(data_option, dtype):
+	"""! optdigits, CSV files of 64 features and the digit, labels +1 for the digit 1 and -1 otherwise
+	"""
+	### ==================== OPTDIGITS DATA ===========================	
 
-	elif (data_option == 'phishing'):
+	from util_Csv import load_csv
 
-		### ==================== phishing DATA ===========================	
+	# Train Data
+	train_data = load_csv(data_path + 'optdigits.tra')
+	X_train = train_data[:,0:64]
+	Y_train = train_data[:,64]
 
-		source_path = data_path
-		
-		# X Data
-		filename_x = 'phishing_x_data.csv'
-		x_data = load_csv(source_path + filename_x)
-		for i in range(len(x_data[0])):
-			str_column_to_float(x_data, i)
+	# Test Data
+	test_data = load_csv(data_path + 'optdigits.tes')
+	X_test = test_data[:,0:64]
+	Y_test = test_data[:,64]
 
-		x_data = np.array(x_data)
-		len_x_data, _ = np.shape(x_data)
-		sep_len = len_x_data*7//10	
-		X_train = x_data[:sep_len]
-		X_test = x_data[sep_len:]
+	# Normalize data
+	X_train, X_test = _min_max_scale(X_train, X_test)
 
-		# Y Data
-		filename_y = 'phishing_y_data.csv'
-		y_data = load_csv(source_path + filename_y)
-		for i in range(len(y_data[0])):
-			str_column_to_float(y_data, i)
+	# Convert label to -1 and +1 (1)
+	New_Y_train = np.where(Y_train != 1, -1.0, 1.0)
+	New_Y_test = np.where(Y_test != 1, -1.0, 1.0)
 
-		y_data = np.array(y_data)
-		Y_train = y_data[:sep_len]
-		Y_test = y_data[sep_len:]
+	return X_train, New_Y_train, X_test, New_Y_test
 
-		# Normalize data
-		max_val = np.max(X_train)
-		min_val = np.min(X_train)
-		X_train = (X_train - min_val)/(max_val - min_val)
-		X_test = (X_test - min_val)/(max_val - min_val)
+@register_dataset('news20')
+def read_news20(data_option, dtype):
+	"""! 20 newsgroups from sklearn, labels +1 for the group 10 and -1 otherwise
+	"""
+	### ==================== NEWS20 DATA ===========================
 
-		# Get sizes of training data
-		num_train, num_feature = np.shape(X_train)
+	from sklearn.datasets import fetch_20newsgroups_vectorized
 
-		# Get size of test data
-		num_test = len(Y_test)
+	train = fetch_20newsgroups_vectorized(subset='train')
+	test = fetch_20newsgroups_vectorized(subset='test')
 
-		# Convert label to -1 (0) and +1 (1)
-		New_Y_train = Y_train*2 - 1
-		New_Y_test = Y_test*2 - 1
+	# Convert sparse matrices
+	X_train = train.data.toarray()
+	X_test = test.data.toarray()
 
-		### ==========================================================	
+	Y_train = train.target
+	Y_test = test.target
 
-	elif (data_option == 'w8a'):
+	# Normalize data
+	X_train, X_test = _min_max_scale(X_train, X_test)
 
-		### ==================== w8a DATA ===========================	
+	# Convert label to -1 and +1 (10)
+	New_Y_train = np.where(Y_train != 10, -1.0, 1.0)
+	New_Y_test = np.where(Y_test != 10, -1.0, 1.0)
 
-		source_path = data_path
-		
-		# Train Data
-		filename_x_train = 'w8a_x_train.csv'
-		train_x_data = load_csv(source_path + filename_x_train)
-		for i in range(len(train_x_data[0])):
-			str_column_to_float(train_x_data, i)
+	return X_train, New_Y_train, X_test, New_Y_test
 
-		train_x_data = np.array(train_x_data)	
-		X_train = train_x_data
+@register_dataset('covtype', 'phishing')
+def read_csv_xy(data_option, dtype):
+	"""! Datasets given as <name>_x_data.csv and <name>_y_data.csv, split 70/30 into train and test data
 
-		filename_y_train = 'w8a_y_train.csv'
-		train_y_data = load_csv(source_path + filename_y_train)
-		for i in range(len(train_y_data[0])):
-			str_column_to_float(train_y_data, i)
+	covtype labels 1/2 and phishing labels 0/1 are converted to -1/+1.
+	"""
+	### ==================== covtype, phishing DATA ===========================	
 
-		train_y_data = np.array(train_y_data)	
-		Y_train = train_y_data
+	from util_Csv import load_csv
 
-		# Test Data
-		filename_x_test = 'w8a_x_test.csv'
-		test_x_data = load_csv(source_path + filename_x_test)
-		for i in range(len(test_x_data[0])):
-			str_column_to_float(test_x_data, i)
+	# X Data
+	x_data = load_csv(data_path + data_option + '_x_data.csv')
+	len_x_data, _ = np.shape(x_data)
+	sep_len = len_x_data*7//10	
+	X_train = x_data[:sep_len]
+	X_test = x_data[sep_len:]
 
-		test_x_data = np.array(test_x_data)	
-		X_test = test_x_data
+	# Y Data
+	y_data = load_csv(data_path + data_option + '_y_data.csv')
+	Y_train = y_data[:sep_len]
+	Y_test = y_data[sep_len:]
 
-		filename_y_test = 'w8a_y_test.csv'
-		test_y_data = load_csv(source_path + filename_y_test)
-		for i in range(len(test_y_data[0])):
-			str_column_to_float(test_y_data, i)
+	# Normalize data
+	X_train, X_test = _min_max_scale(X_train, X_test)
 
-		test_y_data = np.array(test_y_data)	
-		Y_test = test_y_data
+	# Convert label to -1 and +1: covtype (1, 2), phishing (0, 1)
+	label_shift = 3 if data_option == 'covtype' else 1
+	New_Y_train = Y_train*2 - label_shift
+	New_Y_test = Y_test*2 - label_shift
 
-		# Normalize data
-		max_val = np.max(X_train)
-		min_val = np.min(X_train)
-		X_train = (X_train - min_val)/(max_val - min_val)
-		X_test = (X_test - min_val)/(max_val - min_val)
+	return X_train, New_Y_train, X_test, New_Y_test
 
-		# Get sizes of training data
-		num_train, num_feature = np.shape(X_train)
+@register_dataset('ijcnn1', 'w8a')
+def read_csv_train_test(data_option, dtype):
+	"""! Datasets given as <name>_x_train.csv, <name>_y_train.csv, <name>_x_test.csv and <name>_y_test.csv
+	"""
+	### ==================== ijcnn1, w8a DATA ===========================	
 
-		# Get size of test data
-		num_test = len(Y_test)
+	from util_Csv import load_csv
 
-		New_Y_train = Y_train
-		New_Y_test = Y_test
+	# Train Data
+	X_train = load_csv(data_path + data_option + '_x_train.csv')
+	Y_train = load_csv(data_path + data_option + '_y_train.csv')
 
-		### ==========================================================	
-	
-	elif (data_option == 'blog'):
+	# Test Data
+	X_test = load_csv(data_path + data_option + '_x_test.csv')
+	Y_test = load_csv(data_path + data_option + '_y_test.csv')
 
-		### ==================== blog DATA ===========================	
+	# Normalize data
+	X_train, X_test = _min_max_scale(X_train, X_test)
 
-		source_path = data_path
+	return X_train, Y_train, X_test, Y_test
 
-		# Train Data
-		filename_x_train = 'blogData_train.csv'
-		train_x_data = load_csv(source_path + filename_x_train)
-		for i in range(len(train_x_data[0])):
-			str_column_to_float(train_x_data, i)
+## source file of the datasets without labels nor test data
+_unlabeled_files = {'blog' : 'blogData_train.csv', 'YearPredictionMSD' : 'YearPredictionMSD.txt'}
 
-		train_x_data = np.array(train_x_data)	
+@register_dataset(*_unlabeled_files)
+def read_unlabeled(data_option, dtype):
+	"""! Datasets of a single CSV file of features, without labels nor test data
+	"""
+	### ==================== blog, YearPredictionMSD DATA ===========================	
 
-		X_train = train_x_data
+	from util_Csv import load_csv
 
-		# Normalize data
-		max_val = np.max(X_train)
-		min_val = np.min(X_train)
-		X_train = (X_train - min_val)/(max_val - min_val)
-		New_Y_train = []
-		X_test = []
-		New_Y_test = []
+	# Train Data
+	X_train = load_csv(data_path + _unlabeled_files[data_option])
 
-	elif (data_option == 'YearPredictionMSD'):
+	# Normalize data
+	X_train = _min_max_scale(X_train)
 
-		### ==================== YearPredictionMSD DATA ===========================	
+	return X_train, [], [], []
 
-		source_path = data_path
+def read_libsvm(data_option, dtype):
+	"""! LIBSVM dataset <name>.tr, <name>.train or <name> and <name>.t or <name>.test, possibly compressed
 
-		# Train Data
-		filename_x_train = 'YearPredictionMSD.txt'
-		train_x_data = load_csv(source_path + filename_x_train)
-		for i in range(len(train_x_data[0])):
-			str_column_to_float(train_x_data, i)
+	The reader of the datasets without a registered reader.
+	"""
+	### ==================== libsvm DATA ===========================	
 
-		train_x_data = np.array(train_x_data)	
+	from util_Libsvm import load_libsvm, compressed_formats
 
-		X_train = train_x_data
+	# suffixes tried for the files: none, then the compressed formats read on the fly
+	compressed_ext = [''] + sorted(compressed_formats)
 
-		# Normalize data
-		max_val = np.max(X_train)
-		min_val = np.min(X_train)
-		X_train = (X_train - min_val)/(max_val - min_val)
-		New_Y_train = []
-		X_test = []
-		New_Y_test = []
+	def find(exts):
+		for name in [data_option + ext + zext for ext in exts for zext in compressed_ext]:
+			if Path(data_path + name).is_file():
+				return load_libsvm(data_path + name, dtype=dtype)
+		return [], []
 
-	else:
-		### ==================== libsvm DATA ===========================	
-
-		source_path = data_path
-
-		train_ext = ['.tr', '.train','']
-
-		for text in train_ext:
-			# Train Data
-			filename_train = data_option + text
-			trainFile = Path(source_path + filename_train)
-			if trainFile.is_file():
-				X_train, New_Y_train = load_svmlight_file(source_path + filename_train)
-				break
-			else:
-				X_train = []
-				New_Y_train = []
-
-		test_ext = ['.t', '.test']
-
-		for text in test_ext:
-			filename_test = data_option + text
-			testFile = Path(source_path + filename_test)
-			if testFile.is_file():
-				X_test, New_Y_test = load_svmlight_file(source_path + filename_test)
-				break
-			else:
-				X_test = []
-				New_Y_test = []		
+	X_train, New_Y_train = find(['.tr', '.train', ''])
+	X_test, New_Y_test = find(['.t', '.test'])
 
 	return X_train, New_Y_train, X_test, New_Y_test
 
-def load_csv(filename):
-	"""! Load a CSV file
-
-	Parameters
-	----------
-	@param filename : name of the file
-	    
-	Returns
-	-------
-	@retval dataset : list containing input data
-	"""
-	dataset = list()
-	with open(filename, 'r') as file:
-		csv_reader = reader(file)
-		for row in csv_reader:
-			if not row:
-				continue
-			dataset.append(row)
-	return dataset
-
-def str_column_to_float(dataset, column):
-	"""! Convert string column to float
-
-	Parameters
-	----------
-	@param dataset : input data
-	@param column : column index
-	    
-	"""
-	for row in dataset:
-		row[column] = float(row[column].strip())
-
 def split_dataset(data_option, percentage):
 	"""! Split a dataset and save as train and test set in the same folder
 
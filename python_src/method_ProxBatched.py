@@ -0,0 +1,538 @@
+"""!@package method_ProxBatched
+
+Batched ProxSARAH, ProxSpiderBoost and ProxGD that run k configurations at once.
+
+The configurations share the data, the mini-batch sizes, the length of the inner loop and the sampled mini-batches,
+and differ in their learning rate, averaging weight, penalty parameter and initial point. Their iterates are stacked
+as the columns of a d x k matrix, so that every full gradient, gradient difference and logging pass is one product of a
+chunk of rows with a dense block (see util_BlockGrad). Each configuration follows exactly the same iterations as a
+separate run of prox_sarah, prox_spbd or prox_gd with the same sampler.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+#library import
+import copy
+import numpy as np
+
+from util_Sampler import default_sampler
+from util_History import HistoryRecorder
+from util_Stopping import StoppingPolicy
+from util_Profiler import phase
+from util_Prox import prox_with_out
+from util_BlockGrad import block_grad_eval, block_accuracy, block_prox, block_sq_norm
+
+#===============================================================================================================================
+# common routines
+
+def stack_configs(w0, *params):
+	"""! Stack the initial points and the parameters of k configurations
+
+	Parameters
+	----------
+	@param w0 : initial point shared by all configurations, or d x k matrix with one initial point per column
+	@param params : parameters, each a scalar shared by all configurations or a sequence of k values
+
+	Returns
+	-------
+	@retval W : d x k matrix of initial points, in the precision of w0
+	@retval : the parameters as vectors of length k, in the precision of w0
+	"""
+	w0 = np.asarray(w0)
+	k = max([np.size(p) for p in params] + [w0.shape[1] if w0.ndim == 2 else 1])
+
+	if w0.ndim == 1:
+		W = np.repeat(w0[:, np.newaxis], k, axis=1)
+	else:
+		W = np.array(w0)
+
+	stacked = []
+	for p in params:
+		p = np.asarray(p, dtype=W.dtype)
+		if p.size not in (1, k):
+			raise ValueError("All configurations need the same number k of values, got {} and {}".format(p.size, k))
+		stacked.append(np.broadcast_to(p.ravel(), (k,)).copy())
+
+	if W.shape[1] != k:
+		raise ValueError("w0 has {} columns for {} configurations".format(W.shape[1], k))
+
+	return (W,) + tuple(stacked)
+
+def _averaged_step(ProxEval, W, V, eta, thresh, gamma, W_hat, out):
+	"""! Averaged steps (1 - gamma) W + gamma prox(W - eta V) of all configurations, computed in the buffer out, see
+	util_Prox.averaged_prox_step
+	"""
+	np.multiply(V, -eta, out=W_hat)
+	W_hat += W
+	block_prox(ProxEval, W_hat, thresh, out=W_hat)
+	np.multiply(W, 1 - gamma, out=out)
+	W_hat *= gamma
+	out += W_hat
+	return out
+
+def _log_configs(hist, n, X_train, Y_train, X_test, Y_test, bias, W, full_grad, margins, eta_comp, lamb, num_grad, num_epoch, \
+				ProxEval, FuncF_Eval, FuncG_Eval, BlockCoefEval, isAccEval, verbose):
+	"""! Compute, print and record the stats of all configurations from their full gradients and margins
+	"""
+	k = W.shape[1]
+	num_test = len(Y_test)
+
+	# calculate gradient mapping for stats report
+	grad_map = (1/(eta_comp))*(W - block_prox(ProxEval, W - eta_comp*full_grad, lamb*eta_comp))
+	norm_grad_map = block_sq_norm(grad_map)
+
+	# calculate test accuracy of all configurations in one pass
+	if isAccEval:
+		train_accuracy = 1/float(n) * np.sum( 1*(margins > 0), axis=0 )
+		test_accuracy = block_accuracy(num_test, X_test, Y_test, bias, W, BlockCoefEval)
+
+	for j in range(k):
+		# a stopped configuration is no longer logged
+		if hist['Stopping'][j].reason:
+			continue
+
+		# update mins
+		hist['MinGradNorm_cur'][j] = min(hist['MinGradNorm_cur'][j], norm_grad_map[j])
+
+		# Get Training Loss
+		train_loss = FuncF_Eval(n, margins[:, j]) + float(lamb[j]) * FuncG_Eval(W[:, j])
+
+		# print info
+		if verbose:
+			with phase('print'):
+				if isAccEval:
+					print(
+						'{:^16.4f}'.format(num_epoch),'|',
+						'{:^6d}'.format(j),'|',
+						'{:^15.3e}'.format(train_loss),'|',
+						'{:^15.3e}'.format(norm_grad_map[j]),'|',
+						'{:^15.5f}'.format(train_accuracy[j]),'|',
+						'{:^13.5f}'.format(test_accuracy[j]),'|',
+					)
+				else:
+					print(
+						'{:^16.4f}'.format(num_epoch),'|',
+						'{:^6d}'.format(j),'|',
+						'{:^15.3e}'.format(train_loss),'|',
+						'{:^15.3e}'.format(norm_grad_map[j]),'|',
+						'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,),'|',
+					)
+
+		# update history if requires
+		if isAccEval:
+			hist['History'][j].record(num_grad, num_epoch, train_loss, float(norm_grad_map[j]), float(hist['MinGradNorm_cur'][j]), \
+										float(train_accuracy[j]), float(test_accuracy[j]))
+		else:
+			hist['History'][j].record(num_grad, num_epoch, train_loss, float(norm_grad_map[j]), float(hist['MinGradNorm_cur'][j]))
+
+		# check the stopping criteria, a stopped configuration returns its current iterate
+		if hist['Stopping'][j].check(num_epoch, train_loss, norm_grad_map[j], float(test_accuracy[j]) if isAccEval else None):
+			hist['W_stop'][j] = W[:, j].copy()
+
+def _init_hist(k, histories, stopping):
+	"""! History recorders and stopping criteria of k configurations, new recorders in memory if histories is None
+	"""
+	if histories is None:
+		histories = [HistoryRecorder() for j in range(k)]
+	if len(histories) != k:
+		raise ValueError("Got {} history recorders for {} configurations".format(len(histories), k))
+
+	# every configuration gets its own copy of the criteria
+	if stopping is None:
+		stopping = StoppingPolicy()
+	stopping.start()
+
+	hist = {'History': list(histories)}
+	hist['MinGradNorm_cur'] = [1.0e6] * k
+	hist['Stopping'] = [copy.deepcopy(stopping) for j in range(k)]
+	hist['W_stop'] = [None] * k
+	return hist
+
+def _all_stopped(hist, num_epoch = None):
+	"""! Flag whether every configuration met a stopping criterion, checking the wall-clock budget too if num_epoch is given
+	"""
+	if num_epoch is not None:
+		return all([stopping.check_time(num_epoch) for stopping in hist['Stopping']])
+	return all(stopping.reason for stopping in hist['Stopping'])
+
+def _split_results(W, hist, num_epoch, verbose):
+	"""! One result per configuration, in the format returned by the unbatched methods
+	"""
+	results = []
+	for j in range(W.shape[1]):
+		# report why the configuration stopped
+		stopping = hist['Stopping'][j]
+		stopping.finish(num_epoch)
+		if verbose:
+			print('Config {} stopped ({}): {}'.format(j, stopping.reason, stopping.detail))
+		hist['History'][j].metadata['stop_reason'] = stopping.reason
+
+		hist['History'][j].close()
+		w = W[:, j].copy() if hist['W_stop'][j] is None else hist['W_stop'][j]
+		results.append((w,) + hist['History'][j].columns())
+	return results
+
+def _print_start(name, eta, gamma, lamb, inner_batch_size, verbose):
+	"""! Print the parameters of all configurations and the header of the iteration info
+	"""
+	if not verbose:
+		return
+
+	print('Start ' + name + ' with', len(eta), 'configurations ...')
+	print(
+		' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=78,),'\n',
+		'{message:{fill}{align}{width}}'.format(message='Config',fill=' ',align='^',width=6,),'|',
+		'{message:{fill}{align}{width}}'.format(message='eta',fill=' ',align='^',width=13,),'|',
+		'{message:{fill}{align}{width}}'.format(message='gamma',fill=' ',align='^',width=13,),'|',
+		'{message:{fill}{align}{width}}'.format(message='lambda',fill=' ',align='^',width=15,),'|',
+		'{message:{fill}{align}{width}}'.format(message='Inner Batch Size',fill=' ',align='^',width=20,),'\n',
+		'{message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=78,)
+	)
+	for j in range(len(eta)):
+		print(
+				'{:^7d}'.format(j),'|',
+				'{:^13.3e}'.format(eta[j]),'|',
+				'{:^13.2f}'.format(gamma[j]),'|',
+				'{:^15.3e}'.format(lamb[j]),'|',
+				'{:^19d}'.format(inner_batch_size)
+			)
+	print(
+		' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=78,),'\n',
+		)
+	print(
+		' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=96,),'\n',
+		'{message:{fill}{align}{width}}'.format(message='Epoch',fill=' ',align='^',width=15,),'|',
+		'{message:{fill}{align}{width}}'.format(message='Config',fill=' ',align='^',width=6,),'|',
+		'{message:{fill}{align}{width}}'.format(message='Train Loss',fill=' ',align='^',width=15,),'|',
+		'{message:{fill}{align}{width}}'.format(message='||Grad Map||^2',fill=' ',align='^',width=15,),'|',
+		'{message:{fill}{align}{width}}'.format(message='Train Acc',fill=' ',align='^',width=15,),'|',
+		'{message:{fill}{align}{width}}'.format(message='Test Acc',fill=' ',align='^',width=15,),'\n',
+		'{message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=96,)
+	)
+
+#===============================================================================================================================
+# ProxSARAH
+
+def prox_sarah_batched(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num_epoch, max_inner, w0, gamma, lamb, grad_batch_size, \
+				inner_batch_size, BlockCoefEval, FuncF_Eval, ProxEval, FuncG_Eval, isAccEval = 0, verbose = 0, is_fun_eval = 1, sampler = None, \
+				name = 'Prox SARAH', histories = None, stopping = None):
+
+	"""! ProxSARAH algorithm for k configurations at once
+
+	Parameters
+	----------
+	@param n : sample size
+	@param d : number of features
+	@param X_train : train data
+	@param Y_train : train label
+	@param X_test : test data
+	@param Y_test : test label
+	@param bias : bias vector
+	@param eta : learning rate, scalar or one value per configuration
+	@param eta_comp : common learning rate used for gradient mapping squared norm comparsion between algorithms
+	@param max_num_epoch : the minimum number of epochs to run before termination
+	@param max_inner : maximum number of inner loop's iterations, shared by all configurations
+	@param w0 : initial point, or d x k matrix with one initial point per configuration
+	@param gamma : algorithm parameter, scalar or one value per configuration
+	@param lamb : penalty parameter of the non-smooth objective, scalar or one value per configuration
+	@param grad_batch_size : if < n, only compute an estimator of the full gradient. Else compute full gradient
+	@param inner_batch_size : batch size used to calculate gradient difference in the inner loop
+	@param BlockCoefEval : function pointer for the margins and gradient coefficients of k iterates (see util_BlockGrad)
+	@param FuncF_Eval : function pointer to compute objective value of f(w)
+	@param ProxEval : function pointer to compute proximal operator of g(w)
+	@param FuncG_Eval : function pointer to compute objective value of g(w)
+	@param isAccEval : flag whether to compute accuracy
+	@param verbose : specify verbosity level
+
+			0 : silence
+
+			1 : print iteration info
+
+	@param is_fun_eval : flag whether to compute and log data
+	@param sampler : mini-batch sampler (util_Sampler.MinibatchSampler), util_Sampler.default_sampler is used if None
+	@param name : name of the method in the printed info
+	@param histories : list of k history recorders (util_History.HistoryRecorder), one per configuration, new ones in memory if None
+	@param stopping : stopping criteria (util_Stopping.StoppingPolicy) checked for every configuration, which stops being logged once
+		it meets one, the run ends when all configurations stopped or at max_num_epoch
+
+	Returns
+	-------
+	@retval : list with one tuple (w, hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc,
+		hist_TestAcc) per configuration, as returned by prox_sarah
+	"""
+
+	# one column per configuration
+	W_til, eta, gamma, lamb = stack_configs(w0, eta, gamma, lamb)
+	eta_comp = float(eta_comp)
+	thresh = lamb * eta
+	ProxEval = prox_with_out(ProxEval)
+
+	# the steps rotate between the buffers W_prev, W and W_next
+	W = W_til
+	W_prev = np.empty_like(W)
+	W_next = np.empty_like(W)
+	W_hat = np.empty_like(W)
+
+	# initialize history list
+	hist = _init_hist(W_til.shape[1], histories, stopping)
+
+	# Count number of component gradient evaluation
+	num_grad 	= 0
+	num_epoch 	= 0
+
+	# store previous time when message had been printed
+	last_print_num_grad = num_grad
+
+	# use the shared sampler if none is given
+	if sampler is None:
+		sampler = default_sampler
+
+	# print initial message
+	_print_start(name, eta, gamma, lamb, inner_batch_size, verbose)
+
+	# Outer Loop
+	while num_epoch < max_num_epoch and not _all_stopped(hist, num_epoch):
+
+		# permute the rows once per epoch in 'shuffled_contiguous' mode
+		X_train, Y_train, bias = sampler.shuffle_rows(X_train, Y_train, bias)
+
+		# calculate batch gradient, need to calculate full gradient for stats report
+		if grad_batch_size < n:
+			V_cur = block_grad_eval(n, d, grad_batch_size, X_train, Y_train, bias, W_til, BlockCoefEval, sampler.sample(n, grad_batch_size), sampler.sample_weight)
+			# we have not calculated full gradient, need to do it here
+			if is_fun_eval:
+				with phase('log'):
+					full_grad, margins = block_grad_eval(n, d, n, X_train, Y_train, bias, W_til, BlockCoefEval)
+		else:
+			full_grad, margins = block_grad_eval(n, d, n, X_train, Y_train, bias, W_til, BlockCoefEval)
+			V_cur = full_grad
+
+		# log data
+		if is_fun_eval:
+			with phase('log'):
+				_log_configs(hist, n, X_train, Y_train, X_test, Y_test, bias, W_til, full_grad, margins, eta_comp, lamb, num_grad, num_epoch, \
+					ProxEval, FuncF_Eval, FuncG_Eval, BlockCoefEval, isAccEval, verbose)
+
+				# every configuration stopped at the anchor
+				if _all_stopped(hist):
+					W = W_til
+					break
+
+				# update print time
+				last_print_num_grad = num_grad
+
+		# Increase number of component gradient (1 full gradient = n component gradient)
+		num_grad += grad_batch_size
+		num_epoch += grad_batch_size / n
+
+		# First update in the outer loop, W is W_til here
+		_averaged_step(ProxEval, W_til, V_cur, eta, thresh, gamma, W_hat, W_next)
+		W_prev, W, W_next = W_til, W_next, W_prev
+
+		# pre-generate the mini-batches of the inner loop, shared by all configurations
+		index_blocks = sampler.sample_blocks(n, max_inner, inner_batch_size)
+
+		# Inner Loop
+		for iter in range(0, max_inner):
+
+			# calculate stochastic gradient diff of all configurations in one pass over the mini-batch
+			grad_diff = block_grad_eval(n, d, inner_batch_size, X_train, Y_train, bias, W, BlockCoefEval, index_blocks[iter], sampler.sample_weight, W_prev)
+
+			# Increase number of component gradient
+			num_grad += 2*inner_batch_size
+			num_epoch = num_grad / n
+
+			# Algorithm update
+			V_cur += grad_diff
+			_averaged_step(ProxEval, W, V_cur, eta, thresh, gamma, W_hat, W_next)
+			W_prev, W, W_next = W, W_next, W_prev
+
+			if is_fun_eval and (num_grad - last_print_num_grad >= n or num_epoch >= max_num_epoch):
+				with phase('log'):
+					# calculate full gradient and gradient mapping for stats report
+					full_grad, margins = block_grad_eval(n, d, n, X_train, Y_train, bias, W, BlockCoefEval)
+					_log_configs(hist, n, X_train, Y_train, X_test, Y_test, bias, W, full_grad, margins, eta_comp, lamb, num_grad, num_epoch, \
+						ProxEval, FuncF_Eval, FuncG_Eval, BlockCoefEval, isAccEval, verbose)
+
+					# update print time
+					last_print_num_grad = num_grad
+
+					# check if we're done
+					if num_epoch >= max_num_epoch or _all_stopped(hist):
+						break
+
+		# Go back to the outer loop.
+		W_til = W
+	# Outer loop ends
+	print(
+			' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=96,)
+		)
+
+	return _split_results(W, hist, num_epoch, verbose)
+
+#===============================================================================================================================
+# ProxSpiderBoost
+
+def prox_spbd_batched(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num_epoch, max_inner, w0, lamb, batch_size, inner_batch_size, \
+				BlockCoefEval, FuncF_Eval, ProxEval, FuncG_Eval, isAccEval = 0, verbose = 0, is_fun_eval = 1, sampler = None, histories = None, stopping = None):
+
+	"""! ProxSpiderBoost algorithm for k configurations at once, i.e. ProxSARAH without averaging (gamma = 1)
+
+	Parameters
+	----------
+	@param n : sample size
+	@param d : number of features
+	@param X_train : train data
+	@param Y_train : train label
+	@param X_test : test data
+	@param Y_test : test label
+	@param bias : bias vector
+	@param eta : learning rate, scalar or one value per configuration
+	@param eta_comp : common learning rate used for gradient mapping squared norm comparsion between algorithms
+	@param max_num_epoch : the minimum number of epochs to run before termination
+	@param max_inner : maximum number of inner loop's iterations, shared by all configurations
+	@param w0 : initial point, or d x k matrix with one initial point per configuration
+	@param lamb : penalty parameter of the non-smooth objective, scalar or one value per configuration
+	@param batch_size : if < n, only compute an estimator of the full gradient. Else compute full gradient
+	@param inner_batch_size : batch size used to calculate gradient difference in the inner loop
+	@param BlockCoefEval : function pointer for the margins and gradient coefficients of k iterates (see util_BlockGrad)
+	@param FuncF_Eval : function pointer to compute objective value of f(w)
+	@param ProxEval : function pointer to compute proximal operator of g(w)
+	@param FuncG_Eval : function pointer to compute objective value of g(w)
+	@param isAccEval : flag whether to compute accuracy
+	@param verbose : specify verbosity level
+
+			0 : silence
+
+			1 : print iteration info
+
+	@param is_fun_eval : flag whether to compute and log data
+	@param sampler : mini-batch sampler (util_Sampler.MinibatchSampler), util_Sampler.default_sampler is used if None
+	@param histories : list of k history recorders (util_History.HistoryRecorder), one per configuration, new ones in memory if None
+	@param stopping : stopping criteria (util_Stopping.StoppingPolicy) checked for every configuration, which stops being logged once
+		it meets one, the run ends when all configurations stopped or at max_num_epoch
+
+	Returns
+	-------
+	@retval : list with one tuple (w, hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc,
+		hist_TestAcc) per configuration, as returned by prox_spbd
+	"""
+	return prox_sarah_batched(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num_epoch, max_inner, w0, 1.0, lamb, \
+				batch_size, inner_batch_size, BlockCoefEval, FuncF_Eval, ProxEval, FuncG_Eval, isAccEval, verbose, is_fun_eval, sampler, \
+				name = 'Prox SpiderBoost', histories = histories, stopping = stopping)
+
+#===============================================================================================================================
+# ProxGD
+
+def prox_gd_batched(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num_epoch, w0, lamb, BlockCoefEval, FuncF_Eval, \
+				ProxEval, FuncG_Eval, isAccEval = 0, verbose = 0, is_fun_eval = 1, histories = None, stopping = None):
+
+	"""! ProxGD algorithm for k configurations at once
+
+	Parameters
+	----------
+	@param n : sample size
+	@param d : number of features
+	@param X_train : train data
+	@param Y_train : train label
+	@param X_test : test data
+	@param Y_test : test label
+	@param bias : bias vector
+	@param eta : learning rate, scalar or one value per configuration
+	@param eta_comp : common learning rate used for gradient mapping squared norm comparsion between algorithms
+	@param max_num_epoch : the minimum number of epochs to run before termination
+	@param w0 : initial point, or d x k matrix with one initial point per configuration
+	@param lamb : penalty parameter of the non-smooth objective, scalar or one value per configuration
+	@param BlockCoefEval : function pointer for the margins and gradient coefficients of k iterates (see util_BlockGrad)
+	@param FuncF_Eval : function pointer to compute objective value of f(w)
+	@param ProxEval : function pointer to compute proximal operator of g(w)
+	@param FuncG_Eval : function pointer to compute objective value of g(w)
+	@param isAccEval : flag whether to compute accuracy
+	@param verbose : specify verbosity level
+
+			0 : silence
+
+			1 : print iteration info
+
+	@param is_fun_eval : flag whether to compute and log data
+	@param histories : list of k history recorders (util_History.HistoryRecorder), one per configuration, new ones in memory if None
+	@param stopping : stopping criteria (util_Stopping.StoppingPolicy) checked for every configuration, which stops being logged once
+		it meets one, the run ends when all configurations stopped or at max_num_epoch
+
+	Returns
+	-------
+	@retval : list with one tuple (w, hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc,
+		hist_TestAcc) per configuration, as returned by prox_gd
+	"""
+
+	# one column per configuration
+	W, eta, lamb = stack_configs(w0, eta, lamb)
+	eta_comp = float(eta_comp)
+	thresh = lamb * eta
+	ProxEval = prox_with_out(ProxEval)
+
+	# the steps alternate between the buffers W and W_next
+	W_next = np.empty_like(W)
+
+	# initialize history list
+	hist = _init_hist(W.shape[1], histories, stopping)
+
+	# Count number of component gradient evaluation
+	num_grad 	= 0
+	num_epoch 	= 0
+
+	# print initial message
+	_print_start('ProxGD', eta, np.ones_like(eta), lamb, n, verbose)
+
+	# calculate full gradient
+	V_cur, margins = block_grad_eval(n, d, n, X_train, Y_train, bias, W, BlockCoefEval)
+
+	# log data
+	if is_fun_eval:
+		with phase('log'):
+			_log_configs(hist, n, X_train, Y_train, X_test, Y_test, bias, W, V_cur, margins, eta_comp, lamb, num_grad, num_epoch, \
+				ProxEval, FuncF_Eval, FuncG_Eval, BlockCoefEval, isAccEval, verbose)
+
+	# Main loop
+	while num_epoch < max_num_epoch and not _all_stopped(hist, num_epoch):
+
+		# Algorithm update
+		np.multiply(V_cur, -eta, out=W_next)
+		W_next += W
+		block_prox(ProxEval, W_next, thresh, out=W_next)
+		W, W_next = W_next, W
+
+		# calculate full gradient
+		V_cur, margins = block_grad_eval(n, d, n, X_train, Y_train, bias, W, BlockCoefEval)
+
+		# Increase number of component gradient (1 full gradient = n component gradient)
+		num_grad += n
+		num_epoch += 1
+
+		# log data
+		if is_fun_eval:
+			with phase('log'):
+				_log_configs(hist, n, X_train, Y_train, X_test, Y_test, bias, W, V_cur, margins, eta_comp, lamb, num_grad, num_epoch, \
+					ProxEval, FuncF_Eval, FuncG_Eval, BlockCoefEval, isAccEval, verbose)
+	# Main loop ends
+
+	print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=96,))
+
+	return _split_results(W, hist, num_epoch, verbose)
+
+#===============================================================================================================================
@@ -32,11 +32,17 @@ If you found this helpful and are using it within our software please cite the f
 #library import
 import numpy as np
 
+from util_Precision import sq_norm
+from util_Prox import prox_with_out, prox_step, grad_mapping
+from util_History import HistoryRecorder
+from util_Stopping import StoppingPolicy
+from util_Profiler import phase, profiled
+
 #===============================================================================================================================
 # ProxGD
 
 def prox_gd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num_epoch, w0, lamb, GradEval, FuncF_Eval, \
-			ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose = 0, is_fun_eval = 1):
+			ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose = 0, is_fun_eval = 1, history = None, stopping = None):
 
 	"""! ProxGD algorithm
 
@@ -68,6 +74,8 @@ def prox_gd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num
 			1 : print iteration info
 
 	@param is_fun_eval : flag whether to compute and log data
+	@param history : history recorder (util_History.HistoryRecorder) the stats are recorded into, a new one in memory if None
+	@param stopping : stopping criteria (util_Stopping.StoppingPolicy) checked at every logging point besides max_num_epoch, none if None
 
 	Returns
 	-------
@@ -81,14 +89,14 @@ def prox_gd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num
 	@retval hist_TestAcc : test accuracy history
 	"""
 
-	# initialize history list
-	hist_TrainLoss 		= []
-	hist_NumGrad 		= []
-	hist_NumEpoch 		= []
-	hist_GradNorm 		= []
-	hist_TrainAcc 		= []
-	hist_TestAcc 		= []
-	hist_MinGradNorm 	= []
+	# initialize history
+	if history is None:
+		history = HistoryRecorder()
+
+	# initialize stopping criteria, the run also stops at max_num_epoch
+	if stopping is None:
+		stopping = StoppingPolicy()
+	stopping.start()
 
 	# initialize stats variables
 	min_norm_grad_map 	= 1.0e6
@@ -103,11 +111,21 @@ def prox_gd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num
 	# get length of test data
 	num_test = len(Y_test)
 
+	# python floats keep the precision of the data and iterates, see util_Precision
+	eta, eta_comp, lamb = float(eta), float(eta_comp), float(lamb)
+
 	# get average number of non zero elements in training data
 	nnz_Xtrain = np.mean(X_train.getnnz(axis=1))
 	if isAccEval:
 		nnz_Xtest = np.mean(X_test.getnnz(axis=1))
 
+	# time the oracles while the profiler is on, see util_Profiler
+	GradEval = profiled('grad', GradEval)
+	ProxEval = profiled('prox', prox_with_out(ProxEval))
+	FuncF_Eval = profiled('loss', FuncF_Eval)
+	FuncG_Eval = profiled('penalty', FuncG_Eval)
+	Acc_Eval = profiled('accuracy', Acc_Eval)
+
 	# print initial message
 	if verbose:
 		print('Start ProxGD...')
@@ -125,74 +143,77 @@ def prox_gd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num
 			' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=32,),'\n',
 			)
 	
-	# Assign initial value
-	w = w0
+	# Assign initial value, the steps alternate between the buffers w and w_next
+	w = np.array(w0)
+	w_next = np.empty_like(w)
+	grad_map = np.empty_like(w)
 
 	# calculate full gradient
 	v_cur, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
 	
 	# log data
 	if is_fun_eval:
+		with phase('log'):
 
-		# calculate gradient mapping for stats report
-		grad_map = (1/(eta_comp)) *(w - ProxEval(w - eta_comp*v_cur, lamb*eta_comp))
-		norm_grad_map = np.dot(grad_map.T, grad_map)
+			# calculate gradient mapping for stats report
+			norm_grad_map = sq_norm(grad_mapping(ProxEval, w, v_cur, eta_comp, lamb*eta_comp, grad_map))
 
-		# update mins
-		if norm_grad_map < min_norm_grad_map:
-			min_norm_grad_map = norm_grad_map
+			# update mins
+			if norm_grad_map < min_norm_grad_map:
+				min_norm_grad_map = norm_grad_map
 	
-		# Get Training Loss
-		train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
+			# Get Training Loss
+			train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
 
-		# calculate test accuracy
-		if isAccEval:
-			train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
-			test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)
+			# calculate test accuracy
+			if isAccEval:
+				train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
+				test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)
 	
-		# print info
-		if verbose:
-			print(
-				' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=87,),'\n',
-				'{message:{fill}{align}{width}}'.format(message='Epoch',fill=' ',align='^',width=15,),'|',
-				'{message:{fill}{align}{width}}'.format(message='Train Loss',fill=' ',align='^',width=15,),'|',
-				'{message:{fill}{align}{width}}'.format(message='||Grad Map||^2',fill=' ',align='^',width=15,),'|',
-				'{message:{fill}{align}{width}}'.format(message='Train Acc',fill=' ',align='^',width=15,),'|',
-				'{message:{fill}{align}{width}}'.format(message='Test Acc',fill=' ',align='^',width=15,),'\n',
-				'{message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=87,)
-			)
+			# print info
+			if verbose:
+				with phase('print'):
+					print(
+						' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=87,),'\n',
+						'{message:{fill}{align}{width}}'.format(message='Epoch',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='Train Loss',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='||Grad Map||^2',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='Train Acc',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='Test Acc',fill=' ',align='^',width=15,),'\n',
+						'{message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=87,)
+					)
+					if isAccEval:
+						print(
+							'{:^16.4f}'.format(num_epoch),'|',
+							'{:^15.3e}'.format(train_loss),'|',
+							'{:^15.3e}'.format(norm_grad_map),'|',
+							'{:^15.5f}'.format(train_accuracy),'|',
+							'{:^13.5f}'.format(test_accuracy)
+						)
+					else:
+						print(
+							'{:^16.4f}'.format(num_epoch),'|',
+							'{:^15.3e}'.format(train_loss),'|',
+							'{:^15.3e}'.format(norm_grad_map),'|',
+							'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+							'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
+						)	
+
+			# update history if requires
 			if isAccEval:
-				print(
-					'{:^16.4f}'.format(num_epoch),'|',
-					'{:^15.3e}'.format(train_loss),'|',
-					'{:^15.3e}'.format(norm_grad_map),'|',
-					'{:^15.5f}'.format(train_accuracy),'|',
-					'{:^13.5f}'.format(test_accuracy)
-				)
+				history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map, train_accuracy, test_accuracy)
 			else:
-				print(
-					'{:^16.4f}'.format(num_epoch),'|',
-					'{:^15.3e}'.format(train_loss),'|',
-					'{:^15.3e}'.format(norm_grad_map),'|',
-					'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
-					'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
-				)	
-
-		# update history if requires
-		hist_TrainLoss.append(train_loss)
-		if isAccEval:
-			hist_TrainAcc.append(train_accuracy)
-			hist_TestAcc.append(test_accuracy)
-		hist_GradNorm.append(np.asscalar(norm_grad_map))
-		hist_MinGradNorm.append(min_norm_grad_map)
-		hist_NumGrad.append(num_grad)
-		hist_NumEpoch.append(num_epoch)
+				history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map)
+
+			# check the stopping criteria
+			stopping.check(num_epoch, train_loss, norm_grad_map, test_accuracy if isAccEval else None)
 
 	# Main loop
-	while num_epoch < max_num_epoch:
+	while num_epoch < max_num_epoch and not stopping.check_time(num_epoch):
 
 		# Algorithm update
-		w = ProxEval( w - eta*v_cur, lamb*eta )
+		prox_step(ProxEval, w, v_cur, eta, lamb*eta, w_next)
+		w, w_next = w_next, w
 
 		# calculate full gradient 
 		v_cur, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
@@ -203,55 +224,62 @@ def prox_gd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num
 		
 		# log data
 		if is_fun_eval:
-			# calculate gradient norm square and gradient mapping for stats report
-			norm_grad = np.dot(v_cur.T,v_cur)
-			grad_map = (1/(eta_comp)) *(w - ProxEval(w - eta_comp*v_cur, lamb*eta_comp))
-			norm_grad_map = np.dot(grad_map.T, grad_map)
+			with phase('log'):
+				# calculate gradient norm square and gradient mapping for stats report
+				norm_grad = sq_norm(v_cur)
+				norm_grad_map = sq_norm(grad_mapping(ProxEval, w, v_cur, eta_comp, lamb*eta_comp, grad_map))
 
-			# update mins
-			if norm_grad_map < min_norm_grad_map:
-				min_norm_grad_map = norm_grad_map
+				# update mins
+				if norm_grad_map < min_norm_grad_map:
+					min_norm_grad_map = norm_grad_map
 
-			# Get Training Loss
-			train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
+				# Get Training Loss
+				train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
 
-			# calculate test accuracy
-			if isAccEval:
-				train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
-				test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)
+				# calculate test accuracy
+				if isAccEval:
+					train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
+					test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)
 		
-			# print info
-			if verbose:
+				# print info
+				if verbose:
+					with phase('print'):
+						if isAccEval:
+							print(
+								'{:^16.4f}'.format(num_epoch),'|',
+								'{:^15.3e}'.format(train_loss),'|',
+								'{:^15.3e}'.format(norm_grad_map),'|',
+								'{:^15.5f}'.format(train_accuracy),'|',
+								'{:^13.5f}'.format(test_accuracy)
+							)
+						else:
+							print(
+								'{:^16.4f}'.format(num_epoch),'|',
+								'{:^15.3e}'.format(train_loss),'|',
+								'{:^15.3e}'.format(norm_grad_map),'|',
+								'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+								'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
+							)	
+
+				# update history if requires
 				if isAccEval:
-					print(
-						'{:^16.4f}'.format(num_epoch),'|',
-						'{:^15.3e}'.format(train_loss),'|',
-						'{:^15.3e}'.format(norm_grad_map),'|',
-						'{:^15.5f}'.format(train_accuracy),'|',
-						'{:^13.5f}'.format(test_accuracy)
-					)
+					history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map, train_accuracy, test_accuracy)
 				else:
-					print(
-						'{:^16.4f}'.format(num_epoch),'|',
-						'{:^15.3e}'.format(train_loss),'|',
-						'{:^15.3e}'.format(norm_grad_map),'|',
-						'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
-						'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
-					)	
+					history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map)
 
-			# update history if requires
-			hist_TrainLoss.append(train_loss)
-			if isAccEval:
-				hist_TrainAcc.append(train_accuracy)
-				hist_TestAcc.append(test_accuracy)
-			hist_GradNorm.append(np.asscalar(norm_grad_map))
-			hist_MinGradNorm.append(min_norm_grad_map)
-			hist_NumGrad.append(num_grad)
-			hist_NumEpoch.append(num_epoch)
+				# check the stopping criteria
+				stopping.check(num_epoch, train_loss, norm_grad_map, test_accuracy if isAccEval else None)
 	# Main loop ends
 
 	print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=87,))
 	
+	# report why the run stopped
+	stopping.finish(num_epoch, verbose)
+	history.metadata['stop_reason'] = stopping.reason
+
+	history.close()
+	hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc, hist_TestAcc = history.columns()
+
 	return w, hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc, hist_TestAcc
 
 #===============================================================================================================================
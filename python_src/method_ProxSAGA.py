@@ -0,0 +1,337 @@
+"""! @package method_ProxSAGA
+
+Implementation of ProxSAGA algorithm presented in
+
+* S. J. Reddi, S. Sra, B. Poczos, and A. J. Smola. **[Proximal stochastic methods for nonsmooth nonconvex finite-sum optimization](https://papers.nips.cc/paper/6116-proximal-stochastic-methods-for-nonsmooth-nonconvex-finite-sum-optimization)**. In Advances in Neural Information Processing Systems, pp. 1145–1153, 2016.
+
+The algorithm is used to solve the nonconvex composite problem
+    
+\f $ F(w) = \frac{1}{n} \sum_{i=1}^n (f_i(w)) + g(w). \f $
+
+For the GLM losses of this package every component gradient is a multiple of its data row, \f$\nabla f_i(w) = c_i x_i\f$,
+so the SAGA gradient table only stores the n scalars \f$c_i\f$ together with their average \f$\frac{1}{n}\sum_i c_i x_i\f$.
+No periodic full gradient is needed after the table has been initialized.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+#library import
+import numpy as np
+
+from util_Precision import sq_norm
+from util_Prox import prox_with_out, prox_step, grad_mapping
+from util_History import HistoryRecorder
+from util_Stopping import StoppingPolicy
+from util_Profiler import phase, profiled
+from util_Sampler import default_sampler, take_rows, take_weights
+from util_ChunkPlan import iter_row_chunks
+
+#===============================================================================================================================
+# ProxSAGA
+
+def prox_saga(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num_epoch, w0, lamb, batch_size, \
+					GradEval, GradCoefEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose = 0, is_fun_eval = 1, sampler = None, history = None, stopping = None):
+	"""! ProxSAGA algorithm
+
+	Parameters
+	----------
+	@param n : sample size
+	@param d : number of features
+	@param X_train : train data
+	@param Y_train : train label
+	@param X_test : test data
+	@param Y_test : test label
+	@param bias : bias vector
+	@param eta : learning rate
+	@param eta_comp : common learning rate used for gradient mapping squared norm comparsion between algorithms
+	@param max_num_epoch : the minimum number of epochs to run before termination
+	@param w0 : initial point
+	@param lamb : penalty parameter of the non-smooth objective
+	@param batch_size : batch size used to calculate the stochastic gradient
+	@param GradEval : function pointer for gradient of f
+	@param GradCoefEval : function pointer for the scalar coefficients \f$c_i\f$ of \f$\nabla f_i(w) = c_i x_i\f$
+	@param FuncF_Eval : function pointer to compute objective value of f(w)
+	@param ProxEval : function pointer to compute proximal operator of g(w)
+	@param FuncG_Eval : function pointer to compute objective value of g(w)
+	@param Acc_Eval : function pointer to compute accuracy
+	@param verbose : specify verbosity level
+
+			0 : silence
+
+			1 : print iteration info
+
+	@param is_fun_eval : flag whether to compute and log data
+	@param sampler : mini-batch sampler (util_Sampler.MinibatchSampler), util_Sampler.default_sampler is used if None
+	@param history : history recorder (util_History.HistoryRecorder) the stats are recorded into, a new one in memory if None
+	@param stopping : stopping criteria (util_Stopping.StoppingPolicy) checked at every logging point besides max_num_epoch, none if None
+
+	Returns
+	-------
+	@retval w : solution
+	@retval hist_TrainLoss : train loss history
+	@retval hist_NumGrad : number of gradient evaluations history
+	@retval hist_GradNorm : squared norm of gradient mapping history
+	@retval hist_MinGradNorm : minimum squared norm of gradient mapping history
+	@retval hist_NumEpoch : history of epochs at which data were recorded
+	@retval hist_TrainAcc : train accuracy history
+	@retval hist_TestAcc : test accuracy history
+	"""
+
+	# initialize history
+	if history is None:
+		history = HistoryRecorder()
+
+	# initialize stopping criteria, the run also stops at max_num_epoch
+	if stopping is None:
+		stopping = StoppingPolicy()
+	stopping.start()
+
+	# initialize stats variables
+	min_norm_grad_map 	= 1.0e6
+
+	# Count number of component gradient evaluation
+	num_grad 	= 0
+	num_epoch 	= 0
+
+	# store previous time when message had been printed
+	last_print_num_grad = num_grad
+
+	# get length of test data
+	num_test = len(Y_test)
+
+	# python floats keep the precision of the data and iterates, see util_Precision
+	eta, eta_comp, lamb = float(eta), float(eta_comp), float(lamb)
+	# get average number of non zero elements in training data
+	nnz_Xtrain = np.mean(X_train.getnnz(axis=1))
+	if isAccEval:
+		nnz_Xtest = np.mean(X_test.getnnz(axis=1))
+
+	# use the shared sampler if none is given
+	if sampler is None:
+		sampler = default_sampler
+
+	# time the oracles while the profiler is on, see util_Profiler
+	GradEval = profiled('grad', GradEval)
+	GradCoefEval = profiled('grad_coef', GradCoefEval)
+	ProxEval = profiled('prox', prox_with_out(ProxEval))
+	FuncF_Eval = profiled('loss', FuncF_Eval)
+	FuncG_Eval = profiled('penalty', FuncG_Eval)
+	Acc_Eval = profiled('accuracy', Acc_Eval)
+
+	# print initial message
+	if verbose:
+		print('Start ProxSAGA...')
+		print(
+			' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=47,),'\n',
+			'{message:{fill}{align}{width}}'.format(message='eta',fill=' ',align='^',width=13,),'|',
+			'{message:{fill}{align}{width}}'.format(message='lambda',fill=' ',align='^',width=15,),'|',
+			'{message:{fill}{align}{width}}'.format(message='Batch Size',fill=' ',align='^',width=13,),'\n',
+			'{message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=47,)
+		)
+		print(
+				'{:^14.3e}'.format(eta),'|',
+				'{:^15.3e}'.format(lamb),'|',
+				'{:^12d}'.format(batch_size)
+			)
+		print(
+			' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=47,),'\n',
+			)
+	
+	# Assign initial value, the steps alternate between the buffers w and w_next
+	w = np.array(w0)
+	w_next = np.empty_like(w)
+	grad_map = np.empty_like(w)
+
+	if is_fun_eval:
+		with phase('log'):
+			# calculate full gradient and gradient mapping for stats report
+			full_grad, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
+			norm_grad_map = sq_norm(grad_mapping(ProxEval, w, full_grad, eta_comp, lamb*eta_comp, grad_map))
+
+			# update mins
+			if norm_grad_map < min_norm_grad_map:
+				min_norm_grad_map = norm_grad_map
+
+			# Get Training Loss
+			train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
+
+			# calculate test accuracy
+			if isAccEval:
+				train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
+				test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)
+	
+			# print info
+			if verbose:
+				with phase('print'):
+					print(
+						' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=87,),'\n',
+						'{message:{fill}{align}{width}}'.format(message='Epoch',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='Train Loss',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='||Grad Map||^2',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='Train Acc',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='Test Acc',fill=' ',align='^',width=15,),'\n',
+						'{message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=87,)
+					)
+					if isAccEval:
+						print(
+							'{:^16.4f}'.format(num_epoch),'|',
+							'{:^15.3e}'.format(train_loss),'|',
+							'{:^15.3e}'.format(norm_grad_map),'|',
+							'{:^15.5f}'.format(train_accuracy),'|',
+							'{:^13.5f}'.format(test_accuracy)
+						)
+					else:
+						print(
+							'{:^16.4f}'.format(num_epoch),'|',
+							'{:^15.3e}'.format(train_loss),'|',
+							'{:^15.3e}'.format(norm_grad_map),'|',
+							'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+							'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
+						)	
+
+			# update history if requires
+			if isAccEval:
+				history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map, train_accuracy, test_accuracy)
+			else:
+				history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map)
+
+			# check the stopping criteria
+			stopping.check(num_epoch, train_loss, norm_grad_map, test_accuracy if isAccEval else None)
+
+			# update print time
+			last_print_num_grad = num_grad
+
+	# initialize the gradient table at w0, one scalar per sample, and the average of the stored gradients, chunk by chunk
+	# within the memory budget (see util_ChunkPlan)
+	coef_table = np.empty(n, dtype=w.dtype)
+	avg_grad = np.zeros(d, dtype=w.dtype)
+	for startIdx, endIdx in iter_row_chunks(X_train, n):
+		batch_X = X_train[startIdx:endIdx]
+		coef_table[startIdx:endIdx] = GradCoefEval(batch_X, Y_train[startIdx:endIdx], bias[startIdx:endIdx], w)
+		avg_grad += batch_X.transpose().dot(coef_table[startIdx:endIdx])
+	avg_grad /= float(n)
+
+	# Increase number of component gradient (initializing the table costs n component gradients)
+	num_grad += n
+	num_epoch = num_grad / n
+
+	# pre-generate the mini-batches of one epoch at a time
+	num_blocks = max(n // batch_size, 1)
+	block_pos = num_blocks
+
+	# Main loop
+	while num_epoch < max_num_epoch and not stopping.check_time(num_epoch):
+
+		# draw the mini-batches of the next epoch, the table follows the rows if they get permuted
+		if block_pos >= num_blocks:
+			X_train, Y_train, bias, coef_table = sampler.shuffle_rows(X_train, Y_train, bias, coef_table)
+			index_blocks = sampler.sample_blocks(n, num_blocks, batch_size)
+			block_pos = 0
+
+		index = index_blocks[block_pos]
+		block_pos += 1
+
+		# gather the mini-batch and evaluate its gradient coefficients at the current point
+		batch_X = take_rows(X_train, index, 0, batch_size)
+		batch_coef = GradCoefEval(batch_X, take_rows(Y_train, index, 0, batch_size), take_rows(bias, index, 0, batch_size), w)
+		batch_coef_diff = batch_coef - take_rows(coef_table, index, 0, batch_size)
+		batch_weight = take_weights(sampler.sample_weight, index, 0, batch_size)
+
+		# SAGA estimator: new minus stored gradients of the mini-batch plus the average of the table
+		v_cur = batch_X.transpose().dot(batch_weight * batch_coef_diff) / float(batch_size) + avg_grad
+
+		# Increase number of component gradient
+		num_grad += batch_size
+		num_epoch = num_grad / n
+
+		# replace the stored gradients of the mini-batch, samples drawn more than once are updated once
+		if batch_size > 1 and not isinstance(index, slice):
+			index, first = np.unique(index, return_index=True)
+			if len(first) < batch_size:
+				batch_X = batch_X[first]
+				batch_coef_diff = batch_coef_diff[first]
+		avg_grad += batch_X.transpose().dot(batch_coef_diff) / float(n)
+		coef_table[index] += batch_coef_diff
+
+		# Algorithm update
+		prox_step(ProxEval, w, v_cur, eta, lamb*eta, w_next)
+		w, w_next = w_next, w
+
+		if is_fun_eval and (num_grad - last_print_num_grad >= n or num_epoch >= max_num_epoch):
+			with phase('log'):
+
+				# calculate full gradient and gradient mapping for stats report
+				full_grad, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
+				norm_grad_map = sq_norm(grad_mapping(ProxEval, w, full_grad, eta_comp, lamb*eta_comp, grad_map))
+
+				# update mins
+				if norm_grad_map < min_norm_grad_map:
+					min_norm_grad_map = norm_grad_map
+
+				# Get Training Loss
+				train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
+
+				# calculate test accuracy
+				if isAccEval:
+					train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
+					test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)	
+			
+				# print info
+				if verbose:
+					with phase('print'):
+						if isAccEval:
+							print(
+								'{:^16.4f}'.format(num_epoch),'|',
+								'{:^15.3e}'.format(train_loss),'|',
+								'{:^15.3e}'.format(norm_grad_map),'|',
+								'{:^15.5f}'.format(train_accuracy),'|',
+								'{:^13.5f}'.format(test_accuracy)
+							)
+						else:
+							print(
+								'{:^16.4f}'.format(num_epoch),'|',
+								'{:^15.3e}'.format(train_loss),'|',
+								'{:^15.3e}'.format(norm_grad_map),'|',
+								'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+								'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
+							)	
+
+				# update history if requires
+				if isAccEval:
+					history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map, train_accuracy, test_accuracy)
+				else:
+					history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map)
+
+				# check the stopping criteria
+				stopping.check(num_epoch, train_loss, norm_grad_map, test_accuracy if isAccEval else None)
+
+				# update print time
+				last_print_num_grad = num_grad
+
+	# Main loop ends
+	print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=87,))
+	
+	# report why the run stopped
+	stopping.finish(num_epoch, verbose)
+	history.metadata['stop_reason'] = stopping.reason
+
+	history.close()
+	hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc, hist_TestAcc = history.columns()
+
+	return w, hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc, hist_TestAcc
+
+#===============================================================================================================================
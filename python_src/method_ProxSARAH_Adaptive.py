@@ -30,11 +30,18 @@ If you found this helpful and are using it within our software please cite the f
 # library import
 import numpy as np
 
+from util_Precision import sq_norm
+from util_Prox import prox_with_out, averaged_prox_step, grad_mapping
+from util_History import HistoryRecorder
+from util_Stopping import StoppingPolicy
+from util_Profiler import phase, profiled
+from util_Sampler import default_sampler, permute_rows
+
 #===============================================================================================================================
 # ProxSARAH Adaptive step-size
 
 def prox_sarah_adaptive(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num_epoch, max_inner, w0, Lconst, gamma_m, lamb, grad_batch_size, \
-                        inner_batch_size, GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval = None, isAccEval = 0, verbose=0, is_fun_eval=1):
+                        inner_batch_size, GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval = None, isAccEval = 0, verbose=0, is_fun_eval=1, sampler=None, history=None, checkpoint=None, stopping=None):
     
     """! ProxSARAH-Adaptive algorithm
 
@@ -76,6 +83,11 @@ def prox_sarah_adaptive(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_c
             1 : print iteration info
 
     @param is_fun_eval : flag whether to compute and log data
+    @param sampler : mini-batch sampler (util_Sampler.MinibatchSampler), util_Sampler.default_sampler is used if None
+    @param history : history recorder (util_History.HistoryRecorder) the stats are recorded into, a new one in memory if None
+    @param checkpoint : checkpointer (util_Checkpoint.Checkpointer) saving the state at the end of every outer iteration, the run resumes
+        from its last checkpoint if there is one
+    @param stopping : stopping criteria (util_Stopping.StoppingPolicy) checked at every logging point besides max_num_epoch, none if None
 
     Returns
     -------
@@ -89,14 +101,14 @@ def prox_sarah_adaptive(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_c
     @retval hist_TestAcc : test accuracy history
     """
 
-    # initialize history list
-    hist_TrainLoss      = []
-    hist_NumGrad        = []
-    hist_NumEpoch       = []
-    hist_GradNorm       = []
-    hist_TrainAcc       = []
-    hist_TestAcc        = []
-    hist_MinGradNorm    = []
+    # initialize history
+    if history is None:
+        history = HistoryRecorder()
+
+    # initialize stopping criteria, the run also stops at max_num_epoch
+    if stopping is None:
+        stopping = StoppingPolicy()
+    stopping.start()
 
     # initialize stats variables
     min_norm_grad_map   = 1.0e6
@@ -111,11 +123,26 @@ def prox_sarah_adaptive(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_c
     # get length of test data
     num_test = len(Y_test)
 
+    # python floats keep the precision of the data and iterates, see util_Precision
+    eta, eta_comp, Lconst, gamma_m, lamb = float(eta), float(eta_comp), float(Lconst), float(gamma_m), float(lamb)
+
     # get average number of non zero elements in training data
     nnz_Xtrain = np.mean(X_train.getnnz(axis=1))
     if isAccEval:
         nnz_Xtest = np.mean(X_test.getnnz(axis=1))
 
+    # use the shared sampler if none is given
+    if sampler is None:
+        sampler = default_sampler
+
+    # time the oracles while the profiler is on, see util_Profiler
+    GradEval = profiled('grad', GradEval)
+    GradDiffEval = profiled('grad_diff', GradDiffEval)
+    ProxEval = profiled('prox', prox_with_out(ProxEval))
+    FuncF_Eval = profiled('loss', FuncF_Eval)
+    FuncG_Eval = profiled('penalty', FuncG_Eval)
+    Acc_Eval = profiled('accuracy', Acc_Eval)
+
     # print initial message
     if verbose:
         print('Start ProxSARAH-Adaptive...')
@@ -137,8 +164,28 @@ def prox_sarah_adaptive(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_c
             ' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=57,),'\n',
             )
 
-    # Assign initial value
-    w_til = w0
+    # Assign initial value, the steps rotate between the buffers w_prev, w and w_next
+    w_til = w = np.array(w0)
+    w_prev = np.empty_like(w)
+    w_next = np.empty_like(w)
+    w_hat = np.empty_like(w)
+    grad_map = np.empty_like(w)
+
+    # order of the rows of X_train, changed in 'shuffled_contiguous' mode
+    row_order = np.arange(n)
+
+    # continue from the last checkpoint if there is one
+    if checkpoint is not None:
+        with phase('checkpoint'):
+            state = checkpoint.restore(sampler, history)
+            if state is not None:
+                iterates, counters = state
+                w_til = w = iterates['w_til']
+                row_order = iterates['row_order']
+                if sampler.mode == 'shuffled_contiguous':
+                    X_train, Y_train, bias = permute_rows(row_order, X_train, Y_train, bias)
+                num_grad, num_epoch = counters['num_grad'], counters['num_epoch']
+                min_norm_grad_map, last_print_num_grad = counters['min_norm_grad_map'], counters['last_print_num_grad']
 
     # calculate adaptive stepsize once and use in all iterations
     gamma_list = np.zeros(max_inner + 1)
@@ -152,6 +199,9 @@ def prox_sarah_adaptive(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_c
         gamma_list[i] = 1.0 / ( Lconst * (eta + M_const*sum_gamma) )
         sum_gamma += gamma_list[i]
 
+    # python floats, see util_Precision
+    gamma_list = gamma_list.tolist()
+
     # print first time info
     if verbose:
         print(
@@ -165,152 +215,177 @@ def prox_sarah_adaptive(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_c
         )
 
     # Outer Loop
-    while num_epoch < max_num_epoch:
+    while num_epoch < max_num_epoch and not stopping.check_time(num_epoch):
+
+        # permute the rows once per epoch in 'shuffled_contiguous' mode
+        X_train, Y_train, bias, row_order = sampler.shuffle_rows(X_train, Y_train, bias, row_order)
 
         # calculate batch gradient, need to calculate full gradient for stats report
+        XYw_til = None
         if grad_batch_size < n:
-            v_cur = GradEval(n, d, grad_batch_size, X_train, Y_train, bias, w_til, nnz_Xtrain)
+            v_cur = GradEval(n, d, grad_batch_size, X_train, Y_train, bias, w_til, nnz_Xtrain, sampler.sample(n, grad_batch_size), sampler.sample_weight)
 
             # we have not calculated full gradient, need to do it here
             if is_fun_eval:
-                full_grad, XYw_til = GradEval(n, d, n, X_train, Y_train, bias, w_til, nnz_Xtrain)
+                with phase('log'):
+                    full_grad, XYw_til = GradEval(n, d, n, X_train, Y_train, bias, w_til, nnz_Xtrain)
         else:
             full_grad, XYw_til = GradEval(n, d, n, X_train, Y_train, bias, w_til, nnz_Xtrain)
             v_cur = full_grad
 
         if is_fun_eval:
-            # calculate gradient mapping for stats report
-            grad_map = (1 / (eta_comp)) * (w_til - ProxEval(w_til - eta_comp * full_grad, lamb * eta_comp))
-            norm_grad_map = np.dot(grad_map.T, grad_map)
+            with phase('log'):
+                # calculate gradient mapping for stats report
+                norm_grad_map = sq_norm(grad_mapping(ProxEval, w_til, full_grad, eta_comp, lamb*eta_comp, grad_map))
 
-            # update mins
-            if norm_grad_map < min_norm_grad_map:
-                min_norm_grad_map = norm_grad_map
+                # update mins
+                if norm_grad_map < min_norm_grad_map:
+                    min_norm_grad_map = norm_grad_map
 
-            # Get Training Loss
-            train_loss = FuncF_Eval(n, XYw_til) + lamb * FuncG_Eval(w_til)
+                # Get Training Loss
+                train_loss = FuncF_Eval(n, XYw_til) + lamb * FuncG_Eval(w_til)
 
-            # calculate test accuracy
-            if isAccEval:
-                train_accuracy = 1/float(n) * np.sum( 1*(XYw_til > 0) )
-                test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w_til, nnz_Xtest)
+                # calculate test accuracy
+                if isAccEval:
+                    train_accuracy = 1/float(n) * np.sum( 1*(XYw_til > 0) )
+                    test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w_til, nnz_Xtest)
         
-            # print info
-            if verbose:
+                # print info
+                if verbose:
+                    with phase('print'):
+                        if isAccEval:
+                            print(
+                                '{:^16.4f}'.format(num_epoch),'|',
+                                '{:^15.3e}'.format(train_loss),'|',
+                                '{:^15.3e}'.format(norm_grad_map),'|',
+                                '{:^15.5f}'.format(train_accuracy),'|',
+                                '{:^13.5f}'.format(test_accuracy)
+                            )
+                        else:
+                            print(
+                                '{:^16.4f}'.format(num_epoch),'|',
+                                '{:^15.3e}'.format(train_loss),'|',
+                                '{:^15.3e}'.format(norm_grad_map),'|',
+                                '{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+                                '{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
+                            )   
+
+                # update history if requires
                 if isAccEval:
-                    print(
-                        '{:^16.4f}'.format(num_epoch),'|',
-                        '{:^15.3e}'.format(train_loss),'|',
-                        '{:^15.3e}'.format(norm_grad_map),'|',
-                        '{:^15.5f}'.format(train_accuracy),'|',
-                        '{:^13.5f}'.format(test_accuracy)
-                    )
+                    history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map, train_accuracy, test_accuracy)
                 else:
-                    print(
-                        '{:^16.4f}'.format(num_epoch),'|',
-                        '{:^15.3e}'.format(train_loss),'|',
-                        '{:^15.3e}'.format(norm_grad_map),'|',
-                        '{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
-                        '{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
-                    )   
-
-            # update history if requires
-            hist_TrainLoss.append(train_loss)
-            if isAccEval:
-                hist_TrainAcc.append(train_accuracy)
-                hist_TestAcc.append(test_accuracy)
-            hist_GradNorm.append(np.asscalar(norm_grad_map))
-            hist_MinGradNorm.append(min_norm_grad_map)
-            hist_NumGrad.append(num_grad)
-            hist_NumEpoch.append(num_epoch)
-
-            # update print time
-            last_print_num_grad = num_grad
+                    history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map)
+
+                # check the stopping criteria, a run stopped at the anchor returns it
+                if stopping.check(num_epoch, train_loss, norm_grad_map, test_accuracy if isAccEval else None):
+                    w = w_til
+                    break
+
+                # update print time
+                last_print_num_grad = num_grad
 
         # Increase number of component gradient (1 full gradient = n component gradient)
         num_grad += grad_batch_size
         num_epoch += grad_batch_size / n
 
-        # First update in the outer loop
-        w_prev = w_til
-        w_hat = ProxEval(w_til - eta * v_cur, lamb * eta)
-        w = (1 - gamma_list[0]) * w_til + gamma_list[0] * w_hat
+        # First update in the outer loop, w is w_til here
+        averaged_prox_step(ProxEval, w_til, v_cur, eta, lamb * eta, gamma_list[0], w_hat, w_next)
+        w_prev, w, w_next = w_til, w_next, w_prev
+
+        # margins at w_prev, only known at the anchor where they come from the full gradient
+        XYw_prev = XYw_til
+
+        # pre-generate the mini-batches of the inner loop
+        index_blocks = sampler.sample_blocks(n, max_inner, inner_batch_size)
 
         # Inner Loop
         for iter in range(0, max_inner):
             
             # calculate stochastic gradient diff
-            grad_diff = GradDiffEval(n, d, inner_batch_size, X_train, Y_train, bias, w_prev, w, nnz_Xtrain)
+            grad_diff = GradDiffEval(n, d, inner_batch_size, X_train, Y_train, bias, w_prev, w, nnz_Xtrain, index_blocks[iter], sampler.sample_weight, XYw_prev)
 
             # Increase number of component gradient
             num_grad += 2 * inner_batch_size
             num_epoch = num_grad / n
 
             # Algorithm update
-            w_prev = w
+            XYw_prev = None
             v_cur += grad_diff
-            w_hat = ProxEval(w - eta * v_cur, lamb * eta)
-            w = (1 - gamma_list[iter+1]) * w + gamma_list[iter+1] * w_hat
+            averaged_prox_step(ProxEval, w, v_cur, eta, lamb * eta, gamma_list[iter+1], w_hat, w_next)
+            w_prev, w, w_next = w, w_next, w_prev
 
             if is_fun_eval and (num_grad - last_print_num_grad >= n or num_epoch >= max_num_epoch):
-                # calculate full gradient and gradient mapping for stats report
-                full_grad, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
-                grad_map = (1/(eta_comp)) *(w - ProxEval(w - eta_comp*full_grad, lamb*eta_comp))
-                norm_grad_map = np.dot(grad_map.T, grad_map)
+                with phase('log'):
+                    # calculate full gradient and gradient mapping for stats report
+                    full_grad, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
+                    norm_grad_map = sq_norm(grad_mapping(ProxEval, w, full_grad, eta_comp, lamb*eta_comp, grad_map))
 
-                # update mins
-                if norm_grad_map < min_norm_grad_map:
-                    min_norm_grad_map = norm_grad_map
+                    # update mins
+                    if norm_grad_map < min_norm_grad_map:
+                        min_norm_grad_map = norm_grad_map
 
-                # Get Training Loss
-                train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
+                    # Get Training Loss
+                    train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
 
-                # calculate test accuracy
-                if isAccEval:
-                    train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
-                    test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)   
+                    # calculate test accuracy
+                    if isAccEval:
+                        train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
+                        test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)   
                 
-                # print info
-                if verbose:
+                    # print info
+                    if verbose:
+                        with phase('print'):
+                            if isAccEval:
+                                print(
+                                    '{:^16.4f}'.format(num_epoch),'|',
+                                    '{:^15.3e}'.format(train_loss),'|',
+                                    '{:^15.3e}'.format(norm_grad_map),'|',
+                                    '{:^15.5f}'.format(train_accuracy),'|',
+                                    '{:^13.5f}'.format(test_accuracy)
+                                )
+                            else:
+                                print(
+                                    '{:^16.4f}'.format(num_epoch),'|',
+                                    '{:^15.3e}'.format(train_loss),'|',
+                                    '{:^15.3e}'.format(norm_grad_map),'|',
+                                    '{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+                                    '{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
+                                )   
+
+                    # update history if requires
                     if isAccEval:
-                        print(
-                            '{:^16.4f}'.format(num_epoch),'|',
-                            '{:^15.3e}'.format(train_loss),'|',
-                            '{:^15.3e}'.format(norm_grad_map),'|',
-                            '{:^15.5f}'.format(train_accuracy),'|',
-                            '{:^13.5f}'.format(test_accuracy)
-                        )
+                        history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map, train_accuracy, test_accuracy)
                     else:
-                        print(
-                            '{:^16.4f}'.format(num_epoch),'|',
-                            '{:^15.3e}'.format(train_loss),'|',
-                            '{:^15.3e}'.format(norm_grad_map),'|',
-                            '{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
-                            '{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
-                        )   
+                        history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map)
 
-                # update history if requires
-                hist_TrainLoss.append(train_loss)
-                if isAccEval:
-                    hist_TrainAcc.append(train_accuracy)
-                    hist_TestAcc.append(test_accuracy)
-                hist_GradNorm.append(np.asscalar(norm_grad_map))
-                hist_MinGradNorm.append(min_norm_grad_map)
-                hist_NumGrad.append(num_grad)
-                hist_NumEpoch.append(num_epoch)
+                    # check the stopping criteria
+                    stopping.check(num_epoch, train_loss, norm_grad_map, test_accuracy if isAccEval else None)
 
-                # update print time
-                last_print_num_grad = num_grad
+                    # update print time
+                    last_print_num_grad = num_grad
 
-                # check if we're done
-                if num_epoch >= max_num_epoch:
-                    break
+                    # check if we're done
+                    if num_epoch >= max_num_epoch or stopping.reason:
+                        break
 
         # Go back to the outer loop.
         w_til = w
 
+        # save the state at the outer loop boundary
+        if checkpoint is not None:
+            with phase('checkpoint'):
+                checkpoint.step({'w_til': w_til, 'row_order': row_order}, {'num_grad': num_grad, 'num_epoch': num_epoch, \
+                    'min_norm_grad_map': min_norm_grad_map, 'last_print_num_grad': last_print_num_grad}, sampler, history)
+
     ## outer loop ends
 
+    # report why the run stopped
+    stopping.finish(num_epoch, verbose)
+    history.metadata['stop_reason'] = stopping.reason
+
+    history.close()
+    hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc, hist_TestAcc = history.columns()
+
     return w, hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc, hist_TestAcc
 
 #===============================================================================================================================
@@ -32,11 +32,21 @@ If you found this helpful and are using it within our software please cite the f
 #library import
 import numpy as np
 
+from util_Precision import sq_norm
+from util_Prox import prox_with_out, prox_step, grad_mapping
+from util_History import HistoryRecorder
+from util_Stopping import StoppingPolicy
+from util_Profiler import phase, profiled
+from util_Sampler import default_sampler
+from util_LazyProx import LazyProxL1, sparse_row, check_lazy_update
+from util_NumbaKernels import jit_backend, jit_num_steps, jit_weight, prox_sgd_inner_kernel
+
 #===============================================================================================================================
 # ProxSGD
 
 def prox_sgd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_prime, eta_comp, max_num_epoch, w0, lamb, batch_size, \
-					GradEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose = 0, is_fun_eval = 1):
+					GradEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose = 0, is_fun_eval = 1, sampler = None, \
+					lazy_update = 0, GradCoefEval = None, jit_inner = 0, history = None, stopping = None):
 	"""! ProxSGD algorithm
 
 	Parameters
@@ -68,6 +78,15 @@ def prox_sgd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_prime, eta_c
 			1 : print iteration info
 
 	@param is_fun_eval : flag whether to compute and log data
+	@param sampler : mini-batch sampler (util_Sampler.MinibatchSampler), util_Sampler.default_sampler is used if None
+	@param lazy_update : flag whether to apply the steps lazily on the non-zero coordinates of the sampled rows only,
+		requires b = 1, CSR data and ProxEval = l1 soft-thresholding (see util_LazyProx)
+	@param GradCoefEval : function pointer for the scalar coefficients \f$c_i\f$ of \f$\nabla f_i(w) = c_i x_i\f$, needed by lazy_update
+		and jit_inner
+	@param jit_inner : flag whether to run the iterations between two logging points in one call of a compiled kernel,
+		requires b = 1, CSR data, numba and a built-in loss and proximal operator (see util_NumbaKernels)
+	@param history : history recorder (util_History.HistoryRecorder) the stats are recorded into, a new one in memory if None
+	@param stopping : stopping criteria (util_Stopping.StoppingPolicy) checked at every logging point besides max_num_epoch, none if None
 
 	Returns
 	-------
@@ -81,14 +100,14 @@ def prox_sgd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_prime, eta_c
 	@retval hist_TestAcc : test accuracy history
 	"""
 
-	# initialize history list
-	hist_TrainLoss 		= []
-	hist_NumGrad 		= []
-	hist_NumEpoch 		= []
-	hist_GradNorm 		= []
-	hist_TrainAcc 		= []
-	hist_TestAcc 		= []
-	hist_MinGradNorm 	= []
+	# initialize history
+	if history is None:
+		history = HistoryRecorder()
+
+	# initialize stopping criteria, the run also stops at max_num_epoch
+	if stopping is None:
+		stopping = StoppingPolicy()
+	stopping.start()
 
 	# initialize stats variables
 	min_norm_grad_map 	= 1.0e6
@@ -105,11 +124,34 @@ def prox_sgd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_prime, eta_c
 	
 	# get length of test data
 	num_test = len(Y_test)
+
+	# python floats keep the precision of the data and iterates, see util_Precision
+	eta, eta_comp, eta_prime, lamb = float(eta), float(eta_comp), float(eta_prime), float(lamb)
 	# get average number of non zero elements in training data
 	nnz_Xtrain = np.mean(X_train.getnnz(axis=1))
 	if isAccEval:
 		nnz_Xtest = np.mean(X_test.getnnz(axis=1))
 
+	# use the shared sampler if none is given
+	if sampler is None:
+		sampler = default_sampler
+
+	if lazy_update:
+		check_lazy_update(batch_size, X_train, GradCoefEval, ProxEval)
+
+	# loss and prox ids of the compiled loop, None runs it with numpy
+	jit_ids = None
+	if jit_inner:
+		jit_ids = jit_backend(batch_size, X_train, GradCoefEval, ProxEval, lazy_update)
+
+	# time the oracles while the profiler is on, see util_Profiler
+	GradEval = profiled('grad', GradEval)
+	GradCoefEval = profiled('grad_coef', GradCoefEval)
+	ProxEval = profiled('prox', prox_with_out(ProxEval))
+	FuncF_Eval = profiled('loss', FuncF_Eval)
+	FuncG_Eval = profiled('penalty', FuncG_Eval)
+	Acc_Eval = profiled('accuracy', Acc_Eval)
+
 	# print initial message
 	if verbose:
 		print('Start ProxSGD...')
@@ -131,142 +173,192 @@ def prox_sgd(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_prime, eta_c
 			' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=63,),'\n',
 			)
 	
-	# Assign initial value
-	w = w0
+	# Assign initial value, a copy since the kernel updates w in place and the steps alternate between the buffers w
+	# and w_next
+	w = np.array(w0)
+	w_next = np.empty_like(w)
+	grad_map = np.empty_like(w)
 
 	if is_fun_eval:
-		# calculate full gradient and gradient mapping for stats report
-		full_grad, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
-		grad_map = (1/(eta_comp)) *(w - ProxEval(w - eta_comp*full_grad, lamb*eta_comp))
-		norm_grad_map = np.dot(grad_map.T, grad_map)
-
-		# update mins
-		if norm_grad_map < min_norm_grad_map:
-			min_norm_grad_map = norm_grad_map
-
-		# Get Training Loss
-		train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
-
-		# calculate test accuracy
-		if isAccEval:
-			train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
-			test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)
+		with phase('log'):
+			# calculate full gradient and gradient mapping for stats report
+			full_grad, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
+			norm_grad_map = sq_norm(grad_mapping(ProxEval, w, full_grad, eta_comp, lamb*eta_comp, grad_map))
+
+			# update mins
+			if norm_grad_map < min_norm_grad_map:
+				min_norm_grad_map = norm_grad_map
+
+			# Get Training Loss
+			train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
+
+			# calculate test accuracy
+			if isAccEval:
+				train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
+				test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)
 	
-		# print info
-		if verbose:
-			print(
-				' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=87,),'\n',
-				'{message:{fill}{align}{width}}'.format(message='Epoch',fill=' ',align='^',width=15,),'|',
-				'{message:{fill}{align}{width}}'.format(message='Train Loss',fill=' ',align='^',width=15,),'|',
-				'{message:{fill}{align}{width}}'.format(message='||Grad Map||^2',fill=' ',align='^',width=15,),'|',
-				'{message:{fill}{align}{width}}'.format(message='Train Acc',fill=' ',align='^',width=15,),'|',
-				'{message:{fill}{align}{width}}'.format(message='Test Acc',fill=' ',align='^',width=15,),'\n',
-				'{message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=87,)
-			)
+			# print info
+			if verbose:
+				with phase('print'):
+					print(
+						' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=87,),'\n',
+						'{message:{fill}{align}{width}}'.format(message='Epoch',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='Train Loss',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='||Grad Map||^2',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='Train Acc',fill=' ',align='^',width=15,),'|',
+						'{message:{fill}{align}{width}}'.format(message='Test Acc',fill=' ',align='^',width=15,),'\n',
+						'{message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=87,)
+					)
+					if isAccEval:
+						print(
+							'{:^16.4f}'.format(num_epoch),'|',
+							'{:^15.3e}'.format(train_loss),'|',
+							'{:^15.3e}'.format(norm_grad_map),'|',
+							'{:^15.5f}'.format(train_accuracy),'|',
+							'{:^13.5f}'.format(test_accuracy)
+						)
+					else:
+						print(
+							'{:^16.4f}'.format(num_epoch),'|',
+							'{:^15.3e}'.format(train_loss),'|',
+							'{:^15.3e}'.format(norm_grad_map),'|',
+							'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+							'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
+						)	
+
+			# update history if requires
 			if isAccEval:
-				print(
-					'{:^16.4f}'.format(num_epoch),'|',
-					'{:^15.3e}'.format(train_loss),'|',
-					'{:^15.3e}'.format(norm_grad_map),'|',
-					'{:^15.5f}'.format(train_accuracy),'|',
-					'{:^13.5f}'.format(test_accuracy)
-				)
+				history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map, train_accuracy, test_accuracy)
 			else:
-				print(
-					'{:^16.4f}'.format(num_epoch),'|',
-					'{:^15.3e}'.format(train_loss),'|',
-					'{:^15.3e}'.format(norm_grad_map),'|',
-					'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
-					'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
-				)	
-
-		# update history if requires
-		hist_TrainLoss.append(train_loss)
-		if isAccEval:
-			hist_TrainAcc.append(train_accuracy)
-			hist_TestAcc.append(test_accuracy)
-		hist_GradNorm.append(np.asscalar(norm_grad_map))
-		hist_MinGradNorm.append(min_norm_grad_map)
-		hist_NumGrad.append(num_grad)
-		hist_NumEpoch.append(num_epoch)
-
-		# update print time
-		last_print_num_grad = num_grad
+				history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map)
+
+			# check the stopping criteria
+			stopping.check(num_epoch, train_loss, norm_grad_map, test_accuracy if isAccEval else None)
+
+			# update print time
+			last_print_num_grad = num_grad
+
+	# only the coordinates of the sampled rows are updated, the others are soft-thresholded lazily
+	if lazy_update:
+		lazy = LazyProxL1(w, lamb*eta)
+
+	# pre-generate the mini-batches of one epoch at a time
+	num_blocks = max(n // batch_size, 1)
+	block_pos = num_blocks
 
 	# Main loop
-	while True:
+	while num_epoch < max_num_epoch and not stopping.check_time(num_epoch):
+
+		# draw the mini-batches of the next epoch
+		if block_pos >= num_blocks:
+			X_train, Y_train, bias = sampler.shuffle_rows(X_train, Y_train, bias)
+			index_blocks = sampler.sample_blocks(n, num_blocks, batch_size)
+			block_pos = 0
 
 		# calculate stochastic gradient
-		v_cur = GradEval(n, d, batch_size, X_train, Y_train, bias, w, nnz_Xtrain)
+		num_steps = 1
+		if jit_ids is not None:
+			# run all steps of the epoch up to the next logging point at once
+			num_steps = jit_num_steps(num_blocks - block_pos, num_grad, last_print_num_grad, batch_size, n, max_num_epoch, is_fun_eval)
+			prox_sgd_inner_kernel(*jit_ids, X_train.indptr, X_train.indices, X_train.data, Y_train, bias, jit_weight(sampler.sample_weight), \
+				np.ascontiguousarray(index_blocks[block_pos:block_pos + num_steps, 0]), w, eta, eta_prime, lamb*eta, total_iter, n)
+		elif lazy_update:
+			i = index_blocks[block_pos][0]
+			J, x_J = sparse_row(X_train, i)
+			w_J = lazy.refresh(J)
+			coef = GradCoefEval(x_J, Y_train[i:i+1], bias[i:i+1], w_J)
+			if sampler.sample_weight is not None:
+				coef *= sampler.sample_weight[i]
+		else:
+			v_cur = GradEval(n, d, batch_size, X_train, Y_train, bias, w, nnz_Xtrain, index_blocks[block_pos], sampler.sample_weight)
+		block_pos += num_steps
 
 		# Increase number of component gradient
-		num_grad += batch_size
+		num_grad += batch_size*num_steps
 		num_epoch = num_grad / n
 		
 		# diminishing learning rate
-		total_iter += 1
+		total_iter += num_steps
 		eta_cur = eta / (1.0 + eta_prime*(total_iter//n) )
 	
 		# Algorithm update
-		w = ProxEval(w - eta_cur*v_cur, lamb*eta)
+		if lazy_update:
+			lazy.advance(J, lazy.step(w_J, eta_cur*coef*x_J[0]))
+		elif jit_ids is None:
+			prox_step(ProxEval, w, v_cur, eta_cur, lamb*eta, w_next)
+			w, w_next = w_next, w
 
 		if is_fun_eval and (num_grad - last_print_num_grad >= n or num_epoch >= max_num_epoch):
+			with phase('log'):
 
-			# calculate full gradient and gradient mapping for stats report
-			full_grad, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
-			grad_map = (1/(eta_comp)) *(w - ProxEval(w - eta_comp*full_grad, lamb*eta_comp))
-			norm_grad_map = np.dot(grad_map.T, grad_map)
+				# bring all coordinates up to date
+				if lazy_update:
+					w = lazy.flush()
 
-			# update mins
-			if norm_grad_map < min_norm_grad_map:
-				min_norm_grad_map = norm_grad_map
+				# calculate full gradient and gradient mapping for stats report
+				full_grad, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
+				norm_grad_map = sq_norm(grad_mapping(ProxEval, w, full_grad, eta_comp, lamb*eta_comp, grad_map))
 
-			# Get Training Loss
-			train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
+				# update mins
+				if norm_grad_map < min_norm_grad_map:
+					min_norm_grad_map = norm_grad_map
 
-			# calculate test accuracy
-			if isAccEval:
-				train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
-				test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)	
+				# Get Training Loss
+				train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
+
+				# calculate test accuracy
+				if isAccEval:
+					train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
+					test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)	
 			
-			# print info
-			if verbose:
+				# print info
+				if verbose:
+					with phase('print'):
+						if isAccEval:
+							print(
+								'{:^16.4f}'.format(num_epoch),'|',
+								'{:^15.3e}'.format(train_loss),'|',
+								'{:^15.3e}'.format(norm_grad_map),'|',
+								'{:^15.5f}'.format(train_accuracy),'|',
+								'{:^13.5f}'.format(test_accuracy)
+							)
+						else:
+							print(
+								'{:^16.4f}'.format(num_epoch),'|',
+								'{:^15.3e}'.format(train_loss),'|',
+								'{:^15.3e}'.format(norm_grad_map),'|',
+								'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+								'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
+							)	
+
+				# update history if requires
 				if isAccEval:
-					print(
-						'{:^16.4f}'.format(num_epoch),'|',
-						'{:^15.3e}'.format(train_loss),'|',
-						'{:^15.3e}'.format(norm_grad_map),'|',
-						'{:^15.5f}'.format(train_accuracy),'|',
-						'{:^13.5f}'.format(test_accuracy)
-					)
+					history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map, train_accuracy, test_accuracy)
 				else:
-					print(
-						'{:^16.4f}'.format(num_epoch),'|',
-						'{:^15.3e}'.format(train_loss),'|',
-						'{:^15.3e}'.format(norm_grad_map),'|',
-						'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
-						'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
-					)	
+					history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map)
 
-			# update history if requires
-			hist_TrainLoss.append(train_loss)
-			if isAccEval:
-				hist_TrainAcc.append(train_accuracy)
-				hist_TestAcc.append(test_accuracy)
-			hist_GradNorm.append(np.asscalar(norm_grad_map))
-			hist_MinGradNorm.append(min_norm_grad_map)
-			hist_NumGrad.append(num_grad)
-			hist_NumEpoch.append(num_epoch)
+				# check the stopping criteria
+				stopping.check(num_epoch, train_loss, norm_grad_map, test_accuracy if isAccEval else None)
 
-			# update print time
-			last_print_num_grad = num_grad
+				# update print time
+				last_print_num_grad = num_grad
 
-			if num_epoch >= max_num_epoch:
-				break
+				if num_epoch >= max_num_epoch or stopping.reason:
+					break
+
+	if lazy_update:
+		w = lazy.flush()
 
 	# Main loop ends
 	print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=87,))
 	
+	# report why the run stopped
+	stopping.finish(num_epoch, verbose)
+	history.metadata['stop_reason'] = stopping.reason
+
+	history.close()
+	hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc, hist_TestAcc = history.columns()
+
 	return w, hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc, hist_TestAcc
 
 #===============================================================================================================================
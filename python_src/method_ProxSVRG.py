@@ -33,11 +33,21 @@ If you found this helpful and are using it within our software please cite the f
 #library import
 import numpy as np
 
+from util_Precision import sq_norm
+from util_Prox import prox_with_out, prox_step, grad_mapping
+from util_History import HistoryRecorder
+from util_Stopping import StoppingPolicy
+from util_Profiler import phase, profiled
+from util_Sampler import default_sampler, permute_rows
+from util_LazyProx import LazyProxL1, sparse_row, check_lazy_update
+from util_NumbaKernels import jit_backend, jit_num_steps, jit_weight, prox_svrg_inner_kernel
+
 #===============================================================================================================================
 # ProxSVRG
 
 def prox_svrg(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_num_epoch, max_inner, w0, lamb, inner_batch_size, \
-							GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose = 0, is_fun_eval = 1):
+							GradEval, GradDiffEval, FuncF_Eval, ProxEval, FuncG_Eval, Acc_Eval, isAccEval, verbose = 0, is_fun_eval = 1, sampler = None, \
+							lazy_update = 0, GradCoefEval = None, jit_inner = 0, history = None, checkpoint = None, stopping = None):
 
 	"""! ProxSVRG algorithm
 
@@ -71,6 +81,17 @@ def prox_svrg(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_n
 			1 : print iteration info
 
 	@param is_fun_eval : flag whether to compute and log data
+	@param sampler : mini-batch sampler (util_Sampler.MinibatchSampler), util_Sampler.default_sampler is used if None
+	@param lazy_update : flag whether to apply the steps lazily on the non-zero coordinates of the sampled rows only,
+		requires b = 1, CSR data and ProxEval = l1 soft-thresholding (see util_LazyProx)
+	@param GradCoefEval : function pointer for the scalar coefficients \f$c_i\f$ of \f$\nabla f_i(w) = c_i x_i\f$, needed by lazy_update
+		and jit_inner
+	@param jit_inner : flag whether to run the inner loop between two logging points in one call of a compiled kernel,
+		requires b = 1, CSR data, numba and a built-in loss and proximal operator (see util_NumbaKernels)
+	@param history : history recorder (util_History.HistoryRecorder) the stats are recorded into, a new one in memory if None
+	@param checkpoint : checkpointer (util_Checkpoint.Checkpointer) saving the state at the end of every outer iteration, the run resumes
+		from its last checkpoint if there is one
+	@param stopping : stopping criteria (util_Stopping.StoppingPolicy) checked at every logging point besides max_num_epoch, none if None
 
 	Returns
 	-------
@@ -84,14 +105,14 @@ def prox_svrg(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_n
 	@retval hist_TestAcc : test accuracy history
 	"""
 
-	# initialize history list
-	hist_TrainLoss 		= []
-	hist_NumGrad 		= []
-	hist_NumEpoch 		= []
-	hist_GradNorm 		= []
-	hist_TrainAcc 		= []
-	hist_TestAcc 		= []
-	hist_MinGradNorm 	= []
+	# initialize history
+	if history is None:
+		history = HistoryRecorder()
+
+	# initialize stopping criteria, the run also stops at max_num_epoch
+	if stopping is None:
+		stopping = StoppingPolicy()
+	stopping.start()
 
 	# initialize stats variables
 	min_norm_grad_map 	= 1.0e6
@@ -106,11 +127,35 @@ def prox_svrg(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_n
 	# get length of test data
 	num_test = len(Y_test)
 
+	# python floats keep the precision of the data and iterates, see util_Precision
+	eta, eta_comp, lamb = float(eta), float(eta_comp), float(lamb)
+
 	# get average number of non zero elements in training data
 	nnz_Xtrain = np.mean(X_train.getnnz(axis=1))
 	if isAccEval:
 		nnz_Xtest = np.mean(X_test.getnnz(axis=1))
 
+	# use the shared sampler if none is given
+	if sampler is None:
+		sampler = default_sampler
+
+	if lazy_update:
+		check_lazy_update(inner_batch_size, X_train, GradCoefEval, ProxEval)
+
+	# loss and prox ids of the compiled inner loop, None runs it with numpy
+	jit_ids = None
+	if jit_inner:
+		jit_ids = jit_backend(inner_batch_size, X_train, GradCoefEval, ProxEval, lazy_update)
+
+	# time the oracles while the profiler is on, see util_Profiler
+	GradEval = profiled('grad', GradEval)
+	GradDiffEval = profiled('grad_diff', GradDiffEval)
+	GradCoefEval = profiled('grad_coef', GradCoefEval)
+	ProxEval = profiled('prox', prox_with_out(ProxEval))
+	FuncF_Eval = profiled('loss', FuncF_Eval)
+	FuncG_Eval = profiled('penalty', FuncG_Eval)
+	Acc_Eval = profiled('accuracy', Acc_Eval)
+
 	# print initial message
 	if verbose:
 		print('Start ProxSVRG...')
@@ -130,8 +175,28 @@ def prox_svrg(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_n
 			' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=56,),'\n',
 			)
 
-	# Assign initial value
-	w_til = w0
+	# Assign initial value, the inner steps alternate between the buffers w and w_next and leave the anchor w_til intact
+	w_til = np.array(w0)
+	w = np.array(w_til)
+	w_next = np.empty_like(w)
+	grad_map = np.empty_like(w)
+
+	# order of the rows of X_train, changed in 'shuffled_contiguous' mode
+	row_order = np.arange(n)
+
+	# continue from the last checkpoint if there is one
+	if checkpoint is not None:
+		with phase('checkpoint'):
+			state = checkpoint.restore(sampler, history)
+			if state is not None:
+				iterates, counters = state
+				w_til = iterates['w_til']
+				w = np.array(w_til)
+				row_order = iterates['row_order']
+				if sampler.mode == 'shuffled_contiguous':
+					X_train, Y_train, bias = permute_rows(row_order, X_train, Y_train, bias)
+				num_grad, num_epoch = counters['num_grad'], counters['num_epoch']
+				min_norm_grad_map, last_print_num_grad = counters['min_norm_grad_map'], counters['last_print_num_grad']
 
 	# print first time info
 	if verbose:
@@ -146,141 +211,194 @@ def prox_svrg(n, d, X_train, Y_train, X_test, Y_test, bias, eta, eta_comp, max_n
 		)
 
 	# Outer Loop
-	while num_epoch < max_num_epoch:
+	while num_epoch < max_num_epoch and not stopping.check_time(num_epoch):
+
+		# permute the rows once per epoch in 'shuffled_contiguous' mode
+		X_train, Y_train, bias, row_order = sampler.shuffle_rows(X_train, Y_train, bias, row_order)
 
 		# calculate full gradient
 		full_grad, XYw_til = GradEval(n, d, n, X_train, Y_train, bias, w_til, nnz_Xtrain)
 		
 		if is_fun_eval:
-			# calculate gradient mapping for stats report
-			grad_map = (1/(eta_comp))*(w_til - ProxEval(w_til - eta_comp*full_grad, lamb*eta_comp))
-			norm_grad_map = np.dot(grad_map.T, grad_map)
+			with phase('log'):
+				# calculate gradient mapping for stats report
+				norm_grad_map = sq_norm(grad_mapping(ProxEval, w_til, full_grad, eta_comp, lamb*eta_comp, grad_map))
 
-			# update mins
-			if norm_grad_map < min_norm_grad_map:
-				min_norm_grad_map = norm_grad_map
+				# update mins
+				if norm_grad_map < min_norm_grad_map:
+					min_norm_grad_map = norm_grad_map
 		
-			# Get Training Loss
-			train_loss = FuncF_Eval(n, XYw_til) + lamb * FuncG_Eval(w_til)
+				# Get Training Loss
+				train_loss = FuncF_Eval(n, XYw_til) + lamb * FuncG_Eval(w_til)
 
-			# calculate test accuracy
-			if isAccEval:
-				train_accuracy = 1/float(n) * np.sum( 1*(XYw_til > 0) )
-				test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w_til, nnz_Xtest)
+				# calculate test accuracy
+				if isAccEval:
+					train_accuracy = 1/float(n) * np.sum( 1*(XYw_til > 0) )
+					test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w_til, nnz_Xtest)
 		
-			# print info
-			if verbose:
+				# print info
+				if verbose:
+					with phase('print'):
+						if isAccEval:
+							print(
+								'{:^16.4f}'.format(num_epoch),'|',
+								'{:^15.3e}'.format(train_loss),'|',
+								'{:^15.3e}'.format(norm_grad_map),'|',
+								'{:^15.5f}'.format(train_accuracy),'|',
+								'{:^13.5f}'.format(test_accuracy)
+							)
+						else:
+							print(
+								'{:^16.4f}'.format(num_epoch),'|',
+								'{:^15.3e}'.format(train_loss),'|',
+								'{:^15.3e}'.format(norm_grad_map),'|',
+								'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+								'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
+							)	
+
+				# update history if requires
 				if isAccEval:
-					print(
-						'{:^16.4f}'.format(num_epoch),'|',
-						'{:^15.3e}'.format(train_loss),'|',
-						'{:^15.3e}'.format(norm_grad_map),'|',
-						'{:^15.5f}'.format(train_accuracy),'|',
-						'{:^13.5f}'.format(test_accuracy)
-					)
+					history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map, train_accuracy, test_accuracy)
 				else:
-					print(
-						'{:^16.4f}'.format(num_epoch),'|',
-						'{:^15.3e}'.format(train_loss),'|',
-						'{:^15.3e}'.format(norm_grad_map),'|',
-						'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
-						'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
-					)	
-
-			# update history if requires
-			hist_TrainLoss.append(train_loss)
-			if isAccEval:
-				hist_TrainAcc.append(train_accuracy)
-				hist_TestAcc.append(test_accuracy)
-			hist_GradNorm.append(np.asscalar(norm_grad_map))
-			hist_MinGradNorm.append(min_norm_grad_map)
-			hist_NumGrad.append(num_grad)
-			hist_NumEpoch.append(num_epoch)
-
-			# update print time
-			last_print_num_grad = num_grad
+					history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map)
+
+				# check the stopping criteria, a run stopped at the anchor returns it
+				if stopping.check(num_epoch, train_loss, norm_grad_map, test_accuracy if isAccEval else None):
+					w = w_til
+					break
+
+				# update print time
+				last_print_num_grad = num_grad
 	
 		# Increase number of component gradient (1 full gradient = n component gradient)
 		num_grad += n
 		num_epoch += 1
 
-		# start the inner loop.
-		w = w_til
+		# the lazy and compiled inner loops read the anchor gradients as scalars, taken from the margins of the full pass
+		if lazy_update or jit_ids is not None:
+			coef_til = GradCoefEval(X_train, Y_train, bias, w_til, XYw_til)
 
-		# Inner Loop
-		for iter in range(0,max_inner):
+		# coordinates off the sampled rows follow the anchor gradient and are updated lazily
+		if lazy_update:
+			lazy = LazyProxL1(w_til, lamb*eta, 1.0, eta*full_grad)
+
+		# pre-generate the mini-batches of the inner loop
+		index_blocks = sampler.sample_blocks(n, max_inner, inner_batch_size)
 
-			# calculate stochastic gradient diff
-			grad_diff = GradDiffEval(n, d, inner_batch_size, X_train, Y_train, bias, w_til, w, nnz_Xtrain)
+		# Inner Loop
+		iter = 0
+		while iter < max_inner:
+
+			# calculate stochastic gradient diff, the margins at the anchor w_til are read from the full gradient
+			num_steps = 1
+			if jit_ids is not None:
+				# run all steps up to the next logging point at once
+				num_steps = jit_num_steps(max_inner - iter, num_grad, last_print_num_grad, 2*inner_batch_size, n, max_num_epoch, is_fun_eval)
+				prox_svrg_inner_kernel(*jit_ids, X_train.indptr, X_train.indices, X_train.data, Y_train, bias, jit_weight(sampler.sample_weight), \
+					np.ascontiguousarray(index_blocks[iter:iter + num_steps, 0]), w, full_grad, coef_til, eta, lamb*eta)
+			elif lazy_update:
+				i = index_blocks[iter][0]
+				J, x_J = sparse_row(X_train, i)
+				w_J = lazy.refresh(J)
+				coef_diff = GradCoefEval(x_J, Y_train[i:i+1], bias[i:i+1], w_J) - coef_til[i]
+				if sampler.sample_weight is not None:
+					coef_diff *= sampler.sample_weight[i]
+			else:
+				grad_diff = GradDiffEval(n, d, inner_batch_size, X_train, Y_train, bias, w_til, w, nnz_Xtrain, index_blocks[iter], sampler.sample_weight, XYw_til)
 
 			# Increase number of component gradient
-			num_grad += 2 * inner_batch_size
+			num_grad += 2 * inner_batch_size * num_steps
 			num_epoch = num_grad / n
+			iter += num_steps
 
 			# Algorithm update
-			v_cur = full_grad + grad_diff
-			w = ProxEval(w - eta*v_cur, lamb*eta)
+			if lazy_update:
+				lazy.advance(J, lazy.step(w_J, eta*(full_grad[J] + coef_diff*x_J[0])))
+			elif jit_ids is None:
+				v_cur = np.add(full_grad, grad_diff, out=grad_diff)
+				prox_step(ProxEval, w, v_cur, eta, lamb*eta, w_next)
+				w, w_next = w_next, w
 
 			if is_fun_eval and (num_grad - last_print_num_grad >= n or num_epoch >= max_num_epoch):
-				# calculate full gradient and gradient mapping for stats report
-				full_grad, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
-				grad_map = (1/(eta_comp)) *(w - ProxEval(w - eta_comp*full_grad, lamb*eta_comp))
-				norm_grad_map = np.dot(grad_map.T, grad_map)
+				with phase('log'):
 
-				# update mins
-				if norm_grad_map < min_norm_grad_map:
-					min_norm_grad_map = norm_grad_map
+					# bring all coordinates up to date
+					if lazy_update:
+						w = lazy.flush()
 
-				# Get Training Loss
-				train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
+					# calculate full gradient and gradient mapping for stats report, keep the anchor gradient intact
+					full_grad_w, XYw = GradEval(n, d, n, X_train, Y_train, bias, w, nnz_Xtrain)
+					norm_grad_map = sq_norm(grad_mapping(ProxEval, w, full_grad_w, eta_comp, lamb*eta_comp, grad_map))
 
-				# calculate test accuracy
-				if isAccEval:
-					train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
-					test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)	
+					# update mins
+					if norm_grad_map < min_norm_grad_map:
+						min_norm_grad_map = norm_grad_map
+
+					# Get Training Loss
+					train_loss = FuncF_Eval(n, XYw) + lamb * FuncG_Eval(w)
+
+					# calculate test accuracy
+					if isAccEval:
+						train_accuracy = 1/float(n) * np.sum( 1*(XYw > 0) )
+						test_accuracy = Acc_Eval(num_test, d, X_test, Y_test, bias, w, nnz_Xtest)	
 				
-				# print info
-				if verbose:
+					# print info
+					if verbose:
+						with phase('print'):
+							if isAccEval:
+								print(
+									'{:^16.4f}'.format(num_epoch),'|',
+									'{:^15.3e}'.format(train_loss),'|',
+									'{:^15.3e}'.format(norm_grad_map),'|',
+									'{:^15.5f}'.format(train_accuracy),'|',
+									'{:^13.5f}'.format(test_accuracy)
+								)
+							else:
+								print(
+									'{:^16.4f}'.format(num_epoch),'|',
+									'{:^15.3e}'.format(train_loss),'|',
+									'{:^15.3e}'.format(norm_grad_map),'|',
+									'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
+									'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
+								)	
+
+					# update history if requires
 					if isAccEval:
-						print(
-							'{:^16.4f}'.format(num_epoch),'|',
-							'{:^15.3e}'.format(train_loss),'|',
-							'{:^15.3e}'.format(norm_grad_map),'|',
-							'{:^15.5f}'.format(train_accuracy),'|',
-							'{:^13.5f}'.format(test_accuracy)
-						)
+						history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map, train_accuracy, test_accuracy)
 					else:
-						print(
-							'{:^16.4f}'.format(num_epoch),'|',
-							'{:^15.3e}'.format(train_loss),'|',
-							'{:^15.3e}'.format(norm_grad_map),'|',
-							'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=15,),'|',
-							'{message:{fill}{align}{width}}'.format(message='N/A',fill=' ',align='^',width=13,)
-						)	
+						history.record(num_grad, num_epoch, train_loss, float(norm_grad_map), min_norm_grad_map)
 
-				# update history if requires
-				hist_TrainLoss.append(train_loss)
-				if isAccEval:
-					hist_TrainAcc.append(train_accuracy)
-					hist_TestAcc.append(test_accuracy)
-				hist_GradNorm.append(np.asscalar(norm_grad_map))
-				hist_MinGradNorm.append(min_norm_grad_map)
-				hist_NumGrad.append(num_grad)
-				hist_NumEpoch.append(num_epoch)
+					# check the stopping criteria
+					stopping.check(num_epoch, train_loss, norm_grad_map, test_accuracy if isAccEval else None)
 
-				# update print time
-				last_print_num_grad = num_grad
+					# update print time
+					last_print_num_grad = num_grad
 
-				# check if we're done
-				if num_epoch > max_num_epoch:
-					break
+					# check if we're done
+					if num_epoch > max_num_epoch or stopping.reason:
+						break
 
 		# Move to the next outer iteration
-		w_til = w
+		if lazy_update:
+			w = lazy.flush()
+		np.copyto(w_til, w)
+
+		# save the state at the outer loop boundary
+		if checkpoint is not None:
+			with phase('checkpoint'):
+				checkpoint.step({'w_til': w_til, 'row_order': row_order}, {'num_grad': num_grad, 'num_epoch': num_epoch, \
+					'min_norm_grad_map': min_norm_grad_map, 'last_print_num_grad': last_print_num_grad}, sampler, history)
 
 	# Outer loop ends
 	print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=87,))
 
+	# report why the run stopped
+	stopping.finish(num_epoch, verbose)
+	history.metadata['stop_reason'] = stopping.reason
+
+	history.close()
+	hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc, hist_TestAcc = history.columns()
+
 	return w, hist_NumGrad, hist_NumEpoch, hist_TrainLoss, hist_GradNorm, hist_MinGradNorm, hist_TrainAcc, hist_TestAcc
 
 #===============================================================================================================================
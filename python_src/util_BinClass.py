@@ -27,44 +27,11 @@ If you found this helpful and are using it within our software please cite the f
 # external library
 import numpy as np
 import scipy
-import random
-import math
 
-## constant indicating total available memory when calculating full gradient
-total_mem_full = 3.0e10
-
-## constant indicating total available memory when calculating batch gradient
-total_mem_batch = 2.0e10
-
-
-def prox_l1_norm(w, lamb):
-	"""! Compute the proximal operator of the \f$\ell_1\f$-norm
-
-	\f$ prox_{\lambda \|.\|_1} = {arg\min_x}\left\{\|.\|_1^2 + \frac{1}{2\lambda}\|x - w\|^2\right\} \f$
-	
-	Parameters
-	----------
-	@param w : input vector
-	@param lamb : penalty paramemeter
-	    
-	Returns
-	-------
-	@retval : perform soft-thresholding on input vector
-	"""
-	return np.sign(w) * np.maximum( np.abs(w) - lamb, 0)
-
-def func_val_l1_norm(w):
-	"""! Compute \f$\ell_1\f$-norm of a vector
-
-	Parameters
-	----------
-	@param w : input vector
-
-	Returns
-	-------
-	@retval : \f$ \|w\|_1 \f$
-	"""
-	return np.linalg.norm(w,ord = 1)
+from util_Sampler import batch_index, take_rows, take_weights, row_norms_sq
+from util_ChunkPlan import iter_row_chunks
+from util_Profiler import phase
+from util_Prox import prox_l1_norm, func_val_l1_norm
 
 def accuracy(n, d, X, Y, bias, w, nnzX = 0):
 	"""! Compute accuracy
@@ -77,33 +44,46 @@ def accuracy(n, d, X, Y, bias, w, nnzX = 0):
 	@param Y : input label
 	@param bias : bias vector
 	@param w : input vector
-	@param nnzX : average number of non-zero elements for each sample
+	@param nnzX : average number of non-zero elements for each sample, unused since the chunks are planned by util_ChunkPlan
 
 	Returns
 	-------
 	@retval : value between 0-1 indicating the accuracy
 	"""
-	if nnzX == 0:
-		nnzX = d
-	batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-	num_batches = math.ceil(n / batch_size)
 	sum_acc = 0
 
-	for j in range(num_batches): 
-		## calculate start/end indices for each batch
-		startIdx = batch_size*j
-		endIdx = np.minimum(batch_size*(j+1), n)
-
-		batch_X = X[startIdx:endIdx]
-		batch_Y = Y[startIdx:endIdx]
-		batch_bias = bias[startIdx:endIdx]
+	# chunks of rows within the memory budget
+	for startIdx, endIdx in iter_row_chunks(X, n):
+		with phase('gather'):
+			batch_X = X[startIdx:endIdx]
+			batch_Y = Y[startIdx:endIdx]
+			batch_bias = bias[startIdx:endIdx]
 
-		sum_acc += np.sum(1 * (batch_Y*(batch_X.dot(w) + batch_bias) > 0))
+		with phase('matvec'):
+			batch_Xw = batch_X.dot(w)
+		with phase('elementwise'):
+			sum_acc += np.sum(1 * (batch_Y*(batch_Xw + batch_bias) > 0))
 
 	return 1/float(n) * sum_acc
 
 ###################################################################
 
+def sample_lipschitz_bin_class_loss_1(X):
+	"""! Compute the per-sample Lipschitz constants of the gradient of loss function 1
+
+	\f$ L_i = L_{\ell_1}\|x_i\|^2 \f$ with \f$ L_{\ell_1} = \frac{8(1+\sqrt{3})(2+\sqrt{3})}{(3+\sqrt{3})^3}\omega^2 \f$
+
+	Parameters
+	----------
+	@param X : input data
+
+	Returns
+	-------
+	@retval : vector of per-sample Lipschitz constants, used for importance sampling
+	"""
+	omega = 1.0
+	return 8*(1+np.sqrt(3))*(2+np.sqrt(3))/(3 + np.sqrt(3))**3*omega**2 * row_norms_sq(X)
+
 def func_val_bin_class_loss_1(n, XYw_bias):
 	"""! Compute the objective value of loss function 1
 
@@ -122,9 +102,9 @@ def func_val_bin_class_loss_1(n, XYw_bias):
 	"""
 	omega = 1.0
 	expt = np.exp(2.0*omega*XYw_bias)
-	return (1.0/float(n)) * np.sum( 2.0 / (expt + 1.0) )
+	return (1.0/float(n)) * np.sum( 2.0 / (expt + 1.0), dtype=np.float64 )
 
-def grad_eval_bin_class_loss_1(n, d, b, X, Y, bias, w, nnzX = 0):
+def grad_eval_bin_class_loss_1(n, d, b, X, Y, bias, w, nnzX = 0, index = None, weight = None):
 	"""! Compute the (full/stochastic) gradient of loss function 1.
 
 	where \f$\ell_1(Y(Xw+b)) := 1 - \tanh(\omega Y(Xw+b)) \f$
@@ -146,7 +126,9 @@ def grad_eval_bin_class_loss_1(n, d, b, X, Y, bias, w, nnzX = 0):
 	@param Y : input label
 	@param bias : input bias
 	@param w : input vector
-	@param nnzX : average number of non-zero elements for each sample
+	@param nnzX : average number of non-zero elements for each sample, unused since the chunks are planned by util_ChunkPlan
+	@param index : pre-generated mini-batch indices (index array or slice of rows), drawn from util_Sampler.default_sampler if None
+	@param weight : per-sample importance weights \f$1/(n p_i)\f$ of a non-uniform sampler, None for uniform sampling
 
 	Returns
 	-------
@@ -158,68 +140,106 @@ def grad_eval_bin_class_loss_1(n, d, b, X, Y, bias, w, nnzX = 0):
 	# single sample
 	if b == 1:
 		# get a random sample
-		i = np.random.randint(0, n)
+		i = batch_index(n, 1, index)[0]
+		wi = 1.0 if weight is None else weight[i]
 
 		Xi = X[i,:]
 		expt = np.exp( 2.0*omega*Y[i]*(Xi.dot(w) + bias[i]) )
 
-		return -4.0*omega*( expt/(expt + 1.0)/(expt + 1.0) )*Y[i]*Xi
+		return -4.0*omega*( expt/(expt + 1.0)/(expt + 1.0) )*wi*Y[i]*Xi
 	# batch
 	elif b < n:
 		# get a random batch of size b
-		index = random.sample(range(n), b)
-
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		batch_grad = np.zeros(d)
+		index = batch_index(n, b, index)
+
+		batch_grad = np.zeros(d, dtype=w.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, b, index):
+			with phase('gather'):
+				batch_X = take_rows(X, index, startIdx, endIdx)
+				batch_Y = take_rows(Y, index, startIdx, endIdx)
+				batch_bias = take_rows(bias, index, startIdx, endIdx)
+				batch_weight = take_weights(weight, index, startIdx, endIdx)
+
+			with phase('matvec'):
+				batch_Xw = batch_X.dot(w)
+			with phase('elementwise'):
+				expt = np.exp( 2.0*omega * batch_Y * (batch_Xw + batch_bias) )
+				batch_coef = batch_weight*batch_Y*(expt/(expt + 1.0)/(expt + 1.0))
+			with phase('matvec'):
+				batch_grad -= 4.0 * omega * batch_X.transpose().dot(batch_coef)
 
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), b-1)
+		return batch_grad / float(b)
+	# full
+	else:
+		full_grad = np.zeros(d, dtype=w.dtype)
+		XYw_bias = np.zeros(n, dtype=w.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, n):
+			with phase('gather'):
+				batch_X = X[startIdx:endIdx,:]
+				batch_Y = Y[startIdx:endIdx]
+				batch_bias = bias[startIdx:endIdx]
+
+			with phase('matvec'):
+				batch_Xw = batch_X.dot(w)
+			with phase('elementwise'):
+				batch_XYw_bias = batch_Y * (batch_Xw + batch_bias)
+				XYw_bias[startIdx:endIdx] = batch_XYw_bias
+				expt = np.exp(2.0*omega * batch_XYw_bias)
+				batch_coef = batch_Y*(expt/(expt + 1.0)/(expt + 1.0))
+			with phase('matvec'):
+				full_grad -= 4.0 * omega * batch_X.transpose().dot(batch_coef)
 
-			batch_X = X[index[startIdx:endIdx],:]
-			batch_Y = Y[index[startIdx:endIdx]]
-			batch_bias = bias[index[startIdx:endIdx]]
+		return full_grad / float(n), XYw_bias
 
-			expt = np.exp( 2.0*omega * batch_Y * (batch_X.dot(w) + batch_bias) )
+def grad_coef_eval_bin_class_loss_1(X, Y, bias, w, XYw = None):
+	"""! Compute the scalar coefficients of the per-sample gradients of loss function 1
 
-			batch_grad -= 4.0 * omega * batch_X.transpose().dot(batch_Y*(expt/(expt + 1.0)/(expt + 1.0))) 
+	For this GLM loss \f$\nabla f_i(w) = c_i x_i\f$, so a gradient is stored as the scalar \f$c_i\f$ instead of a vector.
 
-		return batch_grad / float(b)
-	# full
-	else:
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		full_grad = np.zeros(d)
-		XYw_bias = np.zeros(n)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), n-1)
-
-			batch_X = X[startIdx:endIdx,:]
-			batch_Y = Y[startIdx:endIdx]
-			batch_bias = bias[startIdx:endIdx]
+	Parameters
+	----------
+	@param X : rows of the input data
+	@param Y : labels of these rows
+	@param bias : bias of these rows
+	@param w : input vector
+	@param XYw : margins \f$ Y(Xw + bias)\f$ of these rows at w if already known, computed from X if None
 
-			batch_XYw_bias = batch_Y * (batch_X.dot(w) + batch_bias)
+	Returns
+	-------
+	@retval : vector of coefficients \f$c_i\f$, one per row of X
+	"""
+	if XYw is None:
+		XYw = Y * (X.dot(w) + bias)
+	omega = 1.0
+	expt = np.exp( 2.0*omega * XYw )
+	return -4.0 * omega * Y * ( expt/(expt + 1.0)/(expt + 1.0) )
 
-			XYw_bias[startIdx:endIdx] = batch_XYw_bias
+def block_coef_eval_bin_class_loss_1(XW, Y, bias):
+	"""! Compute the margins and gradient coefficients of loss function 1 for k iterates at once
 
-			expt = np.exp(2.0*omega * batch_XYw_bias)
+	Parameters
+	----------
+	@param XW : products of some rows of the input data with the d x k matrix of iterates
+	@param Y : labels of these rows
+	@param bias : bias of these rows
 
-			full_grad -= 4.0 * omega * batch_X.transpose().dot(batch_Y*(expt/(expt + 1.0)/(expt + 1.0))) 
+	Returns
+	-------
+	@retval : the margins \f$ Y(Xw + bias)\f$, one column per iterate
 
-		return full_grad / float(n), XYw_bias
+	@retval : the coefficients \f$c_i\f$ of \f$\nabla f_i(w) = c_i x_i\f$, one column per iterate
+	"""
+	omega = 1.0
+	Y = Y[:, np.newaxis]
+	margins = Y * (XW + bias[:, np.newaxis])
+	expt = np.exp( 2.0*omega * margins )
+	return margins, -4.0 * omega * Y * ( expt/(expt + 1.0)/(expt + 1.0) )
 
-def grad_diff_eval_bin_class_loss_1(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
+def grad_diff_eval_bin_class_loss_1(n, d, b, X, Y, bias, w1, w2, nnzX = 0, index = None, weight = None, XYw1 = None):
 	"""! Compute the (full/stochastic) gradient difference of loss function 1
 
 	\f$\displaystyle\frac{1}{b}\left(\sum_{i \in \mathcal{B}_t}(\nabla f_i(w_2) - \nabla f_i(w_1)) \right) \f$
@@ -240,7 +260,10 @@ def grad_diff_eval_bin_class_loss_1(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
 	@param bias : input bias
 	@param w1 : input vector
 	@param w2 : input vector
-	@param nnzX : average number of non-zero elements for each sample
+	@param nnzX : average number of non-zero elements for each sample, unused since the chunks are planned by util_ChunkPlan
+	@param index : pre-generated mini-batch indices (index array or slice of rows), drawn from util_Sampler.default_sampler if None
+	@param weight : per-sample importance weights \f$1/(n p_i)\f$ of a non-uniform sampler, None for uniform sampling
+	@param XYw1 : cached margins \f$y_i(x_i^{\top}w_1 + b_i)\f$ of all samples, e.g. returned by the full gradient at the anchor point w1; recomputed for the mini-batch if None
 
 	Returns
 	-------
@@ -250,72 +273,86 @@ def grad_diff_eval_bin_class_loss_1(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
 	# single sample
 	if b == 1:
 		# get a random sample
-		i = np.random.randint(0,n)
+		i = batch_index(n, 1, index)[0]
+		wi = 1.0 if weight is None else weight[i]
 
 		Xi = X[i, :]
-		expt1 = np.exp( 2.0*omega * Y[i] * (Xi.dot(w1) + bias[i]) )
+		XYw1_i = Y[i] * (Xi.dot(w1) + bias[i]) if XYw1 is None else XYw1[i]
+		expt1 = np.exp( 2.0*omega * XYw1_i )
 		expt2 = np.exp( 2.0*omega * Y[i] * (Xi.dot(w2) + bias[i]) )
 
 		diff_expt = expt2 / (expt2 + 1.0) / (expt2 + 1.0) - expt1 / (expt1 + 1.0) / (expt1 + 1.0)
 		
-		return -(4.0 * omega * diff_expt * Y[i]) * Xi
+		return -(4.0 * omega * diff_expt * wi * Y[i]) * Xi
 	# batch
 	elif b < n:
 		# get a random batch of size b
-		index = random.sample(range(n), b)
-
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		batch_grad_diff = np.zeros(d)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), b-1)
-
-			batch_X = X[index[startIdx:endIdx],:]
-			batch_Y = Y[index[startIdx:endIdx]]
-			batch_bias = bias[index[startIdx:endIdx]]
-
-			expt1 = np.exp( 2.0*omega * batch_Y * (batch_X.dot(w1) + batch_bias) )
-			expt2 = np.exp( 2.0*omega * batch_Y * (batch_X.dot(w2) + batch_bias) )
-
-			diff_expt = expt2/(expt2 + 1.0)/(expt2 + 1.0) - expt1/(expt1 + 1.0)/(expt1 + 1.0)
-
-			batch_grad_diff -= 4.0 * omega * batch_X.transpose().dot(batch_Y * diff_expt )
+		index = batch_index(n, b, index)
+
+		batch_grad_diff = np.zeros(d, dtype=w2.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, b, index):
+			with phase('gather'):
+				batch_X = take_rows(X, index, startIdx, endIdx)
+				batch_Y = take_rows(Y, index, startIdx, endIdx)
+				batch_bias = take_rows(bias, index, startIdx, endIdx)
+				batch_weight = take_weights(weight, index, startIdx, endIdx)
+
+			with phase('matvec'):
+				batch_Xw1 = batch_X.dot(w1) if XYw1 is None else None
+				batch_Xw2 = batch_X.dot(w2)
+			with phase('elementwise'):
+				batch_XYw1 = batch_Y * (batch_Xw1 + batch_bias) if XYw1 is None else take_rows(XYw1, index, startIdx, endIdx)
+				expt1 = np.exp( 2.0*omega * batch_XYw1 )
+				expt2 = np.exp( 2.0*omega * batch_Y * (batch_Xw2 + batch_bias) )
+				diff_expt = expt2/(expt2 + 1.0)/(expt2 + 1.0) - expt1/(expt1 + 1.0)/(expt1 + 1.0)
+				batch_coef = batch_weight * batch_Y * diff_expt
+			with phase('matvec'):
+				batch_grad_diff -= 4.0 * omega * batch_X.transpose().dot(batch_coef)
 
 		return batch_grad_diff / float(b)
 	# full
 	else:
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		full_grad_diff = np.zeros(d)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), n-1)
+		full_grad_diff = np.zeros(d, dtype=w2.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, n):
+			with phase('gather'):
+				batch_X = X[startIdx:endIdx]
+				batch_Y = Y[startIdx:endIdx]
+				batch_bias = bias[startIdx:endIdx]
+
+			with phase('matvec'):
+				batch_Xw1 = batch_X.dot(w1) if XYw1 is None else None
+				batch_Xw2 = batch_X.dot(w2)
+			with phase('elementwise'):
+				batch_XYw1 = batch_Y * (batch_Xw1 + batch_bias) if XYw1 is None else XYw1[startIdx:endIdx]
+				expt1 = np.exp( 2.0*omega * batch_XYw1 )
+				expt2 = np.exp( 2.0*omega * batch_Y * (batch_Xw2 + batch_bias) )
+				diff_expt = expt2/(expt2 + 1.0)/(expt2 + 1.0) - expt1/(expt1 + 1.0)/(expt1 + 1.0)
+				batch_coef = batch_Y * diff_expt
+			with phase('matvec'):
+				full_grad_diff -= 4.0 * omega * batch_X.transpose().dot(batch_coef)
 
-			batch_X = X[startIdx:endIdx]
-			batch_Y = Y[startIdx:endIdx]
-			batch_bias = bias[startIdx:endIdx]
+		return full_grad_diff / float(n)
 
-			expt1 = np.exp( 2.0*omega * batch_Y * (batch_X.dot(w1) + batch_XYw_bias) )
-			expt2 = np.exp( 2.0*omega * batch_Y * (batch_X.dot(w2) + batch_XYw_bias) )
+######################################################################
 
-			diff_expt = expt2/(expt2 + 1.0)/(expt2 + 1.0) - expt1/(expt1 + 1.0)/(expt1 + 1.0)
+def sample_lipschitz_bin_class_loss_2(X):
+	"""! Compute the per-sample Lipschitz constants of the gradient of loss function 2
 
-			full_grad_diff -= 4.0 * omega * batch_X.transpose().dot(batch_Y * diff_expt )
+	\f$ L_i = L_{\ell_2}\|x_i\|^2 \f$ with \f$ L_{\ell_2} \approx 0.15405 \f$
 
-		return full_grad_diff / float(n)
+	Parameters
+	----------
+	@param X : input data
 
-######################################################################
+	Returns
+	-------
+	@retval : vector of per-sample Lipschitz constants, used for importance sampling
+	"""
+	return 0.15405 * row_norms_sq(X)
 
 def func_val_bin_class_loss_2(n, XYw_bias):
 	"""! Compute the objective value of loss function 2
@@ -334,9 +371,9 @@ def func_val_bin_class_loss_2(n, XYw_bias):
 	@retval  : \f$\ell_2(Y(Xw + b))\f$
 	"""
 	expt = np.exp( XYw_bias )
-	return (1.0/float(n))*np.sum ( 1.0 / ( (expt + 1.0)**2.0 ) )
+	return (1.0/float(n))*np.sum ( 1.0 / ( (expt + 1.0)**2.0 ), dtype=np.float64 )
 
-def grad_eval_bin_class_loss_2(n, d, b, X, Y, bias, w, nnzX = 0):
+def grad_eval_bin_class_loss_2(n, d, b, X, Y, bias, w, nnzX = 0, index = None, weight = None):
 	"""! Compute the (full/stochastic) gradient of loss function 2.
 
 	\f$\ell_2(Y(Xw+b)) := \left(1 - \frac{1}{1 + \exp[-Y(Xw+b)]}\right)^2 \f$
@@ -356,7 +393,9 @@ def grad_eval_bin_class_loss_2(n, d, b, X, Y, bias, w, nnzX = 0):
 	@param Y : input label
 	@param bias : input bias
 	@param w : input vector
-	@param nnzX : average number of non-zero elements for each sample
+	@param nnzX : average number of non-zero elements for each sample, unused since the chunks are planned by util_ChunkPlan
+	@param index : pre-generated mini-batch indices (index array or slice of rows), drawn from util_Sampler.default_sampler if None
+	@param weight : per-sample importance weights \f$1/(n p_i)\f$ of a non-uniform sampler, None for uniform sampling
 
 	Returns
 	-------
@@ -367,69 +406,104 @@ def grad_eval_bin_class_loss_2(n, d, b, X, Y, bias, w, nnzX = 0):
 	# single sample
 	if b == 1:
 		# get a random sample
-		i = np.random.randint(0, n)
+		i = batch_index(n, 1, index)[0]
+		wi = 1.0 if weight is None else weight[i]
 		
 		Xi = X[i, :]
 		expt = np.exp(Y[i] * (Xi.dot(w) + bias[i]) )
 		
-		return ( -2.0 * (expt/(1.0 + expt)/(1.0 + expt)/(1.0 + expt)) * Y[i] ) * Xi
+		return ( -2.0 * (expt/(1.0 + expt)/(1.0 + expt)/(1.0 + expt)) * wi * Y[i] ) * Xi
 	# batch
 	elif b < n:
 		# get a random batch of size b
-		index = random.sample(range(n), b)
-
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		batch_grad = np.zeros(d)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), b-1)
-
-			batch_X = X[index[startIdx:endIdx],:]
-			batch_Y = Y[index[startIdx:endIdx]]
-			batch_bias = bias[index[startIdx:endIdx]]
-
-			expt = np.exp( batch_Y * (batch_X.dot(w) + batch_bias) )
-
-			batch_grad -= 2.0 * batch_X.transpose().dot(batch_Y \
-											* (expt/(1.0 + expt)/(1.0 + expt)/(1.0 + expt)) )
+		index = batch_index(n, b, index)
+
+		batch_grad = np.zeros(d, dtype=w.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, b, index):
+			with phase('gather'):
+				batch_X = take_rows(X, index, startIdx, endIdx)
+				batch_Y = take_rows(Y, index, startIdx, endIdx)
+				batch_bias = take_rows(bias, index, startIdx, endIdx)
+				batch_weight = take_weights(weight, index, startIdx, endIdx)
+
+			with phase('matvec'):
+				batch_Xw = batch_X.dot(w)
+			with phase('elementwise'):
+				expt = np.exp( batch_Y * (batch_Xw + batch_bias) )
+				batch_coef = batch_weight * batch_Y * (expt/(1.0 + expt)/(1.0 + expt)/(1.0 + expt))
+			with phase('matvec'):
+				batch_grad -= 2.0 * batch_X.transpose().dot(batch_coef)
         
 		return batch_grad / float(b)
 	# full
 	else:
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		full_grad = np.zeros(d)
-		XYw_bias = np.zeros(n)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), n-1)
+		full_grad = np.zeros(d, dtype=w.dtype)
+		XYw_bias = np.zeros(n, dtype=w.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, n):
+			with phase('gather'):
+				batch_X = X[startIdx:endIdx]
+				batch_Y = Y[startIdx:endIdx]
+				batch_bias = bias[startIdx:endIdx]
+
+			with phase('matvec'):
+				batch_Xw = batch_X.dot(w)
+			with phase('elementwise'):
+				batch_XYw_bias = batch_Y * (batch_Xw + batch_bias)
+				XYw_bias[startIdx:endIdx] = batch_XYw_bias
+				expt = np.exp(batch_XYw_bias)
+				batch_coef = batch_Y * (expt/(expt+1)/(expt+1)/(expt+1) )
+			with phase('matvec'):
+				full_grad -= 2.0 * batch_X.transpose().dot(batch_coef)
 
-			batch_X = X[startIdx:endIdx]
-			batch_Y = Y[startIdx:endIdx]
-			batch_bias = bias[startIdx:endIdx]
+		return full_grad / float(n), XYw_bias
+
+def grad_coef_eval_bin_class_loss_2(X, Y, bias, w, XYw = None):
+	"""! Compute the scalar coefficients of the per-sample gradients of loss function 2
+
+	For this GLM loss \f$\nabla f_i(w) = c_i x_i\f$, so a gradient is stored as the scalar \f$c_i\f$ instead of a vector.
+
+	Parameters
+	----------
+	@param X : rows of the input data
+	@param Y : labels of these rows
+	@param bias : bias of these rows
+	@param w : input vector
+	@param XYw : margins \f$ Y(Xw + bias)\f$ of these rows at w if already known, computed from X if None
 
-			batch_XYw_bias = batch_Y * (batch_X.dot(w) + batch_bias)
+	Returns
+	-------
+	@retval : vector of coefficients \f$c_i\f$, one per row of X
+	"""
+	if XYw is None:
+		XYw = Y * (X.dot(w) + bias)
+	expt = np.exp( XYw )
+	return -2.0 * Y * ( expt/(1.0 + expt)/(1.0 + expt)/(1.0 + expt) )
 
-			XYw_bias[startIdx:endIdx] = batch_XYw_bias
+def block_coef_eval_bin_class_loss_2(XW, Y, bias):
+	"""! Compute the margins and gradient coefficients of loss function 2 for k iterates at once
 
-			expt = np.exp(batch_XYw_bias)
+	Parameters
+	----------
+	@param XW : products of some rows of the input data with the d x k matrix of iterates
+	@param Y : labels of these rows
+	@param bias : bias of these rows
 
-			full_grad -= 2.0 * batch_X.transpose().dot( batch_Y * (expt/(expt+1)/(expt+1)/(expt+1) ) )
+	Returns
+	-------
+	@retval : the margins \f$ Y(Xw + bias)\f$, one column per iterate
 
-		return full_grad / float(n), XYw_bias
+	@retval : the coefficients \f$c_i\f$ of \f$\nabla f_i(w) = c_i x_i\f$, one column per iterate
+	"""
+	Y = Y[:, np.newaxis]
+	margins = Y * (XW + bias[:, np.newaxis])
+	expt = np.exp( margins )
+	return margins, -2.0 * Y * ( expt/(1.0 + expt)/(1.0 + expt)/(1.0 + expt) )
 
-def grad_diff_eval_bin_class_loss_2(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
+def grad_diff_eval_bin_class_loss_2(n, d, b, X, Y, bias, w1, w2, nnzX = 0, index = None, weight = None, XYw1 = None):
 	"""! Compute the (full/stochastic) gradient difference of loss function 2
 
 	\f$\displaystyle\frac{1}{b}\left(\sum_{i \in \mathcal{B}_t}(\nabla f_i(w_2) - \nabla f_i(w_1)) \right) \f$
@@ -450,7 +524,10 @@ def grad_diff_eval_bin_class_loss_2(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
 	@param bias : input bias
 	@param w1 : input vector
 	@param w2 : input vector
-	@param nnzX : average number of non-zero elements for each sample
+	@param nnzX : average number of non-zero elements for each sample, unused since the chunks are planned by util_ChunkPlan
+	@param index : pre-generated mini-batch indices (index array or slice of rows), drawn from util_Sampler.default_sampler if None
+	@param weight : per-sample importance weights \f$1/(n p_i)\f$ of a non-uniform sampler, None for uniform sampling
+	@param XYw1 : cached margins \f$y_i(x_i^{\top}w_1 + b_i)\f$ of all samples, e.g. returned by the full gradient at the anchor point w1; recomputed for the mini-batch if None
 
 	Returns
 	-------
@@ -459,74 +536,86 @@ def grad_diff_eval_bin_class_loss_2(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
 	# single sample
 	if b == 1:
 		# get a random sample
-		i = np.random.randint(0, n)
+		i = batch_index(n, 1, index)[0]
+		wi = 1.0 if weight is None else weight[i]
 		
 		Xi = X[i,:]
-		expt1 = np.exp(Y[i]* (Xi.dot(w1) + bias[i]) )
+		XYw1_i = Y[i] * (Xi.dot(w1) + bias[i]) if XYw1 is None else XYw1[i]
+		expt1 = np.exp( XYw1_i )
 		expt2 = np.exp(Y[i] * (Xi.dot(w2) + bias[i]))
 
 		diff_expt = (expt2/(1.0 + expt2)/(1.0 + expt2)/(1.0 + expt2)) - (expt1/(1.0 + expt1)/(1.0 + expt1)/(1.0 + expt1))
 		
-		return -2.0*diff_expt*Y[i]*Xi
+		return -2.0*diff_expt*wi*Y[i]*Xi
 	# batch
 	elif b < n:
 		# get a random batch of size b
-		index = random.sample(range(n), b)
-
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		batch_grad_diff = np.zeros(d)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), b-1)
-
-			batch_X = X[index[startIdx:endIdx],:]
-			batch_Y = Y[index[startIdx:endIdx]]
-			batch_bias = bias[index[startIdx:endIdx]]
-
-			expt1 = np.exp(batch_Y * (batch_X.dot(w1) + batch_bias) )
-			expt2 = np.exp(batch_Y * (batch_X.dot(w2) + batch_bias) )
-
-			diff_expt = expt2/(1.0 + expt2)/(1.0 + expt2)/(1.0 + expt2) - expt1/(1.0 + expt1)/(1.0 + expt1)/(1.0 + expt1)
-		
-			batch_grad_diff -= 2.0 * batch_X.transpose().dot( batch_Y * diff_expt )
+		index = batch_index(n, b, index)
+
+		batch_grad_diff = np.zeros(d, dtype=w2.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, b, index):
+			with phase('gather'):
+				batch_X = take_rows(X, index, startIdx, endIdx)
+				batch_Y = take_rows(Y, index, startIdx, endIdx)
+				batch_bias = take_rows(bias, index, startIdx, endIdx)
+				batch_weight = take_weights(weight, index, startIdx, endIdx)
+
+			with phase('matvec'):
+				batch_Xw1 = batch_X.dot(w1) if XYw1 is None else None
+				batch_Xw2 = batch_X.dot(w2)
+			with phase('elementwise'):
+				batch_XYw1 = batch_Y * (batch_Xw1 + batch_bias) if XYw1 is None else take_rows(XYw1, index, startIdx, endIdx)
+				expt1 = np.exp( batch_XYw1 )
+				expt2 = np.exp(batch_Y * (batch_Xw2 + batch_bias) )
+				diff_expt = expt2/(1.0 + expt2)/(1.0 + expt2)/(1.0 + expt2) - expt1/(1.0 + expt1)/(1.0 + expt1)/(1.0 + expt1)
+				batch_coef = batch_weight * batch_Y * diff_expt
+			with phase('matvec'):
+				batch_grad_diff -= 2.0 * batch_X.transpose().dot(batch_coef)
 
 		return batch_grad_diff / float(b)
 	# full
 	else:
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		full_grad_diff = np.zeros(d)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), n-1)
+		full_grad_diff = np.zeros(d, dtype=w2.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, n):
+			with phase('gather'):
+				batch_X = X[startIdx:endIdx]
+				batch_Y = Y[startIdx:endIdx]
+				batch_bias = bias[startIdx:endIdx]
+
+			with phase('matvec'):
+				batch_Xw1 = batch_X.dot(w1) if XYw1 is None else None
+				batch_Xw2 = batch_X.dot(w2)
+			with phase('elementwise'):
+				batch_XYw1 = batch_Y * (batch_Xw1 + batch_bias) if XYw1 is None else XYw1[startIdx:endIdx]
+				expt1 = np.exp( batch_XYw1 )
+				expt2 = np.exp(batch_Y * (batch_Xw2 + batch_bias) )
+				diff_expt = expt2/(1.0 + expt2)/(1.0 + expt2)/(1.0 + expt2) - expt1/(1.0 + expt1)/(1.0 + expt1)/(1.0 + expt1)
+				batch_coef = batch_Y * diff_expt
+			with phase('matvec'):
+				full_grad_diff -= 2.0 * batch_X.transpose().dot(batch_coef)
 
-			batch_X = X[startIdx:endIdx]
-			batch_Y = Y[startIdx:endIdx]
-			batch_bias = bias[startIdx:endIdx]
+		return full_grad_diff / float(n)
 
-			expt1 = np.exp(batch_Y * (batch_X.dot(w1) + batch_bias) )
-			expt2 = np.exp(batch_Y * (batch_X.dot(w2) + batch_bias) )
+##################################################################
 
-			expt1 = np.exp( 2.0*omega * batch_Y * (batch_X.dot(w1) + batch_XYw_bias) )
-			expt2 = np.exp( 2.0*omega * batch_Y * (batch_X.dot(w2) + batch_XYw_bias) )
-			diff_expt = expt2/(1.0 + expt2)/(1.0 + expt2)/(1.0 + expt2) - expt1/(1.0 + expt1)/(1.0 + expt1)/(1.0 + expt1)
+def sample_lipschitz_bin_class_loss_3(X):
+	"""! Compute the per-sample Lipschitz constants of the gradient of loss function 3
 
-			full_grad_diff -= 2.0 * batch_X.transpose().dot( batch_Y * diff_expt )
+	\f$ L_i = L_{\ell_3}\|x_i\|^2 \f$ with \f$ L_{\ell_3} \approx 0.092372 \f$
 
-		return full_grad_diff / float(n)
+	Parameters
+	----------
+	@param X : input data
 
-##################################################################
+	Returns
+	-------
+	@retval : vector of per-sample Lipschitz constants, used for importance sampling
+	"""
+	return 0.092372 * row_norms_sq(X)
 
 def func_val_bin_class_loss_3(n, XYw_bias):
 	"""! Compute the objective value of loss function 3
@@ -545,12 +634,12 @@ def func_val_bin_class_loss_3(n, XYw_bias):
 	@retval : \f$\ell_3(Y(Xw + b))\f$
 	"""
 	omega = 1.0
-	exp_g = np.exp(-omega)
+	exp_g = float(np.exp(-omega))
 	expt = np.exp(-XYw_bias)
 
-	return (1.0 / float(n)) * np.sum((np.log(1.0 + expt) - np.log(1.0 + exp_g*expt)))
+	return (1.0 / float(n)) * np.sum((np.log(1.0 + expt) - np.log(1.0 + exp_g*expt)), dtype=np.float64)
 
-def grad_eval_bin_class_loss_3(n, d, b, X, Y, bias, w, nnzX = 0):
+def grad_eval_bin_class_loss_3(n, d, b, X, Y, bias, w, nnzX = 0, index = None, weight = None):
 	"""! Compute the (full/stochastic) gradient of loss function 3.
 
 	where \f$ \ell_3(Y(Xw + b)) := \ln(1 + \exp(-Y(Xw + b))) - \ln(1 + \exp(-Y(Xw + b) - \omega))\f$
@@ -572,7 +661,9 @@ def grad_eval_bin_class_loss_3(n, d, b, X, Y, bias, w, nnzX = 0):
 	@param Y : input label
 	@param bias : input bias
 	@param w : input vector
-	@param nnzX : average number of non-zero elements for each sample
+	@param nnzX : average number of non-zero elements for each sample, unused since the chunks are planned by util_ChunkPlan
+	@param index : pre-generated mini-batch indices (index array or slice of rows), drawn from util_Sampler.default_sampler if None
+	@param weight : per-sample importance weights \f$1/(n p_i)\f$ of a non-uniform sampler, None for uniform sampling
 
 	Returns
 	-------
@@ -581,72 +672,112 @@ def grad_eval_bin_class_loss_3(n, d, b, X, Y, bias, w, nnzX = 0):
 	@retval XYw_bias: The precomputed \f$ Y(Xw + bias)\f$
 	"""
 	alpha = 1
-	exp_a = np.exp(alpha)
+	exp_a = float(np.exp(alpha))
 	# single sample
 	if b == 1:
 		# get a random sample
-		i = np.random.randint(0, n)
+		i = batch_index(n, 1, index)[0]
+		wi = 1.0 if weight is None else weight[i]
 
 		Xi = X[i, :]
 		expt = np.exp( Y[i] * (Xi.dot(w) + bias[i]) )
 
-		return ( (1 / (expt * exp_a + 1.0) - 1 / (expt + 1.0) ) * Y[i] ) * Xi
+		return ( (1 / (expt * exp_a + 1.0) - 1 / (expt + 1.0) ) * wi * Y[i] ) * Xi
 	# batch
 	elif b < n:
 		# get a random batch of size b
-		index = random.sample(range(n), b)
+		index = batch_index(n, b, index)
+
+		batch_grad = np.zeros(d, dtype=w.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, b, index):
+			with phase('gather'):
+				batch_X = take_rows(X, index, startIdx, endIdx)
+				batch_Y = take_rows(Y, index, startIdx, endIdx)
+				batch_bias = take_rows(bias, index, startIdx, endIdx)
+				batch_weight = take_weights(weight, index, startIdx, endIdx)
+
+			with phase('matvec'):
+				batch_Xw = batch_X.dot(w)
+			with phase('elementwise'):
+				expt = np.exp( batch_Y * (batch_Xw + batch_bias) )
+				batch_coef = batch_weight * batch_Y * (1 / (expt * exp_a + 1.0) - 1 / (expt + 1.0))
+			with phase('matvec'):
+				batch_grad += batch_X.transpose().dot(batch_coef)
 
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		batch_grad = np.zeros(d)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), b-1)
+		return batch_grad / float(b)
+	# full
+	else:
+		full_grad = np.zeros(d, dtype=w.dtype)
+		XYw_bias = np.zeros(n, dtype=w.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, n):
+			with phase('gather'):
+				batch_X = X[startIdx:endIdx,:]
+				batch_Y = Y[startIdx:endIdx]
+				batch_bias = bias[startIdx:endIdx]
+
+			with phase('matvec'):
+				batch_Xw = batch_X.dot(w)
+			with phase('elementwise'):
+				batch_XYw_bias = batch_Y * (batch_Xw + batch_bias)
+				XYw_bias[startIdx:endIdx] = batch_XYw_bias
+				expt = np.exp(batch_XYw_bias)
+				batch_coef = batch_Y * ( 1.0/ (expt * exp_a + 1.0) - 1.0/ (expt + 1.0) )
+			with phase('matvec'):
+				full_grad += batch_X.transpose().dot(batch_coef)
 
-			batch_X = X[index[startIdx:endIdx],:]
-			batch_Y = Y[index[startIdx:endIdx]]
-			batch_bias = bias[index[startIdx:endIdx]]
+		return full_grad / float(n), XYw_bias
+		
+def grad_coef_eval_bin_class_loss_3(X, Y, bias, w, XYw = None):
+	"""! Compute the scalar coefficients of the per-sample gradients of loss function 3
 
-			expt = np.exp( batch_Y * (batch_X.dot(w) + batch_bias) )
+	For this GLM loss \f$\nabla f_i(w) = c_i x_i\f$, so a gradient is stored as the scalar \f$c_i\f$ instead of a vector.
 
-			batch_grad += batch_X.transpose().dot(batch_Y * (1 / (expt * exp_a + 1.0) - 1 / (expt + 1.0)) )
+	Parameters
+	----------
+	@param X : rows of the input data
+	@param Y : labels of these rows
+	@param bias : bias of these rows
+	@param w : input vector
+	@param XYw : margins \f$ Y(Xw + bias)\f$ of these rows at w if already known, computed from X if None
 
-		return batch_grad / float(b)
-	# full
-	else:
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		full_grad = np.zeros(d)
-		XYw_bias = np.zeros(n)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), n-1)
-
-			batch_X = X[startIdx:endIdx,:]
-			batch_Y = Y[startIdx:endIdx]
-			batch_bias = bias[startIdx:endIdx]
+	Returns
+	-------
+	@retval : vector of coefficients \f$c_i\f$, one per row of X
+	"""
+	if XYw is None:
+		XYw = Y * (X.dot(w) + bias)
+	alpha = 1
+	exp_a = float(np.exp(alpha))
+	expt = np.exp( XYw )
+	return Y * ( 1.0/(expt*exp_a + 1.0) - 1.0/(expt + 1.0) )
 
-			batch_XYw_bias = batch_Y * (batch_X.dot(w) + batch_bias)
+def block_coef_eval_bin_class_loss_3(XW, Y, bias):
+	"""! Compute the margins and gradient coefficients of loss function 3 for k iterates at once
 
-			XYw_bias[startIdx:endIdx] = batch_XYw_bias
+	Parameters
+	----------
+	@param XW : products of some rows of the input data with the d x k matrix of iterates
+	@param Y : labels of these rows
+	@param bias : bias of these rows
 
-			expt = expt = np.exp(batch_XYw_bias)
+	Returns
+	-------
+	@retval : the margins \f$ Y(Xw + bias)\f$, one column per iterate
 
-			full_grad = batch_X.transpose().dot(batch_Y * ( 1.0/ (expt * exp_a + 1.0) - 1.0/ (expt + 1.0) ) )
+	@retval : the coefficients \f$c_i\f$ of \f$\nabla f_i(w) = c_i x_i\f$, one column per iterate
+	"""
+	alpha = 1
+	exp_a = float(np.exp(alpha))
+	Y = Y[:, np.newaxis]
+	margins = Y * (XW + bias[:, np.newaxis])
+	expt = np.exp( margins )
+	return margins, Y * ( 1.0/(expt*exp_a + 1.0) - 1.0/(expt + 1.0) )
 
-		return full_grad / float(n), XYw_bias
-		
-def grad_diff_eval_bin_class_loss_3(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
+def grad_diff_eval_bin_class_loss_3(n, d, b, X, Y, bias, w1, w2, nnzX = 0, index = None, weight = None, XYw1 = None):
 	"""! Compute the (full/stochastic) gradient difference of loss function 3
 
 	\f$\displaystyle\frac{1}{b}\left(\sum_{i \in \mathcal{B}_t}(\nabla f_i(w_2) - \nabla f_i(w_1)) \right) \f$
@@ -667,78 +798,80 @@ def grad_diff_eval_bin_class_loss_3(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
 	@param bias : input bias
 	@param w1 : input vector
 	@param w2 : input vector
-	@param nnzX : average number of non-zero elements for each sample
+	@param nnzX : average number of non-zero elements for each sample, unused since the chunks are planned by util_ChunkPlan
+	@param index : pre-generated mini-batch indices (index array or slice of rows), drawn from util_Sampler.default_sampler if None
+	@param weight : per-sample importance weights \f$1/(n p_i)\f$ of a non-uniform sampler, None for uniform sampling
+	@param XYw1 : cached margins \f$y_i(x_i^{\top}w_1 + b_i)\f$ of all samples, e.g. returned by the full gradient at the anchor point w1; recomputed for the mini-batch if None
 
 	Returns
 	-------
 	@retval  : computed full/stochastic gradient
 	"""
 	alpha = 1
-	exp_a = np.exp(alpha)
+	exp_a = float(np.exp(alpha))
 	# single sample
 	if b == 1:
 		# get a random sample
-		i = np.random.randint(0, n)
+		i = batch_index(n, 1, index)[0]
+		wi = 1.0 if weight is None else weight[i]
 
 		Xi = X[i,:]
-		expt1 = np.exp( -Y[i]*(Xi.dot(w1) + bias[i]) )
-		expt2 = np.exp( -Y[i]*(Xi.dot(w2) + bias[i]) )
+		XYw1_i = Y[i] * (Xi.dot(w1) + bias[i]) if XYw1 is None else XYw1[i]
+		expt1 = np.exp( XYw1_i )
+		expt2 = np.exp( Y[i]*(Xi.dot(w2) + bias[i]) )
 
 		diff_expt = (1.0/(expt2*exp_a + 1.0) - 1.0/(expt2 + 1.0)) - (1.0/(expt1*exp_a + 1.0) - 1.0/(expt1 + 1.0))
 		
-		return diff_expt*Y[i]*Xi
+		return diff_expt*wi*Y[i]*Xi
 	# batch
 	elif b < n:
 		# get a random batch of size b
-		index = random.sample(range(n), b)
-
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = int(total_mem_batch // nnzX)
-		num_batches = math.ceil(b / batch_size)
-		batch_grad_diff = np.zeros(d)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), b-1)
-
-			batch_X = X[index[startIdx:endIdx],:]
-			batch_Y = Y[index[startIdx:endIdx]]
-			batch_bias = bias[index[startIdx:endIdx]]
-
-			expt1 = np.exp(batch_Y * (batch_X.dot(w1) + batch_bias) )
-			expt2 = np.exp(batch_Y * (batch_X.dot(w2) + batch_bias) )
-
-			diff_expt = ( 1/(expt2*exp_a + 1.0) - 1/(expt2 + 1.0) ) - (1/(expt1*exp_a + 1.0) - 1/(expt1 + 1.0) )
-
-			batch_grad_diff += batch_X.transpose().dot( batch_Y * diff_expt )
+		index = batch_index(n, b, index)
+
+		batch_grad_diff = np.zeros(d, dtype=w2.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, b, index):
+			with phase('gather'):
+				batch_X = take_rows(X, index, startIdx, endIdx)
+				batch_Y = take_rows(Y, index, startIdx, endIdx)
+				batch_bias = take_rows(bias, index, startIdx, endIdx)
+				batch_weight = take_weights(weight, index, startIdx, endIdx)
+
+			with phase('matvec'):
+				batch_Xw1 = batch_X.dot(w1) if XYw1 is None else None
+				batch_Xw2 = batch_X.dot(w2)
+			with phase('elementwise'):
+				batch_XYw1 = batch_Y * (batch_Xw1 + batch_bias) if XYw1 is None else take_rows(XYw1, index, startIdx, endIdx)
+				expt1 = np.exp( batch_XYw1 )
+				expt2 = np.exp(batch_Y * (batch_Xw2 + batch_bias) )
+				diff_expt = ( 1/(expt2*exp_a + 1.0) - 1/(expt2 + 1.0) ) - (1/(expt1*exp_a + 1.0) - 1/(expt1 + 1.0) )
+				batch_coef = batch_weight * batch_Y * diff_expt
+			with phase('matvec'):
+				batch_grad_diff += batch_X.transpose().dot(batch_coef)
 
 		return batch_grad_diff / float(b)
 	# full
 	else:
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = int(total_mem_full // nnzX)
-		num_batches = math.ceil(b / batch_size)
-		full_grad_diff = np.zeros(d)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), n-1)
-
-			batch_X = X[startIdx:endIdx]
-			batch_Y = Y[startIdx:endIdx]
-			batch_bias = bias[startIdx:endIdx]
-
-			expt1 = np.exp(batch_Y * (batch_X.dot(w1) + batch_bias) )
-			expt2 = np.exp(batch_Y * (batch_X.dot(w2) + batch_bias) )
-
-			diff_expt = ( 1/(expt2*exp_a + 1.0) - 1/(expt2 + 1.0) ) - (1/(expt1*exp_a + 1.0) - 1/(expt1 + 1.0) )
-
-			full_grad_diff += batch_X.transpose().dot( batch_Y * diff_expt )
+		full_grad_diff = np.zeros(d, dtype=w2.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, n):
+			with phase('gather'):
+				batch_X = X[startIdx:endIdx]
+				batch_Y = Y[startIdx:endIdx]
+				batch_bias = bias[startIdx:endIdx]
+
+			with phase('matvec'):
+				batch_Xw1 = batch_X.dot(w1) if XYw1 is None else None
+				batch_Xw2 = batch_X.dot(w2)
+			with phase('elementwise'):
+				batch_XYw1 = batch_Y * (batch_Xw1 + batch_bias) if XYw1 is None else XYw1[startIdx:endIdx]
+				expt1 = np.exp( batch_XYw1 )
+				expt2 = np.exp(batch_Y * (batch_Xw2 + batch_bias) )
+				diff_expt = ( 1/(expt2*exp_a + 1.0) - 1/(expt2 + 1.0) ) - (1/(expt1*exp_a + 1.0) - 1/(expt1 + 1.0) )
+				batch_coef = batch_Y * diff_expt
+			with phase('matvec'):
+				full_grad_diff += batch_X.transpose().dot(batch_coef)
 
 		return full_grad_diff / float(n)
@@ -0,0 +1,173 @@
+"""!@package util_BlockGrad
+
+Oracles evaluated for k iterates at once, stacked as the columns of a d x k matrix W.
+
+A hyperparameter sweep runs the same method on the same data with k configurations. The passes over the data are
+shared by multiplying every chunk of rows with the whole block W: one sparse times dense-block product reads each
+non-zero once instead of k times. The loss enters through a BlockCoefEval oracle, e.g.
+util_BinClass.block_coef_eval_bin_class_loss_1, which maps the products XW of some rows to their margins and to the
+scalar gradient coefficients \f$c_i\f$ of \f$\nabla f_i(w) = c_i x_i\f$, one column per iterate.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import numpy as np
+
+from util_Sampler import batch_index, take_rows, take_weights
+from util_ChunkPlan import iter_row_chunks
+from util_Profiler import phase, timed
+
+@timed('grad')
+def block_grad_eval(n, d, b, X, Y, bias, W, BlockCoefEval, index = None, weight = None, W_prev = None):
+	"""! Compute the (full/stochastic) gradients of k iterates
+
+	Parameters
+	----------
+	@param n : sample size
+	@param d : number of features
+	@param b : mini-batch size, b = n for the full gradients
+	@param X : input data
+	@param Y : input label
+	@param bias : input bias
+	@param W : d x k matrix of iterates
+	@param BlockCoefEval : function pointer mapping the products XW of some rows to their margins and gradient coefficients
+	@param index : pre-generated mini-batch indices (index array or slice of rows), drawn from util_Sampler.default_sampler if None
+	@param weight : per-sample importance weights \f$1/(n p_i)\f$ of a non-uniform sampler, None for uniform sampling
+	@param W_prev : if given, return the gradient differences \f$\nabla f_B(W) - \nabla f_B(W_{prev})\f$ of the mini-batch,
+		computed from one product with the stacked block [W, W_prev]
+
+	Returns
+	-------
+	@retval : d x k matrix of full/stochastic gradients, or of gradient differences
+
+	@retval : n x k matrix of margins, only for the full gradients
+	"""
+	k = W.shape[1]
+
+	# full
+	if b >= n:
+		full_grad = np.zeros((d, k), dtype=W.dtype)
+		margins = np.zeros((n, k), dtype=W.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, n):
+			with phase('gather'):
+				batch_X = X[startIdx:endIdx,:]
+
+			with phase('matvec'):
+				batch_XW = batch_X.dot(W)
+			with phase('elementwise'):
+				margins[startIdx:endIdx], coef = BlockCoefEval(batch_XW, Y[startIdx:endIdx], bias[startIdx:endIdx])
+			with phase('matvec'):
+				full_grad += batch_X.transpose().dot(coef)
+
+		return full_grad / float(n), margins
+
+	# batch
+	index = batch_index(n, b, index)
+	if W_prev is not None:
+		W = np.hstack((W, W_prev))
+
+	batch_grad = np.zeros((d, k), dtype=W.dtype)
+
+	# chunks of rows within the memory budget
+	for startIdx, endIdx in iter_row_chunks(X, b, index):
+		with phase('gather'):
+			batch_X = take_rows(X, index, startIdx, endIdx)
+			batch_Y = take_rows(Y, index, startIdx, endIdx)
+			batch_bias = take_rows(bias, index, startIdx, endIdx)
+			batch_weight = take_weights(weight, index, startIdx, endIdx)
+
+		with phase('matvec'):
+			batch_XW = batch_X.dot(W)
+		with phase('elementwise'):
+			_, coef = BlockCoefEval(batch_XW, batch_Y, batch_bias)
+			if W_prev is not None:
+				coef = coef[:, :k] - coef[:, k:]
+			if weight is not None:
+				coef = batch_weight[:, np.newaxis] * coef
+		with phase('matvec'):
+			batch_grad += batch_X.transpose().dot(coef)
+
+	return batch_grad / float(b)
+
+@timed('accuracy')
+def block_accuracy(n, X, Y, bias, W, BlockCoefEval):
+	"""! Compute the accuracy of k iterates
+
+	Parameters
+	----------
+	@param n : sample size
+	@param X : input data
+	@param Y : input label
+	@param bias : bias vector
+	@param W : d x k matrix of iterates
+	@param BlockCoefEval : function pointer of a classification loss, see block_grad_eval
+
+	Returns
+	-------
+	@retval : vector of k values between 0-1
+	"""
+	sum_acc = np.zeros(W.shape[1])
+
+	# chunks of rows within the memory budget
+	for startIdx, endIdx in iter_row_chunks(X, n):
+		with phase('gather'):
+			batch_X = X[startIdx:endIdx]
+
+		with phase('matvec'):
+			batch_XW = batch_X.dot(W)
+		with phase('elementwise'):
+			margins, _ = BlockCoefEval(batch_XW, Y[startIdx:endIdx], bias[startIdx:endIdx])
+			sum_acc += np.sum(margins > 0, axis=0)
+
+	return sum_acc / float(n)
+
+@timed('prox')
+def block_prox(ProxEval, U, thresh, out = None):
+	"""! Apply a proximal operator to every column
+
+	Parameters
+	----------
+	@param ProxEval : function pointer to compute proximal operator of g(w), taking an out= buffer (see util_Prox.prox_with_out)
+	@param U : d x k matrix
+	@param thresh : vector of the k thresholds (penalty parameter times learning rate)
+	@param out : d x k output buffer, may be U, a new matrix if None
+
+	Returns
+	-------
+	@retval : d x k matrix with the proximal points of the columns of U
+	"""
+	if out is None:
+		out = np.empty_like(U)
+	for j in range(U.shape[1]):
+		ProxEval(U[:, j], float(thresh[j]), out=out[:, j])
+	return out
+
+def block_sq_norm(G):
+	"""! Squared \f$\ell_2\f$-norm of every column, accumulated in float64
+
+	Parameters
+	----------
+	@param G : d x k matrix
+
+	Returns
+	-------
+	@retval : vector of the k squared norms
+	"""
+	return np.sum(np.square(G, dtype=np.float64), axis=0)
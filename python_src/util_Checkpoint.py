@@ -0,0 +1,196 @@
+"""!@package util_Checkpoint
+
+Checkpoints of the solver state at outer loop boundaries, to resume a preempted run exactly where it stopped.
+
+At the end of an outer iteration the state of ProxSARAH, ProxSARAH Adaptive, ProxSpiderBoost and ProxSVRG is the
+anchor w_til, the counters (num_grad, num_epoch, min_norm_grad_map, last_print_num_grad), the order of the rows in
+'shuffled_contiguous' mode, the state of the mini-batch sampler and the history recorded so far. Everything else
+(v_cur, w_prev, w_hat, ...) is recomputed from w_til at the start of the next outer iteration, so a run resumed from
+this state draws the same mini-batches and produces bit-for-bit the same iterates and histories as an uninterrupted run.
+
+The arrays are written into memory-mapped .npy files of two alternating slots, which are kept open and rewritten in
+place. The scalars, the sampler state and the active slot go to a small JSON manifest that is replaced atomically
+once the slot has been flushed. A preemption while writing therefore leaves the previous checkpoint intact.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import os
+import re
+import json
+import numpy as np
+
+from util_History import history_columns
+
+class Checkpointer:
+	"""! Periodic checkpoints of one run in a directory
+
+	Parameters
+	----------
+	@param path : directory of the checkpoint, created if needed
+	@param every : number of outer iterations between two checkpoints
+
+	The metadata of the history recorder (algorithm, step sizes, batch sizes, dataset, seed, ...) identifies the run,
+	a checkpoint is only resumed by a run with the same metadata.
+	"""
+
+	def __init__(self, path, every = 1):
+		self.path = path
+		self.every = max(int(every), 1)
+		self.num_outer = 0
+		self.slot = 0
+
+		## open memory maps of the slots, {(slot, name): array}
+		self.maps = {}
+
+	def _manifest_path(self):
+		"""! JSON manifest naming the slot of the last complete checkpoint
+		"""
+		return os.path.join(self.path, 'checkpoint.json')
+
+	def _array_path(self, slot, name):
+		"""! .npy file of an array in a slot
+		"""
+		return os.path.join(self.path, 'slot{}_{}.npy'.format(slot, name))
+
+	def _write_array(self, slot, name, array):
+		"""! Write an array into the memory map of a slot, (re)creating the file if the shape or dtype changed
+		"""
+		array = np.asarray(array)
+		key = (slot, name)
+		mapped = self.maps.get(key)
+		if mapped is None or mapped.shape != array.shape or mapped.dtype != array.dtype:
+			mapped = np.lib.format.open_memmap(self._array_path(slot, name), mode='w+', dtype=array.dtype, shape=array.shape)
+			self.maps[key] = mapped
+		mapped[...] = array
+		mapped.flush()
+
+	def restore(self, sampler, history):
+		"""! Load the last checkpoint, if any
+
+		Parameters
+		----------
+		@param sampler : mini-batch sampler of the run, set to the checkpointed state
+		@param history : history recorder of the run (util_History.HistoryRecorder), set to the checkpointed rows
+
+		Returns
+		-------
+		@retval : None without a checkpoint, else a tuple (iterates, counters) of the dictionaries given to step
+		"""
+		if not os.path.exists(self._manifest_path()):
+			return None
+
+		with open(self._manifest_path()) as f:
+			manifest = json.load(f)
+
+		if manifest['metadata'] != _metadata(history):
+			raise ValueError("Checkpoint in {} belongs to a different run: {}".format(self.path, manifest['metadata']))
+
+		slot = manifest['slot']
+		arrays = {name: np.array(np.load(self._array_path(slot, name), mmap_mode='r')) for name in manifest['arrays']}
+
+		sampler_state = dict(manifest['sampler'])
+		sampler_state['perm'] = arrays.pop('sampler_perm', None)
+		sampler.set_state(sampler_state)
+
+		history.restore(tuple(arrays.pop('hist_' + key) for key in history_columns))
+
+		# the next checkpoint goes to the other slot
+		self.num_outer = manifest['num_outer']
+		self.slot = 1 - slot
+
+		return arrays, manifest['counters']
+
+	def step(self, iterates, counters, sampler, history):
+		"""! Count one outer iteration and write a checkpoint every self.every of them
+
+		Parameters
+		----------
+		@param iterates : dictionary of the arrays of the state, e.g. {'w_til': w_til, 'row_order': row_order}
+		@param counters : dictionary of the scalars of the state, e.g. {'num_grad': num_grad, ...}
+		@param sampler : mini-batch sampler of the run
+		@param history : history recorder of the run
+		"""
+		self.num_outer += 1
+		if self.num_outer % self.every != 0:
+			return
+
+		os.makedirs(self.path, exist_ok=True)
+
+		arrays = dict(iterates)
+		sampler_state = sampler.get_state()
+		if sampler_state['perm'] is not None:
+			arrays['sampler_perm'] = sampler_state['perm']
+		sampler_state['perm'] = None
+		for key, column in zip(history_columns, history.columns()):
+			arrays['hist_' + key] = column
+
+		for name, array in arrays.items():
+			self._write_array(self.slot, name, array)
+
+		manifest = {'metadata': _metadata(history), 'slot': self.slot, 'num_outer': self.num_outer, 'arrays': sorted(arrays), \
+				'counters': counters, 'sampler': sampler_state}
+
+		# switch to the new slot only once it is on disk
+		temp_path = self._manifest_path() + '.tmp'
+		with open(temp_path, 'w') as f:
+			json.dump(manifest, f, default=_to_json)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(temp_path, self._manifest_path())
+
+		self.slot = 1 - self.slot
+
+	def __getstate__(self):
+		# checkpointers are sent to the worker processes of util_ExperimentRunner before they are used
+		state = dict(self.__dict__)
+		state['maps'] = {}
+		return state
+
+def _metadata(history):
+	"""! Metadata of a history recorder as read back from JSON
+	"""
+	return json.loads(json.dumps(history.metadata, default=_to_json))
+
+def _to_json(value):
+	"""! JSON encoding of numpy values, exact for floats
+	"""
+	if isinstance(value, np.ndarray):
+		return value.tolist()
+	if isinstance(value, np.generic):
+		return value.item()
+	return str(value)
+
+def checkpointer(checkpoint_dir, name, every = 1):
+	"""! Checkpointer of a run of a driver
+
+	Parameters
+	----------
+	@param checkpoint_dir : directory of the checkpoints, '' or None to disable them
+	@param name : name of the run, its checkpoint goes to checkpoint_dir/<name>
+	@param every : number of outer iterations between two checkpoints
+
+	Returns
+	-------
+	@retval : Checkpointer, None if checkpoint_dir is empty
+	"""
+	if not checkpoint_dir:
+		return None
+
+	dir_name = re.sub(r'[^A-Za-z0-9.-]+', '_', name).strip('_')
+	return Checkpointer(os.path.join(checkpoint_dir, dir_name), every)
@@ -0,0 +1,166 @@
+"""!@package util_ChunkPlan
+
+Memory-budget-aware planning of the row chunks processed by the oracles.
+
+The batch and full branches of the oracles gather rows of the data and multiply with their transpose chunk by chunk,
+so that the temporaries of one chunk stay within a memory budget. ChunkPlanner is built once per data matrix from
+the number of non-zeros of every row. It precomputes the exact chunk boundaries of a full pass, and it splits a
+mini-batch using the non-zeros of the sampled rows. Chunks are filled greedily and hold at least one row, so a
+chunk only exceeds the budget if a single row does.
+
+The oracles call iter_row_chunks, which builds the planner of a matrix on first use and keeps it for as long as the
+matrix is alive. The full passes over a matrix mapped from a file read the next chunk ahead (see util_OutOfCore).
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import weakref
+import numpy as np
+from scipy import sparse
+
+from util_OutOfCore import is_file_backed, prefetch_chunks
+
+## memory budget in bytes for the temporaries of one chunk, see set_mem_budget
+mem_budget = 2**30
+
+## planners of the matrices seen by iter_row_chunks, keyed by id
+_planners = {}
+
+def set_mem_budget(budget):
+	"""! Set the memory budget of the chunks planned from now on
+
+	Parameters
+	----------
+	@param budget : memory budget in bytes
+	"""
+	global mem_budget
+	if budget <= 0:
+		raise ValueError("The memory budget must be positive, got {}".format(budget))
+	mem_budget = int(budget)
+	_planners.clear()
+
+class ChunkPlanner:
+	"""! Chunk boundaries of the passes over the rows of a data matrix
+
+	A chunk of rows with k non-zeros costs about 2k (value + index) bytes, for the gathered rows and their transpose.
+
+	Parameters
+	----------
+	@param X : CSR matrix or dense array
+	@param budget : memory budget in bytes of one chunk, the module level mem_budget if None
+	"""
+
+	def __init__(self, X, budget = None):
+		if budget is None:
+			budget = mem_budget
+
+		if sparse.isspmatrix_csr(X):
+			self.row_nnz = np.diff(X.indptr)
+			bytes_per_nnz = X.data.itemsize + X.indices.itemsize
+		else:
+			self.row_nnz = np.full(X.shape[0], X.shape[1] if X.ndim > 1 else 1, dtype=np.int64)
+			bytes_per_nnz = X.dtype.itemsize
+
+		self.budget = budget
+
+		## whether the full passes prefetch the next chunk
+		self.file_backed = is_file_backed(X)
+
+		## number of non-zeros allowed in one chunk
+		self.max_nnz = max(int(budget // (2*bytes_per_nnz)), 1)
+
+		## chunk boundaries of a full pass
+		self.full_chunks = self._split(np.cumsum(self.row_nnz))
+
+	def _split(self, cum_nnz):
+		"""! Greedy chunk boundaries of consecutive rows given their cumulative number of non-zeros
+		"""
+		chunks = []
+		start = 0
+		num_rows = len(cum_nnz)
+
+		while start < num_rows:
+			offset = cum_nnz[start - 1] if start > 0 else 0
+			end = int(np.searchsorted(cum_nnz, offset + self.max_nnz, side='right'))
+			end = max(end, start + 1)
+			chunks.append((start, end))
+			start = end
+
+		return chunks
+
+	def chunks(self, b, index = None):
+		"""! Chunk boundaries of a pass over b rows
+
+		Parameters
+		----------
+		@param b : number of rows of the pass
+		@param index : None for the first b rows, else the mini-batch indices (index array or slice of rows)
+
+		Returns
+		-------
+		@retval : list of (start, end) positions, to be used with take_rows or to slice the data directly
+		"""
+		if index is None:
+			if b == len(self.row_nnz):
+				return self.full_chunks
+			return self._split(np.cumsum(self.row_nnz[:b]))
+
+		if isinstance(index, slice):
+			return self._split(np.cumsum(self.row_nnz[index.start:index.start + b]))
+
+		return self._split(np.cumsum(self.row_nnz[index[:b]]))
+
+def chunk_planner(X):
+	"""! Planner of a data matrix, built on first use and kept while the matrix is alive
+
+	Parameters
+	----------
+	@param X : CSR matrix or dense array
+
+	Returns
+	-------
+	@retval : the ChunkPlanner of X
+	"""
+	key = id(X)
+	entry = _planners.get(key)
+	if entry is not None and entry[0]() is X:
+		return entry[1]
+
+	planner = ChunkPlanner(X)
+	_planners[key] = (weakref.ref(X, lambda ref: _planners.pop(key, None)), planner)
+	return planner
+
+def iter_row_chunks(X, b, index = None):
+	"""! Chunk boundaries of a pass of an oracle over b rows of X
+
+	Parameters
+	----------
+	@param X : input data
+	@param b : number of rows of the pass, n for a full pass
+	@param index : None for a full pass, else the mini-batch indices (index array or slice of rows)
+
+	Returns
+	-------
+	@retval : list of (start, end) positions, covering all b rows, or a generator of them reading the next chunk ahead
+		for a full pass over a matrix mapped from a file
+	"""
+	planner = chunk_planner(X)
+	chunks = planner.chunks(b, index)
+	if index is None and planner.file_backed:
+		return prefetch_chunks(X, chunks)
+	return chunks
@@ -0,0 +1,124 @@
+"""!@package util_Csv
+
+Chunked, vectorized reader of numeric CSV files.
+
+load_csv reads a file in blocks of chunk_bytes, cut at the last line break of the block, and parses every block in one
+call of the C parser of np.loadtxt, so no Python object is created per cell or per line. Empty lines are skipped. The
+rows are written into an array allocated once from a count of the line breaks, or, with to_csr, appended block by
+block to a CSR matrix, so the peak memory is the output plus one block.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import io
+import numpy as np
+from scipy import sparse
+
+## default size in bytes of the blocks read at once
+default_chunk_bytes = 2**26
+
+def _blocks(filename, chunk_bytes):
+	"""! Blocks of whole lines of a file, without carriage returns
+	"""
+	with open(filename, 'rb') as f:
+		rest = b''
+		while True:
+			buf = f.read(chunk_bytes)
+			if not buf:
+				break
+			buf = rest + buf
+			cut = buf.rfind(b'\n') + 1
+			if cut == 0:
+				# no line break yet, the line goes on in the next block
+				rest = buf
+				continue
+			rest = buf[cut:]
+			yield buf[:cut].replace(b'\r', b'')
+		if rest:
+			yield rest.replace(b'\r', b'') + b'\n'
+
+def _count_lines(filename, chunk_bytes):
+	"""! Number of lines of a file, an upper bound of its number of rows
+	"""
+	count, last = 0, b'\n'
+	with open(filename, 'rb') as f:
+		while True:
+			buf = f.read(chunk_bytes)
+			if not buf:
+				break
+			count += buf.count(b'\n')
+			last = buf[-1:]
+	return count + (last != b'\n')
+
+def _parse_block(block, num_cols, filename, first_row):
+	"""! Rows of a block of lines, as a float64 array of num_cols columns
+	"""
+	try:
+		rows = np.loadtxt(io.BytesIO(block), dtype=np.float64, delimiter=',', comments=None, ndmin=2)
+	except ValueError as error:
+		raise ValueError("{}, in the block starting at row {}: {}".format(filename, first_row + 1, error))
+
+	if len(rows) and rows.shape[1] != num_cols:
+		raise ValueError("{}: rows from {} have {} columns instead of {}".format(filename, first_row + 1, rows.shape[1], num_cols))
+
+	return rows
+
+def load_csv(filename, dtype = np.float64, to_csr = False, chunk_bytes = default_chunk_bytes):
+	"""! Load a CSV file of numbers
+
+	Parameters
+	----------
+	@param filename : name of the file
+	@param dtype : floating point type of the output, the values are parsed in float64 and then converted
+	@param to_csr : flag whether to return a CSR matrix of the non-zeros instead of a dense array
+	@param chunk_bytes : size in bytes of the blocks read at once
+
+	Returns
+	-------
+	@retval : n x d array (or CSR matrix) of the n non-empty lines of d numbers
+	"""
+	out, parts = None, []
+	num_rows, num_cols = 0, None
+	for block in _blocks(filename, chunk_bytes):
+		# a block of empty lines only
+		if block.count(b'\n') == len(block):
+			continue
+
+		if num_cols is None:
+			first_line = block.lstrip(b'\n').split(b'\n', 1)[0]
+			num_cols = first_line.count(b',') + 1
+			if not to_csr:
+				out = np.empty((_count_lines(filename, chunk_bytes), num_cols), dtype=dtype)
+
+		rows = _parse_block(block, num_cols, filename, num_rows)
+		if to_csr:
+			parts.append(sparse.csr_matrix(rows.astype(dtype, copy=False)))
+		else:
+			out[num_rows:num_rows + len(rows)] = rows
+		num_rows += len(rows)
+
+	if num_cols is None:
+		return sparse.csr_matrix((0, 0), dtype=dtype) if to_csr else np.empty((0, 0), dtype=dtype)
+
+	if to_csr:
+		return sparse.vstack(parts, format='csr')
+
+	# the empty lines were counted
+	if num_rows < len(out):
+		out = out[:num_rows].copy()
+	return out
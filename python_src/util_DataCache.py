@@ -0,0 +1,157 @@
+"""!@package util_DataCache
+
+Cache of the imported datasets as raw .npy arrays, opened as memory maps.
+
+A cached dataset is a directory holding one .npy file per array and a manifest.json describing them: a CSR matrix is
+stored as its indptr, indices and data arrays, a dense matrix and the labels as one array each. load_cache maps the
+arrays with np.load(mmap_mode=...) instead of reading them, so a run starts without parsing or unpickling the dataset,
+only the pages it touches are read from disk, and concurrent runs on the same dataset share the page cache.
+
+The manifest also records the size and modification time of the source files of the dataset, load_cache ignores a
+cache whose sources changed. write_cache builds a cache in a temporary directory and renames it into place, so that a
+run never sees a half-written cache, even when several runs create it at the same time.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import os
+import json
+import glob
+import shutil
+import numpy as np
+from scipy import sparse
+
+## version of the cache layout, caches of another version are rebuilt
+cache_version = 1
+
+## parts of a dataset, in the order import_data returns them
+_parts = ('X_train', 'Y_train', 'X_test', 'Y_test')
+
+def source_files(pattern):
+	"""! Signature of the source files of a dataset, to detect that a cache is stale
+
+	Parameters
+	----------
+	@param pattern : glob pattern of the source files, e.g. data_path + 'w8a*'
+
+	Returns
+	-------
+	@retval : sorted list of [file name, size, modification time in ns]
+	"""
+	files = []
+	for path in sorted(glob.glob(pattern)):
+		if os.path.isfile(path):
+			stat = os.stat(path)
+			files.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+	return files
+
+def _save_part(directory, name, A):
+	"""! Save one part of a dataset, returning its manifest entry
+	"""
+	if sparse.issparse(A):
+		A = A.tocsr()
+		# scipy downcasts 64-bit indices that fit in 32 bits, which would copy the maps, so store them downcast
+		index_dtype = np.int32 if max(A.nnz, max(A.shape)) < 2**31 else np.int64
+		for key in ('indptr', 'indices'):
+			np.save(os.path.join(directory, name + '.' + key + '.npy'), getattr(A, key).astype(index_dtype, copy=False))
+		np.save(os.path.join(directory, name + '.data.npy'), A.data)
+		return {'format': 'csr', 'shape': list(A.shape), 'dtype': A.dtype.str}
+
+	if isinstance(A, np.ndarray) or len(A) > 0:
+		A = np.asarray(A)
+		np.save(os.path.join(directory, name + '.npy'), A)
+		return {'format': 'dense', 'shape': list(A.shape), 'dtype': A.dtype.str}
+
+	# missing test data or labels are empty lists
+	return {'format': 'empty'}
+
+def _load_part(directory, name, entry, mmap_mode):
+	"""! Map one part of a dataset
+	"""
+	if entry['format'] == 'csr':
+		indptr, indices, data = [np.load(os.path.join(directory, name + '.' + key + '.npy'), mmap_mode=mmap_mode) \
+									for key in ('indptr', 'indices', 'data')]
+		# the matrix is built on the maps without copying them
+		return sparse.csr_matrix((data, indices, indptr), shape=tuple(entry['shape']), copy=False)
+
+	if entry['format'] == 'dense':
+		return np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+
+	return []
+
+def write_cache(directory, parts, sources = None):
+	"""! Save a dataset as a cache directory
+
+	Parameters
+	----------
+	@param directory : cache directory, replaced if it exists
+	@param parts : (X_train, Y_train, X_test, Y_test), CSR or dense matrices and label arrays, empty lists if missing
+	@param sources : signature of the source files (see source_files), stored in the manifest
+	"""
+	parent = os.path.dirname(os.path.abspath(directory))
+	os.makedirs(parent, exist_ok=True)
+
+	# write next to the final directory, then rename it into place
+	tmp_directory = '{}.tmp{}'.format(directory, os.getpid())
+	shutil.rmtree(tmp_directory, ignore_errors=True)
+	os.makedirs(tmp_directory)
+	try:
+		manifest = {'version': cache_version, 'sources': sources or [], 'parts': {}}
+		for name, A in zip(_parts, parts):
+			manifest['parts'][name] = _save_part(tmp_directory, name, A)
+		with open(os.path.join(tmp_directory, 'manifest.json'), 'w') as f:
+			json.dump(manifest, f, indent=1)
+
+		shutil.rmtree(directory, ignore_errors=True)
+		os.rename(tmp_directory, directory)
+	except OSError:
+		# another run renamed its cache into place first, keep that one
+		if not os.path.isdir(directory):
+			raise
+	finally:
+		shutil.rmtree(tmp_directory, ignore_errors=True)
+
+def load_cache(directory, sources = None, mmap_mode = 'r'):
+	"""! Map a cached dataset
+
+	Parameters
+	----------
+	@param directory : cache directory written by write_cache
+	@param sources : signature of the current source files, None to skip the staleness check
+	@param mmap_mode : mode of np.load, 'r' for read-only maps, 'c' for copy-on-write maps that can be modified in place
+		without changing the files
+
+	Returns
+	-------
+	@retval : (X_train, Y_train, X_test, Y_test) backed by the .npy files, None if there is no valid cache
+	"""
+	try:
+		with open(os.path.join(directory, 'manifest.json')) as f:
+			manifest = json.load(f)
+	except (OSError, ValueError):
+		return None
+
+	if manifest.get('version') != cache_version:
+		return None
+	if sources is not None and manifest['sources'] != sources:
+		return None
+
+	try:
+		return tuple(_load_part(directory, name, manifest['parts'][name], mmap_mode) for name in _parts)
+	except (OSError, ValueError, KeyError):
+		return None
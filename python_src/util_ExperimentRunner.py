@@ -0,0 +1,231 @@
+"""!@package util_ExperimentRunner
+
+Run the methods compared by an example driver concurrently on one shared copy of the dataset.
+
+The drivers load and normalize the data once and then call every selected method on it. ExperimentRunner starts a pool
+of worker processes that read the train and test data and the bias without copying them: forked workers inherit the
+arrays of the driver, which stay shared copy-on-write since the workers only read them, and with the other start
+methods the data are published in shared memory (see util_SharedData) and mapped by the workers. submit takes the usual call of a method: arguments that are the shared data objects are
+replaced by references and resolved to the mapped arrays in the worker, all other arguments are pickled. results waits
+for all runs and returns, in submission order, the outputs of the methods and their training times. The printed
+output of every run is captured and replayed in the parent in the same order.
+
+With a single worker the runner makes no copy and runs every method directly at submission, exactly like the
+sequential drivers. In parallel, every run gets its own copy of the arguments, in particular of the mini-batch sampler,
+so all methods start from the same sampler state.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import io
+import os
+import time
+import contextlib
+import multiprocessing as mp
+import numpy as np
+from scipy import sparse
+
+from util_SharedData import share_arrays, attach_arrays, csr_from_arrays, release_blocks
+from util_Profiler import phase, active_profiler
+
+## data objects mapped by a worker process, set by _init_runner
+_worker_data = {}
+
+class _SharedRef:
+	"""! Placeholder for a shared data object in the arguments sent to a worker
+	"""
+
+	def __init__(self, key):
+		self.key = key
+
+def _init_runner(spec, shapes):
+	"""! Pool initializer, maps the shared data and rebuilds the CSR matrices around it
+	"""
+	blocks, arrays = attach_arrays(spec, read_only=True)
+
+	for key, shape in shapes.items():
+		if shape is None:
+			_worker_data[key] = arrays[key]
+		else:
+			_worker_data[key] = csr_from_arrays(arrays[key + '_data'], arrays[key + '_indices'], arrays[key + '_indptr'], shape)
+	_worker_data['blocks'] = blocks
+
+def _read_only(array):
+	"""! Read-only view of an array
+	"""
+	view = array.view()
+	view.flags.writeable = False
+	return view
+
+def _inherit_runner(shared):
+	"""! Pool initializer of forked workers, reads the data inherited from the driver through read-only views
+	"""
+	for key, value in shared.items():
+		if sparse.isspmatrix_csr(value):
+			_worker_data[key] = csr_from_arrays(_read_only(value.data), _read_only(value.indices), _read_only(value.indptr), value.shape)
+		else:
+			_worker_data[key] = _read_only(np.asarray(value))
+
+def _resolve(arg):
+	"""! The mapped data object for a placeholder, arg itself otherwise
+	"""
+	if isinstance(arg, _SharedRef):
+		return _worker_data[arg.key]
+	return arg
+
+def _run_captured(name, method, args, kwargs):
+	"""! Run a method in a worker with the shared data, capturing its printed output and, if profiling, its phases
+	"""
+	args = [_resolve(arg) for arg in args]
+	kwargs = {key: _resolve(arg) for key, arg in kwargs.items()}
+
+	# the profiler was forked from the driver, only send back the phases of this run
+	profiler = active_profiler()
+	if profiler is not None:
+		profiler.reset()
+
+	output = io.StringIO()
+	start = time.time()
+	with contextlib.redirect_stdout(output), phase(name):
+		result = method(*args, **kwargs)
+	elapsed = time.time() - start
+
+	return result, elapsed, output.getvalue(), profiler.export() if profiler is not None else None
+
+class ExperimentRunner:
+	"""! Pool of worker processes running the methods of a driver on shared data
+
+	Parameters
+	----------
+	@param X_train : train data, CSR matrix
+	@param Y_train : train label
+	@param X_test : test data, CSR matrix, or an empty list without test data
+	@param Y_test : test label, or an empty list without test data
+	@param bias : bias vector
+	@param num_workers : number of worker processes, os.cpu_count() if None, 1 runs every method at submission
+	"""
+
+	def __init__(self, X_train, Y_train, X_test, Y_test, bias, num_workers = None):
+		if num_workers is None:
+			num_workers = os.cpu_count()
+
+		self.num_workers = num_workers
+		self.runs = []
+		self.blocks = {}
+
+		## shared data objects, identified by identity in the submitted arguments
+		self.shared = {'X_train' : X_train, 'Y_train' : Y_train, 'X_test' : X_test, 'Y_test' : Y_test, 'bias' : bias}
+
+		if num_workers <= 1:
+			self.pool = None
+			return
+
+		# forked workers inherit the data, a copy in shared memory would double the memory of the driver. fork also does
+		# not re-import the driver scripts, which have no __main__ guard
+		if 'fork' in mp.get_all_start_methods():
+			self.pool = mp.get_context('fork').Pool(num_workers, initializer=_inherit_runner, initargs=(self.shared,))
+			return
+
+		# CSR matrices are shared as their three arrays, dense arrays as they are
+		arrays = {}
+		shapes = {}
+		for key, value in self.shared.items():
+			if sparse.isspmatrix_csr(value):
+				arrays[key + '_data'] = value.data
+				arrays[key + '_indices'] = value.indices
+				arrays[key + '_indptr'] = value.indptr
+				shapes[key] = value.shape
+			else:
+				arrays[key] = np.asarray(value)
+				shapes[key] = None
+		self.blocks, spec = share_arrays(arrays)
+		self.pool = mp.get_context().Pool(num_workers, initializer=_init_runner, initargs=(spec, shapes))
+
+	def _reference(self, arg):
+		"""! Placeholder for a shared data object, arg itself otherwise
+		"""
+		for key, value in self.shared.items():
+			if arg is value:
+				return _SharedRef(key)
+		return arg
+
+	def submit(self, name, method, *args, **kwargs):
+		"""! Run a method on the shared data, in a worker process or directly with a single worker
+
+		Parameters
+		----------
+		@param name : name of the run, used in the printed training time and as the top phase of its profile
+		@param method : module level function, e.g. method_ProxSARAH.prox_sarah
+		@param args : positional arguments of the method
+		@param kwargs : keyword arguments of the method
+		"""
+		print('----------------------------------------------------')
+
+		if self.pool is None:
+			start = time.time()
+			with phase(name):
+				result = method(*args, **kwargs)
+			elapsed = time.time() - start
+			print("\nTraining time ({}): {:^8.2f} seconds\n".format(name, elapsed))
+			self.runs.append((name, (result, elapsed)))
+			return
+
+		print('Submit', name)
+		args = [self._reference(arg) for arg in args]
+		kwargs = {key: self._reference(arg) for key, arg in kwargs.items()}
+		self.runs.append((name, self.pool.apply_async(_run_captured, (name, method, args, kwargs))))
+
+	def results(self):
+		"""! Wait for all submitted runs
+
+		Returns
+		-------
+		@retval : dictionary {name: (output of the method, training time in seconds)}, in submission order
+		"""
+		results = {}
+		for name, run in self.runs:
+			if self.pool is None:
+				results[name] = run
+				continue
+
+			result, elapsed, output, profile = run.get()
+			if profile is not None and active_profiler() is not None:
+				active_profiler().merge(profile)
+			print('----------------------------------------------------')
+			print(output, end='')
+			print("\nTraining time ({}): {:^8.2f} seconds\n".format(name, elapsed))
+			results[name] = (result, elapsed)
+
+		self.runs = []
+		return results
+
+	def close(self):
+		"""! Stop the workers and release the shared memory
+		"""
+		if self.pool is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
+		release_blocks(self.blocks)
+		self.blocks = {}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
@@ -0,0 +1,222 @@
+"""!@package util_History
+
+Columnar history of a run, recorded into growable numpy columns and persisted to a compressed .npz file.
+
+Every method records one row per logging point: number of gradient evaluations, epochs, train loss, squared norm of
+the gradient mapping, its running minimum and, if computed, the train and test accuracy. HistoryRecorder keeps the
+columns in preallocated arrays that double their capacity when full, and returns them at the end of the run in the
+order of the history outputs of the methods.
+
+With a file path, the recorder carries the metadata of the run (algorithm, step sizes, batch sizes, dataset, seed, ...)
+and saves the columns and the metadata with numpy.savez_compressed when the run is closed. While the run is going,
+every row is also appended to a stream file next to it (path + '.part'), so that load_history can read the history
+of an unfinished or interrupted run without re-running it.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import os
+import re
+import json
+import numpy as np
+
+## names of the recorded columns, in the order of the history outputs of the methods
+history_columns = ('NumGrad', 'NumEpoch', 'TrainLoss', 'GradNorm', 'MinGradNorm', 'TrainAcc', 'TestAcc')
+
+def _to_json(value):
+	"""! JSON encoding of the numpy values found in the metadata
+	"""
+	if isinstance(value, np.ndarray):
+		return value.tolist()
+	if isinstance(value, np.generic):
+		return value.item()
+	return str(value)
+
+class HistoryRecorder:
+	"""! History of a run, one growable column per recorded quantity
+
+	Parameters
+	----------
+	@param path : .npz file the history is saved to when the run is closed, None to keep it in memory only
+	@param metadata : dictionary describing the run, saved with the columns
+	@param capacity : initial number of rows of the columns
+	"""
+
+	def __init__(self, path = None, metadata = None, capacity = 64):
+		self.path = path
+		self.metadata = dict(metadata or {})
+		self.data = {key: np.empty(capacity) for key in history_columns}
+		self.sizes = {key: 0 for key in history_columns}
+		self.stream = None
+
+	def _append(self, key, value):
+		"""! Append a value to a column, doubling its capacity when full
+		"""
+		column = self.data[key]
+		size = self.sizes[key]
+		if size == len(column):
+			column = np.resize(column, max(2 * size, 1))
+			self.data[key] = column
+		column[size] = value
+		self.sizes[key] = size + 1
+
+	def record(self, num_grad, num_epoch, train_loss, grad_norm, min_grad_norm, train_acc = None, test_acc = None):
+		"""! Record the stats of one logging point
+
+		Parameters
+		----------
+		@param num_grad : number of gradient evaluations
+		@param num_epoch : number of epochs
+		@param train_loss : train loss
+		@param grad_norm : squared norm of the gradient mapping
+		@param min_grad_norm : minimum squared norm of the gradient mapping so far
+		@param train_acc : train accuracy, None if not computed
+		@param test_acc : test accuracy, None if not computed
+		"""
+		row = (num_grad, num_epoch, train_loss, grad_norm, min_grad_norm, train_acc, test_acc)
+		for key, value in zip(history_columns, row):
+			if value is not None:
+				self._append(key, value)
+
+		if self.path is not None:
+			if self.stream is None:
+				self._open_stream()
+			# missing accuracies are streamed as nan
+			self.stream.write(np.array([np.nan if value is None else value for value in row], dtype=np.float64).tobytes())
+			self.stream.flush()
+
+	def _open_stream(self):
+		"""! Start the stream file with a header line holding the metadata
+		"""
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		self.stream = open(self.path + '.part', 'wb')
+		self.stream.write((json.dumps(self.metadata, default=_to_json) + '\n').encode())
+
+	def columns(self):
+		"""! Recorded columns
+
+		Returns
+		-------
+		@retval : tuple of numpy arrays (NumGrad, NumEpoch, TrainLoss, GradNorm, MinGradNorm, TrainAcc, TestAcc),
+			the accuracies are empty if they were not computed
+		"""
+		return tuple(self.data[key][:self.sizes[key]] for key in history_columns)
+
+	def restore(self, columns):
+		"""! Replace the recorded rows, e.g. by those of a checkpoint (see util_Checkpoint)
+
+		Parameters
+		----------
+		@param columns : columns in the format returned by columns()
+		"""
+		for key, column in zip(history_columns, columns):
+			self.data[key] = np.array(column, dtype=np.float64)
+			self.sizes[key] = len(column)
+
+		if self.path is None:
+			return
+
+		# restart the stream with the restored rows, missing accuracies as nan
+		if self.stream is not None:
+			self.stream.close()
+		self._open_stream()
+		num_rows = self.sizes['NumGrad']
+		rows = np.full((num_rows, len(history_columns)), np.nan)
+		for j, key in enumerate(history_columns):
+			rows[:self.sizes[key], j] = self.data[key][:self.sizes[key]]
+		self.stream.write(rows.tobytes())
+		self.stream.flush()
+
+	def close(self):
+		"""! End the run, saving the columns and the metadata if the recorder has a path
+		"""
+		if self.path is None:
+			return
+
+		if self.stream is None:
+			self._open_stream()
+		self.stream.close()
+		self.stream = None
+
+		# write to a temporary file first so that a complete .npz is never replaced by a partial one
+		columns = dict(zip(history_columns, self.columns()))
+		with open(self.path + '.tmp', 'wb') as f:
+			np.savez_compressed(f, metadata=json.dumps(self.metadata, default=_to_json), **columns)
+		os.replace(self.path + '.tmp', self.path)
+		os.remove(self.path + '.part')
+
+	def __getstate__(self):
+		# recorders are sent to the worker processes of util_ExperimentRunner before they are used
+		state = dict(self.__dict__)
+		state['stream'] = None
+		return state
+
+def history_recorder(hist_dir, name, **metadata):
+	"""! Recorder of a run of a driver
+
+	Parameters
+	----------
+	@param hist_dir : directory of the history files, '' or None to keep the history in memory only
+	@param name : name of the run, used for the file name and saved as the algorithm
+	@param metadata : further metadata of the run, e.g. eta, gamma, batch sizes, dataset, seed
+
+	Returns
+	-------
+	@retval : HistoryRecorder saving to hist_dir/<name>.npz
+	"""
+	metadata = dict(algorithm=name, **metadata)
+	if not hist_dir:
+		return HistoryRecorder(None, metadata)
+
+	file_name = re.sub(r'[^A-Za-z0-9.-]+', '_', name).strip('_') + '.npz'
+	return HistoryRecorder(os.path.join(hist_dir, file_name), metadata)
+
+def load_history(path):
+	"""! Read a saved history, or the stream of an unfinished run if the run was not closed
+
+	Parameters
+	----------
+	@param path : .npz file given to the recorder
+
+	Returns
+	-------
+	@retval columns : dictionary of numpy arrays, keys as in history_columns
+	@retval metadata : dictionary describing the run, with 'complete' False for an unfinished run
+	"""
+	if os.path.exists(path):
+		with np.load(path) as data:
+			columns = {key: data[key] for key in history_columns}
+			metadata = json.loads(str(data['metadata']))
+		metadata['complete'] = True
+		return columns, metadata
+
+	with open(path + '.part', 'rb') as f:
+		metadata = json.loads(f.readline().decode())
+		stream = f.read()
+
+	# drop a row that was only partially written
+	row_bytes = 8 * len(history_columns)
+	rows = np.frombuffer(stream[:len(stream) - len(stream) % row_bytes], dtype=np.float64).reshape(-1, len(history_columns))
+
+	columns = {key: rows[:, j].copy() for j, key in enumerate(history_columns)}
+	for key in ('TrainAcc', 'TestAcc'):
+		columns[key] = columns[key][~np.isnan(columns[key])]
+	metadata['complete'] = False
+	return columns, metadata
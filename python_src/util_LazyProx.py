@@ -0,0 +1,266 @@
+"""!@package util_LazyProx
+
+Just-in-time (lazy) proximal updates of the \f$\ell_1\f$-norm for single-sample steps on sparse data.
+
+With b = 1 the sample dependent part of a step only touches the non-zero coordinates of the sampled row. Every other
+coordinate j follows the same scalar map at each step
+
+\f$ w_j \leftarrow (1-\gamma)w_j + \gamma\,\mathrm{sign}(w_j - a_j)\max(|w_j - a_j| - t, 0) \f$
+
+where the drift \f$a_j\f$ is \f$\eta\f$ times the sample independent part of the estimator (0 for ProxSGD, the anchor
+gradient for ProxSVRG, the running estimator for ProxSARAH) and \f$t = \lambda\eta\f$. LazyProxL1 records the last step
+at which each coordinate was brought up to date and applies the skipped steps in closed form when the coordinate is read
+again, so that a step costs O(nnz) instead of O(d).
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import numpy as np
+from scipy import sparse
+
+from util_Prox import prox_l1_norm
+
+def sparse_row(X, i):
+	"""! Non-zero pattern of row i of a CSR matrix
+
+	Parameters
+	----------
+	@param X : CSR matrix
+	@param i : row index
+
+	Returns
+	-------
+	@retval J : column indices of the non-zero entries
+	@retval x_J : values of the non-zero entries as a (1, nnz) array, a dense stand-in for the row restricted to J
+	"""
+	start = X.indptr[i]
+	end = X.indptr[i + 1]
+	return X.indices[start:end], X.data[start:end].reshape(1, -1)
+
+def prox_l1_step(w, a, t, gamma = 1.0):
+	"""! One step of the averaged soft-thresholding map
+
+	\f$ (1-\gamma)w + \gamma\,\mathrm{sign}(w - a)\max(|w - a| - t, 0) \f$
+
+	Parameters
+	----------
+	@param w : current values
+	@param a : drift, \f$\eta\f$ times the estimator
+	@param t : threshold \f$\lambda\eta\f$
+	@param gamma : averaging weight, 1 for a plain proximal gradient step
+
+	Returns
+	-------
+	@retval : the updated values
+	"""
+	u = w - a
+	w_hat = np.sign(u) * np.maximum(np.abs(u) - t, 0.0)
+	if gamma == 1.0:
+		return w_hat
+	return (1.0 - gamma)*w + gamma*w_hat
+
+def prox_l1_repeat(w, a, t, gamma, k):
+	"""! Apply prox_l1_step k times in closed form
+
+	The map is odd in (w, a), so the drift is made non-negative by flipping signs. Then the real line splits into
+	\f$R_+ = (a+t, \infty)\f$ where w moves down by \f$\gamma(a+t)\f$, \f$R_0 = [a-t, a+t]\f$ where w decays to
+	\f$(1-\gamma)w\f$, and \f$R_- = (-\infty, a-t)\f$ where w moves by \f$\gamma(t-a)\f$. If \f$a \le t\f$, \f$R_0\f$
+	contains 0, is invariant, and is reached from both sides. Otherwise the iterates pass from \f$R_+\f$ through
+	\f$R_0\f$ into \f$R_-\f$ and drift down by \f$\gamma(a-t)\f$ per step.
+
+	Parameters
+	----------
+	@param w : values to update
+	@param a : drift of each value (scalar or array like w)
+	@param t : threshold \f$\lambda\eta\f$
+	@param gamma : averaging weight in (0, 1]
+	@param k : number of steps of each value (integer array like w)
+
+	Returns
+	-------
+	@retval : the values after k steps
+	"""
+	sign = np.where(a < 0, -1.0, 1.0)
+	w = sign * w
+	a = sign * a * np.ones_like(w)
+	k = np.asarray(k, dtype=np.float64) * np.ones_like(w)
+
+	upper = a + t
+	lower = a - t
+
+	# R+ : constant decrease by gamma*(a + t) until w <= a + t
+	step = gamma * upper
+	active = (w > upper) & (k > 0)
+	if np.any(active):
+		need = np.full_like(w, np.inf)
+		moving = active & (step > 0)
+		need[moving] = np.ceil((w[moving] - upper[moving]) / step[moving])
+		used = np.where(active, np.minimum(need, k), 0.0)
+		w = w - used*step
+		k = k - used
+
+	# R- with a <= t : constant increase by gamma*(t - a) until w >= a - t
+	step = gamma * (t - a)
+	active = (w < lower) & (k > 0) & (a <= t)
+	if np.any(active):
+		need = np.full_like(w, np.inf)
+		moving = active & (step > 0)
+		need[moving] = np.ceil((lower[moving] - w[moving]) / step[moving])
+		used = np.where(active, np.minimum(need, k), 0.0)
+		w = w + used*step
+		k = k - used
+
+	# R0 : geometric decay, for a > t only until w drops below a - t
+	active = (w >= lower) & (k > 0)
+	if np.any(active):
+		need = np.full_like(w, np.inf)
+		leaving = active & (a > t)
+		if gamma == 1.0:
+			need[leaving] = 1.0
+		else:
+			need[leaving] = np.floor(np.log(lower[leaving] / w[leaving]) / np.log(1.0 - gamma)) + 1.0
+		used = np.where(active, np.minimum(need, k), 0.0)
+		w = np.where(active, w * (1.0 - gamma)**used, w)
+		k = k - used
+
+	# R- with a > t : constant decrease by gamma*(a - t) for the remaining steps
+	active = (k > 0) & (a > t)
+	if np.any(active):
+		w = np.where(active, w - k*gamma*(a - t), w)
+
+	return sign * w
+
+class LazyProxL1:
+	"""! Iterate of a proximal method with \f$\ell_1\f$ regularizer whose coordinates are updated on demand
+
+	Coordinate j of w is stored as of step last[j]; the steps skipped since then follow prox_l1_step with the drift
+	drift[j] and are applied by refresh/flush. A method that changes the drift of a coordinate must refresh it first.
+	For every coordinate that is up to date, w_before keeps its value one step earlier, as needed by ProxSARAH.
+
+	Parameters
+	----------
+	@param w : iterate at step 0
+	@param thresh : threshold \f$\lambda\eta\f$
+	@param gamma : averaging weight, 1 for a plain proximal gradient step
+	@param drift : scalar drift shared by all coordinates or array of per-coordinate drifts
+	"""
+
+	def __init__(self, w, thresh, gamma = 1.0, drift = 0.0):
+		# the repeated steps are carried out in float64, flush returns the precision of w
+		self.dtype = np.asarray(w).dtype
+		self.w = np.array(w, dtype=np.float64)
+		self.thresh = thresh
+		self.gamma = gamma
+		self.drift = drift
+
+		# step at which every coordinate was last brought up to date, and its value one step before
+		self.last = np.zeros(len(self.w), dtype=np.int64)
+		self.w_before = self.w.copy()
+		self.num_step = 0
+
+	def _catch_up(self, J):
+		"""! Apply the skipped steps to the coordinates J, keeping the second to last value in w_before
+		"""
+		drift = self.drift if np.isscalar(self.drift) else self.drift[J]
+		skipped = self.num_step - self.last[J]
+		behind = skipped > 0
+
+		w_prev = prox_l1_repeat(self.w[J], drift, self.thresh, self.gamma, np.maximum(skipped - 1, 0))
+		self.w_before[J] = np.where(behind, w_prev, self.w_before[J])
+		self.w[J] = np.where(behind, prox_l1_step(w_prev, drift, self.thresh, self.gamma), self.w[J])
+		self.last[J] = self.num_step
+
+	def refresh(self, J):
+		"""! Bring the coordinates J up to the current step
+
+		Parameters
+		----------
+		@param J : coordinate indices
+
+		Returns
+		-------
+		@retval : the current values of w[J]
+		"""
+		self._catch_up(J)
+		return self.w[J]
+
+	def previous(self, J):
+		"""! Values of refreshed coordinates one step before the current one
+
+		Parameters
+		----------
+		@param J : coordinate indices, refreshed beforehand
+
+		Returns
+		-------
+		@retval : the values of w[J] at step num_step - 1
+		"""
+		return self.w_before[J]
+
+	def advance(self, J, w_J):
+		"""! Finish the current step with new values for the refreshed coordinates J, all others follow the lazy map
+
+		Parameters
+		----------
+		@param J : coordinate indices brought up to date by refresh
+		@param w_J : new values of w[J]
+		"""
+		self.w_before[J] = self.w[J]
+		self.w[J] = w_J
+		self.num_step += 1
+		self.last[J] = self.num_step
+
+	def step(self, w_J, a_J):
+		"""! One step of the lazy map for the coordinates J with their own drift
+
+		Parameters
+		----------
+		@param w_J : current values of w[J]
+		@param a_J : drift of the coordinates J in this step
+
+		Returns
+		-------
+		@retval : the values after the step
+		"""
+		return prox_l1_step(w_J, a_J, self.thresh, self.gamma)
+
+	def flush(self):
+		"""! Bring all coordinates up to the current step
+
+		Returns
+		-------
+		@retval : a copy of the dense iterate, in the precision of the initial iterate
+		"""
+		self._catch_up(slice(None))
+		return self.w.astype(self.dtype)
+
+def check_lazy_update(b, X, GradCoefEval, ProxEval):
+	"""! Make sure the lazy l1 updates apply
+
+	Parameters
+	----------
+	@param b : mini-batch size, must be 1
+	@param X : input data, must be a CSR matrix
+	@param GradCoefEval : function pointer for the scalar gradient coefficients, must be given
+	@param ProxEval : function pointer of the proximal operator, must be the l1 soft-thresholding prox_l1_norm
+	"""
+	if b != 1 or not sparse.isspmatrix_csr(X) or GradCoefEval is None:
+		raise ValueError("lazy_update needs single-sample steps (b = 1) on CSR data and a GradCoefEval oracle")
+	# the lazy updates replay l1 soft-thresholding steps, other penalties would silently solve another problem
+	if ProxEval is not prox_l1_norm:
+		raise ValueError("lazy_update only supports the l1 proximal operator prox_l1_norm")
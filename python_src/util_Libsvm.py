@@ -0,0 +1,229 @@
+"""!@package util_Libsvm
+
+Parallel, streaming reader of LIBSVM files, plain or compressed with gzip (.gz), bzip2 (.bz2) or xz (.xz).
+
+load_libsvm cuts the file into shards of about chunk_bytes bytes of whole lines: byte ranges of a plain file, which the
+worker processes read themselves, or blocks of the decompressed stream of a compressed file, which the main process
+decompresses and sends to the workers. A worker parses a shard into the labels, row lengths, column indices and values
+of its rows with a few vectorized passes over the bytes (no Python object per line or per value). The shards are copied
+into the final CSR arrays one by one, each shard being dropped after its copy, and the final arrays are allocated empty
+so that their pages are only committed by the copies: the peak memory is about the matrix plus the shards in flight.
+At most two shards per worker are in flight, so a compressed file is never held in memory as a whole.
+
+The result matches sklearn.datasets.load_svmlight_file: sorted indices, zero_based='auto' detection of one-based
+files, as many columns as the largest index. Comments after '#' and empty lines are skipped, query ids (qid:) are not
+supported. The indices are 32-bit when the number of non-zeros and of columns allows it.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import os
+import bz2
+import gzip
+import lzma
+import warnings
+import collections
+import multiprocessing as mp
+import numpy as np
+from scipy import sparse
+
+## extensions of the compressed files and their openers
+compressed_formats = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+## default size in bytes of the shards
+default_chunk_bytes = 2**26
+
+def _read_range(filename, start, end):
+	"""! Lines of a plain file starting in the byte range [start, end)
+	"""
+	with open(filename, 'rb') as f:
+		if start > 0:
+			# the line going over start belongs to the previous range
+			f.seek(start - 1)
+			if f.read(1) != b'\n':
+				f.readline()
+		begin = f.tell()
+		if begin >= end:
+			return b''
+		block = f.read(end - begin)
+		# the line going over end belongs to this range
+		if not block.endswith(b'\n'):
+			block += f.readline()
+		return block
+
+def _stream_blocks(filename, chunk_bytes):
+	"""! Blocks of whole lines of the decompressed stream of a compressed file
+	"""
+	with compressed_formats[os.path.splitext(filename)[1]](filename, 'rb') as f:
+		rest = b''
+		while True:
+			buf = f.read(chunk_bytes)
+			if not buf:
+				break
+			buf = rest + buf
+			cut = buf.rfind(b'\n') + 1
+			rest = buf[cut:]
+			if cut:
+				yield buf[:cut]
+		if rest:
+			yield rest
+
+def _clean_lines(block):
+	"""! Block without comments, surrounding whitespace and blank lines, for the shards that have them
+	"""
+	lines = (line.split(b'#', 1)[0].strip() for line in block.replace(b'\r', b'').split(b'\n'))
+	return b'\n'.join(line for line in lines if line)
+
+def parse_block(block):
+	"""! Parse LIBSVM lines
+
+	Parameters
+	----------
+	@param block : bytes of whole lines
+
+	Returns
+	-------
+	@retval labels : label of every line, float64
+	@retval row_nnz : number of (index, value) pairs of every line, int64
+	@retval indices : indices as written in the file, int64
+	@retval values : values, float64
+	"""
+	if b'#' in block or b'\n\n' in block or block.startswith(b'\n'):
+		block = _clean_lines(block)
+	# nothing left, including blocks of whitespace only that np.fromstring would read as a -1 label
+	if not block.strip():
+		return np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+	if not block.endswith(b'\n'):
+		block += b'\n'
+	if b'qid' in block:
+		raise ValueError("query ids (qid:) are not supported")
+
+	# one label and as many (index, value) pairs as colons per line
+	buf = np.frombuffer(block, dtype=np.uint8)
+	newlines = np.flatnonzero(buf == ord('\n'))
+	colons = np.flatnonzero(buf == ord(':'))
+	row_nnz = np.bincount(np.searchsorted(newlines, colons), minlength=len(newlines)).astype(np.int64)
+
+	# all numbers of the block separated by whitespace
+	with warnings.catch_warnings():
+		warnings.simplefilter('error')
+		try:
+			tokens = np.fromstring(block.replace(b':', b' ').replace(b'\n', b' '), dtype=np.float64, sep=' ')
+		except (DeprecationWarning, ValueError):
+			tokens = None
+
+	if tokens is None or len(tokens) != len(newlines) + 2 * len(colons):
+		# lines of whitespace only have no label
+		cleaned = _clean_lines(block)
+		if cleaned + b'\n' != block:
+			return parse_block(cleaned)
+		raise ValueError("invalid LIBSVM line, expected 'label index:value index:value ...'")
+
+	label_pos = np.concatenate(([0], np.cumsum(1 + 2 * row_nnz)[:-1]))
+	pairs = np.ones(len(tokens), dtype=bool)
+	pairs[label_pos] = False
+	pairs = tokens[pairs].reshape(-1, 2)
+
+	return tokens[label_pos], row_nnz, pairs[:, 0].astype(np.int64), pairs[:, 1].copy()
+
+def _parse_shard(shard):
+	"""! Parse a shard, a (filename, start, end) byte range of a plain file or a block of lines
+	"""
+	if isinstance(shard, tuple):
+		filename, start, end = shard
+		try:
+			return parse_block(_read_range(filename, start, end))
+		except ValueError as error:
+			raise ValueError("{}, in the bytes {} to {}: {}".format(filename, start, end, error))
+	return parse_block(shard)
+
+def _shards(filename, chunk_bytes):
+	"""! Shards of a file in order
+	"""
+	if os.path.splitext(filename)[1] in compressed_formats:
+		for block in _stream_blocks(filename, chunk_bytes):
+			yield block
+	else:
+		size = os.path.getsize(filename)
+		for start in range(0, size, chunk_bytes):
+			yield (filename, start, min(start + chunk_bytes, size))
+
+def load_libsvm(filename, dtype = np.float64, num_workers = None, chunk_bytes = default_chunk_bytes, zero_based = 'auto'):
+	"""! Load a LIBSVM file
+
+	Parameters
+	----------
+	@param filename : name of the file, decompressed on the fly if it ends with .gz, .bz2 or .xz
+	@param dtype : floating point type of the values
+	@param num_workers : number of worker processes parsing the shards, os.cpu_count() if None, 1 parses in this process
+	@param chunk_bytes : size in bytes of the shards
+	@param zero_based : True if the indices start at 0, False if at 1, 'auto' for 1 unless an index is 0
+
+	Returns
+	-------
+	@retval X : CSR matrix with sorted indices
+	@retval y : labels, float64
+	"""
+	if num_workers is None:
+		num_workers = os.cpu_count()
+
+	shards = []
+	if num_workers <= 1:
+		shards = [_parse_shard(shard) for shard in _shards(filename, chunk_bytes)]
+	else:
+		# at most two shards per worker in flight
+		context = mp.get_context('fork' if 'fork' in mp.get_all_start_methods() else None)
+		with context.Pool(num_workers) as pool:
+			pending = collections.deque()
+			for shard in _shards(filename, chunk_bytes):
+				pending.append(pool.apply_async(_parse_shard, (shard,)))
+				if len(pending) >= 2 * num_workers:
+					shards.append(pending.popleft().get())
+			while pending:
+				shards.append(pending.popleft().get())
+
+	num_rows = sum(len(shard[0]) for shard in shards)
+	nnz = sum(len(shard[2]) for shard in shards)
+	max_index = max((int(shard[2].max()) for shard in shards if len(shard[2])), default=-1)
+	min_index = min((int(shard[2].min()) for shard in shards if len(shard[2])), default=0)
+	shift = 1 if zero_based is False or (zero_based == 'auto' and min_index > 0) else 0
+	num_cols = max_index + 1 - shift
+
+	# the pages of the empty arrays are only committed by the copies, each shard is dropped once copied
+	index_dtype = np.int32 if max(nnz, num_cols) < 2**31 else np.int64
+	y = np.empty(num_rows)
+	indptr = np.empty(num_rows + 1, dtype=index_dtype)
+	indices = np.empty(nnz, dtype=index_dtype)
+	data = np.empty(nnz, dtype=dtype)
+	indptr[0] = 0
+	row, pos = 0, 0
+	shards.reverse()
+	while shards:
+		labels, row_nnz, shard_indices, values = shards.pop()
+		y[row:row + len(labels)] = labels
+		np.cumsum(row_nnz, out=indptr[row + 1:row + 1 + len(labels)])
+		indptr[row + 1:row + 1 + len(labels)] += pos
+		np.subtract(shard_indices, shift, out=indices[pos:pos + len(shard_indices)], casting='unsafe')
+		data[pos:pos + len(values)] = values
+		row += len(labels)
+		pos += len(values)
+		del labels, row_nnz, shard_indices, values
+
+	X = sparse.csr_matrix((data, indices, indptr), shape=(num_rows, max(num_cols, 0)), copy=False)
+	X.sort_indices()
+	return X, y
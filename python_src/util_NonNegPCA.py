@@ -26,50 +26,29 @@ If you found this helpful and are using it within our software please cite the f
 # external library
 import numpy as np
 import scipy
-import random
-import math
 
-## constant indicating total available memory when calculating full gradient
-total_mem_full = 3.0e10
+from util_Sampler import batch_index, take_rows, take_weights, row_norms_sq
+from util_ChunkPlan import iter_row_chunks
+from util_Profiler import phase
+from util_Precision import sq_norm
+from util_Prox import prox_half_l2_ball, func_val_indicator
 
-## constant indicating total available memory when calculating batch gradient
-total_mem_batch = 2.0e10
-
-def prox_half_l2_ball(w, lamb):
-	"""! Compute the proximal operator of the indicator function of a half-l2 norm ball.
-
-	\f$ prox_{\lambda \delta_{\mathcal{X}}(.)} = proj_{\mathcal{X}} \f$
+###################################################################
 
-	where $\mathcal{X} = \left\{w:~\|w\| \le 1,~w \ge 0 \right\}
-	
-	Parameters
-	----------
-	@param w : input vector
-	@param lamb : penalty paramemeter, unused in this example
-	    
-	Returns
-	-------
-	@return perform projection onto half-l2 ball
-	  
-	"""
-	mw = np.maximum(w,0)
-	norm_mw = np.linalg.norm(mw, ord = 2)
-	return mw / np.maximum(1,norm_mw)
+def sample_lipschitz_non_neg_pca(X):
+	"""! Compute the per-sample Lipschitz constants of the gradient
 
-def func_val_indicator(w):
-	"""! Compute function value of indicator function \f$ \delta_{\mathcal{X}}(w) \f$.
+	The Hessian of \f$f_i(w) = -\frac{1}{2}(z_i^{\top}w)^2\f$ is \f$-z_iz_i^{\top}\f$, hence \f$ L_i = \|z_i\|^2 \f$.
 
 	Parameters
 	----------
-	@param w : input vector
+	@param X : input data
 
 	Returns
 	-------
-	@return \f$ \delta_{\mathcal{X}}(w) \f$
+	@retval : vector of per-sample Lipschitz constants, used for importance sampling
 	"""
-	return 0
-
-###################################################################
+	return row_norms_sq(X)
 
 def func_val_non_neg_pca(n, Xw):
 	"""! Compute the objective value
@@ -87,7 +66,7 @@ def func_val_non_neg_pca(n, Xw):
 	-------
 	@return \f$f(w)\f$
 	"""
-	return -(1.0/(2.0*float(n)))*np.dot(Xw, Xw)
+	return -(1.0/(2.0*float(n)))*sq_norm(Xw)
 
 """ Compute stochastic gradient / full gradient
 
@@ -113,7 +92,7 @@ Returns
 double
     objective value
 """
-def grad_eval_non_neg_pca(n, d, b, X, Y, bias, w, nnzX = 0):
+def grad_eval_non_neg_pca(n, d, b, X, Y, bias, w, nnzX = 0, index = None, weight = None):
 	"""! Compute the (full/stochastic) gradient.
 
 	\f$f(w) := -\frac{1}{2n}\sum_{i=1}^nw^{\top}(z_iz_i^{\top})w = -\frac{1}{2n}\sum_{i=1}^n(Xw)^{\top}(Xw) \f$
@@ -135,7 +114,9 @@ def grad_eval_non_neg_pca(n, d, b, X, Y, bias, w, nnzX = 0):
 	@param Y : input label, unused in this example
 	@param bias : input bias
 	@param w : input vector
-	@param nnzX : average number of non-zero elements for each sample
+	@param nnzX : average number of non-zero elements for each sample, unused since the chunks are planned by util_ChunkPlan
+	@param index : pre-generated mini-batch indices (index array or slice of rows), drawn from util_Sampler.default_sampler if None
+	@param weight : per-sample importance weights \f$1/(n p_i)\f$ of a non-uniform sampler, None for uniform sampling
 
 	Returns
 	-------
@@ -146,59 +127,91 @@ def grad_eval_non_neg_pca(n, d, b, X, Y, bias, w, nnzX = 0):
 	# single sample
 	if b == 1:
 		# get a random sample
-		i = np.random.randint(0,n)
+		i = batch_index(n, 1, index)[0]
+		wi = 1.0 if weight is None else weight[i]
 
 		z = X[i,:]
 
-		return -z.T.dot(z.dot(w))
+		return -z.T.dot(wi*z.dot(w))
 	# batch
 	elif b < n:
 		# get a random batch of size b
-		index = random.sample(range(n), b)
+		index = batch_index(n, b, index)
+
+		batch_grad = np.zeros(d, dtype=w.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, b, index):
+			with phase('gather'):
+				batch_X = take_rows(X, index, startIdx, endIdx)
+				batch_weight = take_weights(weight, index, startIdx, endIdx)
+
+			with phase('matvec'):
+				batch_Xw = batch_X.dot(w)
+			with phase('elementwise'):
+				batch_coef = batch_weight*batch_Xw
+			with phase('matvec'):
+				batch_grad -= batch_X.transpose().dot(batch_coef)
+        
+		return batch_grad / float(b)
 
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		batch_grad = np.zeros(d)
+	else:
+		full_grad = np.zeros(d, dtype=w.dtype)
+		Xw = np.zeros(n, dtype=w.dtype)
 
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), b-1)
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, n):
+			with phase('gather'):
+				batch_X = X[startIdx:endIdx,:]
 
-			batch_X = X[index[startIdx:endIdx],:]
+			with phase('matvec'):
+				batch_Xw = batch_X.dot(w)
+			with phase('elementwise'):
+				Xw[startIdx:endIdx] = batch_Xw
+			with phase('matvec'):
+				full_grad -= batch_X.transpose().dot(batch_Xw)
 
-			batch_grad -= batch_X.transpose().dot(batch_X.dot(w))
-        
-		return batch_grad / float(b)
+		return full_grad / float(n), Xw
 
-	else:
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		full_grad = np.zeros(d)
-		Xw = np.zeros(n)
+def grad_coef_eval_non_neg_pca(X, Y, bias, w, XYw = None):
+	"""! Compute the scalar coefficients of the per-sample gradients
 
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), n-1)
+	\f$\nabla f_i(w) = -(z_i^{\top}w)z_i\f$, so a gradient is stored as the scalar \f$c_i = -z_i^{\top}w\f$ instead of a vector.
 
-			batch_X = X[startIdx:endIdx,:]
+	Parameters
+	----------
+	@param X : rows of the input data
+	@param Y : labels of these rows (unused)
+	@param bias : bias of these rows (unused)
+	@param w : input vector
+	@param XYw : products \f$ Xw\f$ of these rows with w if already known, computed from X if None
 
-			batch_Xw = (batch_X.dot(w))
+	Returns
+	-------
+	@retval : vector of coefficients \f$c_i\f$, one per row of X
+	"""
+	if XYw is None:
+		XYw = X.dot(w)
+	return -XYw
 
-			Xw[startIdx:endIdx] = batch_Xw
+def block_coef_eval_non_neg_pca(XW, Y, bias):
+	"""! Compute the margins and gradient coefficients of the PCA objective for k iterates at once
 
-			full_grad -= batch_X.transpose().dot(batch_Xw)
+	Parameters
+	----------
+	@param XW : products of some rows of the input data with the d x k matrix of iterates
+	@param Y : labels of these rows
+	@param bias : bias of these rows
 
-		return full_grad / float(n), Xw
+	Returns
+	-------
+	@retval : the margins \f$ Xw\f$, one column per iterate
 
-def grad_diff_eval_non_neg_pca(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
+	@retval : the coefficients \f$c_i\f$ of \f$\nabla f_i(w) = c_i x_i\f$, one column per iterate
+	"""
+	return XW, -XW
+
+def grad_diff_eval_non_neg_pca(n, d, b, X, Y, bias, w1, w2, nnzX = 0, index = None, weight = None, XYw1 = None):
 	"""! Compute the (full/stochastic) gradient difference of loss function 1
 
 	\f$\displaystyle\frac{1}{b}\left(\sum_{i \in \mathcal{B}_t}(\nabla f_i(w_2) - \nabla f_i(w_1)) \right) \f$
@@ -219,7 +232,10 @@ def grad_diff_eval_non_neg_pca(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
 	@param bias : input bias
 	@param w1 : input vector
 	@param w2 : input vector
-	@param nnzX : average number of non-zero elements for each sample
+	@param nnzX : average number of non-zero elements for each sample, unused since the chunks are planned by util_ChunkPlan
+	@param index : pre-generated mini-batch indices (index array or slice of rows), drawn from util_Sampler.default_sampler if None
+	@param weight : per-sample importance weights \f$1/(n p_i)\f$ of a non-uniform sampler, None for uniform sampling
+	@param XYw1 : cached products \f$Xw_1\f$, accepted for interface compatibility but unused since \f$X(w_2 - w_1)\f$ already needs a single product
 
 	Returns
 	-------
@@ -228,49 +244,44 @@ def grad_diff_eval_non_neg_pca(n, d, b, X, Y, bias, w1, w2, nnzX = 0):
 	# single sample
 	if b == 1:
 		# get a random sample
-		i = np.random.randint(0,n)
+		i = batch_index(n, 1, index)[0]
+		wi = 1.0 if weight is None else weight[i]
 
 		z = X[i,:]
 
-		return -z.T.dot(z.dot(w2 - w1))
+		return -z.T.dot(wi*z.dot(w2 - w1))
 	# batch
 	elif b < n:
 		# get a random batch of size b
-		index = random.sample(range(n), b)
-
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		batch_grad_diff = np.zeros(d)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), b-1)
-
-			batch_X = X[index[startIdx:endIdx],:]
-
-			batch_grad_diff -= batch_X.transpose().dot(batch_X.dot(w2 - w1))
+		index = batch_index(n, b, index)
+
+		batch_grad_diff = np.zeros(d, dtype=w2.dtype)
+
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, b, index):
+			with phase('gather'):
+				batch_X = take_rows(X, index, startIdx, endIdx)
+				batch_weight = take_weights(weight, index, startIdx, endIdx)
+
+			with phase('matvec'):
+				batch_Xdw = batch_X.dot(w2 - w1)
+			with phase('elementwise'):
+				batch_coef = batch_weight*batch_Xdw
+			with phase('matvec'):
+				batch_grad_diff -= batch_X.transpose().dot(batch_coef)
         
 		return batch_grad_diff / float(b)
 
 	else:
-		# calculate number of batches
-		if nnzX == 0:
-			nnzX = d
-		batch_size = np.maximum(int(total_mem_full // nnzX), 1)
-		num_batches = math.ceil(b / batch_size)
-		full_grad_diff = np.zeros(d)
-
-		for j in range(num_batches): 
-			# calculate start/end indices for each batch
-			startIdx = batch_size*j
-			endIdx = np.minimum(batch_size*(j+1), n-1)
+		full_grad_diff = np.zeros(d, dtype=w2.dtype)
 
-			batch_X = X[startIdx:endIdx,:]
+		# chunks of rows within the memory budget
+		for startIdx, endIdx in iter_row_chunks(X, n):
+			with phase('gather'):
+				batch_X = X[startIdx:endIdx,:]
 
-			full_grad_diff -= batch_X.transpose().dot(batch_X.dot(w2 - w1))
+			with phase('matvec'):
+				batch_Xdw = batch_X.dot(w2 - w1)
+				full_grad_diff -= batch_X.transpose().dot(batch_Xdw)
 
 		return full_grad_diff / float(n)
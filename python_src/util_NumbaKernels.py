@@ -0,0 +1,296 @@
+"""!@package util_NumbaKernels
+
+Compiled single-sample inner loops of ProxSARAH, ProxSVRG and ProxSGD.
+
+With b = 1 the inner loops run n Python-level iterations, each paying for index handling, a CSR row object and
+several temporaries. The kernels below run a whole segment of iterations (up to the next logging point) in one call,
+directly on the CSR arrays (indptr, indices, data) of the training data. They support the built-in losses and
+proximal operators, selected by the integer ids returned by jit_backend.
+
+Numba is an optional dependency. Without it the kernels remain importable as plain Python functions, but the methods
+fall back to their numpy implementation.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import math
+import warnings
+import numpy as np
+from scipy import sparse
+
+try:
+	import numba
+	numba_available = True
+	jit = numba.njit(cache=True)
+except ImportError:
+	numba_available = False
+	def jit(func):
+		return func
+
+## ids of the losses, keyed by the name of their GradCoefEval oracle
+jit_loss_ids = {
+	'grad_coef_eval_bin_class_loss_1' : 1,
+	'grad_coef_eval_bin_class_loss_2' : 2,
+	'grad_coef_eval_bin_class_loss_3' : 3,
+	'grad_coef_eval_non_neg_pca' : 4,
+}
+
+## ids of the proximal operators, keyed by the name of their ProxEval function
+jit_prox_ids = {
+	'prox_empty' : 0,
+	'prox_l1_norm' : 1,
+	'prox_half_l2_ball' : 2,
+}
+
+def jit_backend(b, X, GradCoefEval, ProxEval, lazy_update = 0):
+	"""! Check whether a method can run its inner loop with the compiled kernels
+
+	Parameters
+	----------
+	@param b : mini-batch size, must be 1
+	@param X : input data, must be a CSR matrix
+	@param GradCoefEval : function pointer for the scalar gradient coefficients of a built-in loss
+	@param ProxEval : function pointer of a built-in proximal operator
+	@param lazy_update : the lazy l1 updates of util_LazyProx, which cannot be combined with the kernels
+
+	Returns
+	-------
+	@retval : (loss id, prox id), or None if numba is not installed
+	"""
+	if b != 1 or not sparse.isspmatrix_csr(X) or lazy_update:
+		raise ValueError("jit_inner needs single-sample steps (b = 1) on CSR data and excludes lazy_update")
+
+	loss_id = jit_loss_ids.get(getattr(GradCoefEval, '__name__', None))
+	prox_id = jit_prox_ids.get(getattr(ProxEval, '__name__', None))
+	if loss_id is None or prox_id is None:
+		raise ValueError("jit_inner only supports the built-in losses and proximal operators")
+
+	if not numba_available:
+		warnings.warn("numba is not installed, running the inner loop with numpy")
+		return None
+
+	return loss_id, prox_id
+
+def jit_num_steps(num_left, num_grad, last_print_num_grad, grad_per_step, n, max_num_epoch, is_fun_eval):
+	"""! Number of single-sample steps until the next logging point of a method
+
+	Parameters
+	----------
+	@param num_left : steps left in the current inner loop or epoch
+	@param num_grad : current number of component gradients
+	@param last_print_num_grad : number of component gradients at the last logging point
+	@param grad_per_step : component gradients evaluated per step
+	@param n : sample size
+	@param max_num_epoch : maximum number of epochs
+	@param is_fun_eval : flag whether the method logs data
+
+	Returns
+	-------
+	@retval : number of steps to run in one kernel call, at least 1
+	"""
+	if not is_fun_eval:
+		return num_left
+
+	to_log = math.ceil((n - (num_grad - last_print_num_grad)) / grad_per_step)
+	to_end = math.ceil((max_num_epoch*n - num_grad) / grad_per_step)
+	return int(max(min(num_left, to_log, to_end), 1))
+
+def jit_weight(sample_weight):
+	"""! Importance weights in the form expected by the kernels
+
+	Parameters
+	----------
+	@param sample_weight : per-sample weights of the sampler, None for uniform sampling
+
+	Returns
+	-------
+	@retval : the weights, or an empty array for uniform sampling
+	"""
+	if sample_weight is None:
+		return np.empty(0)
+	return sample_weight
+
+@jit
+def _margin(loss_id, indptr, indices, data, Y, bias, i, w):
+	"""! Margin \f$y_i(x_i^{\top}w + b_i)\f$ of a classification loss, or \f$x_i^{\top}w\f$ for non-negative PCA
+	"""
+	s = 0.0
+	for k in range(indptr[i], indptr[i + 1]):
+		s += data[k] * w[indices[k]]
+	if loss_id == 4:
+		return s
+	return Y[i] * (s + bias[i])
+
+@jit
+def _coef(loss_id, m, y):
+	"""! Scalar coefficient \f$c_i\f$ of \f$\nabla f_i(w) = c_i x_i\f$ given the margin, as in the grad_coef_eval oracles
+	"""
+	if loss_id == 1:
+		expt = math.exp(2.0 * m)
+		return -4.0 * y * expt / (expt + 1.0) / (expt + 1.0)
+	elif loss_id == 2:
+		expt = math.exp(m)
+		return -2.0 * y * expt / (1.0 + expt) / (1.0 + expt) / (1.0 + expt)
+	elif loss_id == 3:
+		expt = math.exp(m)
+		return y * (1.0 / (expt * math.e + 1.0) - 1.0 / (expt + 1.0))
+	return -m
+
+@jit
+def _prox(prox_id, u, thresh):
+	"""! Apply a built-in proximal operator to u in place
+	"""
+	if prox_id == 1:
+		for j in range(u.shape[0]):
+			if u[j] > thresh:
+				u[j] -= thresh
+			elif u[j] < -thresh:
+				u[j] += thresh
+			else:
+				u[j] = 0.0
+	elif prox_id == 2:
+		norm = 0.0
+		for j in range(u.shape[0]):
+			if u[j] < 0.0:
+				u[j] = 0.0
+			norm += u[j] * u[j]
+		norm = math.sqrt(norm)
+		if norm > 1.0:
+			for j in range(u.shape[0]):
+				u[j] /= norm
+
+@jit
+def prox_sarah_inner_kernel(loss_id, prox_id, indptr, indices, data, Y, bias, weight, index, w, w_prev, v, eta, thresh, gamma):
+	"""! Run single-sample ProxSARAH iterations in place
+
+	Parameters
+	----------
+	@param loss_id : id of the loss, see jit_loss_ids
+	@param prox_id : id of the proximal operator, see jit_prox_ids
+	@param indptr : row pointer of the CSR data
+	@param indices : column indices of the CSR data
+	@param data : values of the CSR data
+	@param Y : input label
+	@param bias : input bias
+	@param weight : per-sample importance weights, empty for uniform sampling
+	@param index : sample index of each iteration
+	@param w : current iterate, updated in place
+	@param w_prev : previous iterate, updated in place
+	@param v : SARAH estimator, updated in place
+	@param eta : learning rate
+	@param thresh : threshold of the proximal operator \f$\lambda\eta\f$
+	@param gamma : averaging weight
+	"""
+	d = w.shape[0]
+	u = np.empty_like(w)
+
+	for t in range(index.shape[0]):
+		i = index[t]
+		y = 0.0 if loss_id == 4 else Y[i]
+
+		# estimator update on the support of the sampled row
+		diff = _coef(loss_id, _margin(loss_id, indptr, indices, data, Y, bias, i, w), y) \
+			- _coef(loss_id, _margin(loss_id, indptr, indices, data, Y, bias, i, w_prev), y)
+		if weight.shape[0] > 0:
+			diff *= weight[i]
+		for k in range(indptr[i], indptr[i + 1]):
+			v[indices[k]] += diff * data[k]
+
+		# proximal step followed by averaging
+		for j in range(d):
+			u[j] = w[j] - eta * v[j]
+		_prox(prox_id, u, thresh)
+		for j in range(d):
+			w_prev[j] = w[j]
+			w[j] = (1.0 - gamma) * w[j] + gamma * u[j]
+
+@jit
+def prox_svrg_inner_kernel(loss_id, prox_id, indptr, indices, data, Y, bias, weight, index, w, full_grad, coef_til, eta, thresh):
+	"""! Run single-sample ProxSVRG iterations in place
+
+	Parameters
+	----------
+	@param loss_id : id of the loss, see jit_loss_ids
+	@param prox_id : id of the proximal operator, see jit_prox_ids
+	@param indptr : row pointer of the CSR data
+	@param indices : column indices of the CSR data
+	@param data : values of the CSR data
+	@param Y : input label
+	@param bias : input bias
+	@param weight : per-sample importance weights, empty for uniform sampling
+	@param index : sample index of each iteration
+	@param w : current iterate, updated in place
+	@param full_grad : full gradient at the anchor point
+	@param coef_til : gradient coefficients of all samples at the anchor point
+	@param eta : learning rate
+	@param thresh : threshold of the proximal operator \f$\lambda\eta\f$
+	"""
+	d = w.shape[0]
+
+	for t in range(index.shape[0]):
+		i = index[t]
+		y = 0.0 if loss_id == 4 else Y[i]
+
+		diff = _coef(loss_id, _margin(loss_id, indptr, indices, data, Y, bias, i, w), y) - coef_til[i]
+		if weight.shape[0] > 0:
+			diff *= weight[i]
+
+		# gradient step with the variance reduced estimator, then the proximal operator
+		for j in range(d):
+			w[j] -= eta * full_grad[j]
+		for k in range(indptr[i], indptr[i + 1]):
+			w[indices[k]] -= eta * diff * data[k]
+		_prox(prox_id, w, thresh)
+
+@jit
+def prox_sgd_inner_kernel(loss_id, prox_id, indptr, indices, data, Y, bias, weight, index, w, eta, eta_prime, thresh, total_iter, n):
+	"""! Run single-sample ProxSGD iterations in place
+
+	Parameters
+	----------
+	@param loss_id : id of the loss, see jit_loss_ids
+	@param prox_id : id of the proximal operator, see jit_prox_ids
+	@param indptr : row pointer of the CSR data
+	@param indices : column indices of the CSR data
+	@param data : values of the CSR data
+	@param Y : input label
+	@param bias : input bias
+	@param weight : per-sample importance weights, empty for uniform sampling
+	@param index : sample index of each iteration
+	@param w : current iterate, updated in place
+	@param eta : initial learning rate
+	@param eta_prime : parameter of the diminishing learning rate
+	@param thresh : threshold of the proximal operator \f$\lambda\eta\f$
+	@param total_iter : number of iterations done before this call
+	@param n : sample size
+	"""
+	for t in range(index.shape[0]):
+		i = index[t]
+		y = 0.0 if loss_id == 4 else Y[i]
+
+		coef = _coef(loss_id, _margin(loss_id, indptr, indices, data, Y, bias, i, w), y)
+		if weight.shape[0] > 0:
+			coef *= weight[i]
+
+		# diminishing learning rate
+		total_iter += 1
+		eta_cur = eta / (1.0 + eta_prime * (total_iter // n))
+
+		for k in range(indptr[i], indptr[i + 1]):
+			w[indices[k]] -= eta_cur * coef * data[k]
+		_prox(prox_id, w, thresh)
@@ -0,0 +1,206 @@
+"""!@package util_OutOfCore
+
+Training on datasets kept on disk as memory-mapped arrays, see the -ooc option of the example drivers.
+
+import_data(..., mmap_mode='r') returns the train and test data as read-only maps of the .npy files of the dataset
+cache (see util_DataCache), so the data is read from disk as the oracles touch it and its pages can be dropped by the
+operating system at any time: the dataset may be several times larger than the memory of the machine. The full
+passes of the oracles go over the rows chunk by chunk (see util_ChunkPlan), and iter_row_chunks asks the kernel with
+madvise(MADV_WILLNEED) to read the next chunk while the current one is processed. The mini-batch gathers read the
+sampled rows through the page cache.
+
+The row normalization of the drivers cannot be done in place on read-only maps: normalize_rows writes the normalized
+values chunk by chunk to a temporary file and maps it, sharing the column indices and row pointer with the input.
+The maps are shared with worker processes by file name and offset instead of being copied (see util_SharedData).
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import os
+import mmap
+import atexit
+import tempfile
+import numpy as np
+from scipy import sparse
+
+## number of non-zeros normalized at once by normalize_rows
+normalize_chunk_nnz = 2**24
+
+def _root_map(a):
+	"""! The np.memmap owning the mapping a is a view of, None if a is not a view of a mapped file
+	"""
+	base = a
+	while isinstance(base, np.ndarray):
+		if isinstance(base, np.memmap) and isinstance(base.base, mmap.mmap):
+			return base
+		base = base.base
+	return None
+
+def file_region(a):
+	"""! Location of a memory-mapped array in its file
+
+	Parameters
+	----------
+	@param a : numpy array
+
+	Returns
+	-------
+	@retval : (file name, offset in bytes, mode of the map) if a is a contiguous view of a mapped file, None otherwise
+	"""
+	root = _root_map(a)
+	if root is None or root.filename is None or not a.flags.c_contiguous:
+		return None
+	return root.filename, root.offset + (a.ctypes.data - root.ctypes.data), root.mode
+
+def is_file_backed(X):
+	"""! Whether a data matrix is a map of a file
+
+	Parameters
+	----------
+	@param X : CSR matrix or dense array
+
+	Returns
+	-------
+	@retval : True if the values of X are read from a file
+	"""
+	if sparse.isspmatrix_csr(X):
+		return _root_map(X.data) is not None
+	return isinstance(X, np.ndarray) and _root_map(X) is not None
+
+def _advise(a, first, last, advice):
+	"""! Give advice on the entries first:last of a mapped array, the advice is only a hint and errors are ignored
+	"""
+	root = _root_map(a)
+	if root is None or last <= first:
+		return
+
+	# the mapping starts at the allocation granularity boundary below the offset of the array in the file
+	mm = root.base
+	shift = root.offset % mmap.ALLOCATIONGRANULARITY + (a.ctypes.data - root.ctypes.data)
+	step = a.strides[0]
+	begin = shift + first * step
+	begin -= begin % mmap.PAGESIZE
+	end = min(shift + last * step, len(mm))
+	try:
+		mm.madvise(advice, begin, end - begin)
+	except (OSError, ValueError):
+		pass
+
+def prefetch_rows(X, start, end):
+	"""! Ask the operating system to read the rows start:end of a mapped data matrix in the background
+
+	Parameters
+	----------
+	@param X : CSR matrix or dense array, nothing is done if it is not a map of a file
+	@param start : first row
+	@param end : one past the last row
+	"""
+	if not hasattr(mmap, 'MADV_WILLNEED'):
+		return
+
+	if sparse.isspmatrix_csr(X):
+		first, last = X.indptr[start], X.indptr[end]
+		_advise(X.data, first, last, mmap.MADV_WILLNEED)
+		_advise(X.indices, first, last, mmap.MADV_WILLNEED)
+	else:
+		_advise(X, start, end, mmap.MADV_WILLNEED)
+
+def prefetch_chunks(X, chunks):
+	"""! Iterate over row chunks, reading the next chunk ahead while the current one is processed
+
+	Parameters
+	----------
+	@param X : CSR matrix or dense array mapped from a file
+	@param chunks : list of (start, end) rows
+
+	Returns
+	-------
+	@retval : generator of the chunks
+	"""
+	if len(chunks) > 0:
+		prefetch_rows(X, *chunks[0])
+
+	for j, chunk in enumerate(chunks):
+		if j + 1 < len(chunks):
+			prefetch_rows(X, *chunks[j + 1])
+		yield chunk
+
+def _remove(filename):
+	"""! Remove a temporary file at exit
+	"""
+	try:
+		os.remove(filename)
+	except OSError:
+		pass
+
+def normalize_rows(X, directory = None):
+	"""! Scale the rows of a mapped CSR matrix to unit \f$\ell_2\f$-norm, out of core
+
+	Same result as sklearn.preprocessing.normalize(X, 'l2'), without loading X in memory. The values are written to
+	a temporary file removed at exit.
+
+	Parameters
+	----------
+	@param X : CSR matrix
+	@param directory : directory of the temporary file, the default temporary directory if None
+
+	Returns
+	-------
+	@retval : CSR matrix with the values mapped read-only from the temporary file and the indices and row pointer of X
+	"""
+	if directory is not None:
+		os.makedirs(directory, exist_ok=True)
+	fd, filename = tempfile.mkstemp(suffix='.npy', dir=directory)
+	os.close(fd)
+	atexit.register(_remove, filename)
+
+	n = X.shape[0]
+	data = np.lib.format.open_memmap(filename, mode='w+', dtype=X.dtype, shape=X.data.shape)
+
+	def next_end(start):
+		# rows holding about normalize_chunk_nnz non-zeros, at least one row
+		end = int(np.searchsorted(X.indptr, X.indptr[start] + normalize_chunk_nnz, side='right')) - 1
+		return min(max(end, start + 1), n)
+
+	start = 0
+	end = next_end(start) if n > 0 else 0
+	prefetch_rows(X, start, end)
+	while start < n:
+		if end < n:
+			prefetch_rows(X, end, next_end(end))
+
+		first, last = X.indptr[start], X.indptr[end]
+		values = np.asarray(X.data[first:last])
+		row_nnz = np.diff(X.indptr[start:end + 1])
+		norms = np.sqrt(np.bincount(np.repeat(np.arange(end - start), row_nnz), weights=values * values, minlength=end - start))
+		# empty rows are left as they are
+		norms[norms == 0.0] = 1.0
+		data[first:last] = values / np.repeat(norms, row_nnz).astype(X.dtype)
+
+		start = end
+		if start < n:
+			end = next_end(start)
+
+	data.flush()
+	del data
+
+	normalized = sparse.csr_matrix(X.shape, dtype=X.dtype)
+	normalized.data = np.load(filename, mmap_mode='r')
+	normalized.indices = X.indices
+	normalized.indptr = X.indptr
+	return normalized
@@ -0,0 +1,72 @@
+"""!@package util_Precision
+
+Floating point precision of the data, iterates and temporaries.
+
+The methods and oracles compute in the dtype of the data and of the initial point w0. In float32 mode the sparse
+products read half the memory of float64. Statistics that accumulate over many terms (objective values, squared norms
+of the gradient mapping) are still summed in float64.
+
+Numpy scalars keep their precision in mixed operations, so a np.float64 step size would promote float32 iterates to
+float64. The methods therefore turn their scalar parameters into Python floats.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import numpy as np
+from scipy import sparse
+
+## supported precisions
+precisions = {
+	'float64' : np.float64,
+	'float32' : np.float32,
+}
+
+def as_precision(A, dtype):
+	"""! Convert data, labels or vectors to a floating point precision
+
+	Parameters
+	----------
+	@param A : CSR matrix, dense array, or an empty list for missing data
+	@param dtype : target dtype, e.g. precisions['float32']
+
+	Returns
+	-------
+	@retval : A in the given precision, A itself if nothing needs to be converted
+	"""
+	if sparse.issparse(A) or isinstance(A, np.ndarray):
+		if A.dtype == dtype:
+			return A
+		return A.astype(dtype)
+
+	if len(A) == 0:
+		return A
+	return np.asarray(A, dtype=dtype)
+
+def sq_norm(v):
+	"""! Squared \f$\ell_2\f$-norm accumulated in float64
+
+	Parameters
+	----------
+	@param v : input vector
+
+	Returns
+	-------
+	@retval : \f$\|v\|^2\f$ as a np.float64
+	"""
+	v = np.asarray(v, dtype=np.float64)
+	return np.dot(v, v)
@@ -0,0 +1,209 @@
+"""!@package util_Preprocess
+
+Declarative preprocessing of the datasets, cached on disk.
+
+A pipeline is a list of (transform name, parameters) steps applied in order to (X_train, Y_train, X_test, Y_test), e.g.
+the pipeline of the binary classification driver
+
+	[('csr', {}), ('test_set', {'fraction': 0.9, 'binary_labels': True}), ('flatten_labels', {}), ('normalize', {'norm': 'l2'})]
+
+converts the train data to CSR, uses the test set if it has the dimension of the train set or holds out the last 10% of
+the train set otherwise, flattens the labels and scales the rows to unit norm. The transforms are registered by name
+with register_transform. import_preprocessed (see import_data) saves the output of a pipeline in a cache keyed by
+pipeline_key, a hash of the source files of the dataset, the precision and the steps, so later runs map the
+preprocessed arrays directly. Changing a parameter, the precision or the dataset files gives another key, and
+pipeline_version is increased when a transform changes its output.
+
+Out of core, the transforms work on the read-only maps of the dataset cache: the split takes views of the rows and the
+normalization writes to temporary files (see util_OutOfCore). The output is the same in and out of core, so both share
+the cache.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import json
+import hashlib
+import numpy as np
+from scipy import sparse
+
+# internal library
+from util_Precision import as_precision
+from util_Sampler import csr_row_view
+from util_OutOfCore import normalize_rows
+
+## version of the transforms, preprocessed caches of another version are rebuilt
+pipeline_version = 1
+
+## transforms by name, called as transform(parts, options, **params) on the list [X_train, Y_train, X_test, Y_test]
+transforms = {}
+
+## position of the parts in the list of a dataset
+_part_index = {'train': (0, 1), 'test': (2, 3)}
+
+def register_transform(name):
+	"""! Register a preprocessing transform under a name
+
+	The transform modifies the list parts = [X_train, Y_train, X_test, Y_test] and gets the options of run_pipeline:
+	'dtype', the floating point type of the data, 'out_of_core', whether the data are read-only maps, and 'scratch_dir',
+	the directory of the temporary files.
+
+	Parameters
+	----------
+	@param name : name of the transform in the pipelines
+
+	Returns
+	-------
+	@retval : decorator of the transform
+	"""
+	def register(transform):
+		transforms[name] = transform
+		return transform
+	return register
+
+def _is_empty(A):
+	"""! Whether a part of a dataset is missing
+	"""
+	return not sparse.issparse(A) and len(A) == 0
+
+def _binary(Y):
+	"""! Labels in {-1, 1}, splitting the labels at the middle of their range
+	"""
+	mid_val = (np.amin(Y) + np.amax(Y)) / 2.0
+	return 1*(Y >= mid_val) - 1*(Y < mid_val)
+
+@register_transform('csr')
+def to_csr(parts, options):
+	"""! Convert the train data to a CSR matrix
+	"""
+	if not sparse.isspmatrix_csr(parts[0]):
+		parts[0] = sparse.csr_matrix(parts[0])
+
+@register_transform('binary_labels')
+def binary_labels(parts, options, part = 'train'):
+	"""! Convert the labels of the train or test set to -1/1, splitting them at the middle of their range
+	"""
+	label = _part_index[part][1]
+	if not _is_empty(parts[label]):
+		parts[label] = _binary(parts[label])
+
+@register_transform('test_set')
+def test_set(parts, options, fraction = 0.9, binary_labels = False):
+	"""! Use the test set if it has the dimension of the train set, hold out the end of the train set otherwise
+
+	The test data are converted to a CSR matrix and, with binary_labels, their labels to -1/1. The train set is split
+	at the row int(fraction * number of rows), without copying the rows out of core.
+	"""
+	X_train, Y_train, X_test, Y_test = parts
+	num_train, total_dim = X_train.shape
+
+	if len(Y_test) > 0 and np.shape(X_test)[1] == total_dim:
+		if not sparse.isspmatrix_csr(X_test):
+			parts[2] = sparse.csr_matrix(X_test)
+		if binary_labels:
+			parts[3] = _binary(Y_test)
+		return
+
+	if len(Y_test) > 0:
+		print('Dimension mismatch between train/test set, splitting train set')
+	else:
+		print('No test set given, splitting train set')
+
+	start_idx = int(fraction*num_train)
+
+	# views of the maps out of core, copies otherwise
+	if options['out_of_core']:
+		parts[0] = csr_row_view(X_train, 0, start_idx)
+		parts[2] = csr_row_view(X_train, start_idx, num_train)
+	else:
+		parts[0] = X_train[:start_idx]
+		parts[2] = X_train[start_idx:]
+	parts[1] = Y_train[:start_idx]
+	parts[3] = Y_train[start_idx:]
+
+@register_transform('no_test')
+def no_test(parts, options):
+	"""! Drop the test set
+	"""
+	parts[2] = []
+	parts[3] = []
+
+@register_transform('flatten_labels')
+def flatten_labels(parts, options):
+	"""! Flatten the labels into vectors of the precision of the data
+	"""
+	for label in (1, 3):
+		if not _is_empty(parts[label]):
+			parts[label] = as_precision(np.asarray(parts[label]).flatten(), options['dtype'])
+
+@register_transform('normalize')
+def normalize(parts, options, norm = 'l2'):
+	"""! Scale the rows of the train and test data to unit norm, like sklearn.preprocessing.normalize
+	"""
+	for data in (0, 2):
+		if _is_empty(parts[data]):
+			continue
+		if options['out_of_core']:
+			if norm != 'l2':
+				raise ValueError("only the 'l2' normalization is supported out of core")
+			# the read-only maps are normalized into temporary files
+			parts[data] = normalize_rows(parts[data], options['scratch_dir'])
+		else:
+			import sklearn.preprocessing
+			sklearn.preprocessing.normalize(parts[data], norm, axis=1, copy=False)
+
+def pipeline_key(pipeline, sources, precision):
+	"""! Key of the output of a pipeline
+
+	Parameters
+	----------
+	@param pipeline : list of (transform name, parameters)
+	@param sources : signature of the source files of the dataset (see util_DataCache.source_files)
+	@param precision : name of the floating point precision of the data
+
+	Returns
+	-------
+	@retval : hexadecimal hash of the sources, the precision and the steps
+	"""
+	for name, params in pipeline:
+		if name not in transforms:
+			raise ValueError("unknown preprocessing transform '{}'".format(name))
+
+	description = {'version': pipeline_version, 'sources': sources, 'precision': precision, \
+					'pipeline': [[name, params] for name, params in pipeline]}
+	return hashlib.sha1(json.dumps(description, sort_keys=True).encode()).hexdigest()[:16]
+
+def run_pipeline(data, pipeline, dtype, out_of_core = False, scratch_dir = None):
+	"""! Apply a pipeline to a dataset
+
+	Parameters
+	----------
+	@param data : (X_train, Y_train, X_test, Y_test), empty lists for the missing parts
+	@param pipeline : list of (transform name, parameters)
+	@param dtype : floating point type of the data
+	@param out_of_core : flag whether the data are read-only maps to transform without loading them
+	@param scratch_dir : directory of the temporary files out of core, the default temporary directory if None
+
+	Returns
+	-------
+	@retval : preprocessed (X_train, Y_train, X_test, Y_test)
+	"""
+	parts = list(data)
+	options = {'dtype': dtype, 'out_of_core': out_of_core, 'scratch_dir': scratch_dir}
+	for name, params in pipeline:
+		transforms[name](parts, options, **params)
+	return tuple(parts)
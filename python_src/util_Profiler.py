@@ -0,0 +1,318 @@
+"""!@package util_Profiler
+
+Per-phase wall time and call counts of the solver loops and oracles, off by default.
+
+While a profiler is enabled with enable_profiler, the methods time their oracles (grad, grad_diff, grad_coef, prox,
+loss, penalty, accuracy), their logging passes (log), printing (print) and checkpoints (checkpoint), the samplers time
+the drawing of the mini-batches (sample) and the row shuffles (shuffle), and the oracles time their row gathers (gather),
+sparse products (matvec) and exp/elementwise work (elementwise). Phases nest: a phase is identified by its path, e.g.
+'ProxSARAH-v1/log/grad/matvec' for the sparse products of the full gradient of a logging pass of a run named
+'ProxSARAH-v1' by util_ExperimentRunner. summary lists the calls, total time and self time (total minus the nested
+phases) of every path, write_trace saves the phases as complete events of a Chrome trace JSON file, which
+chrome://tracing and Perfetto display as a timeline.
+
+A profiler can record only some phases, e.g. enable_profiler(phases=('log',)) times the logging passes and nothing
+else, and elapsed('log') is then the wall time of a run without its logging passes, as benchmark_convergence uses it.
+
+When no profiler is enabled, phase returns a shared no-op context and profiled returns the oracle itself, so the
+instrumentation costs one function call per phase of a mini-batch or full pass and nothing per single-sample step.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import os
+import json
+import time
+import functools
+
+## profiler the phases are recorded into, None when profiling is off
+_profiler = None
+
+class Profiler:
+	"""! Accumulated time and calls of the phases of a process
+
+	Parameters
+	----------
+	@param trace : flag whether to keep every phase as an event for write_trace
+	@param max_events : maximum number of kept events, later ones are only counted
+	@param phases : names of the recorded phases, all if None
+	"""
+
+	def __init__(self, trace = False, max_events = 1000000, phases = None):
+		self.trace = trace
+		self.max_events = max_events
+		self.phases = None if phases is None else frozenset(phases)
+
+		## time origin of the events, shared with the forked worker processes
+		self.origin = time.perf_counter()
+		self.reset()
+
+	def reset(self):
+		"""! Drop the recorded phases, keeping the time origin
+		"""
+		## {path: [total seconds, calls]}
+		self.totals = {}
+		## complete events (path, pid, start, duration) in seconds since origin
+		self.events = []
+		self.dropped_events = 0
+		self.stack = []
+		## start times of the open phases, parallel to stack
+		self.starts = []
+		self.start_time = time.perf_counter()
+
+	def add(self, path, start, elapsed):
+		"""! Account one call of a phase
+		"""
+		total = self.totals.get(path)
+		if total is None:
+			self.totals[path] = [elapsed, 1]
+		else:
+			total[0] += elapsed
+			total[1] += 1
+
+		if self.trace:
+			if len(self.events) < self.max_events:
+				self.events.append((path, os.getpid(), start - self.origin, elapsed))
+			else:
+				self.dropped_events += 1
+
+	def records(self, name):
+		"""! Whether the phase name is recorded
+		"""
+		return self.phases is None or name in self.phases
+
+	def elapsed(self, exclude = None):
+		"""! Wall time since the profiler was enabled or reset, without the time spent in a phase
+
+		Parameters
+		----------
+		@param exclude : name of the phase whose time is not counted, e.g. 'log', nested calls are counted once
+
+		Returns
+		-------
+		@retval : time in seconds, including the part of an open exclude phase
+		"""
+		now = time.perf_counter()
+		elapsed = now - self.start_time
+		if exclude is None:
+			return elapsed
+
+		# outermost calls of the phase only, the nested ones are already in their total
+		for path, total in self.totals.items():
+			names = path.split('/')
+			if names[-1] == exclude and exclude not in names[:-1]:
+				elapsed -= total[0]
+
+		if exclude in self.stack:
+			elapsed -= now - self.starts[self.stack.index(exclude)]
+
+		return elapsed
+
+	def export(self):
+		"""! Recorded phases in a picklable form, e.g. to send them from a worker process to merge
+		"""
+		return {'totals': self.totals, 'events': self.events, 'dropped_events': self.dropped_events}
+
+	def merge(self, profile):
+		"""! Add the phases exported by another profiler, e.g. of a worker process
+
+		Parameters
+		----------
+		@param profile : dictionary returned by export
+		"""
+		for path, (elapsed, calls) in profile['totals'].items():
+			total = self.totals.setdefault(path, [0.0, 0])
+			total[0] += elapsed
+			total[1] += calls
+
+		room = max(self.max_events - len(self.events), 0)
+		self.events.extend(profile['events'][:room])
+		self.dropped_events += profile['dropped_events'] + max(len(profile['events']) - room, 0)
+
+	def summary(self):
+		"""! Table of the phases, one row per path in tree order
+
+		Returns
+		-------
+		@retval : the table as a string, times in seconds and in percent of the wall time since the profiler was enabled
+		"""
+		wall = max(time.perf_counter() - self.start_time, 1.0e-12)
+
+		# self time: total minus the phases nested directly inside
+		self_time = {path: total[0] for path, total in self.totals.items()}
+		for path, total in self.totals.items():
+			parent = path.rpartition('/')[0]
+			if parent in self_time:
+				self_time[parent] -= total[0]
+
+		lines = [
+			' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=96,),
+			' {:<44}|{:^12}|{:^12}|{:^12}|{:^12}'.format('Phase', 'Calls', 'Total (s)', 'Self (s)', '% of wall'),
+			' {message:{fill}{align}{width}}'.format(message='',fill='-',align='^',width=96,),
+		]
+		for path in sorted(self.totals, key=lambda path: path.split('/')):
+			elapsed, calls = self.totals[path]
+			depth = path.count('/')
+			name = '  '*depth + path.rpartition('/')[2]
+			lines.append(' {:<44}|{:^12d}|{:^12.4f}|{:^12.4f}|{:^12.2f}'.format(name, calls, elapsed, self_time[path], 100.0*elapsed/wall))
+		lines.append(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=96,))
+		lines.append(' Wall time: {:.4f} seconds'.format(wall))
+		if self.dropped_events:
+			lines.append(' {} trace events beyond max_events were dropped'.format(self.dropped_events))
+
+		return '\n'.join(lines)
+
+	def write_trace(self, path):
+		"""! Save the events as a Chrome trace JSON file
+
+		Parameters
+		----------
+		@param path : output file
+		"""
+		events = [{'name': name.rpartition('/')[2], 'cat': name, 'ph': 'X', 'pid': pid, 'tid': pid, \
+					'ts': 1.0e6*start, 'dur': 1.0e6*elapsed} for name, pid, start, elapsed in self.events]
+
+		directory = os.path.dirname(path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		with open(path, 'w') as f:
+			json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+class _Phase:
+	"""! Context timing one call of a phase
+	"""
+	__slots__ = ('profiler', 'name', 'start')
+
+	def __init__(self, profiler, name):
+		self.profiler = profiler
+		self.name = name
+
+	def __enter__(self):
+		self.profiler.stack.append(self.name)
+		self.start = time.perf_counter()
+		self.profiler.starts.append(self.start)
+		return self
+
+	def __exit__(self, *exc_info):
+		elapsed = time.perf_counter() - self.start
+		stack = self.profiler.stack
+		path = '/'.join(stack)
+		stack.pop()
+		self.profiler.starts.pop()
+		self.profiler.add(path, self.start, elapsed)
+		return False
+
+class _NoPhase:
+	"""! Context doing nothing, used while profiling is off
+	"""
+	__slots__ = ()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		return False
+
+_no_phase = _NoPhase()
+
+def enable_profiler(trace = False, max_events = 1000000, phases = None):
+	"""! Start profiling the phases of this process (and of the worker processes forked later)
+
+	Parameters
+	----------
+	@param trace : flag whether to keep the events for a Chrome trace
+	@param max_events : maximum number of kept events
+	@param phases : names of the recorded phases, all if None
+
+	Returns
+	-------
+	@retval : the new Profiler
+	"""
+	global _profiler
+	_profiler = Profiler(trace, max_events, phases)
+	return _profiler
+
+def disable_profiler():
+	"""! Stop profiling
+
+	Returns
+	-------
+	@retval : the Profiler that was active, None if profiling was off
+	"""
+	global _profiler
+	profiler, _profiler = _profiler, None
+	return profiler
+
+def active_profiler():
+	"""! The Profiler phases are recorded into, None if profiling is off
+	"""
+	return _profiler
+
+def phase(name):
+	"""! Context timing a phase, e.g. with phase('matvec'): ...
+
+	Parameters
+	----------
+	@param name : name of the phase, nested in the phases entered before
+
+	Returns
+	-------
+	@retval : context manager, a no-op one if profiling is off or the phase is not recorded
+	"""
+	if _profiler is None or not _profiler.records(name):
+		return _no_phase
+	return _Phase(_profiler, name)
+
+def profiled(name, func):
+	"""! Time every call of a function pointer as a phase
+
+	Parameters
+	----------
+	@param name : name of the phase
+	@param func : function, e.g. an oracle given to a method, or None
+
+	Returns
+	-------
+	@retval : func itself if profiling is off, the phase is not recorded or func is None, else a wrapper timing it
+	"""
+	profiler = _profiler
+	if profiler is None or func is None or not profiler.records(name):
+		return func
+
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		with _Phase(profiler, name):
+			return func(*args, **kwargs)
+	return wrapper
+
+def timed(name):
+	"""! Decorator timing every call of a function as a phase while profiling is on
+
+	Parameters
+	----------
+	@param name : name of the phase
+	"""
+	def decorate(func):
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			if _profiler is None or not _profiler.records(name):
+				return func(*args, **kwargs)
+			with _Phase(_profiler, name):
+				return func(*args, **kwargs)
+		return wrapper
+	return decorate
@@ -0,0 +1,662 @@
+"""!@package util_Prox
+
+Proximal operators and values of the penalties \f$g\f$ of the composite problem \f$\min_w f(w) + \lambda g(w)\f$.
+
+The operators have the signature ProxEval(w, lamb, out = None) of the methods, which call them with lamb = penalty
+parameter x step size, and write the result into out, a buffer of the shape and dtype of w that may be w itself; a new
+array is returned if out is None. With numba (see util_NumbaKernels) every operator runs as one compiled loop over w
+(two for the projection onto the half l2-ball, which needs the norm first), otherwise as a few in-place numpy passes
+over out using scratch buffers kept between calls, so no temporary is allocated per call besides out. The values
+FuncG_Eval(w) are only evaluated at the logging points and use plain numpy.
+
+The methods take their proximal gradient steps and gradient mappings with prox_step, averaged_prox_step and
+grad_mapping, in buffers allocated once per run, so their iterations do not allocate vectors for the proximal operator.
+User operators without the out argument are wrapped by prox_with_out to copy their result into the buffer.
+
+The penalties with parameters besides lamb take them as keyword arguments, and penalty_pair binds them into a
+ProxEval/FuncG_Eval pair for the methods, e.g. penalty_pair('mcp', theta=0.5). The nonconvex penalties are scaled so
+that lamb is their slope at 0 and theta, in the units of w, the knot where they become constant (MCP) or leave the
+l1-norm (SCAD): lamb * g is the MCP of parameters (lamb, theta / lamb), and the SCAD of parameters (lamb, a) when
+theta = lamb.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import math
+import inspect
+import functools
+import numpy as np
+
+# internal library
+from util_NumbaKernels import jit, numba_available
+from util_Precision import sq_norm
+
+## scratch buffers of the numpy passes, keyed by (slot, shape, dtype)
+_scratch_buffers = {}
+
+def _scratch(slot, shape, dtype):
+	"""! Scratch buffer kept between calls
+	"""
+	key = (slot, shape, np.dtype(dtype).str)
+	buf = _scratch_buffers.get(key)
+	if buf is None:
+		buf = np.empty(shape, dtype=dtype)
+		_scratch_buffers[key] = buf
+	return buf
+
+def _output(w, out):
+	"""! Output buffer of an operator
+	"""
+	return np.empty_like(w) if out is None else out
+
+def _fused(w, out):
+	"""! Whether an operator runs its compiled loop
+	"""
+	return numba_available and w.ndim == 1 and out.ndim == 1
+
+def _source(w, out):
+	"""! Input of the numpy passes that read w after writing out, copied to a scratch buffer if out overlaps w
+	"""
+	if not np.may_share_memory(w, out):
+		return w
+	src = _scratch('source', w.shape, w.dtype)
+	np.copyto(src, w)
+	return src
+
+#=========================== Kernels ==============================
+
+@jit
+def _soft_threshold_kernel(w, thresh, scale, out):
+	"""! out = scale * sign(w) * max(|w| - thresh, 0)
+	"""
+	for i in range(w.shape[0]):
+		v = w[i]
+		if v > thresh:
+			out[i] = (v - thresh) * scale
+		elif v < -thresh:
+			out[i] = (v + thresh) * scale
+		else:
+			out[i] = 0.0
+
+@jit
+def _nonneg_threshold_kernel(w, thresh, out):
+	"""! out = max(w - thresh, 0)
+	"""
+	for i in range(w.shape[0]):
+		v = w[i] - thresh
+		out[i] = v if v > 0.0 else 0.0
+
+@jit
+def _clip_kernel(w, lower, upper, out):
+	"""! out = min(max(w, lower), upper)
+	"""
+	for i in range(w.shape[0]):
+		v = w[i]
+		if v < lower:
+			v = lower
+		elif v > upper:
+			v = upper
+		out[i] = v
+
+@jit
+def _half_l2_ball_kernel(w, out):
+	"""! Projection of w onto \f$\{w:~\|w\| \le 1,~w \ge 0\}\f$
+	"""
+	s = 0.0
+	for i in range(w.shape[0]):
+		v = w[i]
+		if v < 0.0:
+			v = 0.0
+		out[i] = v
+		s += v * v
+	if s > 1.0:
+		scale = 1.0 / math.sqrt(s)
+		for i in range(out.shape[0]):
+			out[i] = out[i] * scale
+
+@jit
+def _group_threshold_kernel(w, thresh, group_size, out):
+	"""! Block soft-thresholding of the groups of group_size consecutive coordinates
+	"""
+	d = w.shape[0]
+	for start in range(0, d, group_size):
+		end = min(start + group_size, d)
+		s = 0.0
+		for i in range(start, end):
+			s += w[i] * w[i]
+		norm = math.sqrt(s)
+		scale = 1.0 - thresh / norm if norm > thresh else 0.0
+		for i in range(start, end):
+			out[i] = w[i] * scale
+
+@jit
+def _mcp_kernel(w, thresh, theta, out):
+	"""! Firm thresholding, the proximal operator of thresh * MCP
+	"""
+	c = 1.0 / (1.0 - thresh / theta)
+	for i in range(w.shape[0]):
+		v = w[i]
+		a = abs(v)
+		x = (a - thresh) * c if a > thresh else 0.0
+		if x > a:
+			x = a
+		out[i] = x if v >= 0.0 else -x
+
+@jit
+def _scad_kernel(w, thresh, theta, a, out):
+	"""! Proximal operator of thresh * SCAD
+	"""
+	for i in range(w.shape[0]):
+		v = w[i]
+		av = abs(v)
+		if av <= theta + thresh:
+			x = av - thresh if av > thresh else 0.0
+		elif av <= a * theta:
+			x = ((a - 1.0) * theta * av - a * theta * thresh) / ((a - 1.0) * theta - thresh)
+		else:
+			x = av
+		out[i] = x if v >= 0.0 else -x
+
+#======================= Proximal operators =======================
+
+def prox_l1_norm(w, lamb, out = None):
+	"""! Compute the proximal operator of the \f$\ell_1\f$-norm
+
+	\f$ prox_{\lambda \|.\|_1} = {arg\min_x}\left\{\|.\|_1^2 + \frac{1}{2\lambda}\|x - w\|^2\right\} \f$
+
+	Parameters
+	----------
+	@param w : input vector
+	@param lamb : penalty paramemeter
+	@param out : output buffer, may be w, a new array if None
+
+	Returns
+	-------
+	@retval : perform soft-thresholding on input vector
+	"""
+	out = _output(w, out)
+	if _fused(w, out):
+		_soft_threshold_kernel(w, lamb, 1.0, out)
+	else:
+		# w - clip(w, -lamb, lamb)
+		src = _source(w, out)
+		np.clip(src, -lamb, lamb, out=out)
+		np.subtract(src, out, out=out)
+	return out
+
+def prox_elastic_net(w, lamb, mu = 1.0, out = None):
+	"""! Compute the proximal operator of the elastic net \f$\|w\|_1 + \frac{\mu}{2}\|w\|^2\f$
+
+	Parameters
+	----------
+	@param w : input vector
+	@param lamb : penalty paramemeter
+	@param mu : weight of the squared \f$\ell_2\f$-norm
+	@param out : output buffer, may be w, a new array if None
+
+	Returns
+	-------
+	@retval : soft-thresholding of w shrunk by \f$1/(1 + \lambda\mu)\f$
+	"""
+	out = _output(w, out)
+	scale = 1.0 / (1.0 + lamb * mu)
+	if _fused(w, out):
+		_soft_threshold_kernel(w, lamb, scale, out)
+	else:
+		src = _source(w, out)
+		np.clip(src, -lamb, lamb, out=out)
+		np.subtract(src, out, out=out)
+		np.multiply(out, scale, out=out)
+	return out
+
+def prox_nonneg_l1(w, lamb, out = None):
+	"""! Compute the proximal operator of \f$\|w\|_1 + \delta_{\{w \ge 0\}}(w)\f$
+
+	Parameters
+	----------
+	@param w : input vector
+	@param lamb : penalty paramemeter
+	@param out : output buffer, may be w, a new array if None
+
+	Returns
+	-------
+	@retval : \f$\max(w - \lambda, 0)\f$
+	"""
+	out = _output(w, out)
+	if _fused(w, out):
+		_nonneg_threshold_kernel(w, lamb, out)
+	else:
+		np.subtract(w, lamb, out=out)
+		np.maximum(out, 0, out=out)
+	return out
+
+def prox_box(w, lamb, lower = -1.0, upper = 1.0, out = None):
+	"""! Compute the projection onto the box \f$\{w:~lower \le w \le upper\}\f$
+
+	Parameters
+	----------
+	@param w : input vector
+	@param lamb : penalty paramemeter, unused
+	@param lower : lower bound of the coordinates
+	@param upper : upper bound of the coordinates
+	@param out : output buffer, may be w, a new array if None
+
+	Returns
+	-------
+	@retval : w clipped to [lower, upper]
+	"""
+	out = _output(w, out)
+	if _fused(w, out):
+		_clip_kernel(w, lower, upper, out)
+	else:
+		np.clip(w, lower, upper, out=out)
+	return out
+
+def prox_half_l2_ball(w, lamb, out = None):
+	"""! Compute the proximal operator of the indicator function of a half-l2 norm ball.
+
+	\f$ prox_{\lambda \delta_{\mathcal{X}}(.)} = proj_{\mathcal{X}} \f$
+
+	where $\mathcal{X} = \left\{w:~\|w\| \le 1,~w \ge 0 \right\}
+
+	Parameters
+	----------
+	@param w : input vector
+	@param lamb : penalty paramemeter, unused in this example
+	@param out : output buffer, may be w, a new array if None
+
+	Returns
+	-------
+	@return perform projection onto half-l2 ball
+
+	"""
+	out = _output(w, out)
+	if _fused(w, out):
+		_half_l2_ball_kernel(w, out)
+	else:
+		np.maximum(w, 0, out=out)
+		norm_mw = math.sqrt(np.dot(out, out))
+		if norm_mw > 1:
+			np.divide(out, norm_mw, out=out)
+	return out
+
+def prox_group_lasso(w, lamb, group_size = 10, out = None):
+	"""! Compute the proximal operator of the group lasso \f$\sum_g \|w_g\|\f$
+
+	The groups are the blocks of group_size consecutive coordinates, the last one may be shorter.
+
+	Parameters
+	----------
+	@param w : input vector
+	@param lamb : penalty paramemeter
+	@param group_size : number of coordinates of a group
+	@param out : output buffer, may be w, a new array if None
+
+	Returns
+	-------
+	@retval : every group scaled by \f$\max(1 - \lambda/\|w_g\|, 0)\f$
+	"""
+	out = _output(w, out)
+	if _fused(w, out):
+		_group_threshold_kernel(w, lamb, group_size, out)
+		return out
+
+	if not out.flags.c_contiguous:
+		raise ValueError("prox_group_lasso needs a contiguous output buffer without numba")
+
+	src = _source(w, out)
+	d = src.shape[0]
+	head = d - d % group_size
+	blocks = [(src[:head].reshape(-1, group_size), out[:head].reshape(-1, group_size))]
+	if head < d:
+		blocks.append((src[head:].reshape(1, -1), out[head:].reshape(1, -1)))
+
+	for slot, (W, O) in enumerate(blocks):
+		scale = _scratch('group_scale' + str(slot), (W.shape[0],), np.float64)
+		np.square(W, out=O)
+		np.add.reduce(O, axis=1, dtype=np.float64, out=scale)
+		np.sqrt(scale, out=scale)
+		# 1 - lamb / norm, set to 0 for the groups of norm at most lamb (including the zero groups)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			np.divide(lamb, scale, out=scale)
+		np.subtract(1.0, scale, out=scale)
+		np.fmax(scale, 0.0, out=scale)
+		np.multiply(W, scale[:, None], out=O)
+	return out
+
+def prox_mcp(w, lamb, theta = 1.0, out = None):
+	"""! Compute the proximal operator of the minimax concave penalty (MCP)
+
+	\f$ g(w) = \sum_i |w_i| - \frac{w_i^2}{2\theta} \f$ if \f$|w_i| \le \theta\f$, \f$\frac{\theta}{2}\f$ otherwise.
+
+	Parameters
+	----------
+	@param w : input vector
+	@param lamb : penalty paramemeter, smaller than theta
+	@param theta : knot where the penalty becomes constant
+	@param out : output buffer, may be w, a new array if None
+
+	Returns
+	-------
+	@retval : firm thresholding \f$sign(w)\min(|w|, \max(|w| - \lambda, 0)/(1 - \lambda/\theta))\f$
+	"""
+	if lamb >= theta:
+		raise ValueError("prox_mcp needs lamb < theta, got lamb = {} and theta = {}".format(lamb, theta))
+
+	out = _output(w, out)
+	if _fused(w, out):
+		_mcp_kernel(w, lamb, theta, out)
+		return out
+
+	src = _source(w, out)
+	abs_w = _scratch('abs', src.shape, src.dtype)
+	np.abs(src, out=abs_w)
+	np.subtract(abs_w, lamb, out=out)
+	np.maximum(out, 0, out=out)
+	np.multiply(out, 1.0 / (1.0 - lamb / theta), out=out)
+	np.minimum(out, abs_w, out=out)
+	np.copysign(out, src, out=out)
+	return out
+
+def prox_scad(w, lamb, theta = 1.0, a = 3.7, out = None):
+	"""! Compute the proximal operator of the smoothly clipped absolute deviation penalty (SCAD)
+
+	\f$ g(w) = \sum_i |w_i| \f$ if \f$|w_i| \le \theta\f$, \f$\frac{2a\theta|w_i| - w_i^2 - \theta^2}{2(a-1)\theta}\f$ if
+	\f$\theta < |w_i| \le a\theta\f$, \f$\frac{(a+1)\theta}{2}\f$ otherwise.
+
+	Parameters
+	----------
+	@param w : input vector
+	@param lamb : penalty paramemeter, smaller than (a - 1) * theta
+	@param theta : knot where the penalty leaves the \f$\ell_1\f$-norm
+	@param a : the penalty is constant beyond a * theta, a > 2
+	@param out : output buffer, may be w, a new array if None
+
+	Returns
+	-------
+	@retval : soft-thresholding of w for \f$|w_i| \le \theta + \lambda\f$, w beyond \f$a\theta\f$, linear in between
+	"""
+	if lamb >= (a - 1.0) * theta:
+		raise ValueError("prox_scad needs lamb < (a - 1) * theta, got lamb = {}, a = {}, theta = {}".format(lamb, a, theta))
+
+	out = _output(w, out)
+	if _fused(w, out):
+		_scad_kernel(w, lamb, theta, a, out)
+		return out
+
+	# min(|w|, max(|w| - lamb, 0, c |w| - e)) with the line c |w| - e of the middle piece
+	denom = (a - 1.0) * theta - lamb
+	src = _source(w, out)
+	abs_w = _scratch('abs', src.shape, src.dtype)
+	np.abs(src, out=abs_w)
+	np.multiply(abs_w, (a - 1.0) * theta / denom, out=out)
+	np.subtract(out, a * theta * lamb / denom - lamb, out=out)
+	np.maximum(out, abs_w, out=out)
+	np.subtract(out, lamb, out=out)
+	np.maximum(out, 0, out=out)
+	np.minimum(out, abs_w, out=out)
+	np.copysign(out, src, out=out)
+	return out
+
+#======================== Penalty values ==========================
+
+def func_val_l1_norm(w):
+	"""! Compute \f$\ell_1\f$-norm of a vector
+
+	Parameters
+	----------
+	@param w : input vector
+
+	Returns
+	-------
+	@retval : \f$ \|w\|_1 \f$
+	"""
+	return np.sum(np.abs(w), dtype=np.float64)
+
+def func_val_elastic_net(w, mu = 1.0):
+	"""! Compute the elastic net \f$\|w\|_1 + \frac{\mu}{2}\|w\|^2\f$
+
+	Parameters
+	----------
+	@param w : input vector
+	@param mu : weight of the squared \f$\ell_2\f$-norm
+
+	Returns
+	-------
+	@retval : value of the penalty
+	"""
+	return func_val_l1_norm(w) + 0.5 * mu * sq_norm(w)
+
+def func_val_nonneg_l1(w):
+	"""! Compute \f$\|w\|_1 + \delta_{\{w \ge 0\}}(w)\f$, the sum of w for the non-negative iterates of prox_nonneg_l1
+
+	Parameters
+	----------
+	@param w : input vector
+
+	Returns
+	-------
+	@retval : value of the penalty
+	"""
+	return np.sum(w, dtype=np.float64)
+
+def func_val_indicator(w):
+	"""! Compute function value of indicator function \f$ \delta_{\mathcal{X}}(w) \f$.
+
+	Parameters
+	----------
+	@param w : input vector
+
+	Returns
+	-------
+	@return \f$ \delta_{\mathcal{X}}(w) \f$
+	"""
+	return 0
+
+def func_val_box(w, lower = -1.0, upper = 1.0):
+	"""! Compute the indicator function of the box, 0 for the iterates of prox_box
+
+	Parameters
+	----------
+	@param w : input vector
+	@param lower : lower bound of the coordinates
+	@param upper : upper bound of the coordinates
+
+	Returns
+	-------
+	@retval : 0
+	"""
+	return 0
+
+def func_val_group_lasso(w, group_size = 10):
+	"""! Compute the group lasso \f$\sum_g \|w_g\|\f$ of the blocks of group_size consecutive coordinates
+
+	Parameters
+	----------
+	@param w : input vector
+	@param group_size : number of coordinates of a group
+
+	Returns
+	-------
+	@retval : value of the penalty
+	"""
+	w = np.asarray(w, dtype=np.float64)
+	head = len(w) - len(w) % group_size
+	value = np.sum(np.linalg.norm(w[:head].reshape(-1, group_size), axis=1))
+	return value + np.linalg.norm(w[head:])
+
+def func_val_mcp(w, theta = 1.0):
+	"""! Compute the minimax concave penalty, see prox_mcp
+
+	Parameters
+	----------
+	@param w : input vector
+	@param theta : knot where the penalty becomes constant
+
+	Returns
+	-------
+	@retval : value of the penalty
+	"""
+	abs_w = np.abs(np.asarray(w, dtype=np.float64))
+	return np.sum(np.where(abs_w <= theta, abs_w - abs_w**2 / (2*theta), theta / 2))
+
+def func_val_scad(w, theta = 1.0, a = 3.7):
+	"""! Compute the smoothly clipped absolute deviation penalty, see prox_scad
+
+	Parameters
+	----------
+	@param w : input vector
+	@param theta : knot where the penalty leaves the \f$\ell_1\f$-norm
+	@param a : the penalty is constant beyond a * theta
+
+	Returns
+	-------
+	@retval : value of the penalty
+	"""
+	abs_w = np.abs(np.asarray(w, dtype=np.float64))
+	middle = (2*a*theta*abs_w - abs_w**2 - theta**2) / (2*(a - 1)*theta)
+	return np.sum(np.where(abs_w <= theta, abs_w, np.where(abs_w <= a*theta, middle, (a + 1)*theta / 2)))
+
+## proximal operator and value of the penalties, by name
+penalties = {
+	'l1' : (prox_l1_norm, func_val_l1_norm),
+	'elastic_net' : (prox_elastic_net, func_val_elastic_net),
+	'nonneg_l1' : (prox_nonneg_l1, func_val_nonneg_l1),
+	'box' : (prox_box, func_val_box),
+	'half_l2_ball' : (prox_half_l2_ball, func_val_indicator),
+	'group_lasso' : (prox_group_lasso, func_val_group_lasso),
+	'mcp' : (prox_mcp, func_val_mcp),
+	'scad' : (prox_scad, func_val_scad),
+}
+
+def penalty_pair(name, **params):
+	"""! ProxEval/FuncG_Eval pair of a penalty
+
+	Parameters
+	----------
+	@param name : name of the penalty, see penalties
+	@param params : parameters of the penalty besides lamb, e.g. mu for the elastic net
+
+	Returns
+	-------
+	@retval ProxEval : proximal operator, called as ProxEval(w, lamb, out = None)
+	@retval FuncG_Eval : value of the penalty, called as FuncG_Eval(w)
+	"""
+	if name not in penalties:
+		raise ValueError("unknown penalty '{}', expected one of {}".format(name, ', '.join(sorted(penalties))))
+
+	ProxEval, FuncG_Eval = penalties[name]
+	if not params:
+		return ProxEval, FuncG_Eval
+	return functools.partial(ProxEval, **params), functools.partial(FuncG_Eval, **params)
+
+#=========================== Method steps ===========================
+
+def prox_with_out(ProxEval):
+	"""! Proximal operator taking an out= buffer
+
+	The operators of this module are returned as they are, user operators called as ProxEval(w, lamb) are wrapped to
+	copy their result into out.
+
+	Parameters
+	----------
+	@param ProxEval : proximal operator
+
+	Returns
+	-------
+	@retval : proximal operator called as ProxEval(w, lamb, out = None)
+	"""
+	try:
+		params = inspect.signature(ProxEval).parameters.values()
+	except (TypeError, ValueError):
+		params = []
+	if any(param.name == 'out' or param.kind == param.VAR_KEYWORD for param in params):
+		return ProxEval
+
+	@functools.wraps(ProxEval)
+	def prox_copy(w, lamb, out = None):
+		if out is None:
+			return ProxEval(w, lamb)
+		np.copyto(out, ProxEval(w, lamb))
+		return out
+	return prox_copy
+
+def prox_step(ProxEval, w, v, eta, thresh, out):
+	"""! Proximal gradient step \f$prox_{thresh \cdot g}(w - \eta v)\f$ of the methods, computed in the buffer out
+
+	Parameters
+	----------
+	@param ProxEval : proximal operator taking an out= buffer, see prox_with_out
+	@param w : iterate
+	@param v : gradient (estimator) at w
+	@param eta : step size
+	@param thresh : parameter of the proximal operator, penalty parameter x step size
+	@param out : buffer of the shape and dtype of w, must not overlap w or v
+
+	Returns
+	-------
+	@retval : out
+	"""
+	np.multiply(v, -eta, out=out)
+	out += w
+	return ProxEval(out, thresh, out=out)
+
+def averaged_prox_step(ProxEval, w, v, eta, thresh, gamma, w_hat, out):
+	"""! Averaged step \f$(1 - \gamma) w + \gamma\, prox_{thresh \cdot g}(w - \eta v)\f$ of ProxSARAH, computed in the buffer out
+
+	Parameters
+	----------
+	@param ProxEval : proximal operator taking an out= buffer, see prox_with_out
+	@param w : iterate
+	@param v : gradient estimator at w
+	@param eta : step size
+	@param thresh : parameter of the proximal operator, penalty parameter x step size
+	@param gamma : averaging weight of the proximal step
+	@param w_hat : buffer of the proximal step, overwritten
+	@param out : buffer of the shape and dtype of w, must not overlap w, v or w_hat
+
+	Returns
+	-------
+	@retval : out
+	"""
+	prox_step(ProxEval, w, v, eta, thresh, w_hat)
+	np.multiply(w, 1 - gamma, out=out)
+	w_hat *= gamma
+	out += w_hat
+	return out
+
+def grad_mapping(ProxEval, w, grad, eta, thresh, out):
+	"""! Gradient mapping \f$\frac{1}{\eta}(w - prox_{thresh \cdot g}(w - \eta \nabla f(w)))\f$, computed in the buffer out
+
+	Parameters
+	----------
+	@param ProxEval : proximal operator taking an out= buffer, see prox_with_out
+	@param w : iterate
+	@param grad : full gradient at w
+	@param eta : step size of the gradient mapping
+	@param thresh : parameter of the proximal operator, penalty parameter x eta
+	@param out : buffer of the shape and dtype of w, must not overlap w or grad
+
+	Returns
+	-------
+	@retval : out
+	"""
+	prox_step(ProxEval, w, grad, eta, thresh, out)
+	np.subtract(w, out, out=out)
+	out *= 1/(eta)
+	return out
@@ -0,0 +1,409 @@
+"""!@package util_Sampler
+
+Minibatch index samplers used by the stochastic oracles and methods.
+
+A sampler draws the row indices of each minibatch from a single seedable numpy.random.Generator and can
+pre-generate the index blocks of a whole inner loop at once. The supported sampling modes are:
+
+	'without_replacement' : each minibatch contains distinct indices (default, same as random.sample)
+
+	'with_replacement' : indices of a minibatch are drawn independently and uniformly
+
+	'shuffled_epoch' : indices are read sequentially from a random permutation of the samples which is
+	redrawn every time it has been exhausted
+
+	'shuffled_contiguous' : the rows of the data are permuted once per epoch by shuffle_rows and each minibatch
+	is a contiguous range of rows, given as a slice, which take_rows reads without copying the CSR arrays. Once
+	the rows run out before the next shuffle_rows, e.g. in an inner loop crossing the end of an epoch, the
+	minibatches are index arrays read from fresh permutations of the rows, as in 'shuffled_epoch'
+
+	'importance' : indices are drawn with replacement with probability \f$p_i = L_i / \sum_j L_j\f$ proportional
+	to the per-sample Lipschitz constants; the oracles reweight sample i by sample_weight[i] = \f$1/(n p_i)\f$
+	so that the estimators stay unbiased
+
+Indices inside a minibatch are sorted so that the row gathers on CSR matrices access memory in order.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import numpy as np
+from scipy import sparse
+
+from util_Profiler import timed
+from util_ChunkPlan import iter_row_chunks
+
+## supported sampling modes
+sampling_modes = ('without_replacement', 'with_replacement', 'shuffled_epoch', 'shuffled_contiguous', 'importance')
+
+class MinibatchSampler:
+	"""! Draw minibatch indices from a seedable random generator
+
+	Parameters
+	----------
+	@param mode : sampling mode, one of sampling_modes
+	@param seed : seed of the underlying numpy.random.Generator
+	@param sort_index : flag whether to sort the indices inside each minibatch
+	@param lipschitz : per-sample Lipschitz constants \f$L_i\f$, required in 'importance' mode
+	"""
+
+	def __init__(self, mode = 'without_replacement', seed = None, sort_index = True, lipschitz = None):
+		if mode not in sampling_modes:
+			raise ValueError("Unknown sampling mode '{}', expected one of {}".format(mode, sampling_modes))
+
+		self.mode = mode
+		self.sort_index = sort_index
+		self.seed(seed)
+
+		## per-sample weights passed to the oracles, None for uniform sampling
+		self.sample_weight = None
+		self.cdf = None
+
+		if mode == 'importance':
+			if lipschitz is None:
+				raise ValueError("'importance' sampling needs the per-sample Lipschitz constants")
+			self.set_lipschitz(lipschitz)
+
+	def set_lipschitz(self, lipschitz):
+		"""! Set the importance sampling distribution \f$p_i \propto L_i\f$
+
+		Parameters
+		----------
+		@param lipschitz : per-sample Lipschitz constants \f$L_i \ge 0\f$, not all zero
+		"""
+		lipschitz = np.asarray(lipschitz, dtype=np.float64)
+		n = len(lipschitz)
+		total = np.sum(lipschitz)
+
+		if np.any(lipschitz < 0) or total <= 0:
+			raise ValueError("Lipschitz constants must be non-negative and not all zero")
+
+		prob = lipschitz / total
+		self.cdf = np.cumsum(prob)
+
+		# samples with p_i = 0 are never drawn, their weight is irrelevant
+		self.sample_weight = np.zeros(n)
+		np.divide(1.0, n*prob, out=self.sample_weight, where=prob > 0)
+
+	def seed(self, seed = None):
+		"""! Reset the random generator
+
+		Parameters
+		----------
+		@param seed : new seed, None to draw fresh entropy from the OS
+		"""
+		self.rng = np.random.default_rng(seed)
+
+		# permutation and read position used in 'shuffled_epoch' mode
+		self.perm = None
+		self.perm_pos = 0
+
+		# read position in the permuted rows and epoch flag used in 'shuffled_contiguous' mode
+		self.row_pos = 0
+		self.epoch_done = True
+
+	def sample(self, n, b):
+		"""! Draw the indices of one minibatch
+
+		Parameters
+		----------
+		@param n : sample size
+		@param b : mini-batch size
+
+		Returns
+		-------
+		@retval index : array of b indices in [0, n)
+		"""
+		return self.sample_blocks(n, 1, b)[0]
+
+	@timed('sample')
+	def sample_blocks(self, n, num_blocks, b):
+		"""! Pre-generate the indices of several minibatches at once
+
+		This is typically called once per outer loop with num_blocks equal to the number of inner iterations.
+
+		Parameters
+		----------
+		@param n : sample size
+		@param num_blocks : number of minibatches
+		@param b : mini-batch size
+
+		Returns
+		-------
+		@retval blocks : array of shape (num_blocks, b), row t holds the indices of minibatch t.
+			In 'shuffled_contiguous' mode with b > 1, a list of num_blocks slices of length b, or index arrays once
+			the rows of the current permutation run out.
+		"""
+		b = int(b)
+		num_blocks = int(num_blocks)
+
+		if self.mode == 'shuffled_contiguous':
+			return self._next_row_ranges(n, num_blocks, b)
+
+		if self.mode == 'with_replacement':
+			blocks = self.rng.integers(0, n, size=(num_blocks, b))
+
+		elif self.mode == 'importance':
+			if len(self.cdf) != n:
+				raise ValueError("Sampler holds {} Lipschitz constants, got sample size {}".format(len(self.cdf), n))
+			u = self.rng.random((num_blocks, b)) * self.cdf[-1]
+			blocks = np.minimum(np.searchsorted(self.cdf, u, side='right'), n - 1)
+
+		elif self.mode == 'without_replacement':
+			if b == 1:
+				blocks = self.rng.integers(0, n, size=(num_blocks, 1))
+			else:
+				blocks = np.empty((num_blocks, b), dtype=np.int64)
+				for t in range(num_blocks):
+					blocks[t] = self.rng.choice(n, b, replace=False, shuffle=False)
+
+		else:
+			blocks = self._next_from_permutation(n, num_blocks*b).reshape(num_blocks, b)
+
+		if self.sort_index and b > 1:
+			blocks.sort(axis=1)
+
+		return blocks
+
+	@timed('shuffle')
+	def shuffle_rows(self, X, Y, bias, *tables):
+		"""! Permute the rows of the data at the start of a new epoch
+
+		Only does something in 'shuffled_contiguous' mode, and only once all rows of the current permutation
+		have been handed out by sample_blocks. Otherwise the inputs are returned unchanged.
+
+		Parameters
+		----------
+		@param X : input data
+		@param Y : input label, left untouched if it does not have one entry per row
+		@param bias : input bias
+		@param tables : further per-row arrays kept by a method (e.g. the ProxSAGA gradient table), permuted alike
+
+		Returns
+		-------
+		@retval X, Y, bias, *tables : the (possibly) permuted data
+		"""
+		if self.mode != 'shuffled_contiguous' or not self.epoch_done:
+			return (X, Y, bias) + tables
+
+		perm = self.rng.permutation(X.shape[0])
+
+		self.row_pos = 0
+		self.epoch_done = False
+
+		return permute_rows(perm, X, Y, bias, *tables)
+
+	def get_state(self):
+		"""! State of the random generator and of the epoch permutations, e.g. for util_Checkpoint
+
+		Returns
+		-------
+		@retval : dictionary with the generator state, the 'shuffled_epoch' permutation ('perm', None if not drawn yet)
+			and the read positions
+		"""
+		return {'rng': self.rng.bit_generator.state, 'perm': self.perm, 'perm_pos': self.perm_pos, 'row_pos': self.row_pos, \
+				'epoch_done': self.epoch_done}
+
+	def set_state(self, state):
+		"""! Continue from a state returned by get_state, the sampler then draws the same indices as the one it was taken from
+
+		Parameters
+		----------
+		@param state : dictionary returned by get_state
+		"""
+		self.rng.bit_generator.state = state['rng']
+		self.perm = None if state['perm'] is None else np.array(state['perm'], dtype=np.int64)
+		self.perm_pos = int(state['perm_pos'])
+		self.row_pos = int(state['row_pos'])
+		self.epoch_done = bool(state['epoch_done'])
+
+	def _next_row_ranges(self, n, num_blocks, b):
+		"""! Hand out the next num_blocks contiguous ranges of b rows of the permuted data
+		"""
+		# contiguous ranges while the rows of the current permutation last
+		num_ranges = min(num_blocks, max(n - self.row_pos, 0) // b)
+		starts = self.row_pos + b*np.arange(num_ranges, dtype=np.int64)
+		self.row_pos += b*num_ranges
+
+		# then, instead of reading the same rows again in the same order, draw the other minibatches from fresh
+		# permutations of the rows until shuffle_rows permutes the data again
+		extra = None
+		if num_ranges < num_blocks:
+			self.row_pos = n
+			extra = self._next_from_permutation(n, (num_blocks - num_ranges)*b).reshape(num_blocks - num_ranges, b)
+			if self.sort_index and b > 1:
+				extra.sort(axis=1)
+
+		if self.row_pos >= n:
+			self.epoch_done = True
+
+		if b == 1:
+			starts = starts.reshape(num_ranges, 1)
+			return starts if extra is None else np.concatenate((starts, extra))
+		return [slice(start, start + b) for start in starts] + ([] if extra is None else list(extra))
+
+	def _next_from_permutation(self, n, count):
+		"""! Read the next count entries of the epoch permutation, reshuffling whenever it is exhausted
+		"""
+		out = np.empty(count, dtype=np.int64)
+		filled = 0
+
+		while filled < count:
+			if self.perm is None or len(self.perm) != n or self.perm_pos >= n:
+				self.perm = self.rng.permutation(n)
+				self.perm_pos = 0
+
+			take = min(count - filled, n - self.perm_pos)
+			out[filled:filled + take] = self.perm[self.perm_pos:self.perm_pos + take]
+			filled += take
+			self.perm_pos += take
+
+		return out
+
+def permute_rows(perm, X, Y, bias, *tables):
+	"""! Reorder the rows of the data
+
+	Parameters
+	----------
+	@param perm : new order of the rows
+	@param X : input data
+	@param Y : input label, left untouched if it does not have one entry per row
+	@param bias : input bias, left untouched if it does not have one entry per row
+	@param tables : further per-row arrays, permuted alike
+
+	Returns
+	-------
+	@retval X, Y, bias, *tables : the permuted data
+	"""
+	n = X.shape[0]
+
+	X = X[perm]
+	if len(Y) == n:
+		Y = Y[perm]
+	if len(bias) == n:
+		bias = bias[perm]
+	tables = tuple(table[perm] for table in tables)
+
+	return (X, Y, bias) + tables
+
+## sampler used by the oracles when no index is given
+default_sampler = MinibatchSampler()
+
+def batch_index(n, b, index = None):
+	"""! Return the minibatch indices used by an oracle
+
+	Parameters
+	----------
+	@param n : sample size
+	@param b : mini-batch size
+	@param index : pre-generated indices, if None a fresh minibatch is drawn from default_sampler
+
+	Returns
+	-------
+	@retval index : array of b indices in [0, n)
+	"""
+	if index is None:
+		return default_sampler.sample(n, b)
+	return index
+
+def take_weights(weight, index, start, end):
+	"""! Gather the importance weights of the entries index[start:end] of a mini-batch
+
+	Parameters
+	----------
+	@param weight : per-sample weights, None for uniform sampling
+	@param index : mini-batch indices, either an index array or a slice of contiguous rows
+	@param start : first position inside the mini-batch
+	@param end : one past the last position inside the mini-batch
+
+	Returns
+	-------
+	@retval : 1.0 for uniform sampling, else the weights of the selected samples
+	"""
+	if weight is None:
+		return 1.0
+	return take_rows(weight, index, start, end)
+
+def row_norms_sq(X):
+	"""! Squared \f$\ell_2\f$-norm of every row of X
+
+	Parameters
+	----------
+	@param X : CSR matrix or dense array
+
+	Returns
+	-------
+	@retval : vector of length n with \f$\|x_i\|^2\f$
+	"""
+	if sparse.isspmatrix_csr(X):
+		# chunk by chunk, X may be mapped from a file
+		norms = np.empty(X.shape[0], dtype=X.dtype)
+		for start, end in iter_row_chunks(X, X.shape[0]):
+			rows = csr_row_view(X, start, end)
+			norms[start:end] = np.asarray(rows.multiply(rows).sum(axis=1)).ravel()
+		return norms
+	if sparse.issparse(X):
+		return np.asarray(X.multiply(X).sum(axis=1)).ravel()
+	return np.einsum('ij,ij->i', X, X)
+
+def csr_row_view(X, start, end):
+	"""! Rows start:end of a CSR matrix that share data and indices with X
+
+	Parameters
+	----------
+	@param X : CSR matrix
+	@param start : first row
+	@param end : one past the last row
+
+	Returns
+	-------
+	@retval : CSR matrix of shape (end - start, d), only its row pointer is newly allocated
+	"""
+	indptr = X.indptr[start:end + 1]
+	first = indptr[0]
+	last = indptr[-1]
+
+	# assign the arrays after construction, the constructor prunes (copies) views of larger buffers
+	view = sparse.csr_matrix((end - start, X.shape[1]), dtype=X.dtype)
+	view.data = X.data[first:last]
+	view.indices = X.indices[first:last]
+	view.indptr = indptr - first
+
+	return view
+
+def take_rows(A, index, start, end):
+	"""! Gather the entries index[start:end] of a mini-batch from a matrix or vector
+
+	Parameters
+	----------
+	@param A : CSR matrix, dense array or vector
+	@param index : mini-batch indices, either an index array or a slice of contiguous rows
+	@param start : first position inside the mini-batch
+	@param end : one past the last position inside the mini-batch
+
+	Returns
+	-------
+	@retval : the selected rows, a view of A when index is a slice
+	"""
+	if isinstance(index, slice):
+		start = index.start + start
+		end = index.start + end
+		if sparse.isspmatrix_csr(A):
+			return csr_row_view(A, start, end)
+		return A[start:end]
+
+	return A[index[start:end]]
@@ -0,0 +1,119 @@
+"""!@package util_SharedData
+
+Arrays and CSR matrices published in multiprocessing.shared_memory blocks.
+
+The parent process copies each array once into a new block with share_arrays and hands the returned description to
+its workers. The workers map the blocks with attach_arrays without copying, and rebuild CSR matrices around the
+mapped arrays with csr_from_arrays. Used by util_SharedGrad and util_ExperimentRunner.
+
+Arrays that are read-only maps of a file (see util_OutOfCore) are not copied: the workers map the same file region.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+from multiprocessing import shared_memory
+import numpy as np
+from scipy import sparse
+
+from util_OutOfCore import file_region
+
+def share_arrays(arrays):
+	"""! Copy arrays into new shared memory blocks
+
+	Parameters
+	----------
+	@param arrays : dictionary of numpy arrays
+
+	Returns
+	-------
+	@retval blocks : dictionary of the created SharedMemory blocks, to be closed and unlinked by the caller
+	@retval spec : dictionary {key: (block name, shape, dtype, file region)} describing the blocks to the workers, the
+		block name is None and the file region (file name, offset) is set for the arrays mapped read-only from a file
+	"""
+	blocks = {}
+	spec = {}
+	for key, array in arrays.items():
+		region = file_region(array) if isinstance(array, np.ndarray) and array.nbytes > 0 else None
+		if region is not None and region[2] == 'r':
+			spec[key] = (None, array.shape, array.dtype, region[:2])
+			continue
+
+		array = np.asarray(array)
+		block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+		np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+		blocks[key] = block
+		spec[key] = (block.name, array.shape, array.dtype, None)
+	return blocks, spec
+
+def attach_arrays(spec, read_only = False):
+	"""! Map the shared arrays described by spec
+
+	Parameters
+	----------
+	@param spec : description returned by share_arrays
+	@param read_only : flag whether to map the arrays read-only
+
+	Returns
+	-------
+	@retval blocks : dictionary of the mapped SharedMemory blocks, to be kept alive as long as the arrays are used
+	@retval arrays : dictionary of the arrays
+	"""
+	blocks = {}
+	arrays = {}
+	for key, (name, shape, dtype, region) in spec.items():
+		if name is None:
+			arrays[key] = np.memmap(region[0], dtype=dtype, mode='r', offset=region[1], shape=shape)
+			continue
+
+		blocks[key] = shared_memory.SharedMemory(name=name)
+		arrays[key] = np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf)
+		if read_only:
+			arrays[key].flags.writeable = False
+	return blocks, arrays
+
+def csr_from_arrays(data, indices, indptr, shape):
+	"""! CSR matrix around existing arrays, without copying them
+
+	Parameters
+	----------
+	@param data : values
+	@param indices : column indices
+	@param indptr : row pointer
+	@param shape : shape of the matrix
+
+	Returns
+	-------
+	@retval : the CSR matrix
+	"""
+	# assign the arrays after construction, the constructor may copy them
+	X = sparse.csr_matrix(shape, dtype=data.dtype)
+	X.data = data
+	X.indices = indices
+	X.indptr = indptr
+	return X
+
+def release_blocks(blocks):
+	"""! Close and unlink shared memory blocks created by share_arrays
+
+	Parameters
+	----------
+	@param blocks : dictionary of SharedMemory blocks, views of them must have been dropped before
+	"""
+	for block in blocks.values():
+		block.close()
+		block.unlink()
@@ -0,0 +1,196 @@
+"""!@package util_SharedGrad
+
+Full gradients computed by a pool of worker processes sharing the training data.
+
+The b = n branch of the grad_eval oracles is a serial loop over the rows. SharedGradEngine copies the CSR arrays of the
+training data, the labels and the bias once into multiprocessing.shared_memory blocks and starts a pool of workers
+that map them without copying. Each worker owns a contiguous shard of rows, balanced by number of non-zeros, and runs
+the unchanged oracle on it. The partial sums \f$X_s^{\top} r_s\f$ and the margins of the shard are written to shared
+output buffers and reduced by the calling process.
+
+The engine is used transparently through wrap(GradEval), which only redirects full gradients of the data it holds.
+Mini-batch calls, and full gradients of other data (e.g. the rows permuted in 'shuffled_contiguous' mode), still go to
+the serial oracle.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import os
+import functools
+import multiprocessing as mp
+import numpy as np
+from scipy import sparse
+
+from util_Sampler import csr_row_view
+from util_SharedData import share_arrays, attach_arrays, csr_from_arrays, release_blocks
+
+## arrays mapped by a worker process, set by _init_worker
+_worker_arrays = {}
+
+def _init_worker(spec, shape):
+	"""! Pool initializer, maps the shared data and rebuilds the CSR matrix around it
+	"""
+	blocks, arrays = attach_arrays(spec)
+
+	_worker_arrays.update(arrays)
+	_worker_arrays['X'] = csr_from_arrays(arrays['data'], arrays['indices'], arrays['indptr'], shape)
+	_worker_arrays['blocks'] = blocks
+
+def _shard_full_grad(GradEval, k, nnzX):
+	"""! Full gradient of shard k, stored as a sum in row k of the shared gradient buffer
+	"""
+	start, end = _worker_arrays['bounds'][k]
+	m = end - start
+	n, d = _worker_arrays['X'].shape
+
+	X = csr_row_view(_worker_arrays['X'], start, end)
+	Y = _worker_arrays['Y']
+	bias = _worker_arrays['bias']
+	if len(Y) == n:
+		Y = Y[start:end]
+	if len(bias) == n:
+		bias = bias[start:end]
+
+	grad, XYw = GradEval(m, d, m, X, Y, bias, _worker_arrays['w'], nnzX)
+
+	_worker_arrays['grad'][k] = m * grad
+	_worker_arrays['XYw'][start:end] = XYw
+
+def shard_bounds(indptr, num_shards, min_rows = 2):
+	"""! Split the rows of a CSR matrix into contiguous shards with about the same number of non-zeros
+
+	Parameters
+	----------
+	@param indptr : row pointer of the CSR matrix
+	@param num_shards : requested number of shards
+	@param min_rows : minimum number of rows of a shard, the oracles treat a single row as a stochastic sample
+
+	Returns
+	-------
+	@retval : array of shape (num_shards, 2) with the first and one past the last row of each shard
+	"""
+	n = len(indptr) - 1
+	targets = np.linspace(0, indptr[-1], num_shards + 1)[1:-1]
+	cuts = np.searchsorted(indptr, targets)
+
+	bounds = [0]
+	for cut in cuts:
+		if cut - bounds[-1] >= min_rows and n - cut >= min_rows:
+			bounds.append(int(cut))
+	bounds.append(n)
+
+	return np.array([bounds[:-1], bounds[1:]]).T
+
+class SharedGradEngine:
+	"""! Pool of worker processes computing full gradients on row shards of shared training data
+
+	Parameters
+	----------
+	@param X : train data, CSR matrix
+	@param Y : train label
+	@param bias : bias vector
+	@param num_workers : number of worker processes, os.cpu_count() if None
+	"""
+
+	def __init__(self, X, Y, bias, num_workers = None):
+		if not sparse.isspmatrix_csr(X):
+			raise ValueError("SharedGradEngine needs the train data as a CSR matrix")
+
+		if num_workers is None:
+			num_workers = os.cpu_count()
+
+		self.X = X
+		self.Y = Y
+		self.bias = bias
+		self.n, self.d = X.shape
+
+		bounds = shard_bounds(X.indptr, max(min(num_workers, self.n // 2), 1))
+		self.num_shards = len(bounds)
+
+		# inputs are copied once, outputs are written by the workers
+		arrays = {
+			'data' : X.data,
+			'indices' : X.indices,
+			'indptr' : X.indptr,
+			'Y' : np.asarray(Y),
+			'bias' : np.asarray(bias),
+			'bounds' : bounds,
+			'w' : np.zeros(self.d, dtype=X.dtype),
+			'grad' : np.zeros((self.num_shards, self.d), dtype=X.dtype),
+			'XYw' : np.zeros(self.n, dtype=X.dtype),
+		}
+		self.blocks, spec = share_arrays(arrays)
+		self.arrays = {key: np.ndarray(spec[key][1], dtype=spec[key][2], buffer=self.blocks[key].buf) for key in ('w', 'grad', 'XYw')}
+
+		# fork does not re-import the driver scripts, which have no __main__ guard
+		context = mp.get_context('fork' if 'fork' in mp.get_all_start_methods() else None)
+		self.pool = context.Pool(self.num_shards, initializer=_init_worker, initargs=(spec, X.shape))
+
+	def full_grad(self, GradEval, w, nnzX = 0):
+		"""! Compute the full gradient in parallel
+
+		Parameters
+		----------
+		@param GradEval : module level gradient oracle, run unchanged on every shard
+		@param w : input vector
+		@param nnzX : average number of non-zero elements for each sample
+
+		Returns
+		-------
+		@retval : the full gradient
+		@retval : the margins returned by GradEval, e.g. \f$ Y(Xw + bias)\f$
+		"""
+		self.arrays['w'][:] = w
+		self.pool.starmap(_shard_full_grad, [(GradEval, k, nnzX) for k in range(self.num_shards)], chunksize=1)
+
+		return self.arrays['grad'].sum(axis=0) / float(self.n), self.arrays['XYw'].copy()
+
+	def wrap(self, GradEval):
+		"""! Gradient oracle with the signature of GradEval whose full gradients of the shared data run on the pool
+
+		Parameters
+		----------
+		@param GradEval : module level gradient oracle
+
+		Returns
+		-------
+		@retval : the wrapped oracle
+		"""
+		@functools.wraps(GradEval)
+		def grad_eval(n, d, b, X, Y, bias, w, nnzX = 0, index = None, weight = None):
+			if b < n or X is not self.X or Y is not self.Y or bias is not self.bias:
+				return GradEval(n, d, b, X, Y, bias, w, nnzX, index, weight)
+			return self.full_grad(GradEval, w, nnzX)
+
+		return grad_eval
+
+	def close(self):
+		"""! Stop the workers and release the shared memory
+		"""
+		self.pool.close()
+		self.pool.join()
+		# drop the views before unmapping the blocks
+		self.arrays = {}
+		release_blocks(self.blocks)
+		self.blocks = {}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
@@ -0,0 +1,145 @@
+"""!@package util_Stopping
+
+Stopping criteria checked by the methods at every logging point, besides their maximum number of epochs.
+
+At a logging point a method knows the number of epochs, the train loss, the squared norm of the gradient mapping and,
+with isAccEval, the test accuracy. StoppingPolicy.check decides from them whether to stop the run:
+
+	grad_map_tol : the squared norm of the gradient mapping is at most this tolerance
+
+	time_limit : the wall-clock time since the start of the run exceeds this many seconds
+
+	test_acc_target : the test accuracy reaches this target
+
+	plateau_window, plateau_tol : the best train loss of the last plateau_window logging points improved on the loss
+		recorded plateau_window points earlier by at most plateau_tol relatively
+
+The criteria are only checked at logging points (about once per epoch), so they need is_fun_eval. Once a run has
+stopped, reason names the criterion that stopped it ('max_num_epoch' if none did) and detail describes it.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import time
+
+class StoppingPolicy:
+	"""! Stopping criteria of a run, None disables a criterion
+
+	Parameters
+	----------
+	@param grad_map_tol : tolerance on the squared norm of the gradient mapping
+	@param time_limit : wall-clock budget of the run in seconds
+	@param test_acc_target : test accuracy at which to stop, only checked with isAccEval
+	@param plateau_window : number of logging points over which the train loss has to improve
+	@param plateau_tol : minimum relative improvement of the train loss over plateau_window logging points
+	"""
+
+	def __init__(self, grad_map_tol = None, time_limit = None, test_acc_target = None, plateau_window = None, plateau_tol = 1.0e-4):
+		self.grad_map_tol = grad_map_tol
+		self.time_limit = time_limit
+		self.test_acc_target = test_acc_target
+		self.plateau_window = plateau_window
+		self.plateau_tol = plateau_tol
+		self.start()
+
+	def start(self):
+		"""! Start a run: reset the clock, the loss window and the reason
+		"""
+		self.start_time = time.time()
+		self.losses = []
+
+		## criterion that stopped the run, None while it is running
+		self.reason = None
+		## description of the stop
+		self.detail = ''
+
+	def _stop(self, reason, detail):
+		self.reason = reason
+		self.detail = detail
+		return True
+
+	def check(self, num_epoch, train_loss, norm_grad_map, test_accuracy = None):
+		"""! Check the criteria at a logging point
+
+		Parameters
+		----------
+		@param num_epoch : number of epochs
+		@param train_loss : train loss
+		@param norm_grad_map : squared norm of the gradient mapping
+		@param test_accuracy : test accuracy, None if not computed
+
+		Returns
+		-------
+		@retval : True if the run has to stop, the criterion is then in reason
+		"""
+		if self.reason is not None:
+			return True
+
+		if self.grad_map_tol is not None and norm_grad_map <= self.grad_map_tol:
+			return self._stop('grad_map_tol', '||Grad Map||^2 = {:.3e} <= {:.3e} at epoch {:.4f}'.format(norm_grad_map, \
+						self.grad_map_tol, num_epoch))
+
+		if self.test_acc_target is not None and test_accuracy is not None and test_accuracy >= self.test_acc_target:
+			return self._stop('test_acc_target', 'test accuracy {:.5f} >= {:.5f} at epoch {:.4f}'.format(test_accuracy, \
+						self.test_acc_target, num_epoch))
+
+		if self.plateau_window is not None:
+			self.losses.append(float(train_loss))
+			if len(self.losses) > self.plateau_window:
+				old_loss = self.losses[-self.plateau_window - 1]
+				best_loss = min(self.losses[-self.plateau_window:])
+				if old_loss - best_loss <= self.plateau_tol * abs(old_loss):
+					return self._stop('plateau', 'train loss improved by less than {:.1e} over the last {} logging points at epoch {:.4f}'\
+								.format(self.plateau_tol, self.plateau_window, num_epoch))
+
+		return self.check_time(num_epoch)
+
+	def check_time(self, num_epoch):
+		"""! Check the wall-clock budget, at every outer-loop boundary of the methods whether they log or not
+
+		Parameters
+		----------
+		@param num_epoch : number of epochs
+
+		Returns
+		-------
+		@retval : True if the run has to stop, the criterion is then in reason
+		"""
+		if self.reason is not None:
+			return True
+
+		if self.time_limit is not None:
+			elapsed = time.time() - self.start_time
+			if elapsed >= self.time_limit:
+				return self._stop('time_limit', '{:.2f} seconds >= {:.2f} seconds at epoch {:.4f}'.format(elapsed, self.time_limit, num_epoch))
+
+		return False
+
+	def finish(self, num_epoch, verbose = 0):
+		"""! End a run, the reason is 'max_num_epoch' if no criterion stopped it
+
+		Parameters
+		----------
+		@param num_epoch : number of epochs
+		@param verbose : flag whether to print the reason
+		"""
+		if self.reason is None:
+			self._stop('max_num_epoch', 'maximum number of epochs reached at epoch {:.4f}'.format(num_epoch))
+
+		if verbose:
+			print('Stopped ({}): {}'.format(self.reason, self.detail))
@@ -0,0 +1,101 @@
+"""!@package util_Synthetic
+
+Deterministic synthetic sparse datasets, e.g. for benchmarking the oracles without a LIBSVM file.
+
+synthetic_csr draws a CSR matrix of n rows and d columns with about density*n*d non-zeros. With skew s = 0 the
+non-zeros are spread uniformly over the rows and columns. With s > 0 the row lengths and the column frequencies follow
+power laws with exponent s, so that a few long rows and a few frequent columns hold most of the non-zeros, as in text
+datasets like news20 or rcv1. The rows are normalized to unit norm like the drivers do, and the labels split the
+margins of a random linear model at their median. The same arguments always give the same dataset.
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+# external library
+import numpy as np
+from scipy import sparse
+
+def _power_law(rng, size, skew):
+	"""! Weights proportional to rank^(-skew), randomly assigned to size items
+	"""
+	weights = np.arange(1, size + 1, dtype=np.float64) ** (-skew)
+	return weights[rng.permutation(size)]
+
+def synthetic_csr(n, d, density = 0.01, skew = 0.0, seed = 0, dtype = np.float64, max_draws = 20):
+	"""! Draw a sparse binary classification dataset
+
+	Parameters
+	----------
+	@param n : number of rows
+	@param d : number of columns
+	@param density : fraction of non-zeros
+	@param skew : exponent of the power laws of the row lengths and column frequencies, 0 for uniform
+	@param seed : seed of the random generator
+	@param dtype : floating point type of the values
+	@param max_draws : number of rounds redrawing the duplicate columns of the rows, a heavily skewed matrix can end
+		up with a few less non-zeros than asked
+
+	Returns
+	-------
+	@retval X : n x d CSR matrix with sorted indices and rows of unit norm
+	@retval Y : n labels in {-1, 1}
+	"""
+	if n <= 0 or d <= 0:
+		raise ValueError("The dataset needs at least one row and one column, got {} x {}".format(n, d))
+	if not 0 < density <= 1:
+		raise ValueError("The density must be in (0, 1], got {}".format(density))
+
+	rng = np.random.default_rng(seed)
+	nnz = max(int(round(density * n * d)), 1)
+
+	# row lengths proportional to the row weights, at least one non-zero per row while there are enough
+	row_weights = _power_law(rng, n, skew)
+	row_len = np.floor(nnz * row_weights / row_weights.sum()).astype(np.int64)
+	if nnz >= n:
+		row_len = np.maximum(row_len, 1)
+	row_len = np.minimum(row_len, d)
+
+	# columns drawn from the column frequencies, redrawing the duplicates of a row until it has its length
+	col_cdf = np.cumsum(_power_law(rng, d, skew))
+	keys = np.empty(0, dtype=np.int64)
+	missing = row_len
+	for _ in range(max_draws):
+		rows = np.repeat(np.arange(n), missing)
+		if len(rows) == 0:
+			break
+		cols = np.minimum(np.searchsorted(col_cdf, rng.random(len(rows)) * col_cdf[-1], side='right'), d - 1)
+		keys = np.unique(np.concatenate((keys, rows * d + cols)))
+		missing = row_len - np.bincount(keys // d, minlength=n)
+
+	# keys are sorted, so are the rows and the indices within a row
+	rows, cols = keys // d, keys % d
+	vals = rng.random(len(keys)) + 0.1
+
+	# normalize the rows
+	vals /= np.sqrt(np.bincount(rows, weights=vals**2, minlength=n))[rows]
+
+	# 32-bit indices like the matrices loaded from LIBSVM files, unless they overflow
+	index_dtype = np.int32 if max(len(keys), d) < 2**31 else np.int64
+	indptr = np.zeros(n + 1, dtype=index_dtype)
+	np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+	X = sparse.csr_matrix((vals, cols.astype(index_dtype), indptr), shape=(n, d))
+
+	# labels of a random linear model, split at the median margin
+	margins = X.dot(rng.standard_normal(d))
+	Y = np.where(margins > np.median(margins), 1.0, -1.0)
+
+	return X.astype(dtype), Y.astype(dtype)
@@ -0,0 +1,320 @@
+"""@package benchmark_convergence
+
+Convergence-versus-time benchmark of the methods on the fully connected network of example_neural_net_1.py.
+
+Every selected method is run with the step sizes and batch sizes of example_neural_net_1.py on a synthetic dataset of
+small random images or on a dataset of load_data (mnist, fashion_mnist, cached by keras after the first download), and
+the training time it takes to reach given thresholds of the squared norm of the gradient mapping and of the train loss
+is reported per algorithm and batch size. The methods return the training time at every logging point in hist_Time,
+without the time spent on the stats. The thresholds are checked at the logging points.
+
+The results are saved in the JSON format of python_src/benchmark_convergence.py, so that
+
+    python ../python_src/benchmark_convergence.py -show benchmark_convergence_tf.json other_results.json
+
+prints them next to other results.
+
+Example: python benchmark_convergence.py -n 6000 -ep 5 -a ProxSARAH-v2,ProxSVRG-mb
+
+Copyright (c) 2019 Nhan H. Pham, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Quoc Tran-Dinh, Department of Statistics and Operations Research, University of North Carolina at Chapel Hill
+
+Copyright (c) 2019 Lam M. Nguyen, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+
+Copyright (c) 2019 Dzung T. Phan, IBM Research, Thomas J. Watson Research Center
+Yorktown Heights
+All rights reserved.
+
+If you found this helpful and are using it within our software please cite the following publication:
+
+* N. H. Pham, L. M. Nguyen, D. T. Phan, and Q. Tran-Dinh, **[ProxSARAH: An Efficient Algorithmic Framework for Stochastic Composite Nonconvex Optimization](https://arxiv.org/abs/1902.05679)**, _arXiv preprint arXiv:1902.05679_, 2019.
+
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tensorflow as tf
+from keras import backend as K
+import numpy as np
+
+from models import *
+from load_data import *
+
+# import methods
+from method_ProxSARAH import *
+from method_ProxSpiderBoost import *
+from method_ProxSVRG import *
+from method_ProxSGD import *
+
+def synthetic_images(n, size, num_classes, seed):
+    """! Draw a classification dataset of n random size x size images, one class center per class plus noise
+
+    Parameters
+    ----------
+    @param n : number of images
+    @param size : number of rows and columns of an image
+    @param num_classes : number of classes
+    @param seed : seed of the random generator
+
+    Returns
+    -------
+    @retval x : images, shape (n, size, size, 1) or (n, 1, size, size) with channels first
+    @retval y : one-hot labels, shape (n, num_classes)
+    """
+    rng = np.random.RandomState(seed)
+    centers = rng.rand(num_classes, size * size)
+    labels = rng.randint(num_classes, size=n)
+    x = (centers[labels] + 0.5 * rng.rand(n, size * size)).astype('float32')
+    if K.image_data_format() == 'channels_first':
+        x = x.reshape(n, 1, size, size)
+    else:
+        x = x.reshape(n, size, size, 1)
+    y = np.eye(num_classes, dtype='float32')[labels]
+    return x, y
+
+def solver_configs(n, L, eta_prox_spdb, eta_prox_svrg):
+    """! Runs of the benchmark, with the parameters example_neural_net_1.py uses for batch size 1 and for its mini-batch
+    variants
+
+    Parameters
+    ----------
+    @param n : number of train samples
+    @param L : Lipschitz constant of the driver
+    @param eta_prox_spdb : step size of ProxSpiderBoost
+    @param eta_prox_svrg : step size of mini-batch ProxSVRG
+
+    Returns
+    -------
+    @retval : list of (name, algorithm, b, method, params), params are the arguments of the method between the data and
+        the model
+    """
+    # params for ProxSARAH, see the driver
+    c, r = 1.0, 1.0
+    q = 2 + c + (1/r)
+    omega = (q**2 + 8) / (q**2)
+    gamma_const = np.array([0.5, 0.95, 0.99, 0.95, 0.99])
+    eta_prox_sarah = 2.0 / (q + gamma_const * L)
+
+    sarah_single_eta = 2 * np.sqrt(omega * n) / (q * np.sqrt(omega * n) + 1)
+    sarah_single_gamma = 1.0 / (L * np.sqrt(omega * n))
+    sarah_v2_b = max(int(n**0.5), 1)
+    sarah_v4_b = max(int(n**(1.0/3.0)), 1)
+
+    spdb_b = max(int(round(np.sqrt(n))), 1)
+    svrg_b = max(int(round(n**(2.0/3.0))), 1)
+    sgd_b = max(int(round(np.sqrt(n))), 1)
+
+    lamb = 1.0 / n
+    eta_comp = 0.5
+
+    return [
+        ('ProxSARAH-single', 'ProxSARAH', 1, Prox_SARAH, (sarah_single_eta, eta_comp, lamb, sarah_single_gamma, n, 1, n)),
+        ('ProxSARAH-v2', 'ProxSARAH', sarah_v2_b, Prox_SARAH, (eta_prox_sarah[2], eta_comp, lamb, gamma_const[2], n, sarah_v2_b, \
+            max(n // sarah_v2_b, 1))),
+        ('ProxSARAH-v4', 'ProxSARAH', sarah_v4_b, Prox_SARAH, (eta_prox_sarah[4], eta_comp, lamb, gamma_const[4], n, sarah_v4_b, \
+            sarah_v4_b)),
+        ('ProxSpiderBoost', 'ProxSpiderBoost', spdb_b, Prox_SPDBoost, (eta_prox_spdb, eta_comp, lamb, n, spdb_b, max(n // spdb_b, 1))),
+        ('ProxSVRG-single', 'ProxSVRG', 1, Prox_SVRG, (1, 0.005, eta_comp, lamb, n)),
+        ('ProxSVRG-mb', 'ProxSVRG', svrg_b, Prox_SVRG, (svrg_b, eta_prox_svrg, eta_comp, lamb, max(n // svrg_b, 1))),
+        ('ProxSGD-single', 'ProxSGD', 1, Prox_SGD, (1, 0.1, 0.05, eta_comp, lamb)),
+        ('ProxSGD-mb', 'ProxSGD', sgd_b, Prox_SGD, (sgd_b, 0.1, 0.5, eta_comp, lamb)),
+    ]
+
+def run_config(config, data, model, max_num_epoch, verbose):
+    """! Run one configuration and return its history with the training times
+
+    Returns
+    -------
+    @retval : dictionary of lists times, epochs, losses and grad_norms, one entry per logging point
+    """
+    name, algorithm, b, method, params = config
+    x, y, x_train, y_train, x_test, y_test = data
+    w_list, w_list_dup, loss_operation, loss_operation_dup, accuracy_operation = model
+    hist_Time = []
+
+    # the maximum number of epochs sits between the parameters of each signature
+    if method is Prox_SARAH:
+        args = params[:6] + (max_num_epoch, params[6], w_list, loss_operation, accuracy_operation)
+    elif method is Prox_SPDBoost:
+        args = params[:5] + (max_num_epoch, params[5], w_list, loss_operation, accuracy_operation)
+    elif method is Prox_SVRG:
+        args = params[:4] + (max_num_epoch, params[4], w_list, w_list_dup, loss_operation, loss_operation_dup, accuracy_operation)
+    else:
+        args = params + (max_num_epoch, w_list, loss_operation, accuracy_operation)
+
+    hist = method(x, y, x_train, y_train, x_test, y_test, *args, verbose=verbose, log_enable=1, hist_Time=hist_Time)
+
+    return {'times': hist_Time, 'epochs': list(hist[2]), 'losses': list(hist[3]), 'grad_norms': list(hist[4])}
+
+def first_hit(rep, column, threshold):
+    """! Training time and epochs at the first logging point where rep[column] <= threshold, (None, None) if never
+    """
+    for elapsed, epoch, value in zip(rep['times'], rep['epochs'], rep[column]):
+        if value <= threshold:
+            return float(elapsed), float(epoch)
+    return None, None
+
+def summarize(runs, grad_tols, loss_targets):
+    """! Rows of the comparison table, medians over the repeats with None (not reached) counted as infinite
+    """
+    def median(values):
+        value = float(np.median([np.inf if v is None else v for v in values]))
+        return None if np.isinf(value) else value
+
+    rows = []
+    for run in runs:
+        repeats = run['repeats']
+        row = {
+            'name': run['name'], 'algorithm': run['algorithm'], 'b': int(run['b']), 'framework': 'tensorflow',
+            'repeats': len(repeats),
+            'time_to_grad': [], 'epochs_to_grad': [], 'time_to_loss': [], 'epochs_to_loss': [],
+            'final_loss': float(np.median([rep['losses'][-1] for rep in repeats])),
+            'final_grad_map': float(np.median([rep['grad_norms'][-1] for rep in repeats])),
+            'epochs': float(np.median([rep['epochs'][-1] for rep in repeats])),
+            'train_time': float(np.median([rep['times'][-1] for rep in repeats])),
+        }
+        for key, column, thresholds in (('grad', 'grad_norms', grad_tols), ('loss', 'losses', loss_targets)):
+            for threshold in thresholds:
+                hits = [first_hit(rep, column, threshold) for rep in repeats]
+                row['time_to_' + key].append(median([hit[0] for hit in hits]))
+                row['epochs_to_' + key].append(median([hit[1] for hit in hits]))
+        rows.append(row)
+
+    return rows
+
+def print_rows(results):
+    """! Print the time to reach each threshold, one line per algorithm and batch size
+    """
+    headers = ['||G||^2<={:g}'.format(tol) for tol in results['grad_thresholds']] + list(results['loss_labels'])
+    print('Time in seconds to reach each threshold (epochs), without the stats:')
+    for row in results['rows']:
+        cells = []
+        for key in ('grad', 'loss'):
+            for elapsed, epochs in zip(row['time_to_' + key], row['epochs_to_' + key]):
+                cells.append('-' if elapsed is None else '{:.3f} ({:.1f})'.format(elapsed, epochs))
+        print('{:<18} b = {:<6d}'.format(row['name'], row['b']), ', '.join('{}: {}'.format(h, c) for h, c in zip(headers, cells)), \
+            ', final loss: {:.3e}, final ||G||^2: {:.3e}, time: {:.3f}'.format(row['final_loss'], row['final_grad_map'], row['train_time']))
+
+def parse_args(argv = None):
+    """! Options of the benchmark, see python benchmark_convergence.py -h
+    """
+    ap = argparse.ArgumentParser(description='Time to reach gradient mapping and loss thresholds of the methods')
+    ap.add_argument("-d", "--data", default=None, choices=['mnist', 'fashion_mnist'],
+        help="dataset of load_data (default: synthetic images)")
+    ap.add_argument("-n", "--numrows", type=int, default=6000, help="number of synthetic images (default 6000)")
+    ap.add_argument("-sz", "--size", type=int, default=8, help="rows and columns of the synthetic images (default 8)")
+    ap.add_argument("-sd", "--seed", type=int, default=0, help="seed of the synthetic data and of the first repeat (default 0)")
+    ap.add_argument("-a", "--algorithms", default=None,
+        help="comma separated runs (default: all of " + ', '.join(config[0] for config in solver_configs(100, 1.0, 0.1, 0.1)) + ")")
+    ap.add_argument("-ep", "--epochs", type=int, default=5, help="maximum number of epochs of a run (default 5)")
+    ap.add_argument("-gt", "--gradtol", default='1e-2,1e-3',
+        help="comma separated thresholds on ||Grad Map||^2 (default 1e-2,1e-3)")
+    ap.add_argument("-lt", "--losstarget", default=None, help="comma separated absolute thresholds on the train loss")
+    ap.add_argument("-lg", "--lossgap", default='1e-1,1e-2',
+        help="comma separated fractions of the initial suboptimality: F <= F* + gap (F0 - F*), F* the best loss of all runs (default 1e-1,1e-2)")
+    ap.add_argument("-r", "--repeat", type=int, default=1, help="number of repeats with different shuffling seeds (default 1)")
+    ap.add_argument("-v", "--verbose", type=int, default=0, help="flag whether the methods print their progress (default 0)")
+    ap.add_argument("-o", "--output", default='benchmark_convergence_tf.json',
+        help="JSON file of the results (default benchmark_convergence_tf.json)")
+    return ap.parse_args(argv)
+
+def _floats(option):
+    return [] if not option else [float(value) for value in option.split(',')]
+
+def main(argv = None):
+    args = parse_args(argv)
+
+    # load data
+    if args.data is None:
+        dataset = {'name': 'synthetic_images', 'n': args.numrows, 'size': args.size, 'seed': args.seed}
+        x_train, y_train = synthetic_images(args.numrows, args.size, 10, args.seed)
+        start_idx = int(0.9 * args.numrows)
+        x_train, x_test, y_train, y_test = x_train[:start_idx], x_train[start_idx:], y_train[:start_idx], y_train[start_idx:]
+    else:
+        dataset = {'name': args.data}
+        x_train, y_train, x_test, y_test = load_data(args.data)
+
+    # normalize data like the drivers, every image to unit norm
+    axis = (1, 2, 3)
+    x_train = x_train / np.sqrt(np.sum(x_train**2, axis=axis, keepdims=True))
+    x_test = x_test / np.sqrt(np.sum(x_test**2, axis=axis, keepdims=True))
+    dataset.update({'num_train': len(x_train), 'num_test': len(x_test), 'shape': list(x_train.shape[1:])})
+    print('Dataset:', dataset)
+
+    # model of example_neural_net_1.py
+    if K.image_data_format() == 'channels_first':
+        img_rows, img_cols, num_channel = x_train.shape[2], x_train.shape[3], x_train.shape[1]
+    else:
+        img_rows, img_cols, num_channel = x_train.shape[1], x_train.shape[2], x_train.shape[3]
+
+    x = tf.placeholder(tf.float32, (None, img_rows, img_cols, num_channel))
+    y = tf.placeholder(tf.int32, (None, y_train.shape[1]))
+    logits, logits_dup, w_list, w_list_dup = model1(x, img_rows * img_cols * num_channel, y_train.shape[1])
+
+    loss_operation = tf.reduce_mean(tf.nn.softmax_cross_entropy_with_logits_v2(logits=logits, labels=tf.stop_gradient(y)))
+    loss_operation_dup = tf.reduce_mean(tf.nn.softmax_cross_entropy_with_logits_v2(logits=logits_dup, labels=tf.stop_gradient(y)))
+    correct_prediction = tf.equal(tf.argmax(logits, 1), tf.argmax(y, 1))
+    accuracy_operation = tf.reduce_mean(tf.cast(correct_prediction, tf.float32))
+
+    # step sizes of the driver, the mnist ones for the synthetic data
+    n = len(x_train)
+    if args.data == 'fashion_mnist':
+        configs = solver_configs(n, 4.0, 0.15, 0.11)
+    else:
+        configs = solver_configs(n, 1.0, 0.12, 0.2)
+    if args.algorithms:
+        names = args.algorithms.split(',')
+        unknown = set(names) - set(config[0] for config in configs)
+        if unknown:
+            raise ValueError("Unknown runs: {}".format(', '.join(sorted(unknown))))
+        configs = [config for config in configs if config[0] in names]
+
+    data = (x, y, x_train, y_train, x_test, y_test)
+    model = (w_list, w_list_dup, loss_operation, loss_operation_dup, accuracy_operation)
+
+    runs = []
+    for config in configs:
+        print('Run {} (b = {})'.format(config[0], config[2]))
+        repeats = []
+        for repeat in range(args.repeat):
+            # the methods sample with random and np.random
+            random.seed(args.seed + repeat)
+            np.random.seed(args.seed + repeat)
+            repeats.append(run_config(config, data, model, args.epochs, args.verbose))
+        runs.append({'name': config[0], 'algorithm': config[1], 'b': config[2], 'repeats': repeats})
+
+    # loss thresholds relative to the initial loss and the best train loss of all runs
+    best_loss = min(float(np.min(rep['losses'])) for run in runs for rep in run['repeats'])
+    init_loss = float(runs[0]['repeats'][0]['losses'][0])
+    loss_targets = _floats(args.losstarget)
+    loss_labels = ['F<={:.4g}'.format(target) for target in loss_targets]
+    for gap in _floats(args.lossgap):
+        loss_targets.append(best_loss + gap * (init_loss - best_loss))
+        loss_labels.append('F-F*<={:g}(F0-F*)'.format(gap))
+
+    grad_tols = _floats(args.gradtol)
+    results = {
+        'machine': {'python': platform.python_version(), 'numpy': np.__version__, 'tensorflow': tf.__version__, \
+                    'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'date': time.strftime('%Y-%m-%d %H:%M:%S')},
+        'dataset': dataset, 'framework': 'tensorflow', 'max_num_epoch': args.epochs, 'init_loss': init_loss,
+        'best_loss': best_loss, 'grad_thresholds': grad_tols, 'loss_thresholds': loss_targets, 'loss_labels': loss_labels,
+        'rows': summarize(runs, grad_tols, loss_targets),
+    }
+    print_rows(results)
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print('Results saved to', args.output)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
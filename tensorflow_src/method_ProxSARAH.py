@@ -34,6 +34,7 @@ import numpy as np
 import random
 import pandas as pd
 import math
+import time
 
 from utils import *
 
@@ -42,7 +43,7 @@ from utils import *
 
 def Prox_SARAH(x, y, x_train, y_train, x_test, y_test, LR, LR_COMP, LBD, GAMMA, \
                grad_batch_size, inner_batch_size, MAX_TOTAL_EPOCH, MAX_INNER_ITERATION, \
-               w_list, loss_operation, accuracy_operation, verbose = 1, log_enable = 1):
+               w_list, loss_operation, accuracy_operation, verbose = 1, log_enable = 1, hist_Time = None):
 
     """! ProxSARAH algorithm
 
@@ -73,6 +74,8 @@ def Prox_SARAH(x, y, x_train, y_train, x_test, y_test, LR, LR_COMP, LBD, GAMMA,
             1 : print iteration info
 
     @param log_enable : flag whether to compute and log data
+    @param hist_Time : list receiving the training time in seconds at every logging point, excluding the time spent on
+        the stats (loss, accuracies, full gradient and gradient mapping), None to skip
 
     Returns
     -------
@@ -251,6 +254,10 @@ def Prox_SARAH(x, y, x_train, y_train, x_test, y_test, LR, LR_COMP, LBD, GAMMA,
         # store previous time when message had been printed
         last_print_num_grad = num_grad
 
+        # training time excluding the stats, for hist_Time
+        stats_time = 0.0
+        start_time = time.time()
+
         # print first time info
         if verbose:
             print(
@@ -267,12 +274,14 @@ def Prox_SARAH(x, y, x_train, y_train, x_test, y_test, LR, LR_COMP, LBD, GAMMA,
         while num_epoch < MAX_TOTAL_EPOCH:
             
             if grad_batch_size < num_examples:
-                # compute full gradient and assign to v0
+                # compute full gradient and assign to v0, only used by the gradient mapping so not training time
+                stats_start = time.time()
                 sess.run(trainer_set_v0_to_zero)
                 for j in range(num_batches_grad_full): 
                     batch_X = x_train[bs*j:bs*(j+1)]
                     batch_Y = y_train[bs*j:bs*(j+1)]
                     sess.run(trainer_add_grad_to_v0, feed_dict={x: batch_X, y: batch_Y, scale: scale_full})
+                stats_time += time.time() - stats_start
         
                 # Compute batch gradient
                 index = random.sample(range(num_examples), grad_batch_size)
@@ -295,6 +304,9 @@ def Prox_SARAH(x, y, x_train, y_train, x_test, y_test, LR, LR_COMP, LBD, GAMMA,
                 sess.run(trainer_assign_v_to_v0)
 
             if log_enable:
+                # the stats are timed separately, they are not part of the training time
+                stats_start = time.time()
+
                 # calculate loss, test accuracy
                 sess.run(trainer_set_norm_l1_w_to_zero)
                 sess.run(trainer_calc_norm_l1_w)
@@ -322,9 +334,13 @@ def Prox_SARAH(x, y, x_train, y_train, x_test, y_test, LR, LR_COMP, LBD, GAMMA,
                         '{:^13.5f}'.format(test_accuracy)
                     )
 
+                # training time up to this logging point
+                if hist_Time is not None:
+                    hist_Time.append(stats_start - start_time - stats_time)
+
                 # update history
                 hist_TrainLoss.append(train_loss)
-                hist_GradNorm.append(np.asscalar(grad_map_norm_square))
+                hist_GradNorm.append(float(grad_map_norm_square))
                 hist_MinGradNorm.append(min_grad_map_norm_square)
                 hist_NumEpoch.append(num_epoch)
                 hist_NumGrad.append(num_grad)
@@ -334,6 +350,9 @@ def Prox_SARAH(x, y, x_train, y_train, x_test, y_test, LR, LR_COMP, LBD, GAMMA,
                 # update print time
                 last_print_num_grad = num_grad
 
+                # exclude the stats from the training time
+                stats_time += time.time() - stats_start
+
             # update number of gradient evaluations
             num_grad += grad_batch_size
             num_epoch = num_grad / num_examples
@@ -378,6 +397,9 @@ def Prox_SARAH(x, y, x_train, y_train, x_test, y_test, LR, LR_COMP, LBD, GAMMA,
                 num_epoch = num_grad / num_examples
 
                 if log_enable and (num_grad - last_print_num_grad >= num_examples or num_epoch >= MAX_TOTAL_EPOCH):
+                    # the stats are timed separately, they are not part of the training time
+                    stats_start = time.time()
+
                     # calculate loss, test accuracy
                     sess.run(trainer_set_norm_l1_w_to_zero)
                     sess.run(trainer_calc_norm_l1_w)
@@ -412,9 +434,13 @@ def Prox_SARAH(x, y, x_train, y_train, x_test, y_test, LR, LR_COMP, LBD, GAMMA,
                             '{:^13.5f}'.format(test_accuracy)
                         )
 
+                    # training time up to this logging point
+                    if hist_Time is not None:
+                        hist_Time.append(stats_start - start_time - stats_time)
+
                     # update history
                     hist_TrainLoss.append(train_loss)
-                    hist_GradNorm.append(np.asscalar(grad_map_norm_square))
+                    hist_GradNorm.append(float(grad_map_norm_square))
                     hist_MinGradNorm.append(min_grad_map_norm_square)
                     hist_NumEpoch.append(num_epoch)
                     hist_NumGrad.append(num_grad)
@@ -424,6 +450,9 @@ def Prox_SARAH(x, y, x_train, y_train, x_test, y_test, LR, LR_COMP, LBD, GAMMA,
                     # update print time
                     last_print_num_grad = num_grad
 
+                    # exclude the stats from the training time
+                    stats_time += time.time() - stats_start
+
                     # check if we're done
                     if num_epoch >= MAX_TOTAL_EPOCH:
                         break
@@ -36,6 +36,7 @@ import numpy as np
 import random
 import pandas as pd
 import math
+import time
 
 from utils import *
 
@@ -44,7 +45,7 @@ from utils import *
 # ProxSGD
 
 def Prox_SGD(x, y, x_train, y_train, x_test, y_test, batch_size, LRinit, LRprime, LR_COMP, LBD, MAX_TOTAL_EPOCH,\
-        w_list, loss_operation, accuracy_operation, verbose = 1, log_enable = 1):
+        w_list, loss_operation, accuracy_operation, verbose = 1, log_enable = 1, hist_Time = None):
 
     """! ProxSGD algorithm
 
@@ -73,6 +74,8 @@ def Prox_SGD(x, y, x_train, y_train, x_test, y_test, batch_size, LRinit, LRprime
             1 : print iteration info
 
     @param log_enable : flag whether to compute and log data
+    @param hist_Time : list receiving the training time in seconds at every logging point, excluding the time spent on
+        the stats (loss, accuracies, full gradient and gradient mapping), None to skip
 
     Returns
     -------
@@ -236,10 +239,17 @@ def Prox_SGD(x, y, x_train, y_train, x_test, y_test, batch_size, LRinit, LRprime
         # store previous time when message had been printed
         last_print_num_grad = num_grad
 
+        # training time excluding the stats, for hist_Time
+        stats_time = 0.0
+        start_time = time.time()
+
         # count total number of iterations
         total_iter = 0
 
         if log_enable:
+            # the stats are timed separately, they are not part of the training time
+            stats_start = time.time()
+
             # calculate loss, test accuracy
             sess.run(trainer_set_norm_l1_w_to_zero)
             sess.run(trainer_calc_norm_l1_w)
@@ -283,9 +293,13 @@ def Prox_SGD(x, y, x_train, y_train, x_test, y_test, batch_size, LRinit, LRprime
                         '{:^13.5f}'.format(test_accuracy),'|',
                     )
 
+            # training time up to this logging point
+            if hist_Time is not None:
+                hist_Time.append(stats_start - start_time - stats_time)
+
             # update history
             hist_TrainLoss.append(train_loss)
-            hist_GradNorm.append(np.asscalar(grad_map_norm_square))
+            hist_GradNorm.append(float(grad_map_norm_square))
             hist_MinGradNorm.append(min_grad_map_norm_square)
             hist_NumEpoch.append(num_epoch)
             hist_NumGrad.append(num_grad)
@@ -294,6 +308,9 @@ def Prox_SGD(x, y, x_train, y_train, x_test, y_test, batch_size, LRinit, LRprime
 
             # update print time
             last_print_num_grad = num_grad
+
+            # exclude the stats from the training time
+            stats_time += time.time() - stats_start
         
         # ProxSGD main loop
         while num_epoch < MAX_TOTAL_EPOCH:
@@ -333,6 +350,9 @@ def Prox_SGD(x, y, x_train, y_train, x_test, y_test, batch_size, LRinit, LRprime
             sess.run(trainer_update_w, feed_dict={lr: LR, lbd: LBD})
             
             if log_enable and (num_grad - last_print_num_grad >= num_examples or num_epoch >= MAX_TOTAL_EPOCH):
+                # the stats are timed separately, they are not part of the training time
+                stats_start = time.time()
+
                 # calculate loss, test accuracy
                 sess.run(trainer_set_norm_l1_w_to_zero)
                 sess.run(trainer_calc_norm_l1_w)
@@ -374,9 +394,13 @@ def Prox_SGD(x, y, x_train, y_train, x_test, y_test, batch_size, LRinit, LRprime
                         '{:^13.5f}'.format(test_accuracy),'|',
                     )
 
+                # training time up to this logging point
+                if hist_Time is not None:
+                    hist_Time.append(stats_start - start_time - stats_time)
+
                 # update history
                 hist_TrainLoss.append(train_loss)
-                hist_GradNorm.append(np.asscalar(grad_map_norm_square))
+                hist_GradNorm.append(float(grad_map_norm_square))
                 hist_MinGradNorm.append(min_grad_map_norm_square)
                 hist_NumEpoch.append(num_epoch)
                 hist_NumGrad.append(num_grad)
@@ -386,6 +410,9 @@ def Prox_SGD(x, y, x_train, y_train, x_test, y_test, batch_size, LRinit, LRprime
                 # update print time
                 last_print_num_grad = num_grad
 
+                # exclude the stats from the training time
+                stats_time += time.time() - stats_start
+
         #end main loop
         print(' {message:{fill}{align}{width}}'.format(message='',fill='=',align='^',width=87,))
 
@@ -36,6 +36,7 @@ import numpy as np
 from sklearn.utils import shuffle
 import pandas as pd
 import math
+import time
 
 from utils import *
 
@@ -44,7 +45,7 @@ from utils import *
 # ProxSVRG
 
 def Prox_SVRG(x, y, x_train, y_train, x_test, y_test, inner_batch_size, LR, LR_COMP, LBD, MAX_TOTAL_EPOCH, MAX_INNER_ITERATION, \
-                w_list, w_list_dup, loss_operation, loss_operation_dup, accuracy_operation, verbose = 1, log_enable = 1):
+                w_list, w_list_dup, loss_operation, loss_operation_dup, accuracy_operation, verbose = 1, log_enable = 1, hist_Time = None):
     
     """! ProxSVRG algorithm
 
@@ -75,6 +76,8 @@ def Prox_SVRG(x, y, x_train, y_train, x_test, y_test, inner_batch_size, LR, LR_C
             1 : print iteration info
 
     @param log_enable : flag whether to compute and log data
+    @param hist_Time : list receiving the training time in seconds at every logging point, excluding the time spent on
+        the stats (loss, accuracies, full gradient and gradient mapping), None to skip
 
     Returns
     -------
@@ -244,6 +247,10 @@ def Prox_SVRG(x, y, x_train, y_train, x_test, y_test, inner_batch_size, LR, LR_C
         # store previous time when message had been printed
         last_print_num_grad = num_grad
 
+        # training time excluding the stats, for hist_Time
+        stats_time = 0.0
+        start_time = time.time()
+
         # print first time info
         if verbose:
             print(
@@ -270,6 +277,9 @@ def Prox_SVRG(x, y, x_train, y_train, x_test, y_test, inner_batch_size, LR, LR_C
                 sess.run(trainer_add_grad_to_v0, feed_dict={x: batch_X, y: batch_Y, scale: scale_full})
                    
             if log_enable:
+                # the stats are timed separately, they are not part of the training time
+                stats_start = time.time()
+
                 # calculate loss, test accuracy
                 sess.run(trainer_set_norm_l1_w_to_zero)
                 sess.run(trainer_calc_norm_l1_w)
@@ -297,9 +307,13 @@ def Prox_SVRG(x, y, x_train, y_train, x_test, y_test, inner_batch_size, LR, LR_C
                         '{:^13.5f}'.format(test_accuracy)
                     )
 
+                # training time up to this logging point
+                if hist_Time is not None:
+                    hist_Time.append(stats_start - start_time - stats_time)
+
                 # update history
                 hist_TrainLoss.append(train_loss)
-                hist_GradNorm.append(np.asscalar(grad_map_norm_square))
+                hist_GradNorm.append(float(grad_map_norm_square))
                 hist_MinGradNorm.append(min_grad_map_norm_square)
                 hist_NumEpoch.append(num_epoch)
                 hist_NumGrad.append(num_grad)
@@ -309,6 +323,9 @@ def Prox_SVRG(x, y, x_train, y_train, x_test, y_test, inner_batch_size, LR, LR_C
                 # update print time
                 last_print_num_grad = num_grad
 
+                # exclude the stats from the training time
+                stats_time += time.time() - stats_start
+
             # update number of gradient evaluations
             num_grad += num_examples
             num_epoch += 1
@@ -346,6 +363,9 @@ def Prox_SVRG(x, y, x_train, y_train, x_test, y_test, inner_batch_size, LR, LR_C
                 num_epoch = num_grad / num_examples
 
                 if log_enable and (num_grad - last_print_num_grad >= num_examples or num_epoch >= MAX_TOTAL_EPOCH):
+                    # the stats are timed separately, they are not part of the training time
+                    stats_start = time.time()
+
                     # calculate loss, test accuracy
                     sess.run(trainer_set_norm_l1_w_to_zero)
                     sess.run(trainer_calc_norm_l1_w)
@@ -380,9 +400,13 @@ def Prox_SVRG(x, y, x_train, y_train, x_test, y_test, inner_batch_size, LR, LR_C
                             '{:^13.5f}'.format(test_accuracy)
                         )
 
+                    # training time up to this logging point
+                    if hist_Time is not None:
+                        hist_Time.append(stats_start - start_time - stats_time)
+
                     # update history
                     hist_TrainLoss.append(train_loss)
-                    hist_GradNorm.append(np.asscalar(grad_map_norm_square))
+                    hist_GradNorm.append(float(grad_map_norm_square))
                     hist_MinGradNorm.append(min_grad_map_norm_square)
                     hist_NumEpoch.append(num_epoch)
                     hist_NumGrad.append(num_grad)
@@ -392,6 +416,9 @@ def Prox_SVRG(x, y, x_train, y_train, x_test, y_test, inner_batch_size, LR, LR_C
                     # update print time
                     last_print_num_grad = num_grad
 
+                    # exclude the stats from the training time
+                    stats_time += time.time() - stats_start
+
                     # check if we're done
                     if num_epoch >= MAX_TOTAL_EPOCH:
                         break